@@ -36,6 +36,10 @@ import time
 import threading
 from go_server_client import GoServerClient
 from local_command_server import LocalCommandServer
+try:
+    import wireguard_status
+except ImportError:
+    wireguard_status = None
 from dbus.exceptions import DBusException
 
 from advertisement import Advertisement
@@ -544,11 +548,14 @@ class CommandCharacteristic(Characteristic):
                         ["sudo", "systemctl", "start", "wireguard-support.service"],
                         capture_output=True, text=True, timeout=60
                     )
-                    status_result = subprocess.run(
-                        ["bash", "/usr/bin/fula/wireguard/status.sh"],
-                        capture_output=True, text=True, timeout=10
-                    )
-                    response = json.loads(status_result.stdout) if status_result.returncode == 0 else {"status": "started", "returncode": result.returncode}
+                    if wireguard_status is not None:
+                        response = wireguard_status.get_status(max_age=0)
+                    else:
+                        status_result = subprocess.run(
+                            ["bash", "/usr/bin/fula/wireguard/status.sh"],
+                            capture_output=True, text=True, timeout=10
+                        )
+                        response = json.loads(status_result.stdout) if status_result.returncode == 0 else {"status": "started", "returncode": result.returncode}
                 except Exception as e:
                     response = {"error": str(e)}
                 print(f"WireGuard start response: {response}")
@@ -559,6 +566,8 @@ class CommandCharacteristic(Characteristic):
                         ["sudo", "systemctl", "stop", "wireguard-support.service"],
                         capture_output=True, text=True, timeout=30
                     )
+                    if wireguard_status is not None:
+                        wireguard_status.invalidate()
                     response = {"status": "stopped"}
                 except Exception as e:
                     response = {"error": str(e)}
@@ -566,11 +575,14 @@ class CommandCharacteristic(Characteristic):
 
             elif val == "wireguard/status":
                 try:
-                    result = subprocess.run(
-                        ["bash", "/usr/bin/fula/wireguard/status.sh"],
-                        capture_output=True, text=True, timeout=10
-                    )
-                    response = json.loads(result.stdout) if result.returncode == 0 else {"error": "status check failed"}
+                    if wireguard_status is not None:
+                        response = wireguard_status.get_status()
+                    else:
+                        result = subprocess.run(
+                            ["bash", "/usr/bin/fula/wireguard/status.sh"],
+                            capture_output=True, text=True, timeout=10
+                        )
+                        response = json.loads(result.stdout) if result.returncode == 0 else {"error": "status check failed"}
                 except Exception as e:
                     response = {"error": str(e)}
                 print(f"WireGuard status response: {response}")
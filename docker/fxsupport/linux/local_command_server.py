@@ -7,6 +7,11 @@ from urllib.parse import urlparse
 
 import requests
 
+try:
+    import wireguard_status  # shipped next to this script by fula.sh
+except ImportError:
+    wireguard_status = None
+
 
 PLUGIN_MANIFEST_GLOB = "/home/pi/.internal/plugins/*/ble_commands.json"
 PLUGIN_PROXY_DEFAULT_TIMEOUT_S = 10
@@ -117,7 +122,7 @@ class LocalCommandServer:
                 ['sudo', 'systemctl', 'start', 'wireguard-support.service'],
                 capture_output=True, text=True, timeout=60
             )
-            status = self._wireguard_status()
+            status = self._wireguard_status(fresh=True)
             if isinstance(status, dict):
                 return status
             return {"status": "started", "returncode": result.returncode}
@@ -130,12 +135,16 @@ class LocalCommandServer:
                 ['sudo', 'systemctl', 'stop', 'wireguard-support.service'],
                 capture_output=True, text=True, timeout=30
             )
+            if wireguard_status is not None:
+                wireguard_status.invalidate()
             return {"status": "stopped"}
         except Exception as e:
             return f"Error: {str(e)}"
 
-    def _wireguard_status(self):
+    def _wireguard_status(self, fresh=False):
         try:
+            if wireguard_status is not None:
+                return wireguard_status.get_status(max_age=0 if fresh else None)
             result = subprocess.run(
                 ['bash', '/usr/bin/fula/wireguard/status.sh'],
                 capture_output=True, text=True, timeout=10
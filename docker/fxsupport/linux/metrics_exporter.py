@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+OpenMetrics exporter for the device state
+
+Used by readiness-check.py, which serves and refreshes the metrics; run
+directly it prints them once from the state store. The /run/fula-*.state
+files are otherwise read one at a time over BLE. render() turns them, plus
+the watchdog timing metrics, into OpenMetrics gauges and counters so fleets
+can be scraped with standard tooling. Both outputs are opt-in:
+
+- METRICS_EXPORTER_PORT=<port> serves GET /metrics on METRICS_EXPORTER_BIND,
+  127.0.0.1 unless overridden (scrape over the support tunnel or an SSH
+  forward; nothing is exposed to the LAN by default);
+- METRICS_TEXTFILE_PATH=<dir>/fula.prom rewrites the same metrics every
+  METRICS_TEXTFILE_INTERVAL_SEC for node_exporter's textfile collector, in
+  the Prometheus text format it parses (counter families named with their
+  _total suffix, no "# EOF").
+
+Sections are taken from one read of the consolidated state store
+(state_store.py), falling back to the per-file views; either file is only
+parsed again when its inode, mtime or size changes.
+
+Environment (or defaults):
+    METRICS_EXPORTER_PORT           0 (off)
+    METRICS_EXPORTER_BIND           127.0.0.1
+    METRICS_TEXTFILE_PATH           "" (off)
+    METRICS_TEXTFILE_INTERVAL_SEC   60
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import state_store  # shipped next to this script by fula.sh
+except ImportError:
+    state_store = None
+
+PORT = int(os.environ.get("METRICS_EXPORTER_PORT", "0"))
+BIND = os.environ.get("METRICS_EXPORTER_BIND", "127.0.0.1")
+TEXTFILE_PATH = os.environ.get("METRICS_TEXTFILE_PATH", "")
+TEXTFILE_INTERVAL_SEC = int(os.environ.get("METRICS_TEXTFILE_INTERVAL_SEC", "60"))
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_logger = logging.getLogger(__name__)
+_cache_lock = threading.Lock()
+_cache = {}  # path -> ((inode, mtime_ns, size), parsed JSON or None)
+_server_lock = threading.Lock()
+_server_thread = None
+
+
+def read_state_cached(path):
+    """Parsed JSON of a state file, re-read only when the file changed; None
+    if missing or unparseable."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        with _cache_lock:
+            _cache.pop(path, None)
+        return None
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = None
+    with _cache_lock:
+        _cache[path] = (key, data)
+    return data
+
+
+def _iso_epoch(ts):
+    try:
+        return (datetime.fromisoformat(ts.rstrip("Z")) - datetime(1970, 1, 1)).total_seconds()
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _om_escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _ms_to_s(ms):
+    return ms / 1000.0 if isinstance(ms, (int, float)) else None
+
+
+class MetricFamilies:
+    """Collects samples per metric family, in first-seen order."""
+
+    def __init__(self):
+        self.families = {}
+
+    def add(self, family, kind, help_text, value, labels=None, suffix=""):
+        if value is None or isinstance(value, (dict, list, str)):
+            return
+        self.families.setdefault(family, (kind, help_text, []))[2].append(
+            (family + suffix, labels or {}, float(value)))
+
+    # Positional-only so that "name" is free to be a label.
+    def gauge(self, family, help_text, value, /, **labels):
+        self.add(family, "gauge", help_text, value, labels)
+
+    def counter(self, family, help_text, value, /, **labels):
+        self.add(family, "counter", help_text, value, labels, "_total")
+
+    def render(self, eof=True):
+        """OpenMetrics text; eof=False gives Prometheus text format instead,
+        where a counter's TYPE/HELP must carry the sample name (_total) or
+        the samples end up untyped."""
+        lines = []
+        for name, (kind, help_text, samples) in self.families.items():
+            if kind == "counter" and not eof:
+                name += "_total"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {_om_escape(help_text)}")
+            for sample, labels, value in samples:
+                label_text = ",".join(f'{k}="{_om_escape(v)}"' for k, v in labels.items())
+                value_text = str(int(value)) if value.is_integer() else repr(value)
+                lines.append(f"{sample}{{{label_text}}} {value_text}" if label_text else f"{sample} {value_text}")
+        if eof:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def state_view(paths=None):
+    """({section: data}, {section: updated_epoch}) from one store read;
+    sections the store lacks come from their compatibility files. paths maps
+    section -> compatibility file (state_store.SECTIONS by default)."""
+    if paths is None:
+        paths = state_store.SECTIONS if state_store is not None else {}
+    doc = read_state_cached(state_store.STORE_PATH) if state_store is not None else None
+    if not isinstance(doc, dict) or doc.get("format") != state_store.FORMAT_VERSION:
+        doc = {}
+    sections = doc.get("sections") or {}
+    view, updated = {}, {}
+    for section, path in paths.items():
+        entry = sections.get(section)
+        if isinstance(entry, dict) and isinstance(entry.get("data"), dict):
+            view[section] = entry["data"]
+            updated[section] = entry.get("updated_epoch")
+        else:
+            view[section] = read_state_cached(path)
+    return view, updated
+
+
+def _collect_state_metrics(m, view, updated):
+    for section, ts in sorted(updated.items()):
+        m.gauge("fula_state_updated_timestamp_seconds", "Last update of a state store section", ts,
+                section=section)
+    hb = view.get("heartbeat") or {}
+    if hb:
+        m.gauge("fula_heartbeat_last_attempt_timestamp_seconds", "Last heartbeat POST attempt",
+                _iso_epoch(hb.get("last_attempt_ts")))
+        m.gauge("fula_heartbeat_ok", "1 if the last heartbeat returned HTTP 200", hb.get("http_status") == 200)
+        m.gauge("fula_heartbeat_http_status", "HTTP status of the last heartbeat", hb.get("http_status"))
+        m.gauge("fula_heartbeat_latency_seconds", "Round trip of the last heartbeat POST",
+                _ms_to_s(hb.get("latency_ms")))
+        m.gauge("fula_heartbeat_circuits", "Relay circuits reported in the last heartbeat",
+                hb.get("last_circuit_count"))
+    disc = view.get("discovery") or {}
+    if disc:
+        m.gauge("fula_discovery_ok", "1 if the discovery API was reachable over HTTPS", disc.get("ok"))
+        m.gauge("fula_discovery_latency_seconds", "Discovery API probe latency", _ms_to_s(disc.get("latency_ms")))
+    tm = view.get("time") or {}
+    if tm:
+        m.gauge("fula_time_synced", "1 if the clock is NTP-synchronised", tm.get("synced"))
+        m.gauge("fula_time_offset_seconds", "NTP offset", _ms_to_s(tm.get("offset_ms")))
+    wg = view.get("wireguard") or {}
+    if wg:
+        m.gauge("fula_wireguard_active", "1 if the support tunnel is up", wg.get("active"))
+        m.gauge("fula_wireguard_handshake_age_seconds", "Age of the last WireGuard handshake",
+                wg.get("last_handshake_age_sec"))
+        m.counter("fula_wireguard_receive_bytes", "Bytes received over the support tunnel", wg.get("rx_bytes"))
+        m.counter("fula_wireguard_transmit_bytes", "Bytes sent over the support tunnel", wg.get("tx_bytes"))
+        m.gauge("fula_wireguard_bounce_failures", "Consecutive failed tunnel bounces", wg.get("consec_failures"))
+    for c in (view.get("containers") or {}).get("containers") or ():
+        name = c.get("name")
+        if not name:
+            continue
+        m.gauge("fula_container_running", "1 if the container is running", c.get("state") == "running",
+                name=name)
+        m.counter("fula_container_restarts", "Docker restart count", c.get("restart_count"), name=name)
+        m.gauge("fula_container_oom_killed", "1 if the last exit was an OOM kill", c.get("oom_killed"), name=name)
+        res = c.get("resources") or {}
+        m.gauge("fula_container_memory_bytes", "cgroup memory.current", res.get("memory_bytes"), name=name)
+        m.gauge("fula_container_cpu_cores", "CPU cores used over the sampler window", res.get("cpu_cores"),
+                name=name)
+        m.gauge("fula_container_read_bytes_per_second", "Block reads over the sampler window",
+                res.get("read_bps"), name=name)
+        m.gauge("fula_container_write_bytes_per_second", "Block writes over the sampler window",
+                res.get("write_bps"), name=name)
+        m.gauge("fula_container_memory_pressure_some_avg60", "memory.pressure some avg60, percent",
+                (res.get("memory_pressure") or {}).get("some_avg60"), name=name)
+    pw = view.get("power") or {}
+    if pw:
+        m.gauge("fula_power_max_temp_celsius", "Hottest thermal zone at the last check", pw.get("max_temp_c"))
+        for q in ("p50", "p95", "max"):
+            m.gauge("fula_power_temp_window_celsius", "Hottest thermal zone over the sampler window",
+                    (pw.get("thermal") or {}).get(q), stat=q)
+        m.gauge("fula_power_soc_voltage_ratio", "SoC rail voltage / minimum voltage", pw.get("soc_voltage_ratio"))
+        m.gauge("fula_power_undervoltage_events_24h", "Undervoltage events in the last 24h",
+                pw.get("undervoltage_events_24h"))
+        m.gauge("fula_uptime_seconds", "System uptime", pw.get("uptime_s"))
+        for policy, t in (pw.get("cpu_throttle") or {}).items():
+            m.gauge("fula_cpu_capped_ratio", "Share of the window with scaling_max_freq below hardware max",
+                    t.get("capped_pct") / 100.0 if t.get("capped_pct") is not None else None, policy=policy)
+
+
+def _collect_watchdog_metrics(m, wd):
+    m.counter("fula_watchdog_subprocess_spawns", "Subprocesses spawned by the watchdog", wd.get("subprocess_spawns"))
+    for kind, label in (("checks", "check"), ("cycles", "cycle")):
+        family = f"fula_watchdog_{label}_duration_seconds"
+        for name, s in (wd.get(kind) or {}).items():
+            labels = {label: name}
+            for q, key in (("0.5", "p50_s"), ("0.95", "p95_s")):
+                m.add(family, "summary", f"Watchdog {label} duration", s[key], {**labels, "quantile": q})
+            m.add(family, "summary", f"Watchdog {label} duration", s["sum_s"], labels, "_sum")
+            m.add(family, "summary", f"Watchdog {label} duration", s["count"], labels, "_count")
+            m.counter(f"fula_watchdog_{label}_errors", f"Watchdog {label} runs that raised", s["errors"], **labels)
+            m.counter(f"fula_watchdog_{label}_spawns", f"Subprocesses spawned by the {label}", s["spawns"], **labels)
+
+
+def render(paths=None, watchdog=None, eof=True):
+    """OpenMetrics text for the state sections and watchdog metrics. watchdog
+    is the live watchdog_metrics() dict; without it the published
+    watchdog_metrics section is used. eof=False renders Prometheus text
+    format for node_exporter's textfile collector."""
+    view, updated = state_view(paths)
+    m = MetricFamilies()
+    _collect_state_metrics(m, view, updated)
+    wd = watchdog if watchdog is not None else view.get("watchdog_metrics")
+    if isinstance(wd, dict):
+        _collect_watchdog_metrics(m, wd)
+    return m.render(eof)
+
+
+def write_textfile(text, path=None):
+    """Replace the node_exporter textfile with text (temp write + rename)."""
+    path = path or TEXTFILE_PATH
+    tmp = "{}.tmp.{}".format(path, os.getpid())
+    try:
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError as e:
+        _logger.warning("could not write metrics textfile %s: %s", path, e)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics; serve() subclasses it with the render callable."""
+
+    render = staticmethod(render)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        _logger.debug("metrics exporter: " + fmt, *args)
+
+
+def make_server(render_fn, bind=None, port=None):
+    """ThreadingHTTPServer answering /metrics with render_fn(); raises
+    OSError if the address can't be bound."""
+    handler = type("MetricsHandler", (MetricsHandler,), {"render": staticmethod(render_fn)})
+    server = ThreadingHTTPServer((bind or BIND, PORT if port is None else port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(render_fn, bind=None, port=None):
+    """Serve /metrics on a daemon thread unless one already is. Returns
+    False if the address couldn't be bound."""
+    global _server_thread
+    bind, port = bind or BIND, PORT if port is None else port
+    with _server_lock:
+        if _server_thread is not None and _server_thread.is_alive():
+            return True
+        try:
+            server = make_server(render_fn, bind, port)
+        except OSError as e:
+            _logger.warning("metrics exporter could not bind %s:%s: %s", bind, port, e)
+            return False
+        _server_thread = threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True)
+        _server_thread.start()
+    _logger.info("metrics exporter listening on %s:%s", bind, port)
+    return True
+
+
+if __name__ == "__main__":
+    print(render(), end="")
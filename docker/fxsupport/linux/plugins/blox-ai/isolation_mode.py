@@ -34,6 +34,9 @@ from datetime import datetime, timezone
 HEARTBEAT_STATE_PATH = "/run/fula-heartbeat.state"
 DISCOVERY_STATE_PATH = "/run/fula-discovery.state"
 BLE_STATE_PATH = "/run/fula-ble.state"  # Phase 1.9 scanner could optionally write this on BLE command
+# Consolidated store readiness-check.py publishes every state file into
+# (state_store.py); the per-file paths above are its compatibility views.
+STATE_STORE_PATH = "/run/fula-state.json"
 PENDING_LOG_PATH = "/var/log/fula/ai-pending-actions.jsonl"
 PENDING_LOG_MAX_BYTES = 10 * 1024 * 1024  # 10 MB (smaller than events log; entries are rare)
 COMMANDS_FLAG_DIR = "/home/pi/commands"
@@ -71,6 +74,15 @@ def _read_json_state(path):
         return {}
 
 
+def _read_state_section(section, path):
+    """A section of the consolidated state store, or the compatibility file
+    at path when the store is missing or lacks it (older core OTA)."""
+    entry = (_read_json_state(STATE_STORE_PATH).get("sections") or {}).get(section)
+    if isinstance(entry, dict) and isinstance(entry.get("data"), dict):
+        return entry["data"]
+    return _read_json_state(path)
+
+
 def _last_libp2p_activity_ts():
     """Most-recent libp2p activity timestamp (epoch seconds). Returns None
     if no log or no parseable line."""
@@ -102,7 +114,7 @@ def _discovery_unreachable():
     """True iff /run/fula-discovery.state says discovery is unreachable.
     Defensive: missing/malformed file → assume reachable (don't fire
     isolation mode spuriously)."""
-    s = _read_json_state(DISCOVERY_STATE_PATH)
+    s = _read_state_section("discovery", DISCOVERY_STATE_PATH)
     ok = s.get("ok")
     # Phase 3 schema: ok is a bool. False = unreachable.
     return ok is False
@@ -1,17 +1,40 @@
 # Watcher for Fula tower v1.2
 import os
 import errno
+import functools
 import subprocess
 import time
 import logging
 import sys
 import json
+import hashlib
+import queue
 import requests
 import re
 import threading
 import shutil
+import socket
+import struct
 import yaml
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+try:
+    import relay_cache  # shipped next to this script by fula.sh
+except ImportError:
+    relay_cache = None
+try:
+    import wireguard_status  # shipped next to this script by fula.sh
+except ImportError:
+    wireguard_status = None
+try:
+    import state_store  # shipped next to this script by fula.sh
+except ImportError:
+    state_store = None
+try:
+    import metrics_exporter  # shipped next to this script by fula.sh
+except ImportError:
+    metrics_exporter = None
 
 FULA_PATH = "/usr/bin/fula"
 HOME_PATH = "/home/pi"
@@ -41,10 +64,24 @@ BOOTSTRAP_PEERS = [
 DISCOVERY_API_URL = os.environ.get("DISCOVERY_API_URL", "https://discovery.fula.network").rstrip("/")
 DISCOVERY_TIMEOUT_SEC = 5
 RELAY_DRIFT_CHECK_INTERVAL_SEC = int(os.environ.get("RELAY_DRIFT_CHECK_INTERVAL_SEC", "3600"))  # hourly
-# 5 min default keeps Worker request volume within Cloudflare's free-tier
-# 100k/day budget at ~100 edges. Override at deploy time via the
-# HEARTBEAT_INTERVAL_SEC env var (e.g., 60 on paid-tier) without rebuilding.
+# Drift detection reuses a relay list validated this recently instead of
+# fetching /relays again (the discovery probe revalidates every ~450s).
+RELAY_CACHE_MAX_AGE_SEC = 900
+# Heartbeats are change-driven: the circuit set is checked locally every
+# HEARTBEAT_CHECK_INTERVAL_SEC and a full heartbeat goes out as soon as it
+# changes. While it stays stable only a compact signed keep-alive is sent,
+# first after HEARTBEAT_INTERVAL_SEC and then at doubling intervals up to
+# HEARTBEAT_MAX_INTERVAL_SEC. A stable fleet costs the Worker ~24 requests
+# per edge per day instead of 288, well inside Cloudflare's free-tier 100k/day
+# budget at ~1000 edges. A Worker that rejects a keep-alive (one deployed
+# before they existed) is sent plain full heartbeats every
+# HEARTBEAT_INTERVAL_SEC for HEARTBEAT_KEEPALIVE_RETRY_SEC before keep-alives
+# are tried again, so it never sees more than the old 288/day. All are
+# env-overridable without rebuilding.
+HEARTBEAT_CHECK_INTERVAL_SEC = int(os.environ.get("HEARTBEAT_CHECK_INTERVAL_SEC", "15"))
 HEARTBEAT_INTERVAL_SEC = int(os.environ.get("HEARTBEAT_INTERVAL_SEC", "300"))
+HEARTBEAT_MAX_INTERVAL_SEC = int(os.environ.get("HEARTBEAT_MAX_INTERVAL_SEC", "3600"))
+HEARTBEAT_KEEPALIVE_RETRY_SEC = int(os.environ.get("HEARTBEAT_KEEPALIVE_RETRY_SEC", "86400"))
 _last_relay_drift_check = 0.0
 _last_heartbeat = 0.0
 
@@ -70,6 +107,36 @@ WIREGUARD_STATE_PATH = "/run/fula-wireguard.state"
 # Phase 13 — Layer 1.5 / 1.6 / 1.7 state files
 CONTAINERS_STATE_PATH = "/run/fula-containers.state"
 POWER_STATE_PATH = "/run/fula-power.state"
+# Active CPU performance profile (governor/caps/container CPU placement).
+CPU_PROFILE_STATE_PATH = "/run/fula-cpu-profile.state"
+# Per-container memory.high/max targets and the zram swap device.
+MEMORY_POLICY_STATE_PATH = "/run/fula-memory-policy.state"
+# Per-disk latency/throughput + I/O stall flags from the /proc/diskstats sampler.
+IO_STATE_PATH = "/run/fula-io.state"
+# Per-target latency/success scoreboard for the DNS/HTTPS reachability race.
+REACHABILITY_STATE_PATH = "/run/fula-reachability.state"
+# Per-check / per-cycle durations, error and subprocess-spawn counts.
+WATCHDOG_METRICS_PATH = "/run/fula-watchdog-metrics.json"
+# Every state file above is also published as a section of the consolidated
+# store (state_store.py, /run/fula-state.json): one atomically replaced
+# document, so a reader gets a consistent snapshot of all of them in one read.
+# The per-file outputs stay as compatibility views. Keyed by constant name
+# so a path moved at runtime (tests) still maps to its section.
+_STATE_SECTIONS = {
+    "HEARTBEAT_STATE_PATH": "heartbeat",
+    "DISCOVERY_STATE_PATH": "discovery",
+    "TIME_STATE_PATH": "time",
+    "WIREGUARD_STATE_PATH": "wireguard",
+    "CONTAINERS_STATE_PATH": "containers",
+    "POWER_STATE_PATH": "power",
+    "CPU_PROFILE_STATE_PATH": "cpu_profile",
+    "MEMORY_POLICY_STATE_PATH": "memory_policy",
+    "IO_STATE_PATH": "io",
+    "STORAGE_STATE_PATH": "storage",
+    "NETWORK_STATE_PATH": "network",
+    "REACHABILITY_STATE_PATH": "reachability",
+    "WATCHDOG_METRICS_PATH": "watchdog_metrics",
+}
 
 # Phase 13 — Layer 1.7 Kubo/Cluster API hang escalation.
 # Gated behind KUBO_HANG_ESCALATION=1 (set via fula-readiness-check.service
@@ -85,20 +152,17 @@ _api_timeout_streak = {"kubo": 0, "cluster": 0}
 # - 120s initial grace before assuming a never-handshook tunnel is broken
 WG_HANDSHAKE_FLOOR_SEC = 180
 WG_HANDSHAKE_NULL_KEEPALIVE_SEC = 300
-# 3-strike escalation per advisor consensus: after WG_BOUNCE_MAX_CONSEC_FAIL
-# failed bounces in a row, back off to a much longer cooldown so a
-# permanently-broken upstream doesn't generate constant churn + log spam.
-WG_BOUNCE_COOLDOWN_SEC = 300
-WG_BOUNCE_BACKOFF_SEC = 1800
-WG_BOUNCE_MAX_CONSEC_FAIL = 3
-_last_wg_bounce_attempt = 0.0
-_consec_wg_bounce_failures = 0
-# Hydration flag: read the persisted counter from /run/fula-wireguard.state
-# on the first check call after process start, so Phase 2's recovery-service
-# restart doesn't reset the 3-strike backoff (built-in advisor finding —
-# without this, a device in deep backoff has its cooldown wiped on every
-# fula-readiness-check daemon restart, defeating the backoff entirely).
-_wg_counter_hydrated = False
+# Bounces are rate-limited by the remediation engine under WG_BOUNCE_SIGNATURE:
+# backoff doubles per failed bounce and after REMEDIATION_REFUSE_AFTER in a
+# row the tunnel is left alone for REMEDIATION_REFUSE_SEC, so a permanently
+# broken upstream doesn't generate constant churn + log spam. The ledger lives
+# under ~/.internal, so neither a daemon restart (Phase 2's OnFailure
+# recovery) nor a reboot wipes the backoff.
+WG_BOUNCE_SIGNATURE = "wg-handshake-stale"
+WG_BOUNCE_ACTION = "wg-bounce"
+# Reading tunnel status is one `wg show support dump` (wireguard_status.py),
+# cheap enough to check the handshake age every minute.
+WG_CHECK_INTERVAL_SEC = int(os.environ.get("WG_CHECK_INTERVAL_SEC", "60"))
 # Internet-down guard: if the Phase 3 discovery probe failed within this window
 # we skip WG bounce remediation (a broken WG won't fix dead WAN).
 WG_INTERNET_GUARD_WINDOW_SEC = 600
@@ -151,6 +215,40 @@ def _atomic_write_state(path, data):
                     os.unlink(tmp)
             except OSError:
                 pass
+    _publish_state_section(path, data)
+
+
+def _state_section_for(path):
+    for const, section in _STATE_SECTIONS.items():
+        if globals().get(const) == path:
+            return section
+    return None
+
+
+def _publish_state_section(path, data):
+    """Mirror a state file write into the consolidated store. Best-effort."""
+    section = _state_section_for(path)
+    if section is None or state_store is None:
+        return
+    try:
+        state_store.update(section, data)
+    except (TypeError, ValueError) as e:
+        logging.warning("could not publish state section %s: %s", section, e)
+
+
+def _read_state_section(section, path):
+    """A section from the consolidated store, falling back to its
+    compatibility file (older writer, store missing). None if neither
+    parses."""
+    if state_store is not None:
+        data = state_store.section(section)
+        if data is not None:
+            return data
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
 
 
 def _append_event(category, detail):
@@ -194,18 +292,196 @@ def _append_event(category, detail):
         logging.warning("could not append event %s: %s", category, e)
 
 
-def _write_heartbeat_state(http_status, error, circuit_count, reserved_on):
+_periodic_threads = {}  # thread name -> Thread, for _start_periodic
+
+
+def _start_periodic(name, fn, interval):
+    """Run fn() every interval seconds on a daemon thread called name.
+    Idempotent per name; an exception from fn is logged at debug and the
+    loop carries on."""
+    thread = _periodic_threads.get(name)
+    if thread is not None and thread.is_alive():
+        return thread
+
+    def _worker():
+        while True:
+            try:
+                fn()
+            except Exception as e:
+                logging.debug(f"{name}: {fn.__name__} raised: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_worker, name=name, daemon=True)
+    _periodic_threads[name] = thread
+    thread.start()
+    return thread
+
+
+# --- Watchdog metrics ----------------------------------------------------------
+# Per-check timing so a slow monitor cycle can be traced to the check that
+# made it slow. @instrumented (or `with timed_check(name)`) records duration,
+# exceptions and subprocess spawns for each check/remediation into a bounded
+# ring; watchdog_cycle_begin()/_end() do the same for a whole monitor cycle.
+# Spawns are counted with an audit hook on subprocess.Popen/os.system, so
+# subprocess.getoutput() and friends are included, and attributed per thread
+# so background samplers don't inflate the check that happens to be running.
+# Snapshots go to /run/fula-watchdog-metrics.json at most every
+# METRICS_WRITE_INTERVAL_SEC and at the end of every cycle.
+METRICS_WINDOW = 200
+METRICS_WRITE_INTERVAL_SEC = 30
+_metrics_lock = threading.Lock()
+_metrics = {"checks": {}, "cycles": {}}
+_metrics_started = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+_metrics_last_write = 0.0
+_metrics_open_cycles = {}
+_spawns_total = 0
+_spawns_local = threading.local()
+
+
+def _count_spawns(event, _args):
+    global _spawns_total
+    if event == "subprocess.Popen" or event == "os.system":
+        _spawns_total += 1
+        _spawns_local.count = getattr(_spawns_local, "count", 0) + 1
+
+
+sys.addaudithook(_count_spawns)
+
+
+def _thread_spawns():
+    return getattr(_spawns_local, "count", 0)
+
+
+def _metric_record(kind, name, elapsed, error, spawns, result=None):
+    """Fold one run into _metrics[kind][name]. Caller holds _metrics_lock."""
+    m = _metrics[kind].get(name)
+    if m is None:
+        m = _metrics[kind][name] = {"count": 0, "errors": 0, "spawns": 0, "sum_s": 0.0, "max_s": 0.0,
+                                    "durations": deque(maxlen=METRICS_WINDOW)}
+    m["count"] += 1
+    m["sum_s"] += elapsed
+    m["errors"] += bool(error)
+    m["spawns"] += spawns
+    m["max_s"] = max(m["max_s"], elapsed)
+    m["durations"].append(elapsed)
+    m["last_s"] = elapsed
+    m["last_spawns"] = spawns
+    m["last_error"] = error
+    m["last_ts"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    if isinstance(result, bool) or result is None:
+        m["last_result"] = result
+
+
+def _metric_summary(m):
+    durations = sorted(m["durations"])
+    out = {k: v for k, v in m.items() if k != "durations"}
+    for key in ("sum_s", "max_s", "last_s"):
+        out[key] = round(out[key], 3)
+    out["p50_s"] = round(_percentile(durations, 50), 3)
+    out["p95_s"] = round(_percentile(durations, 95), 3)
+    out["window"] = len(durations)
+    return out
+
+
+def watchdog_metrics():
+    """Snapshot of all check and cycle metrics, as written to the file."""
+    with _metrics_lock:
+        return {
+            "started": _metrics_started,
+            "updated": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "subprocess_spawns": _spawns_total,
+            "checks": {n: _metric_summary(m) for n, m in sorted(_metrics["checks"].items())},
+            "cycles": {n: _metric_summary(m) for n, m in sorted(_metrics["cycles"].items())},
+        }
+
+
+def write_watchdog_metrics(force=False):
+    global _metrics_last_write
+    now = time.monotonic()
+    if not force and now - _metrics_last_write < METRICS_WRITE_INTERVAL_SEC:
+        return
+    _metrics_last_write = now
+    _atomic_write_state(WATCHDOG_METRICS_PATH, watchdog_metrics())
+
+
+class timed_check:
+    """Context manager recording one run of name. An exception escaping the
+    block counts as an error and is re-raised."""
+
+    def __init__(self, name):
+        self.name = name
+        self.result = None
+
+    def __enter__(self):
+        self._spawns = _thread_spawns()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, _tb):
+        elapsed = time.perf_counter() - self._start
+        error = None if exc_type is None else f"{exc_type.__name__}: {exc}"[:200]
+        with _metrics_lock:
+            _metric_record("checks", self.name, elapsed, error,
+                           _thread_spawns() - self._spawns, self.result)
+        try:
+            write_watchdog_metrics()
+        except Exception as e:
+            logging.debug(f"write_watchdog_metrics raised: {e}")
+        return False
+
+
+def instrumented(fn):
+    """Decorator: time every call of fn under its own name."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with timed_check(fn.__name__) as t:
+            t.result = fn(*args, **kwargs)
+            return t.result
+    return wrapper
+
+
+def watchdog_cycle_begin(name):
+    """Start timing a cycle of name, closing one still open."""
+    watchdog_cycle_end(name)
+    _metrics_open_cycles[name] = (time.perf_counter(), _thread_spawns())
+
+
+def watchdog_cycle_end(name):
+    """Close the open cycle of name, if any, and write the metrics file."""
+    opened = _metrics_open_cycles.pop(name, None)
+    if opened is None:
+        return
+    start, spawns = opened
+    with _metrics_lock:
+        _metric_record("cycles", name, time.perf_counter() - start, None, _thread_spawns() - spawns)
+    write_watchdog_metrics(force=True)
+
+
+def _write_heartbeat_state(http_status, error, circuit_count, reserved_on,
+                           kind=None, next_due_in=None, latency_ms=None):
     """Snapshot the last heartbeat attempt to /run/fula-heartbeat.state so the
-    BLE diag/heartbeat command can surface it without re-running the HTTP call."""
-    _atomic_write_state(HEARTBEAT_STATE_PATH, {
-        "last_attempt_ts": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+    BLE diag/heartbeat command can surface it without re-running the HTTP call.
+    kind is "full" or "keepalive"; next_due_in (seconds) tells readers when the
+    next send is expected, since a stable box may stay quiet for up to
+    HEARTBEAT_MAX_INTERVAL_SEC; latency_ms is the signed POST's round trip."""
+    now = datetime.utcnow()
+    state = {
+        "last_attempt_ts": now.isoformat(timespec="seconds") + "Z",
         "http_status": http_status,
         "error": error,
         "last_circuit_count": circuit_count,
         "last_reserved_on": reserved_on,
-    })
+    }
+    if kind is not None:
+        state["kind"] = kind
+    if latency_ms is not None:
+        state["latency_ms"] = latency_ms
+    if next_due_in is not None:
+        state["next_due_ts"] = (now + timedelta(seconds=next_due_in)).isoformat(timespec="seconds") + "Z"
+    _atomic_write_state(HEARTBEAT_STATE_PATH, state)
 
 
+@instrumented
 def check_discovery_https_reachable():
     """GET-based reachability check against discovery.fula.network/relays.
 
@@ -250,25 +526,41 @@ def check_discovery_https_reachable():
         # headers, so use GET with stream=True to avoid downloading the body.
         # allow_redirects=False per Phase 1 advisor lesson — catches captive
         # portals that 301-redirect to a login page.
+        headers = {
+            "user-agent": "fula-readiness-check/1.0",
+            "x-fula-client": "edge",
+            "accept": "application/json",
+        }
+        # The probe doubles as the relay_cache revalidation: If-None-Match
+        # turns an unchanged list into a body-less 304, and a 200 that
+        # carries an ETag refreshes the cache so drift detection needn't
+        # fetch /relays itself. A 200 without one isn't worth the body: the
+        # next probe couldn't make it conditional anyway.
+        if relay_cache is not None:
+            headers.update(relay_cache.conditional_headers())
         r = requests.get(
             url,
             timeout=DISCOVERY_TIMEOUT_SEC,
-            headers={
-                "user-agent": "fula-readiness-check/1.0",
-                "x-fula-client": "edge",
-                "accept": "application/json",
-            },
+            headers=headers,
             allow_redirects=False,
             stream=True,
         )
         try:
             state["latency_ms"] = int((time.monotonic() - t0) * 1000)
             state["status_code"] = r.status_code
-            # Strict 2xx. 3xx redirects are suspicious (captive portal pattern)
-            # and 4xx/5xx mean Fula's WAF / Worker is blocking us.
-            state["ok"] = 200 <= r.status_code < 300
+            # Strict 2xx (or 304 answering our own If-None-Match). Other 3xx
+            # redirects are suspicious (captive portal pattern) and 4xx/5xx
+            # mean Fula's WAF / Worker is blocking us.
+            state["ok"] = 200 <= r.status_code < 300 or (
+                r.status_code == 304 and "if-none-match" in headers)
             if not state["ok"]:
                 state["error"] = "http_{}".format(r.status_code)
+            elif relay_cache is not None and (r.status_code == 304 or r.headers.get("ETag")):
+                try:
+                    data = r.json() if r.status_code == 200 else None
+                except ValueError:
+                    data = None
+                relay_cache.store_response(r.status_code, r.headers.get("ETag"), data)
         finally:
             r.close()
     except requests.Timeout:
@@ -379,6 +671,192 @@ def _read_ntp_offset_ms(daemon):
     return None
 
 
+# --- Native time status --------------------------------------------------------
+# The subprocess readers above cost 3–4 process launches per check (timedatectl
+# show, systemctl is-active ×2, chronyc / timedatectl timesync-status). The
+# same answers are available in-process:
+#   - synced: adjtimex(2) maxerror < 16s — exactly what systemd-timedated
+#     reports as NTPSynchronized. org.freedesktop.timedate1 over D-Bus is used
+#     when the syscall is unavailable (seccomp, non-Linux dev box).
+#   - service: the comm names in /proc instead of `systemctl is-active`.
+#   - offset: chronyd's command socket (the same REQ_TRACKING `chronyc
+#     tracking` sends) or, under systemd-timesyncd, the kernel PLL offset
+#     from adjtimex (timesyncd disciplines the clock through it).
+# Anything that can't be read natively falls back to the subprocess reader,
+# so /run/fula-time.state keeps the same schema and meaning.
+TIME_CHECK_INTERVAL_SEC = int(os.environ.get("TIME_CHECK_INTERVAL_SEC", "30"))
+_ADJTIMEX_UNSYNCED_MAXERROR_US = 16000000
+_STA_PLL = 0x0001
+_STA_NANO = 0x2000
+# glibc struct timex up to `tai`; the kernel also writes 44 bytes of padding,
+# covered by the oversized buffer below.
+_TIMEX_FMT = "@IllllilllllllllilllllI"
+_TIMEX_BUFSIZE = struct.calcsize(_TIMEX_FMT) + 64
+CHRONY_SOCKET_PATH = "/run/chrony/chronyd.sock"
+_CHRONY_REQ_TRACKING = 33
+_CHRONY_RPY_TRACKING = 5
+_CHRONY_TRACKING_REPLY_LEN = 108  # 28-byte header + RPY_Tracking
+_NTP_DAEMON_COMMS = (("chronyd", "chronyd"), ("systemd-timesyn", "systemd-timesyncd"))
+
+
+def _adjtimex():
+    """Read the kernel clock discipline with adjtimex(2), modes=0 (read-only,
+    no privileges needed). Returns {state, status, offset_us, maxerror_us}
+    or None if the call isn't available."""
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        buf = ctypes.create_string_buffer(_TIMEX_BUFSIZE)
+        rc = libc.adjtimex(buf)
+    except (ImportError, OSError, AttributeError):
+        return None
+    if rc < 0:
+        return None
+    fields = struct.unpack_from(_TIMEX_FMT, buf.raw)
+    offset, maxerror, status = fields[1], fields[3], fields[5]
+    return {
+        "state": rc,
+        "status": status,
+        "offset_us": offset / 1000.0 if status & _STA_NANO else float(offset),
+        "maxerror_us": maxerror,
+    }
+
+
+def _timedate1_synced(bus=None):
+    """NTPSynchronized from org.freedesktop.timedate1, or None without D-Bus."""
+    try:
+        if bus is None:
+            import dbus  # python3-dbus; lazily so the watchdog runs without it
+            bus = dbus.SystemBus(private=True)
+        obj = bus.get_object("org.freedesktop.timedate1", "/org/freedesktop/timedate1")
+        return bool(obj.Get("org.freedesktop.timedate1", "NTPSynchronized",
+                            dbus_interface=_DBUS_PROPS_IFACE))
+    except Exception as e:
+        logging.debug(f"timedate1 D-Bus read failed: {e}")
+        return None
+
+
+def _native_ntp_synced():
+    """Return (synced, timex) where synced is None if neither adjtimex nor
+    timedate1 could answer."""
+    timex = _adjtimex()
+    if timex is not None:
+        return timex["maxerror_us"] < _ADJTIMEX_UNSYNCED_MAXERROR_US, timex
+    return _timedate1_synced(), None
+
+
+def _native_ntp_daemon(proc_root="/proc"):
+    """Return 'chronyd', 'systemd-timesyncd' or None by scanning /proc/*/comm.
+    Same precedence as _read_active_ntp_daemon()."""
+    running = set()
+    try:
+        pids = [p for p in os.listdir(proc_root) if p.isdigit()]
+    except OSError:
+        return None
+    for pid in pids:
+        comm = _read_first_line(os.path.join(proc_root, pid, "comm"))
+        if comm:
+            running.add(comm)
+    for comm, name in _NTP_DAEMON_COMMS:
+        if comm in running:
+            return name
+    return None
+
+
+def _chrony_float(value):
+    """Decode chrony's 32-bit network float (7-bit exponent, 25-bit coefficient)."""
+    exp = value >> 25
+    if exp >= 64:
+        exp -= 128
+    coef = value & 0x1FFFFFF
+    if coef >= 1 << 24:
+        coef -= 1 << 25
+    return coef * 2.0 ** (exp - 25)
+
+
+def _chrony_tracking_offset_ms(sock_path=None, timeout=2.0):
+    """System-time offset (chronyc tracking's "System time") in ms, read from
+    chronyd's command socket. None if the socket isn't there or the reply
+    doesn't parse."""
+    sock_path = sock_path or CHRONY_SOCKET_PATH
+    if not os.path.exists(sock_path):
+        return None
+    # chronyd answers to the sender's address, so the client socket needs a
+    # path of its own, in a directory chronyd can write to.
+    local = os.path.join(os.path.dirname(sock_path), "fula-readiness.{}.sock".format(os.getpid()))
+    seq = int(time.time() * 1000) & 0xFFFFFFFF
+    # version 6, REQ, command, attempt, sequence; zero-padded to the reply
+    # length (chronyd rejects shorter requests to prevent amplification).
+    req = struct.pack("!BBBBHHIII", 6, 1, 0, 0, _CHRONY_REQ_TRACKING, 0, seq, 0, 0)
+    req = req.ljust(_CHRONY_TRACKING_REPLY_LEN, b"\0")
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        try:
+            os.unlink(local)
+        except OSError:
+            pass
+        s.bind(local)
+        # chronyd drops root and runs as _chrony; like chronyc, make the
+        # client socket writable by it or the reply never arrives.
+        os.chmod(local, 0o666)
+        s.settimeout(timeout)
+        s.connect(sock_path)
+        s.send(req)
+        reply = s.recv(1024)
+    except OSError as e:
+        logging.debug(f"chrony command socket: {e}")
+        return None
+    finally:
+        s.close()
+        try:
+            os.unlink(local)
+        except OSError:
+            pass
+    if len(reply) < _CHRONY_TRACKING_REPLY_LEN:
+        return None
+    version, pkt_type, _r1, _r2, command, rpy, status = struct.unpack_from("!BBBBHHH", reply)
+    (rseq,) = struct.unpack_from("!I", reply, 16)
+    if (version, pkt_type, command, rpy, status, rseq) != (
+            6, 2, _CHRONY_REQ_TRACKING, _CHRONY_RPY_TRACKING, 0, seq):
+        return None
+    # RPY_Tracking: ref_id(4) ip_addr(20) stratum(2) leap(2) ref_time(12),
+    # then current_correction — 28 + 40 bytes in.
+    (raw,) = struct.unpack_from("!I", reply, 68)
+    offset_s = _chrony_float(raw)
+    if abs(offset_s) >= 3600:
+        return None
+    return int(offset_s * 1000)
+
+
+def _read_ntp_synced():
+    """Sync flag only (post-remediation re-checks); None if unreadable."""
+    synced, _timex = _native_ntp_synced()
+    if synced is None:
+        synced, _err = _read_timedatectl_synced()
+    return synced
+
+
+def _read_time_status():
+    """Return (synced, service, offset_ms, error) — the fields check_ntp_sync()
+    records — reading natively where possible and falling back to the
+    subprocess readers per field."""
+    synced, timex = _native_ntp_synced()
+    if synced is None:
+        synced, err = _read_timedatectl_synced()
+        if err is not None:
+            return None, None, None, err
+    service = _native_ntp_daemon() or _read_active_ntp_daemon()
+    offset_ms = None
+    if service == "chronyd":
+        offset_ms = _chrony_tracking_offset_ms()
+    elif service == "systemd-timesyncd" and timex and timex["status"] & _STA_PLL:
+        offset_ms = int(timex["offset_us"] / 1000)
+    if offset_ms is None and service:
+        offset_ms = _read_ntp_offset_ms(service)
+    return bool(synced), service, offset_ms, None
+
+
+@instrumented
 def check_ntp_sync():
     """Verify systemd's NTP-sync status; auto-correct on drift.
 
@@ -404,17 +882,16 @@ def check_ntp_sync():
         "error": None,
     }
 
-    synced, err = _read_timedatectl_synced()
+    synced, service, offset_ms, err = _read_time_status()
     if err is not None:
         state["error"] = err
         _atomic_write_state(TIME_STATE_PATH, state)
         logging.warning("NTP check: timedatectl failed: %s", err)
         return False
 
-    state["synced"] = bool(synced)
-    state["service"] = _read_active_ntp_daemon()
-    if state["service"]:
-        state["offset_ms"] = _read_ntp_offset_ms(state["service"])
+    state["synced"] = synced
+    state["service"] = service
+    state["offset_ms"] = offset_ms
 
     if state["synced"]:
         _atomic_write_state(TIME_STATE_PATH, state)
@@ -464,7 +941,7 @@ def check_ntp_sync():
     # and adjusts within 1-2 seconds; chronyc makestep is immediate.
     try:
         time.sleep(2)
-        new_synced, _ = _read_timedatectl_synced()
+        new_synced = _read_ntp_synced()
         if new_synced is not None:
             state["synced"] = bool(new_synced)
     except Exception:
@@ -494,7 +971,7 @@ def check_ntp_sync():
             })
             try:
                 time.sleep(3)
-                new_synced, _ = _read_timedatectl_synced()
+                new_synced = _read_ntp_synced()
                 if new_synced is not None:
                     state["synced"] = bool(new_synced)
             except Exception:
@@ -512,16 +989,22 @@ def check_ntp_sync():
     return bool(state["synced"])
 
 
+def start_time_monitor():
+    """Run check_ntp_sync() every TIME_CHECK_INTERVAL_SEC on its own thread.
+    With the native readers a healthy check is a syscall and a /proc scan, so
+    /run/fula-time.state can track the clock far more closely than the ~450s
+    monitor cycle it used to ride on."""
+    _start_periodic("time-monitor", check_ntp_sync, TIME_CHECK_INTERVAL_SEC)
+
+
 def _internet_likely_down():
     """Read /run/fula-discovery.state (Phase 3). Returns True only if the
     file exists, was written within WG_INTERNET_GUARD_WINDOW_SEC, AND says
     ok=false. Missing file → False (assume internet OK). Used as a guard so
     WG bounce remediation is skipped when WAN itself is broken — bouncing
     WG can't fix dead internet, and the churn just wastes CPU/log space."""
-    try:
-        with open(DISCOVERY_STATE_PATH) as f:
-            ds = json.load(f)
-    except (OSError, json.JSONDecodeError):
+    ds = _read_state_section("discovery", DISCOVERY_STATE_PATH)
+    if not isinstance(ds, dict):
         return False
     if ds.get("ok") is True:
         return False
@@ -535,10 +1018,18 @@ def _internet_likely_down():
 
 
 def _read_wireguard_status():
-    """Invoke the shell `status.sh` and parse the JSON. Returns (dict, error_str|None).
-    The JSON shape includes: installed, registered, active, endpoint,
+    """Read the support tunnel status. Returns (dict, error_str|None).
+    The dict shape includes: installed, registered, active, endpoint,
     assigned_ip, peer_id_registered, last_handshake_age_sec, rx_bytes,
-    tx_bytes, persistent_keepalive_sec.  Any failure returns ({}, error)."""
+    tx_bytes, persistent_keepalive_sec.  Any failure returns ({}, error).
+
+    Uses the shared wireguard_status provider (cached for a few seconds) and
+    falls back to invoking status.sh if that module isn't installed."""
+    if wireguard_status is not None:
+        try:
+            return wireguard_status.get_status(), None
+        except Exception as e:
+            return {}, "wg_status_failed: {}: {}".format(type(e).__name__, str(e)[:100])
     try:
         r = subprocess.run(
             ["bash", "/usr/bin/fula/wireguard/status.sh"],
@@ -554,31 +1045,16 @@ def _read_wireguard_status():
         return {}, "status_sh_parse_error: {}".format(str(e)[:100])
 
 
+@instrumented
 def check_wireguard_handshake_age():
     """Watch the WG support tunnel's actual protocol-level liveness, not just
     `systemctl is-active` (which lies for Type=oneshot + RemainAfterExit=yes
-    after the underlying tunnel drops). Reads wireguard/status.sh for ground
-    truth, decides if a bounce is needed, and rate-limits remediation with a
-    3-strike escalation per advisor consensus.
+    after the underlying tunnel drops). Reads the tunnel status for ground
+    truth, decides if a bounce is needed, and rate-limits bounces through the
+    remediation ledger (WG_BOUNCE_SIGNATURE).
 
     State written to /run/fula-wireguard.state. Best-effort: never raises."""
-    global _last_wg_bounce_attempt, _consec_wg_bounce_failures, _wg_counter_hydrated
-
-    # First-call-after-process-start hydration: rebuild the backoff counter
-    # from /run/fula-wireguard.state if a prior daemon instance persisted one.
-    # Without this, Phase 2's OnFailure recovery (which restarts this daemon)
-    # would silently wipe the 3-strike backoff, defeating the cooldown
-    # escalation that's the entire point of consec_failures.
-    if not _wg_counter_hydrated:
-        _wg_counter_hydrated = True
-        try:
-            with open(WIREGUARD_STATE_PATH) as _f:
-                _prior = json.load(_f)
-            _cf = _prior.get("consec_failures")
-            if isinstance(_cf, int) and 0 <= _cf <= 100:
-                _consec_wg_bounce_failures = _cf
-        except (OSError, json.JSONDecodeError, KeyError, ValueError):
-            pass  # missing or malformed → start fresh (host probably rebooted)
+    consec_failures = remediation_action_state(WG_BOUNCE_SIGNATURE, WG_BOUNCE_ACTION).get("consec_failures", 0)
 
     state = {
         "last_check_ts": datetime.utcnow().isoformat(timespec="seconds") + "Z",
@@ -593,7 +1069,7 @@ def check_wireguard_handshake_age():
         "remediation": None,
         "remediation_ok": None,
         "remediation_stderr": None,
-        "consec_failures": _consec_wg_bounce_failures,
+        "consec_failures": consec_failures,
         "error": None,
     }
 
@@ -647,7 +1123,7 @@ def check_wireguard_handshake_age():
         # marginal-but-not-stale data.
         fresh_window = keepalive if keepalive else 60
         if age <= fresh_window:
-            _consec_wg_bounce_failures = 0
+            reset_remediation_failures(WG_BOUNCE_SIGNATURE, WG_BOUNCE_ACTION)
             state["consec_failures"] = 0
         _atomic_write_state(WIREGUARD_STATE_PATH, state)
         return True
@@ -661,15 +1137,12 @@ def check_wireguard_handshake_age():
         _atomic_write_state(WIREGUARD_STATE_PATH, state)
         return False
 
-    cooldown = (WG_BOUNCE_BACKOFF_SEC
-                if _consec_wg_bounce_failures >= WG_BOUNCE_MAX_CONSEC_FAIL
-                else WG_BOUNCE_COOLDOWN_SEC)
-    if now - _last_wg_bounce_attempt < cooldown:
-        state["remediation"] = ("rate_limited_backoff" if cooldown == WG_BOUNCE_BACKOFF_SEC
+    if remediation_blocked(WG_BOUNCE_SIGNATURE, WG_BOUNCE_ACTION, now) is not None:
+        entry = remediation_action_state(WG_BOUNCE_SIGNATURE, WG_BOUNCE_ACTION)
+        state["remediation"] = ("rate_limited_backoff" if now < entry.get("refused_until", 0)
                                 else "rate_limited")
         _atomic_write_state(WIREGUARD_STATE_PATH, state)
         return False
-    _last_wg_bounce_attempt = now
 
     logging.warning("WG handshake stale (age=%ds threshold=%ds); bouncing tunnel",
                     age, threshold)
@@ -717,6 +1190,8 @@ def check_wireguard_handshake_age():
     post_bounce_age = age  # default: assume nothing changed
     try:
         time.sleep(2)
+        if wireguard_status is not None:
+            wireguard_status.invalidate()
         parsed2, err2 = _read_wireguard_status()
         if err2 is None:
             if "active" in parsed2:
@@ -743,11 +1218,10 @@ def check_wireguard_handshake_age():
     # Counter reset semantics: reset only on confirmed recovery (real fresh
     # handshake post-bounce). bounce_attempt_ok-without-recovery counts as
     # a failure for backoff accounting.
-    if bounce_recovered:
-        _consec_wg_bounce_failures = 0
-    else:
-        _consec_wg_bounce_failures += 1
-    state["consec_failures"] = _consec_wg_bounce_failures
+    sig = record_remediation(WG_BOUNCE_SIGNATURE, WG_BOUNCE_ACTION, bounce_recovered,
+                             time.time() - now, started=now)
+    consec_failures = sig["actions"][WG_BOUNCE_ACTION]["consec_failures"]
+    state["consec_failures"] = consec_failures
 
     _append_event("wg-bounce", {
         "age_sec": age,
@@ -757,7 +1231,7 @@ def check_wireguard_handshake_age():
         "bounce_attempt_ok": bounce_attempt_ok,
         "bounce_recovered": bounce_recovered,
         "post_bounce_age_sec": post_bounce_age,
-        "consec_failures": _consec_wg_bounce_failures,
+        "consec_failures": consec_failures,
     })
 
     _atomic_write_state(WIREGUARD_STATE_PATH, state)
@@ -768,12 +1242,20 @@ def check_wireguard_handshake_age():
         logging.warning(
             "WG bounce attempt OK but no fresh handshake yet (post_age=%s, "
             "consec_failures=%d); will count as failure for backoff",
-            post_bounce_age, _consec_wg_bounce_failures)
+            post_bounce_age, consec_failures)
     else:
         logging.warning("WG bounce failed: %s (consec_failures=%d)",
-                        state["remediation_stderr"], _consec_wg_bounce_failures)
+                        state["remediation_stderr"], consec_failures)
     return bounce_recovered
 
+
+def start_wireguard_monitor():
+    """Run check_wireguard_handshake_age() every WG_CHECK_INTERVAL_SEC on its
+    own thread. Bounce remediation keeps its own cooldowns, so the tighter
+    cadence only shortens detection, not the bounce rate."""
+    _start_periodic("wireguard-monitor", check_wireguard_handshake_age, WG_CHECK_INTERVAL_SEC)
+
+
 # Global variables to control LED flashing
 led_flash_thread = None
 led_flash_stop_event = None
@@ -821,24 +1303,37 @@ FULA_DNS_LIST = ["1.1.1.1", "1.0.0.1", "8.8.8.8", "8.8.4.4", "9.9.9.9", "208.67.
 # (b) signed heartbeats so the Worker's /find-box endpoint knows where this
 # device is reachable right now.
 
-def fetch_discovery_relays(timeout=DISCOVERY_TIMEOUT_SEC):
-    """Fetch the live relay list from the discovery API.
+def _requests_fetch(url, headers, timeout):
+    """relay_cache fetcher over requests: (status, etag, parsed JSON or None)."""
+    r = requests.get(url, timeout=timeout, headers=headers)
+    return r.status_code, r.headers.get("ETag"), r.json() if r.status_code == 200 else None
+
+
+def fetch_discovery_relays(timeout=DISCOVERY_TIMEOUT_SEC, max_age=RELAY_CACHE_MAX_AGE_SEC):
+    """Return the live relay list from the discovery API via the shared
+    relay_cache: no request if the cached copy was validated within max_age
+    (check_discovery_https_reachable revalidates it every monitor cycle),
+    otherwise a conditional GET. Never serves a stale copy — drift detection
+    must only act on a list the Worker just confirmed.
     Returns list of relay records, or None on any failure (graceful no-op)."""
     if not DISCOVERY_API_URL:
         return None
+    url = DISCOVERY_API_URL + "/relays"
+    if relay_cache is not None:
+        return relay_cache.get_relays(url, max_age=max_age, fetch=_requests_fetch, timeout=timeout,
+                                      user_agent="fula-readiness-check/1.0", allow_stale=False,
+                                      logger=logging.getLogger())
     try:
-        r = requests.get(DISCOVERY_API_URL + "/relays", timeout=timeout,
-                         headers={
-                             "accept": "application/json",
-                             # Avoid Cloudflare Bot Fight Mode's default-UA blocklist.
-                             "user-agent": "fula-readiness-check/1.0",
-                             # X-Fula-Client gates a WAF rule that blocks bots.
-                             "x-fula-client": "edge",
-                         })
-        if r.status_code != 200:
-            logging.info("discovery: /relays returned HTTP %d", r.status_code)
+        status, _etag, data = _requests_fetch(url, {
+            "accept": "application/json",
+            # Avoid Cloudflare Bot Fight Mode's default-UA blocklist.
+            "user-agent": "fula-readiness-check/1.0",
+            # X-Fula-Client gates a WAF rule that blocks bots.
+            "x-fula-client": "edge",
+        }, timeout)
+        if status != 200:
+            logging.info("discovery: /relays returned HTTP %d", status)
             return None
-        data = r.json()
     except Exception as e:
         logging.info("discovery: /relays fetch failed: %s", e)
         return None
@@ -863,6 +1358,7 @@ def get_relay_multiaddrs():
     return [RELAY_MULTIADDR_FALLBACK]
 
 
+@instrumented
 def maybe_refresh_relays():
     """Once per RELAY_DRIFT_CHECK_INTERVAL_SEC, compare Workers' relay list with
     kubo's configured StaticRelays. If they differ, rewrite the kubo config via
@@ -922,6 +1418,120 @@ def maybe_refresh_relays():
         logging.warning("discovery: docker restart ipfs_host failed: %s", e)
 
 
+# --- Relay scoreboard --------------------------------------------------------
+# StaticRelays used to be written in whatever order /relays returned them, and
+# the relay check dialled them in that order. Every RELAY_SCORE_INTERVAL_SEC
+# each configured relay is probed concurrently through kubo (swarm/connect to
+# confirm it's reachable, then a libp2p ping for RTT) and an EWMA of latency
+# and success is persisted. update_kubo_config.py orders StaticRelays and
+# Peering.Peers by the same file on the next merge, so circuits get reserved
+# on the closest healthy relays. Stored under ~/.internal rather than /run so
+# the ranking survives the reboot that usually precedes that merge.
+RELAY_SCORES_PATH = os.path.join(HOME_PATH, ".internal", "relay_scores.json")
+RELAY_SCORE_INTERVAL_SEC = int(os.environ.get("RELAY_SCORE_INTERVAL_SEC", "900"))
+RELAY_SCORE_ALPHA = 0.3
+RELAY_PING_COUNT = 3
+_last_relay_score = 0.0
+
+
+def load_relay_scores():
+    if relay_cache is None:
+        return {}
+    return relay_cache.load_relay_scores(RELAY_SCORES_PATH)
+
+
+def rank_relay_multiaddrs(multiaddrs, scores=None):
+    """Order multiaddrs by the scoreboard (relay_cache.rank_by_score); input
+    order if relay_cache isn't installed."""
+    if relay_cache is None:
+        return list(multiaddrs)
+    return relay_cache.rank_by_score(multiaddrs, load_relay_scores() if scores is None else scores)
+
+
+def _probe_relay(multiaddr):
+    """(ok, rtt_ms) for one relay via the kubo API. rtt_ms is the median of
+    RELAY_PING_COUNT libp2p pings, or None if the ping didn't complete."""
+    resp = requests.post(IPFS_API_URL + "/api/v0/swarm/connect",
+                         params={"arg": multiaddr}, timeout=15)
+    if not any("success" in s.lower() for s in resp.json().get("Strings", [])):
+        return False, None
+    peer_id = multiaddr.rsplit("/p2p/", 1)[-1]
+    resp = requests.post(IPFS_API_URL + "/api/v0/ping",
+                         params={"arg": peer_id, "count": RELAY_PING_COUNT}, timeout=15)
+    # ping streams one JSON object per line; Time is in nanoseconds.
+    times = []
+    for line in resp.text.splitlines():
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue
+        if msg.get("Success") and msg.get("Time"):
+            times.append(msg["Time"] / 1e6)
+    times.sort()
+    return True, round(times[len(times) // 2], 2) if times else None
+
+
+def score_relays(multiaddrs=None):
+    """Probe every relay concurrently and fold the results into the EWMA
+    scoreboard. Returns the updated scores dict."""
+    if multiaddrs is None:
+        multiaddrs = get_relay_multiaddrs()
+    results = {}
+
+    def worker(addr):
+        try:
+            results[addr] = _probe_relay(addr)
+        except Exception as e:
+            logging.debug(f"relay probe {addr} failed: {e}")
+            results[addr] = (False, None)
+
+    threads = [threading.Thread(target=worker, args=(a,), name="relay-probe", daemon=True)
+               for a in multiaddrs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=35)
+
+    scores = load_relay_scores()
+    now = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    for addr in multiaddrs:
+        ok, rtt = results.get(addr, (False, None))
+        s = scores.setdefault(addr, {"ewma_ms": None, "success_ewma": None, "samples": 0,
+                                     "last_ok_ts": None})
+        prev = s["success_ewma"]
+        s["success_ewma"] = round(float(ok) if prev is None else
+                                  RELAY_SCORE_ALPHA * ok + (1 - RELAY_SCORE_ALPHA) * prev, 3)
+        if rtt is not None:
+            s["ewma_ms"] = rtt if s["ewma_ms"] is None else round(
+                RELAY_SCORE_ALPHA * rtt + (1 - RELAY_SCORE_ALPHA) * s["ewma_ms"], 2)
+        if ok:
+            s["last_ok_ts"] = now
+        s["samples"] += 1
+        s["last_probe_ts"] = now
+    # Relays no longer configured drop out so the file doesn't grow forever.
+    scores = {a: s for a, s in scores.items() if a in multiaddrs}
+    _atomic_write_state(RELAY_SCORES_PATH, scores)
+    logging.info("relay scoreboard: %s", ", ".join(
+        f"{a.rsplit('/p2p/', 1)[-1][-8:]}={scores[a]['ewma_ms']}ms/{scores[a]['success_ewma']}"
+        for a in rank_relay_multiaddrs(multiaddrs, scores)))
+    return scores
+
+
+@instrumented
+def maybe_score_relays():
+    """Rate-limited wrapper for the main loop. Skips while kubo's API is down."""
+    global _last_relay_score
+    now = time.time()
+    if now - _last_relay_score < RELAY_SCORE_INTERVAL_SEC:
+        return
+    _last_relay_score = now
+    try:
+        requests.post(IPFS_API_URL + "/api/v0/id", timeout=10)
+    except Exception:
+        return
+    score_relays()
+
+
 def _canonical_json(value):
     """Produce canonical JSON matching the Worker's verify.ts canonicalJSON.
     Keys sorted alphabetically; no whitespace; standard JSON escaping.
@@ -1015,14 +1625,88 @@ def _read_cluster_peer_id():
     return pid
 
 
+# Heartbeat schedule. _heartbeat_digest is the circuit-set digest of the last
+# full heartbeat sent; keep-alives reference it as "unchanged since <digest>".
+# Only touched under _heartbeat_lock (the heartbeat thread and any direct
+# caller may overlap); the POST itself runs outside it, with
+# _heartbeat_sending keeping a second caller from sending concurrently.
+_heartbeat_lock = threading.Lock()
+_heartbeat_digest = None
+_heartbeat_acked = False
+_heartbeat_interval = HEARTBEAT_INTERVAL_SEC
+_heartbeat_due = 0.0
+_heartbeat_sending = False
+_keepalive_rejected_until = 0.0  # survives _reset_heartbeat_schedule
+
+
+def _heartbeat_data_digest(data):
+    """sha256 over the canonical JSON of the full heartbeat data — the same
+    bytes the Worker verifies, so it can recompute the digest from what it
+    stored."""
+    return hashlib.sha256(_canonical_json(data).encode("utf-8")).hexdigest()
+
+
+def _reset_heartbeat_schedule():
+    """Forget the last full heartbeat so the next check sends one."""
+    global _heartbeat_digest, _heartbeat_acked, _heartbeat_interval, _heartbeat_due
+    _heartbeat_digest = None
+    _heartbeat_acked = False
+    _heartbeat_interval = HEARTBEAT_INTERVAL_SEC
+    _heartbeat_due = 0.0
+
+
+def _sign_and_post_heartbeat(key, peer_id, data):
+    """Sign {peerId, timestamp, data} and POST it to /heartbeat. Returns the
+    response; raises on network errors."""
+    import base64
+    timestamp = datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+    signing_input = _canonical_json({
+        "peerId": peer_id,
+        "timestamp": timestamp,
+        "data": data,
+    })
+    sig = key.sign(signing_input.encode("utf-8"))
+    body = {
+        "type": "box",
+        "peerId": peer_id,
+        "timestamp": timestamp,
+        "data": data,
+        "signature": base64.b64encode(sig).decode("ascii"),
+    }
+    return requests.post(
+        DISCOVERY_API_URL + "/heartbeat",
+        json=body,
+        timeout=5,
+        headers={
+            "user-agent": "fula-readiness-check/1.0",
+            "x-fula-client": "edge",
+        },
+    )
+
+
+@instrumented
 def post_heartbeat():
-    """Once per HEARTBEAT_INTERVAL_SEC, POST a signed heartbeat to the Discovery
-    API describing which relays this box is currently reachable through. The
-    Worker's /find-box uses this to route the box-app to the right circuit
-    address. Best-effort; failures are logged but never raise."""
-    global _last_heartbeat
+    """Report which relays this box is currently reachable through to the
+    Discovery API. The Worker's /find-box uses this to route the box-app to
+    the right circuit address. Best-effort; failures are logged but never raise.
+
+    Runs at most once per HEARTBEAT_CHECK_INTERVAL_SEC. Each run reads the
+    circuit set from kubo and:
+      - sends a full signed heartbeat immediately if it changed, or if the
+        Worker has not acknowledged the current one;
+      - otherwise, once the backoff interval has elapsed, sends a signed
+        keep-alive {"unchangedSince": <digest>} and doubles the interval up
+        to HEARTBEAT_MAX_INTERVAL_SEC;
+      - otherwise does nothing.
+    A keep-alive the Worker answers with anything but 200 (Worker restarted,
+    entry expired, older Worker that only accepts full payloads) is followed
+    by a full heartbeat on the next check, and for HEARTBEAT_KEEPALIVE_RETRY_SEC
+    afterwards only full heartbeats go out, every HEARTBEAT_INTERVAL_SEC.
+    """
+    global _last_heartbeat, _heartbeat_digest, _heartbeat_acked, _heartbeat_interval, _heartbeat_due
+    global _heartbeat_sending, _keepalive_rejected_until
     now = time.time()
-    if now - _last_heartbeat < HEARTBEAT_INTERVAL_SEC:
+    if now - _last_heartbeat < HEARTBEAT_CHECK_INTERVAL_SEC:
         return  # rate-limited; leave existing state file untouched
     if not DISCOVERY_API_URL:
         _write_heartbeat_state(http_status=None, error="discovery_url_empty",
@@ -1048,15 +1732,16 @@ def post_heartbeat():
 
     if not circuit_addrs:
         # Nothing useful to report yet (kubo just started, no circuits
-        # established). Rate-limit retry to one minute — checking earlier
-        # rarely changes the outcome since circuit reservation handshakes
-        # take 10–30 seconds anyway.
+        # established). Checking again next cycle is cheap — it's one local
+        # /api/v0/id call. Forget the last digest so the circuits count as a
+        # change (and go out immediately) when they come back.
         _write_heartbeat_state(http_status=None, error="no_circuits",
                                circuit_count=0, reserved_on=reserved_on)
+        with _heartbeat_lock:
+            _reset_heartbeat_schedule()
         _last_heartbeat = now
         return
 
-    timestamp = datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
     data = {
         "type": "box",
         "reservedOn": reserved_on,
@@ -1069,82 +1754,215 @@ def post_heartbeat():
     cluster_pid = _read_cluster_peer_id()
     if cluster_pid:
         data["clusterPeerId"] = cluster_pid
+    digest = _heartbeat_data_digest(data)
 
-    signing_input = _canonical_json({
-        "peerId": peer_id,
-        "timestamp": timestamp,
-        "data": data,
-    })
+    with _heartbeat_lock:
+        _last_heartbeat = now
+        changed = digest != _heartbeat_digest
+        if _heartbeat_sending or (not changed and now < _heartbeat_due):
+            return  # in flight elsewhere, or stable and not yet due
+        full = changed or not _heartbeat_acked or now < _keepalive_rejected_until
+        _heartbeat_sending = True
+    if full:
+        payload = data
+    else:
+        payload = {"type": "box", "unchangedSince": digest}
+    kind = "full" if full else "keepalive"
+    latency_ms = None
     try:
-        import base64
-        sig = key.sign(signing_input.encode("utf-8"))
-        body = {
-            "type": "box",
-            "peerId": peer_id,
-            "timestamp": timestamp,
-            "data": data,
-            "signature": base64.b64encode(sig).decode("ascii"),
-        }
-        r = requests.post(
-            DISCOVERY_API_URL + "/heartbeat",
-            json=body,
-            timeout=5,
-            headers={
-                "user-agent": "fula-readiness-check/1.0",
-                "x-fula-client": "edge",
-            },
-        )
+        t0 = time.monotonic()
+        r = _sign_and_post_heartbeat(key, peer_id, payload)
+        latency_ms = int((time.monotonic() - t0) * 1000)
+        status, error = r.status_code, None
         if r.status_code != 200:
-            logging.info("heartbeat: POST returned HTTP %d: %s", r.status_code, r.text[:200])
-        _write_heartbeat_state(
-            http_status=r.status_code,
-            error=None if r.status_code == 200 else "http_{}".format(r.status_code),
-            circuit_count=len(circuit_addrs),
-            reserved_on=reserved_on,
-        )
+            logging.info("heartbeat: %s POST returned HTTP %d: %s", kind, r.status_code, r.text[:200])
+            error = "http_{}".format(r.status_code)
     except Exception as e:
-        logging.info("heartbeat: POST failed: %s", e)
+        logging.info("heartbeat: %s POST failed: %s", kind, e)
+        status, error = None, "{}: {}".format(type(e).__name__, str(e)[:100])
+
+    with _heartbeat_lock:
+        _heartbeat_sending = False
+        if full:
+            if changed and _heartbeat_digest is not None:
+                logging.info("heartbeat: circuit set changed, now reserved on %s", reserved_on)
+            _heartbeat_digest = digest
+            _heartbeat_acked = status == 200
+            _heartbeat_interval = HEARTBEAT_INTERVAL_SEC
+            _heartbeat_due = now + _heartbeat_interval
+        elif status == 200:
+            _heartbeat_interval = min(_heartbeat_interval * 2, HEARTBEAT_MAX_INTERVAL_SEC)
+            _heartbeat_due = now + _heartbeat_interval
+        else:
+            # The last valid heartbeat is already HEARTBEAT_INTERVAL_SEC old,
+            # so resend the full payload on the next check rather than
+            # waiting out another interval. If the Worker answered, it
+            # doesn't recognise the digest (or keep-alives at all): stay on
+            # full heartbeats for a while instead of paying a rejected
+            # keep-alive plus a full every interval.
+            if status is not None:
+                _keepalive_rejected_until = now + HEARTBEAT_KEEPALIVE_RETRY_SEC
+                logging.info("heartbeat: keep-alive rejected; sending full heartbeats for %ds",
+                             HEARTBEAT_KEEPALIVE_RETRY_SEC)
+            _heartbeat_acked = False
+            _heartbeat_interval = HEARTBEAT_INTERVAL_SEC
+            _heartbeat_due = now
         _write_heartbeat_state(
-            http_status=None,
-            error="{}: {}".format(type(e).__name__, str(e)[:100]),
+            http_status=status,
+            error=error,
             circuit_count=len(circuit_addrs),
             reserved_on=reserved_on,
+            kind=kind,
+            next_due_in=_heartbeat_due - now,
+            latency_ms=latency_ms,
         )
-    _last_heartbeat = now
 
 
+def start_heartbeat_loop():
+    """Run post_heartbeat() on its own thread so a circuit change is reported
+    within HEARTBEAT_CHECK_INTERVAL_SEC rather than whenever the main loop
+    next comes round (restart back-offs there can hold it for minutes)."""
+    _start_periodic("heartbeat", post_heartbeat, HEARTBEAT_CHECK_INTERVAL_SEC)
 
-def check_dns_reachable(timeout=5):
-    """Return first reachable target from FULA_DNS_LIST, or "google.com" if all
-    public DNS IPs fail but google.com resolves via the network's own resolver,
-    or None if everything fails (truly no internet).
 
-    The google.com fallback handles private networks that ship their own DNS
-    server and block 1.1.1.1/8.8.8.8/9.9.9.9 directly. subprocess timeout
-    bounds the call so a broken local resolver can't hang the script.
-    """
-    for dns in FULA_DNS_LIST:
+
+# --- Reachability race --------------------------------------------------------
+# Probing resolvers one at a time with a 5s timeout each costs 30s+ per cycle
+# on a half-broken network. Instead every target is raced concurrently,
+# happy-eyeballs style: targets start REACHABILITY_STAGGER_SEC apart in
+# scoreboard order (the next one starts immediately if one fails), and the
+# first success wins. Stragglers keep running on daemon threads and still
+# record their result. The per-target scoreboard (EWMA latency, consecutive
+# failures) lives in /run so the fastest known-good target goes first even
+# after a watchdog restart.
+REACHABILITY_HTTPS_TARGETS = ["https://www.google.com", "https://1.1.1.1", "https://dns.google"]
+REACHABILITY_STAGGER_SEC = 0.25
+_REACHABILITY_EWMA_ALPHA = 0.3
+_reachability_lock = threading.Lock()
+_reachability_scores = None  # "kind:target" -> score dict; loaded lazily
+
+
+def _load_reachability_scores():
+    global _reachability_scores
+    if _reachability_scores is None:
         try:
-            result = subprocess.run(
-                ["ping", "-c", "1", "-W", str(timeout), dns],
-                capture_output=True, timeout=timeout + 2,
-            )
-            if result.returncode == 0:
-                return dns
-        except (subprocess.TimeoutExpired, OSError):
+            with open(REACHABILITY_STATE_PATH, "r") as f:
+                _reachability_scores = json.load(f).get("targets") or {}
+        except (OSError, ValueError, AttributeError):
+            _reachability_scores = {}
+    return _reachability_scores
+
+
+def _record_reachability(key, ok, latency_ms):
+    with _reachability_lock:
+        scores = _load_reachability_scores()
+        s = scores.setdefault(key, {"ok": 0, "fail": 0, "consecutive_fail": 0,
+                                    "ewma_ms": None, "last_ok_ts": None})
+        if ok:
+            s["ok"] += 1
+            s["consecutive_fail"] = 0
+            s["last_ok_ts"] = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+            s["ewma_ms"] = latency_ms if s["ewma_ms"] is None else int(
+                _REACHABILITY_EWMA_ALPHA * latency_ms + (1 - _REACHABILITY_EWMA_ALPHA) * s["ewma_ms"])
+        else:
+            s["fail"] += 1
+            s["consecutive_fail"] += 1
+
+
+def _rank_reachability_targets(targets):
+    """Known-good targets by EWMA latency, then untried ones in the given
+    order, then failing ones by how long they've been failing."""
+    scores = _load_reachability_scores()
+
+    def rank(item):
+        idx, (kind, target) = item
+        s = scores.get(f"{kind}:{target}")
+        if s is None or (s["consecutive_fail"] == 0 and s["ewma_ms"] is None):
+            return (1, 0, idx)
+        if s["consecutive_fail"] == 0:
+            return (0, s["ewma_ms"], idx)
+        return (2, s["consecutive_fail"], idx)
+
+    return [t for _i, t in sorted(enumerate(targets), key=rank)]
+
+
+def _probe_target(kind, target, timeout):
+    """One probe: ICMP echo via ping, or an HTTPS HEAD where any response at
+    all (even a redirect) means the network path works."""
+    if kind == "icmp":
+        result = subprocess.run(["ping", "-c", "1", "-W", str(timeout), target],
+                                capture_output=True, timeout=timeout + 2)
+        return result.returncode == 0
+    requests.head(target, timeout=timeout, allow_redirects=False)
+    return True
+
+
+def race_reachability(targets, timeout=5):
+    """Race [(kind, target)] and return the first (kind, target) to succeed,
+    or None once every probe has failed or the deadline passed."""
+    results = queue.Queue()
+
+    def worker(kind, target):
+        t0 = time.monotonic()
+        try:
+            ok = _probe_target(kind, target, timeout)
+        except (Exception, _SubprocessTimeoutExpired):
+            ok = False
+        _record_reachability(f"{kind}:{target}", ok, int((time.monotonic() - t0) * 1000))
+        results.put(((kind, target), ok))
+
+    pending = _rank_reachability_targets(targets)
+    running = 0
+    winner = None
+    deadline = time.monotonic() + timeout + 3
+    while winner is None and (pending or running):
+        if pending:
+            kind, target = pending.pop(0)
+            threading.Thread(target=worker, args=(kind, target),
+                             name=f"reach-{target}", daemon=True).start()
+            running += 1
+            wait = REACHABILITY_STAGGER_SEC
+        else:
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                break
+        try:
+            item, ok = results.get(timeout=wait)
+        except queue.Empty:
             continue
-    try:
-        result = subprocess.run(
-            ["ping", "-c", "1", "-W", str(timeout), "google.com"],
-            capture_output=True, timeout=timeout + 2,
-        )
-        if result.returncode == 0:
-            return "google.com"
-    except (subprocess.TimeoutExpired, OSError):
-        pass
-    return None
+        running -= 1
+        if ok:
+            winner = item
+        # A failure frees its slot; the loop launches the next target right away.
+    _write_reachability_state(winner)
+    return winner
+
+
+def _write_reachability_state(winner):
+    with _reachability_lock:
+        targets = dict(_load_reachability_scores())
+    _atomic_write_state(REACHABILITY_STATE_PATH, {
+        "last_check_ts": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "last_winner": f"{winner[0]}:{winner[1]}" if winner else None,
+        "targets": targets,
+    })
+
+
+def check_dns_reachable(timeout=5):
+    """Return whichever target (an entry of FULA_DNS_LIST or "google.com")
+    answers first, or None if everything fails (truly no internet).
+
+    The google.com probe handles private networks that ship their own DNS
+    server and block 1.1.1.1/8.8.8.8/9.9.9.9 directly. All seven are raced
+    concurrently (see race_reachability), so a dead network costs one
+    timeout rather than seven.
+    """
+    winner = race_reachability(
+        [("icmp", dns) for dns in FULA_DNS_LIST] + [("icmp", "google.com")], timeout)
+    return winner[1] if winner else None
 
 
+@instrumented
 def safe_restart_fula(**kwargs):
     """Restart fula.service, clearing any start-limit failures first."""
     subprocess.run(["sudo", "systemctl", "reset-failed", "fula.service"],
@@ -1157,6 +1975,7 @@ def safe_restart_fula(**kwargs):
     })
     return result
 
+@instrumented
 def safe_start_fula(**kwargs):
     """Start fula.service, clearing any start-limit failures first."""
     subprocess.run(["sudo", "systemctl", "reset-failed", "fula.service"],
@@ -1170,95 +1989,596 @@ def safe_start_fula(**kwargs):
     return result
 
 
-def has_yaml_invalid_chars(content):
-    """Check for control characters that YAML parsers reject.
+# --- Targeted restarts ---------------------------------------------------------
+# safe_restart_fula() restarts every container, so a cluster-only fault also
+# drops kubo's swarm connections and bitswap sessions. restart_containers()
+# restarts just the failed container and the ones that depend on it, per the
+# compose depends_on graph below: dependents are stopped first and started
+# after what they depend on, with the host-side init hooks fula.sh runs before
+# `docker compose up` re-run for the containers that need them. If a container
+# can't be stopped/started (e.g. compose never created it) or the stack isn't
+# healthy afterwards, it falls back to a full fula.service restart.
+#
+# container -> containers that must restart after it. go-fula depends only
+# on fxsupport, so cluster repairs leave the proxy/BLE control plane up.
+RESTART_DEPENDENTS = {
+    "ipfs_host": ("ipfs_cluster", "ipfs_local"),
+    "ipfs_local": ("fula_pinning", "fula_gateway"),
+}
+# Readiness signal (wait_until_healthy) that shows a container is serving.
+_RESTART_SIGNALS = {"ipfs_host": "kubo", "ipfs_cluster": "cluster", "fula_go": "proxy"}
 
-    YAML allows: tab (0x09), newline (0x0A), carriage return (0x0D)
-    YAML rejects: all other control characters (0x00-0x08, 0x0B-0x0C, 0x0E-0x1F)
 
-    Args:
-        content: bytes content to check
+def _restart_hook_kubo():
+    """fula.sh restart(): init script executable + kubo config merge."""
+    subprocess.run(["sudo", "chmod", "755", os.path.join(FULA_PATH, "kubo", "kubo-container-init.d.sh")],
+                   capture_output=True, timeout=20)
+    merge = os.path.join(FULA_PATH, "update_kubo_config.py")
+    if os.path.exists(merge):
+        res = subprocess.run(["sudo", "python3", merge], capture_output=True, text=True, timeout=120)
+        if res.returncode != 0:
+            logging.warning(f"kubo config merge failed before restart: {(res.stderr or '').strip()}")
 
-    Returns:
-        tuple: (has_invalid, list of (byte_value, position) for invalid chars found)
-    """
-    invalid_found = []
-    for i, byte in enumerate(content):
-        if byte in YAML_INVALID_CHARS:
-            invalid_found.append((byte, i))
-    return (len(invalid_found) > 0, invalid_found)
 
+def _restart_hook_cluster():
+    """fula.sh restart(): the cluster entrypoint must stay executable."""
+    subprocess.run(["sudo", "chmod", "755",
+                    os.path.join(FULA_PATH, "ipfs-cluster", "ipfs-cluster-container-init.d.sh")],
+                   capture_output=True, timeout=20)
 
-def validate_yaml_syntax(file_path):
-    """Validate YAML file syntax.
 
-    Args:
-        file_path: Path to the YAML file to validate
+RESTART_HOOKS = {"ipfs_host": _restart_hook_kubo, "ipfs_cluster": _restart_hook_cluster}
 
-    Returns:
-        tuple: (is_valid, error_message or None)
-    """
-    try:
-        with open(file_path, 'r') as f:
-            yaml.safe_load(f)
-        return True, None
-    except yaml.YAMLError as e:
-        return False, str(e)
-    except Exception as e:
-        return False, str(e)
 
+def plan_restart(failed):
+    """failed plus everything downstream of it, each after the containers it
+    depends on."""
+    members, stack = set(), [failed]
+    while stack:
+        name = stack.pop()
+        if name not in members:
+            members.add(name)
+            stack.extend(RESTART_DEPENDENTS.get(name, ()))
+    plan = []
+    while members:
+        ready = sorted(n for n in members
+                       if not any(n in RESTART_DEPENDENTS.get(p, ()) for p in members))
+        plan += ready
+        members -= set(ready)
+    return plan
 
-def strip_deprecated_provider_fields(config_path):
-    """Remove deprecated Provider/Reprovider fields from a kubo config JSON file.
 
-    kubo 0.40+ emits a FATAL and refuses to start if the deprecated Provider
-    field exists.  This reads the config via sudo, strips the offending keys,
-    and writes it back (preserving ipfs user ownership).
+def _docker_container_cmd(action, name):
+    try:
+        res = subprocess.run(["sudo", "docker", action, name], capture_output=True, text=True, timeout=120)
+    except (_SubprocessTimeoutExpired, OSError) as e:
+        logging.warning(f"docker {action} {name} failed: {e}")
+        return False
+    if res.returncode != 0:
+        logging.warning(f"docker {action} {name} failed: {(res.stderr or '').strip()}")
+        return False
+    return True
 
-    Args:
-        config_path: Absolute path to the kubo config JSON file.
 
-    Returns:
-        True if fields were removed, False if nothing changed or on error.
+@instrumented
+def restart_containers(failed, reason, while_stopped=None, escalate=True):
+    """Restart failed and its dependents instead of all of fula.service.
+
+    while_stopped, if given, runs after the containers are stopped and before
+    they start again (e.g. removing a stale lock file). With escalate=False
+    there is no fula.service fallback; the remediation engine picks the next
+    step instead. Returns True if the stack is healthy afterwards.
     """
-    try:
-        result = subprocess.run(
-            ["sudo", "cat", config_path],
-            capture_output=True, text=True, timeout=10
-        )
-        if result.returncode != 0:
-            return False
-        config = json.loads(result.stdout)
-        changed = False
-        for key in ("Provider", "Reprovider"):
-            if key in config:
-                del config[key]
-                changed = True
-        if changed:
-            new_content = json.dumps(config, indent=2) + "\n"
-            subprocess.run(
-                ["sudo", "tee", config_path],
-                input=new_content.encode(), capture_output=True, timeout=10
-            )
-            subprocess.run(
-                ["sudo", "chown", "1000:1000", config_path],
-                capture_output=True, timeout=10
-            )
-            logging.info(f"Stripped deprecated Provider/Reprovider fields from {config_path}")
-        return changed
-    except Exception as e:
-        logging.error(f"Error stripping Provider fields from {config_path}: {e}")
-        return False
+    plan = plan_restart(failed)
+    logging.info(f"targeted restart of {plan} ({reason})")
+    ok = all([_docker_container_cmd("stop", name) for name in reversed(plan)])
+    if while_stopped is not None:
+        while_stopped()
+    if ok:
+        for name in plan:
+            hook = RESTART_HOOKS.get(name)
+            if hook is not None:
+                try:
+                    hook()
+                except (_SubprocessTimeoutExpired, OSError) as e:
+                    logging.warning(f"restart hook for {name} failed: {e}")
+            if not _docker_container_cmd("start", name):
+                ok = False
+                break
+    checks = ("containers",) + tuple(_RESTART_SIGNALS[n] for n in plan if n in _RESTART_SIGNALS)
+    healthy = ok and wait_until_healthy(f"targeted-restart:{failed}", checks=checks)
+    escalated = not healthy and escalate
+    if escalated:
+        logging.warning(f"targeted restart of {failed} did not recover; restarting fula.service")
+        safe_restart_fula(capture_output=True, timeout=120)
+        healthy = wait_until_healthy(f"targeted-restart:{failed}:escalated")
+    _append_event("restart", {
+        "unit": "containers",
+        "action": "targeted",
+        "failed": failed,
+        "plan": plan,
+        "reason": reason,
+        "escalated": escalated,
+        "healthy": healthy,
+    })
+    return healthy
 
 
-def backup_config_if_valid(config_path):
-    """Create backup of config if it's valid YAML.
+# --- Health-gated waits --------------------------------------------------------
+# Remediations used to sleep a fixed 30-90s before moving on, although the
+# stack is sometimes back in 8s and sometimes needs two minutes.
+# wait_until_healthy() polls the real readiness signals with exponential
+# backoff (HEALTH_WAIT_INITIAL_SEC doubling up to HEALTH_WAIT_MAX_INTERVAL_SEC)
+# until they all pass or the deadline runs out, and appends the measured
+# time-to-healthy as a "time-to-healthy" event so remediations can be compared.
+HEALTH_WAIT_DEADLINE_SEC = int(os.environ.get("HEALTH_WAIT_DEADLINE_SEC", "120"))
+HEALTH_WAIT_INITIAL_SEC = 2
+HEALTH_WAIT_MAX_INTERVAL_SEC = 15
+# Cheap, local signals first: a poll stops at the first failing one.
+HEALTH_CHECKS = ("mergerfs", "docker", "containers", "proxy", "kubo", "cluster")
+HEALTH_CONTAINERS = ("fula_go", "ipfs_host", "ipfs_cluster")
+# main() re-runs check_conditions() after a repair; wait on the signals it
+# needs, allowing for fula.service's ExecStartPre=sleep 60.
+_CONDITION_CHECKS = ("mergerfs", "docker", "containers")
+_REPAIR_WAIT_DEADLINE_SEC = 180
 
-    Args:
-        config_path: Path to the config file
 
-    Returns:
-        bool: True if backup was created successfully
+def _healthy_mergerfs():
+    return check_fs_type("/uniondrive", "fuse.mergerfs")
+
+
+def _healthy_docker():
+    try:
+        res = subprocess.run(["sudo", "systemctl", "is-active", "docker.service"],
+                             capture_output=True, text=True, timeout=10)
+    except (_SubprocessTimeoutExpired, OSError):
+        return False
+    return (res.stdout or "").strip() == "active"
+
+
+def _healthy_containers():
+    try:
+        res = subprocess.run(["sudo", "docker", "ps", "--format", "{{.Names}}"],
+                             capture_output=True, text=True, timeout=10)
+    except (_SubprocessTimeoutExpired, OSError):
+        return False
+    running = set((res.stdout or "").split())
+    return res.returncode == 0 and all(c in running for c in HEALTH_CONTAINERS)
+
+
+def _healthy_proxy():
+    # check_proxy_health() without the per-port warning: failures are
+    # expected while polling.
+    for port in (4020, 4021):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=2):
+                pass
+        except OSError:
+            return False
+    return True
+
+
+def _healthy_kubo():
+    try:
+        return requests.post(IPFS_API_URL + "/api/v0/id", timeout=3).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def _healthy_cluster():
+    try:
+        return requests.get("http://127.0.0.1:9094/id", timeout=3).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+_HEALTH_PROBES = {
+    "mergerfs": _healthy_mergerfs,
+    "docker": _healthy_docker,
+    "containers": _healthy_containers,
+    "proxy": _healthy_proxy,
+    "kubo": _healthy_kubo,
+    "cluster": _healthy_cluster,
+}
+
+
+def _first_unhealthy(checks):
+    for name in checks:
+        try:
+            if not _HEALTH_PROBES[name]():
+                return name
+        except Exception as e:
+            logging.debug(f"health probe {name} raised: {e}")
+            return name
+    return None
+
+
+@instrumented
+def wait_until_healthy(remediation, checks=HEALTH_CHECKS, deadline=None):
+    """Block until every signal in checks passes or deadline seconds pass.
+
+    Returns True if healthy. Time is counted both on the clock and as the
+    sum of the backoff sleeps, so the wait stays bounded when sleep is
+    patched out.
+    """
+    deadline = HEALTH_WAIT_DEADLINE_SEC if deadline is None else deadline
+    start = time.monotonic()
+    interval = HEALTH_WAIT_INITIAL_SEC
+    slept = 0.0
+    while True:
+        sleep_for = min(interval, max(0.0, deadline - max(time.monotonic() - start, slept)))
+        time.sleep(sleep_for)
+        slept += sleep_for
+        failing = _first_unhealthy(checks)
+        elapsed = max(time.monotonic() - start, slept)
+        if failing is None or elapsed >= deadline:
+            break
+        interval = min(interval * 2, HEALTH_WAIT_MAX_INTERVAL_SEC)
+    healthy = failing is None
+    if healthy:
+        logging.info(f"{remediation}: healthy after {elapsed:.1f}s")
+    else:
+        logging.warning(f"{remediation}: {failing} still unhealthy after {elapsed:.1f}s")
+    _append_event("time-to-healthy", {
+        "remediation": remediation,
+        "healthy": healthy,
+        "elapsed_s": round(elapsed, 1),
+        "failing": failing,
+        "checks": list(checks),
+        "deadline_s": deadline,
+    })
+    return healthy
+
+
+# --- Remediation engine --------------------------------------------------------
+# Throttling used to be a single restart_attempts counter that every fix bumped,
+# so a restart that never helps a given fault ran again every monitor cycle
+# until the reboot escalation. run_remediation() keeps state per failure
+# signature (e.g. "container-down:ipfs_cluster") and walks an ordered ladder of
+# remediations, cheapest first:
+# - a failed attempt puts that action into backoff for REMEDIATION_BACKOFF_SEC,
+#   doubling per consecutive failure up to REMEDIATION_BACKOFF_MAX_SEC;
+# - after REMEDIATION_REFUSE_AFTER consecutive failures on the same signature
+#   the action is refused for REMEDIATION_REFUSE_SEC and the ladder moves on
+#   to the next step (one probation attempt is allowed once that expires);
+# - a "recovery" followed by the same signature within REMEDIATION_RECUR_SEC
+#   didn't hold and is counted as a failure;
+# - a success closes the episode and records its time-to-recover.
+# Stored under ~/.internal rather than /run (like relay_scores.json) so the
+# backoff survives the daemon restarts and reboots a thrash loop goes through.
+REMEDIATION_STATE_PATH = os.path.join(HOME_PATH, ".internal", "remediation.json")
+REMEDIATION_BACKOFF_SEC = int(os.environ.get("REMEDIATION_BACKOFF_SEC", "300"))
+REMEDIATION_BACKOFF_MAX_SEC = 3600
+REMEDIATION_REFUSE_AFTER = 3
+REMEDIATION_REFUSE_SEC = int(os.environ.get("REMEDIATION_REFUSE_SEC", str(6 * 3600)))
+REMEDIATION_RECUR_SEC = 3600
+# Signatures untouched for this long are dropped from the file.
+REMEDIATION_RETAIN_SEC = 7 * 24 * 3600
+_remediation_lock = threading.Lock()
+_remediation_state = None
+
+
+def _load_remediation_state():
+    """The ledger, read from REMEDIATION_STATE_PATH on first use. Caller
+    holds _remediation_lock."""
+    global _remediation_state
+    if _remediation_state is None:
+        try:
+            with open(REMEDIATION_STATE_PATH) as f:
+                state = json.load(f)
+            if isinstance(state.get("signatures"), dict):
+                _remediation_state = state
+        except (OSError, json.JSONDecodeError, AttributeError):
+            pass  # missing or malformed → start fresh
+        if _remediation_state is None:
+            _remediation_state = {"signatures": {}}
+    return _remediation_state
+
+
+def _save_remediation_state(state, now):
+    """Prune stale signatures and persist. Caller holds _remediation_lock."""
+    sigs = state["signatures"]
+    for name in [n for n, s in sigs.items()
+                 if now - (s.get("last_ts") or 0) > REMEDIATION_RETAIN_SEC]:
+        del sigs[name]
+    state["updated"] = int(now)
+    _atomic_write_state(REMEDIATION_STATE_PATH, state)
+
+
+def _remediation_entry(state, signature, action=None):
+    sig = state["signatures"].setdefault(signature, {
+        "episode_start": None, "last_action": None, "last_outcome": None, "last_ts": None,
+        "recoveries": 0, "time_to_recover_s": None, "actions": {},
+    })
+    if action is None:
+        return sig
+    return sig, sig["actions"].setdefault(action, {
+        "attempts": 0, "successes": 0, "failures": 0, "consec_failures": 0,
+        "last_outcome": None, "last_ts": None, "last_elapsed_s": None,
+        "next_allowed": 0, "refused_until": 0,
+    })
+
+
+def _mark_failed(entry, now):
+    entry["failures"] += 1
+    entry["consec_failures"] += 1
+    backoff = min(REMEDIATION_BACKOFF_SEC * 2 ** (entry["consec_failures"] - 1), REMEDIATION_BACKOFF_MAX_SEC)
+    entry["next_allowed"] = int(now + backoff)
+    if entry["consec_failures"] >= REMEDIATION_REFUSE_AFTER:
+        entry["refused_until"] = int(now + REMEDIATION_REFUSE_SEC)
+        entry["next_allowed"] = entry["refused_until"]
+
+
+def remediation_blocked(signature, action, now=None):
+    """None if action may run for signature now, otherwise the reason not."""
+    now = time.time() if now is None else now
+    with _remediation_lock:
+        sig = _load_remediation_state()["signatures"].get(signature) or {}
+        entry = sig.get("actions", {}).get(action)
+    if not entry:
+        return None
+    if now < entry.get("refused_until", 0):
+        return f"refused after {entry['consec_failures']} failed attempts"
+    if now < entry.get("next_allowed", 0):
+        return f"backoff, {int(entry['next_allowed'] - now)}s left"
+    return None
+
+
+def record_remediation(signature, action, ok, elapsed_s, started=None, now=None):
+    """Fold one attempt into the ledger and persist it. Returns a copy of the
+    signature's entry."""
+    now = time.time() if now is None else now
+    with _remediation_lock:
+        state = _load_remediation_state()
+        sig, entry = _remediation_entry(state, signature, action)
+        if sig["episode_start"] is None:
+            sig["episode_start"] = int(now if started is None else started)
+        entry["attempts"] += 1
+        entry["last_ts"] = int(now)
+        entry["last_elapsed_s"] = round(elapsed_s, 1)
+        if ok:
+            entry["successes"] += 1
+            entry["consec_failures"] = 0
+            entry["next_allowed"] = entry["refused_until"] = 0
+            entry["last_outcome"] = "recovered"
+            sig["recoveries"] += 1
+            sig["time_to_recover_s"] = int(now) - sig["episode_start"]
+            sig["episode_start"] = None
+        else:
+            _mark_failed(entry, now)
+            entry["last_outcome"] = "failed"
+        sig["last_action"] = action
+        sig["last_outcome"] = entry["last_outcome"]
+        sig["last_ts"] = int(now)
+        _save_remediation_state(state, now)
+        return json.loads(json.dumps(sig))
+
+
+def _note_recurrence(signature, now):
+    """The signature is back: a recent "recovered" didn't hold, so count it
+    against the action that claimed it. Returns that action, or None."""
+    with _remediation_lock:
+        state = _load_remediation_state()
+        sig = state["signatures"].get(signature)
+        if (not sig or sig.get("last_outcome") != "recovered"
+                or now - (sig.get("last_ts") or 0) > REMEDIATION_RECUR_SEC):
+            return None
+        action = sig["last_action"]
+        entry = sig["actions"][action]
+        entry["successes"] -= 1
+        entry["recoveries_reverted"] = entry.get("recoveries_reverted", 0) + 1
+        _mark_failed(entry, now)
+        entry["last_outcome"] = sig["last_outcome"] = "recurred"
+        sig["recoveries"] -= 1
+        # The episode never really ended.
+        sig["episode_start"] = int(now) - (sig.get("time_to_recover_s") or 0)
+        sig["time_to_recover_s"] = None
+        _save_remediation_state(state, now)
+        return action
+
+
+def run_remediation(signature, ladder, reason):
+    """Run the first step of ladder that isn't backing off or refused for
+    signature.
+
+    ladder is an ordered sequence of (action, fn) pairs, cheapest first; fn()
+    returns True once the fault is gone. Returns that result, or None when
+    every step was skipped (the caller's own escalation still applies).
+    """
+    now = time.time()
+    recurred = _note_recurrence(signature, now)
+    if recurred is not None:
+        logging.warning(f"{signature} is back within {REMEDIATION_RECUR_SEC}s of {recurred}; counting it as failed")
+    skipped = {}
+    for action, fn in ladder:
+        why = remediation_blocked(signature, action, now)
+        if why is not None:
+            skipped[action] = why
+            continue
+        logging.info(f"remediation {action} for {signature} ({reason})")
+        start = time.monotonic()
+        try:
+            ok = bool(fn())
+        except Exception as e:
+            logging.error(f"remediation {action} for {signature} raised: {e}")
+            ok = False
+        elapsed = time.monotonic() - start
+        sig = record_remediation(signature, action, ok, elapsed, started=now)
+        entry = sig["actions"][action]
+        _append_event("remediation", {
+            "signature": signature,
+            "action": action,
+            "reason": reason,
+            "outcome": entry["last_outcome"],
+            "elapsed_s": entry["last_elapsed_s"],
+            "attempts": entry["attempts"],
+            "consec_failures": entry["consec_failures"],
+            "time_to_recover_s": sig["time_to_recover_s"] if ok else None,
+            "skipped": skipped,
+        })
+        return ok
+    logging.warning(f"no remediation left for {signature}: {skipped}")
+    with _remediation_lock:
+        state = _load_remediation_state()
+        sig = _remediation_entry(state, signature)
+        if sig["episode_start"] is None:
+            sig["episode_start"] = int(now)
+        sig["last_outcome"] = "refused"
+        sig["last_ts"] = int(now)
+        _save_remediation_state(state, now)
+    _append_event("remediation", {
+        "signature": signature,
+        "action": None,
+        "reason": reason,
+        "outcome": "refused",
+        "skipped": skipped,
+    })
+    return None
+
+
+def _restart_stack(remediation):
+    """Remediation step: full fula.service restart, then wait for the stack."""
+    safe_restart_fula(capture_output=True, timeout=120)
+    return wait_until_healthy(remediation)
+
+
+def restart_ladder(container, reason, while_stopped=None):
+    """Targeted restart of container, escalating to a full stack restart.
+    while_stopped runs between stop and start on the targeted step, and just
+    before the restart on the stack step."""
+    def stack_restart():
+        if while_stopped is not None:
+            while_stopped()
+        return _restart_stack(f"{container}:stack-restart")
+
+    return [
+        ("targeted-restart", lambda: restart_containers(container, reason, while_stopped, escalate=False)),
+        ("stack-restart", stack_restart),
+    ]
+
+
+def remediate_with_stack_restart(signature, reason, caller):
+    """Full stack restart for a log-pattern fix, gated by signature's ledger
+    entry so a pattern the restart doesn't clear backs off instead of
+    restarting fula.service every cycle. True if the restart ran."""
+    return run_remediation(signature, [("stack-restart", lambda: _restart_stack(caller))], reason) is not None
+
+
+def pattern_signature(prefix, pattern):
+    """prefix plus a slug of a matched log pattern, e.g. "config-yaml:unmarshal-failed"."""
+    return prefix + ":" + re.sub(r"[^a-z0-9]+", "-", pattern.lower()).strip("-")
+
+
+def remediation_action_state(signature, action):
+    """Copy of action's ledger entry under signature ({} if it never ran)."""
+    with _remediation_lock:
+        sig = _load_remediation_state()["signatures"].get(signature) or {}
+        return dict(sig.get("actions", {}).get(action) or {})
+
+
+def reset_remediation_failures(signature, action, now=None):
+    """The fault was seen gone without action's help: forget its consecutive
+    failures and backoff under signature."""
+    now = time.time() if now is None else now
+    with _remediation_lock:
+        state = _load_remediation_state()
+        entry = (state["signatures"].get(signature) or {}).get("actions", {}).get(action)
+        if not entry or (not entry["consec_failures"] and not entry["next_allowed"]):
+            return
+        entry["consec_failures"] = 0
+        entry["next_allowed"] = entry["refused_until"] = 0
+        _save_remediation_state(state, now)
+
+
+def has_yaml_invalid_chars(content):
+    """Check for control characters that YAML parsers reject.
+
+    YAML allows: tab (0x09), newline (0x0A), carriage return (0x0D)
+    YAML rejects: all other control characters (0x00-0x08, 0x0B-0x0C, 0x0E-0x1F)
+
+    Args:
+        content: bytes content to check
+
+    Returns:
+        tuple: (has_invalid, list of (byte_value, position) for invalid chars found)
+    """
+    invalid_found = []
+    for i, byte in enumerate(content):
+        if byte in YAML_INVALID_CHARS:
+            invalid_found.append((byte, i))
+    return (len(invalid_found) > 0, invalid_found)
+
+
+def validate_yaml_syntax(file_path):
+    """Validate YAML file syntax.
+
+    Args:
+        file_path: Path to the YAML file to validate
+
+    Returns:
+        tuple: (is_valid, error_message or None)
+    """
+    try:
+        with open(file_path, 'r') as f:
+            yaml.safe_load(f)
+        return True, None
+    except yaml.YAMLError as e:
+        return False, str(e)
+    except Exception as e:
+        return False, str(e)
+
+
+def strip_deprecated_provider_fields(config_path):
+    """Remove deprecated Provider/Reprovider fields from a kubo config JSON file.
+
+    kubo 0.40+ emits a FATAL and refuses to start if the deprecated Provider
+    field exists.  This reads the config via sudo, strips the offending keys,
+    and writes it back (preserving ipfs user ownership).
+
+    Args:
+        config_path: Absolute path to the kubo config JSON file.
+
+    Returns:
+        True if fields were removed, False if nothing changed or on error.
+    """
+    try:
+        result = subprocess.run(
+            ["sudo", "cat", config_path],
+            capture_output=True, text=True, timeout=10
+        )
+        if result.returncode != 0:
+            return False
+        config = json.loads(result.stdout)
+        changed = False
+        for key in ("Provider", "Reprovider"):
+            if key in config:
+                del config[key]
+                changed = True
+        if changed:
+            new_content = json.dumps(config, indent=2) + "\n"
+            subprocess.run(
+                ["sudo", "tee", config_path],
+                input=new_content.encode(), capture_output=True, timeout=10
+            )
+            subprocess.run(
+                ["sudo", "chown", "1000:1000", config_path],
+                capture_output=True, timeout=10
+            )
+            logging.info(f"Stripped deprecated Provider/Reprovider fields from {config_path}")
+        return changed
+    except Exception as e:
+        logging.error(f"Error stripping Provider fields from {config_path}: {e}")
+        return False
+
+
+def backup_config_if_valid(config_path):
+    """Create backup of config if it's valid YAML.
+
+    Args:
+        config_path: Path to the config file
+
+    Returns:
+        bool: True if backup was created successfully
     """
     backup_path = config_path + ".backup"
     try:
@@ -1299,6 +2619,7 @@ def restore_config_from_backup(config_path):
     return False
 
 
+@instrumented
 def check_disk_space(path="/uniondrive", min_gb=1):
     """Check if path has at least min_gb free space.
 
@@ -1328,6 +2649,261 @@ def check_disk_space(path="/uniondrive", min_gb=1):
         return True, -1  # Don't block on error
 
 
+# --- Tiered disk-space reclamation -------------------------------------------
+# `docker system prune -f` was the only lever when space ran low: slow, and
+# it frees nothing on /uniondrive (docker's data-root lives on the eMMC). The
+# engine below walks ordered tiers, cheapest/safest first. Each tier names
+# where its data lives so tiers on a different filesystem than the one
+# that's full are skipped outright, estimates what it can free, runs, and
+# the engine stops as soon as the target free space is reached.
+CONTAINER_LOG_CAP_BYTES = int(os.environ.get("CONTAINER_LOG_CAP_BYTES", str(50 * 1024 * 1024)))
+KUBO_GC_TIMEOUT = 600
+_DOCKER_SIZE_UNITS = {"B": 1, "kB": 1000, "KB": 1000, "MB": 1000**2, "GB": 1000**3, "TB": 1000**4}
+_ENV_IMAGE_KEYS = ("GO_FULA", "FX_SUPPROT", "IPFS_CLUSTER", "FULA_PINNING", "FULA_GATEWAY")
+
+
+def _parse_docker_size(text):
+    """'1.23GB' -> 1230000000 (docker CLI uses decimal units). 0 if unparseable."""
+    m = re.match(r'^\s*([\d.]+)\s*([kKMGT]?B)\s*$', text or "")
+    if not m:
+        return 0
+    try:
+        return int(float(m.group(1)) * _DOCKER_SIZE_UNITS[m.group(2)])
+    except (ValueError, KeyError):
+        return 0
+
+
+def _docker_root_dir():
+    try:
+        result = subprocess.run(["sudo", "docker", "info", "--format", "{{.DockerRootDir}}"],
+                                capture_output=True, text=True, timeout=20)
+        root = result.stdout.strip()
+        if result.returncode == 0 and root:
+            return root
+    except Exception as e:
+        logging.debug(f"docker info failed: {e}")
+    return "/var/lib/docker"
+
+
+def _env_image_refs():
+    """Image references the current .env pins, e.g. {'functionland/go-fula:release'}."""
+    refs = set()
+    try:
+        with open(ENV_FILE_PATH, "r") as f:
+            for line in f:
+                key, sep, value = line.strip().partition("=")
+                if sep and key in _ENV_IMAGE_KEYS and value:
+                    refs.add(value if ":" in value.rsplit("/", 1)[-1] else value + ":latest")
+    except OSError as e:
+        logging.debug(f"Could not read {ENV_FILE_PATH}: {e}")
+    return refs
+
+
+def _stale_fula_images():
+    """[(image_id, size_bytes, label)] for images of the fula repos pinned by
+    .env whose tag isn't the pinned one, including ones a re-pull left
+    untagged (<repo>:<none>). Dangling images of any other repo (blox-ai,
+    third-party plugins, <none>:<none> build layers) are never listed. In-use
+    images are left in the list — `docker rmi` without -f refuses them,
+    which is what we want."""
+    refs = _env_image_refs()
+    repos = {r.rsplit(":", 1)[0] for r in refs}
+    result = subprocess.run(
+        ["sudo", "docker", "image", "ls", "--format", "{{.ID}}|{{.Repository}}|{{.Tag}}|{{.Size}}"],
+        capture_output=True, text=True, timeout=30)
+    stale, seen = [], set()
+    for line in result.stdout.strip().splitlines():
+        parts = line.split("|")
+        if len(parts) != 4:
+            continue
+        image_id, repo, tag, size = parts
+        ref = f"{repo}:{tag}"
+        if image_id in seen or repo not in repos or ref in refs:
+            continue
+        seen.add(image_id)
+        stale.append((image_id, _parse_docker_size(size), ref))
+    return stale
+
+
+def _oversized_container_logs():
+    """[(path, size)] of json-file container logs over CONTAINER_LOG_CAP_BYTES, largest first."""
+    logs = []
+    for path in _glob_paths(os.path.join(_docker_root_dir(), "containers", "*", "*-json.log")):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        if size > CONTAINER_LOG_CAP_BYTES:
+            logs.append((path, size))
+    return sorted(logs, key=lambda x: -x[1])
+
+
+def _events_backups():
+    return [p for p in _glob_paths(EVENTS_LOG_PATH + ".*") if re.search(r'\.\d+$', p)]
+
+
+def _reclaim_docker_images(done):
+    for image_id, _size, ref in _stale_fula_images():
+        if done():
+            return
+        r = subprocess.run(["sudo", "docker", "rmi", image_id],
+                           capture_output=True, text=True, timeout=120)
+        if r.returncode == 0:
+            logging.info(f"reclaim: removed image {ref} ({image_id})")
+        else:
+            logging.debug(f"reclaim: docker rmi {image_id} refused: {r.stderr.strip()}")
+
+
+def _reclaim_container_logs(done):
+    for path, size in _oversized_container_logs():
+        if done():
+            return
+        try:
+            # json-file keeps the fd open with O_APPEND, so truncating in place is safe.
+            os.truncate(path, 0)
+            logging.info(f"reclaim: truncated {path} ({size / (1024**2):.0f}MB)")
+        except OSError as e:
+            logging.warning(f"reclaim: could not truncate {path}: {e}")
+
+
+def _reclaim_trash(done):
+    """Wake the background reaper at best-effort rather than idle I/O
+    priority and wait, at most TRASH_RECLAIM_WAIT_SEC, for it to free enough.
+    Deleting inline would block the monitor loop for up to
+    TRASH_REAP_TIMEOUT per entry and race the reaper on the same entry."""
+    _trash_urgent.set()
+    _start_trash_reaper()
+    deadline = time.monotonic() + TRASH_RECLAIM_WAIT_SEC
+    while not done() and time.monotonic() < deadline:
+        with _trash_lock:
+            if _trash_reaper_thread is None or not _trash_reaper_thread.is_alive():
+                return
+        time.sleep(5)
+
+
+def _reclaim_kubo_gc(done):
+    resp = requests.post("http://127.0.0.1:5001/api/v0/repo/gc?quiet=true",
+                         timeout=(5, KUBO_GC_TIMEOUT))
+    logging.info(f"reclaim: kubo repo/gc returned HTTP {resp.status_code}")
+
+
+def _reclaim_events_backups(done):
+    for path in sorted(_events_backups(), reverse=True):  # oldest (.5) first
+        if done():
+            return
+        try:
+            os.remove(path)
+            logging.info(f"reclaim: removed {path}")
+        except OSError as e:
+            logging.debug(f"reclaim: could not remove {path}: {e}")
+
+
+def _estimate_trash():
+    """0 if the trash is empty, otherwise unknown: sizing the entries would
+    mean the full tree walk the rename-to-trash design exists to avoid."""
+    return None if _list_trash_entries() else 0
+
+
+def _estimate_kubo_gc():
+    """kubo can't tell how much GC will free without running it; report the
+    repo size as an upper bound (None if the API is down)."""
+    try:
+        resp = requests.post("http://127.0.0.1:5001/api/v0/repo/stat?size-only=true", timeout=10)
+        return int(resp.json().get("RepoSize", 0))
+    except Exception:
+        return None
+
+
+# (name, data path, estimate, run) — order is the order tiers are tried.
+_RECLAIM_TIERS = (
+    ("docker_images", _docker_root_dir,
+     lambda: sum(size for _i, size, _r in _stale_fula_images()), _reclaim_docker_images),
+    ("container_logs", _docker_root_dir,
+     lambda: sum(size for _p, size in _oversized_container_logs()), _reclaim_container_logs),
+    ("trash", lambda: UNIONDRIVE_PATH, _estimate_trash, _reclaim_trash),
+    ("kubo_gc", lambda: os.path.join(UNIONDRIVE_PATH, "ipfs_datastore"),
+     _estimate_kubo_gc, _reclaim_kubo_gc),
+    ("events_backups", lambda: os.path.dirname(EVENTS_LOG_PATH),
+     lambda: sum(os.path.getsize(p) for p in _events_backups()), _reclaim_events_backups),
+)
+
+
+def _backing_devices(path):
+    """st_dev values that hold data written under path. For the mergerfs
+    pool that's every branch as well as the FUSE mount itself."""
+    devs = set()
+    paths = [path]
+    real = os.path.realpath(path)
+    union = os.path.realpath(UNIONDRIVE_PATH)
+    if real == union or real.startswith(union + os.sep):
+        paths.extend(_list_mounted_branches())
+    for p in paths:
+        try:
+            devs.add(os.stat(p).st_dev)
+        except OSError:
+            continue
+    return devs
+
+
+@instrumented
+def reclaim_disk_space(path="/uniondrive", target_free_gb=1):
+    """Free space on path's filesystem until target_free_gb is available.
+
+    Tiers run in _RECLAIM_TIERS order; tiers whose data lives on another
+    filesystem are skipped, tiers estimating 0 bytes are skipped, and the
+    loop stops once the target is met. Returns a summary dict (ok=True when
+    the target was reached) and logs it to events.jsonl as "disk-reclaim".
+    """
+    target = int(target_free_gb * 1024**3)
+    start_free = _free_bytes(path)
+    summary = {"path": path, "target_free_bytes": target, "start_free_bytes": start_free,
+               "tiers": [], "ok": start_free is not None and start_free >= target}
+    if summary["ok"] or start_free is None:
+        return summary
+    devs = _backing_devices(path)
+
+    def done():
+        free = _free_bytes(path)
+        return free is not None and free >= target
+
+    for name, data_path, estimate, run in _RECLAIM_TIERS:
+        record = {"tier": name}
+        try:
+            tier_path = data_path()
+            try:
+                same_fs = os.stat(tier_path).st_dev in devs
+            except OSError:
+                same_fs = False
+            if not same_fs:
+                record["skipped"] = "other filesystem"
+                summary["tiers"].append(record)
+                continue
+            record["estimate_bytes"] = estimate()
+            if record["estimate_bytes"] == 0:
+                record["skipped"] = "nothing to reclaim"
+                summary["tiers"].append(record)
+                continue
+            before = _free_bytes(path)
+            started = time.monotonic()
+            run(done)
+            after = _free_bytes(path)
+            record["duration_s"] = round(time.monotonic() - started, 1)
+            record["reclaimed_bytes"] = max(after - before, 0) if None not in (before, after) else None
+            logging.info(f"reclaim: tier {name} on {path}: estimated "
+                         f"{record['estimate_bytes']} bytes, freed {record['reclaimed_bytes']}")
+        except Exception as e:
+            record["error"] = "{}: {}".format(type(e).__name__, str(e)[:100])
+            logging.warning(f"reclaim: tier {name} failed: {e}")
+        summary["tiers"].append(record)
+        if done():
+            break
+
+    summary["end_free_bytes"] = _free_bytes(path)
+    summary["ok"] = summary["end_free_bytes"] is not None and summary["end_free_bytes"] >= target
+    _append_event("disk-reclaim", summary)
+    return summary
+
+
 def _acquire_fsck_lock():
     """Acquire PID-based lockfile for fsck. Returns True if acquired."""
     if os.path.exists(FSCK_LOCKFILE):
@@ -1416,69 +2992,373 @@ def _find_ro_ext4_partitions():
     return results
 
 
+# === Block-device I/O stall detection (/proc/diskstats) ====================
+# A hung USB/SATA bridge shows up in the block layer long before anything
+# else notices: requests stay in flight while the completed-I/O counters stop
+# moving. Sampling /proc/diskstats + /sys/block/<disk>/inflight catches that
+# regardless of WHICH process is blocked — kubo and pebble hit the disk
+# through mergerfs, so their argv never names /dev/sdX and a process-table
+# scan can't attribute the stall. The sampler runs on a daemon thread every
+# IO_SAMPLE_INTERVAL_SEC; each pass is two small file reads per disk, no
+# subprocesses.
+IO_SAMPLE_INTERVAL_SEC = 5
+IO_STALL_THRESHOLD_SEC = int(os.environ.get("IO_STALL_THRESHOLD_SEC", "60"))
+_DISKSTATS_PATH = "/proc/diskstats"
+_SYS_BLOCK_PATH = "/sys/block"
+# Whole external disks only — partitions share the parent's request queue,
+# and the boot disk (mmcblk*) is excluded separately via _get_boot_disk().
+_EXTERNAL_DISK_RE = re.compile(r'^(sd[a-z]+|nvme\d+n\d+)$')
+_SECTOR_BYTES = 512  # /proc/diskstats always counts 512-byte sectors
+_io_lock = threading.Lock()
+_io_prev_sample = {}   # disk -> (monotonic ts, counters dict)
+_io_stall_since = {}   # disk -> monotonic ts the current stall was first seen
+_io_sampler_thread = None
+_io_sampler_stop_event = None
+
+
+def _read_diskstats():
+    """Parse /proc/diskstats into {name: counters}. Returns {} on error.
+
+    Field layout (Documentation/admin-guide/iostats.rst), after major/minor/name:
+      0 reads completed   2 sectors read     3 ms reading
+      4 writes completed  6 sectors written  7 ms writing
+      8 I/Os in flight    9 ms doing I/O
+    """
+    stats = {}
+    try:
+        with open(_DISKSTATS_PATH, "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 14:
+                    continue
+                try:
+                    vals = [int(v) for v in parts[3:14]]
+                except ValueError:
+                    continue
+                stats[parts[2]] = {
+                    "reads": vals[0],
+                    "sectors_read": vals[2],
+                    "read_ms": vals[3],
+                    "writes": vals[4],
+                    "sectors_written": vals[6],
+                    "write_ms": vals[7],
+                    "in_flight": vals[8],
+                    "io_ms": vals[9],
+                }
+    except OSError as e:
+        logging.debug(f"Could not read {_DISKSTATS_PATH}: {e}")
+    return stats
+
+
+def _read_inflight(disk):
+    """Return outstanding requests for disk from /sys/block/<disk>/inflight
+    (reads + writes), or None if unavailable. More accurate than the
+    diskstats in-flight column for blk-mq devices."""
+    line = _read_first_line(os.path.join(_SYS_BLOCK_PATH, disk, "inflight"))
+    if not line:
+        return None
+    try:
+        return sum(int(v) for v in line.split()[:2])
+    except ValueError:
+        return None
+
+
+def _io_rates(prev, cur, dt):
+    """Rates between two diskstats counter snapshots taken dt seconds apart.
+
+    await_ms is the mean per-request service time over the interval (None if
+    nothing completed); util_pct is the share of wall time the device had I/O
+    outstanding, as iostat's %util.
+    """
+    d_reads = max(cur["reads"] - prev["reads"], 0)
+    d_writes = max(cur["writes"] - prev["writes"], 0)
+    d_ios = d_reads + d_writes
+    await_ms = None
+    if d_ios:
+        d_ms = (max(cur["read_ms"] - prev["read_ms"], 0)
+                + max(cur["write_ms"] - prev["write_ms"], 0))
+        await_ms = round(d_ms / d_ios, 2)
+    return {
+        "read_iops": round(d_reads / dt, 1),
+        "write_iops": round(d_writes / dt, 1),
+        "read_bps": int(max(cur["sectors_read"] - prev["sectors_read"], 0) * _SECTOR_BYTES / dt),
+        "write_bps": int(max(cur["sectors_written"] - prev["sectors_written"], 0) * _SECTOR_BYTES / dt),
+        "await_ms": await_ms,
+        "util_pct": round(min(max(cur["io_ms"] - prev["io_ms"], 0) / (dt * 10.0), 100.0), 1),
+    }
+
+
+@instrumented
+def sample_disk_io(now=None, stats=None):
+    """Take one diskstats sample, update stall tracking, and write
+    /run/fula-io.state. Returns the per-disk dict that was written.
+
+    A disk is stalled while it has requests in flight AND its completed
+    read+write count hasn't advanced since the previous sample. stalled_sec
+    measures how long that has been continuously true.
+    """
+    if now is None:
+        now = time.monotonic()
+    boot_disk = _get_boot_disk()
+    if stats is None:
+        stats = _read_diskstats()
+    disks = {}
+    with _io_lock:
+        for name, cur in stats.items():
+            if not _EXTERNAL_DISK_RE.match(name) or name == boot_disk:
+                continue
+            inflight = _read_inflight(name)
+            if inflight is None:
+                inflight = cur["in_flight"]
+            entry = {
+                "in_flight": inflight,
+                "read_iops": None,
+                "write_iops": None,
+                "read_bps": None,
+                "write_bps": None,
+                "await_ms": None,
+                "util_pct": None,
+                "stalled_sec": 0,
+            }
+            prev = _io_prev_sample.get(name)
+            _io_prev_sample[name] = (now, cur)
+            if prev is not None and now > prev[0]:
+                entry.update(_io_rates(prev[1], cur, now - prev[0]))
+                completed = ((cur["reads"] + cur["writes"])
+                             - (prev[1]["reads"] + prev[1]["writes"]))
+                if inflight > 0 and completed <= 0:
+                    since = _io_stall_since.setdefault(name, prev[0])
+                    entry["stalled_sec"] = int(now - since)
+                else:
+                    _io_stall_since.pop(name, None)
+            disks[name] = entry
+        # Forget disks that disappeared (unplugged / SCSI-deleted) so a
+        # re-enumerated disk starts with a clean history.
+        for gone in set(_io_prev_sample) - set(disks):
+            _io_prev_sample.pop(gone, None)
+            _io_stall_since.pop(gone, None)
+
+    stalled = sorted(n for n, e in disks.items() if e["stalled_sec"] >= IO_STALL_THRESHOLD_SEC)
+    _atomic_write_state(IO_STATE_PATH, {
+        "last_sample_ts": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "interval_s": IO_SAMPLE_INTERVAL_SEC,
+        "stall_threshold_s": IO_STALL_THRESHOLD_SEC,
+        "disks": disks,
+        "stalled": stalled,
+    })
+    return disks
+
+
+def _stalled_disks(threshold=None):
+    """Disks whose current stall has lasted at least threshold seconds."""
+    if threshold is None:
+        threshold = IO_STALL_THRESHOLD_SEC
+    now = time.monotonic()
+    with _io_lock:
+        return sorted(d for d, since in _io_stall_since.items() if now - since >= threshold)
+
+
+def start_io_sampler():
+    """Start the background diskstats sampler. Idempotent."""
+    global _io_sampler_thread, _io_sampler_stop_event
+    if _io_sampler_thread and _io_sampler_thread.is_alive():
+        return
+    _io_sampler_stop_event = threading.Event()
+    stop_event = _io_sampler_stop_event
+
+    def io_sampler_worker():
+        while not stop_event.is_set():
+            now = time.monotonic()
+            stats = _read_diskstats()
+            try:
+                sample_disk_io(now=now, stats=stats)
+            except Exception as e:
+                logging.debug(f"diskstats sample failed: {e}")
+            try:
+                sample_branch_io(now=now, stats=stats)
+            except Exception as e:
+                logging.debug(f"branch I/O sample failed: {e}")
+            if stop_event.wait(timeout=IO_SAMPLE_INTERVAL_SEC):
+                break
+
+    _io_sampler_thread = threading.Thread(target=io_sampler_worker, daemon=True)
+    _io_sampler_thread.start()
+    logging.info(f"Started diskstats I/O sampler (interval={IO_SAMPLE_INTERVAL_SEC}s, "
+                 f"stall threshold={IO_STALL_THRESHOLD_SEC}s)")
+
+
+def stop_io_sampler():
+    """Stop the background diskstats sampler if running."""
+    global _io_sampler_thread, _io_sampler_stop_event
+    if _io_sampler_stop_event:
+        _io_sampler_stop_event.set()
+    if _io_sampler_thread and _io_sampler_thread.is_alive():
+        _io_sampler_thread.join(timeout=2.0)
+    _io_sampler_thread = None
+    _io_sampler_stop_event = None
+
+
+# --- Per-branch rolling I/O aggregates (/run/fula-storage.state) -----------
+# Each mergerfs branch is one ext4 partition mounted under /media/pi/. The
+# sampler keeps cumulative diskstats snapshots per branch and reports rates
+# over the trailing 1m/15m/24h, so a slow or degrading drive stands out next
+# to its siblings before kubo starts timing out on the pooled mount. Snapshots
+# are cumulative counters, so a window's rate is just (newest - oldest)/dt —
+# 15 minutes of 5s snapshots plus one per minute for the 24h window keeps
+# memory bounded (~1.6k tuples per branch).
+STORAGE_STATE_PATH = "/run/fula-storage.state"
+STORAGE_STATE_WRITE_INTERVAL_SEC = 30
+_BRANCH_WINDOWS = (("1m", 60), ("15m", 900), ("24h", 86400))
+_BRANCH_COARSE_STEP_SEC = 60
+_branch_fine = {}     # mountpoint -> deque[(ts, counters)], last 15m
+_branch_coarse = {}   # mountpoint -> deque[(ts, counters)], 1/min, last 24h
+_branch_devices = {}  # mountpoint -> partition name, to reset history on re-enumeration
+_last_storage_state_write = None
+
+
+def _list_mounted_branches():
+    """Return {mountpoint: partition_name} for block devices mounted under
+    /media/pi/ (the uniondrive branch convention)."""
+    branches = {}
+    try:
+        with open('/proc/mounts', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 2:
+                    continue
+                device, mountpoint = parts[0], parts[1]
+                if device.startswith('/dev/') and mountpoint.startswith('/media/pi/'):
+                    branches[mountpoint] = os.path.basename(os.path.realpath(device))
+    except OSError as e:
+        logging.debug(f"Could not read /proc/mounts for branch list: {e}")
+    return branches
+
+
+def _branch_window_rates(samples, now, window):
+    """Rates from the oldest snapshot inside [now - window, now] to the newest.
+    Returns None until two snapshots span the window's start."""
+    if len(samples) < 2:
+        return None
+    newest_ts, newest = samples[-1]
+    oldest_ts, oldest = None, None
+    for ts, counters in samples:
+        if ts >= now - window:
+            oldest_ts, oldest = ts, counters
+            break
+    if oldest is None or newest_ts <= oldest_ts:
+        return None
+    dt = newest_ts - oldest_ts
+    rates = _io_rates(oldest, newest, dt)
+    rates["span_s"] = int(dt)
+    return rates
+
+
+@instrumented
+def sample_branch_io(now=None, stats=None):
+    """Record one diskstats snapshot per mounted branch and, at most every
+    STORAGE_STATE_WRITE_INTERVAL_SEC, write rolling aggregates to
+    /run/fula-storage.state. Returns the branches dict (written or not)."""
+    global _last_storage_state_write
+    if now is None:
+        now = time.monotonic()
+    if stats is None:
+        stats = _read_diskstats()
+    mounted = _list_mounted_branches()
+    branches = {}
+    with _io_lock:
+        for mountpoint, partition in mounted.items():
+            cur = stats.get(partition)
+            if cur is None:
+                continue
+            if _branch_devices.get(mountpoint) != partition:
+                # New branch or the same mountpoint now backed by another
+                # device — counters aren't comparable, start over.
+                _branch_devices[mountpoint] = partition
+                _branch_fine[mountpoint] = deque()
+                _branch_coarse[mountpoint] = deque()
+            fine = _branch_fine[mountpoint]
+            coarse = _branch_coarse[mountpoint]
+            fine.append((now, cur))
+            while fine and fine[0][0] < now - 900:
+                fine.popleft()
+            if not coarse or now - coarse[-1][0] >= _BRANCH_COARSE_STEP_SEC:
+                coarse.append((now, cur))
+            while coarse and coarse[0][0] < now - 86400:
+                coarse.popleft()
+            windows = {}
+            for label, seconds in _BRANCH_WINDOWS:
+                # The coarse series only lands once a minute; append the live
+                # snapshot so the 24h window always ends at "now".
+                series = fine if seconds <= 900 else list(coarse) + [fine[-1]]
+                windows[label] = _branch_window_rates(series, now, seconds)
+            branches[mountpoint] = {"device": f"/dev/{partition}", "windows": windows}
+        for gone in set(_branch_devices) - set(branches):
+            _branch_devices.pop(gone, None)
+            _branch_fine.pop(gone, None)
+            _branch_coarse.pop(gone, None)
+
+    if (_last_storage_state_write is None
+            or now - _last_storage_state_write >= STORAGE_STATE_WRITE_INTERVAL_SEC):
+        _last_storage_state_write = now
+        _atomic_write_state(STORAGE_STATE_PATH, {
+            "last_sample_ts": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "branches": branches,
+        })
+    return branches
+
+
+def _first_partition_of(disk_name):
+    """Return the lowest-numbered partition name of disk_name from sysfs
+    (e.g. 'sda1'), defaulting to '<disk>1' if sysfs has none listed."""
+    try:
+        parts = [p for p in os.listdir(os.path.join(_SYS_BLOCK_PATH, disk_name))
+                 if re.match(rf'{re.escape(disk_name)}\d+$', p)]
+    except OSError:
+        parts = []
+    if parts:
+        return sorted(parts, key=lambda p: int(p[len(disk_name):]))[0]
+    return f"{disk_name}1"
+
+
 def _detect_io_dead_drive():
-    """Detect external drives stuck in I/O errors with D-state (uninterruptible sleep) processes.
+    """Detect external drives whose I/O has hung, from block-layer counters.
 
     This catches drives too broken to mount — _find_ro_ext4_partitions() misses them.
-    Requires BOTH D-state processes targeting /dev/sd* AND I/O errors in dmesg to avoid
-    false positives (a brief D-state during normal I/O is not a problem).
+    A drive is I/O dead when the diskstats sampler has seen requests in flight
+    with zero completions for IO_STALL_THRESHOLD_SEC. That is far stronger
+    evidence than a brief D-state during normal I/O, so no dmesg cross-check
+    is needed, and it also covers stalls where the blocked process never names
+    the device (kubo/pebble through mergerfs).
+
+    Only sd* disks are returned — the remediation is a SCSI delete + rescan.
+    Stalled NVMe disks are still visible in /run/fula-io.state.
 
     Returns (device_path, partition_name, disk_name) or (None, None, None).
     """
-    try:
-        # Find D-state processes targeting /dev/sd*
-        ps_result = subprocess.run(
-            ["ps", "-eo", "state,args", "--no-headers"],
-            capture_output=True, text=True, timeout=10
-        )
-        d_state_devices = set()
-        for line in ps_result.stdout.strip().split('\n'):
-            if not line:
-                continue
-            parts = line.split(None, 1)
-            if len(parts) < 2:
-                continue
-            state, args = parts[0], parts[1]
-            if 'D' not in state:
-                continue
-            for token in args.split():
-                if re.match(r'/dev/sd[a-z]+\d*$', token):
-                    d_state_devices.add(token)
-
-        if not d_state_devices:
-            return None, None, None
-
-        device = sorted(d_state_devices)[0]
-        disk_match = re.match(r'/dev/(sd[a-z]+)(\d*)$', device)
-        if not disk_match:
-            return None, None, None
-        disk_name = disk_match.group(1)
-        part_num = disk_match.group(2) or '1'
-        partition_name = f"{disk_name}{part_num}"
-
-        # Require I/O errors in dmesg to avoid false positives
-        try:
-            dmesg_result = subprocess.run(
-                ["dmesg"], capture_output=True, text=True, timeout=10
-            )
-            recent_lines = dmesg_result.stdout.strip().split('\n')[-200:]
-            has_io_errors = any(
-                f'I/O error, dev {disk_name}' in line or
-                f'[{disk_name}] timing out' in line
-                for line in recent_lines
-            )
-            if not has_io_errors:
-                logging.debug(f"D-state on {device} but no I/O errors in dmesg — not I/O dead")
-                return None, None, None
-        except Exception:
-            pass  # If dmesg fails, trust D-state alone (conservative)
+    dead = _detect_io_dead_drives()
+    if dead:
+        return dead[0]
+    return None, None, None
 
-        logging.warning(f"I/O dead drive detected: /dev/{partition_name} (D-state + I/O errors)")
-        return f"/dev/{partition_name}", partition_name, disk_name
 
+def _detect_io_dead_drives():
+    """All I/O dead sd* drives, as a list of (device_path, partition_name,
+    disk_name) tuples. See _detect_io_dead_drive()."""
+    results = []
+    try:
+        # Refresh so a caller outside the sampler cadence sees current state.
+        sample_disk_io()
+        for disk_name in _stalled_disks():
+            if not disk_name.startswith("sd"):
+                logging.warning(f"I/O stall on {disk_name} (no SCSI reset path for this device type)")
+                continue
+            partition_name = _first_partition_of(disk_name)
+            logging.warning(f"I/O dead drive detected: /dev/{partition_name} "
+                            f"(in-flight I/O with no completions for >= {IO_STALL_THRESHOLD_SEC}s)")
+            results.append((f"/dev/{partition_name}", partition_name, disk_name))
     except Exception as e:
         logging.error(f"Error detecting I/O dead drive: {e}")
-        return None, None, None
+    return results
 
 
 def _reset_scsi_drive(disk_name, timeout=90):
@@ -1728,60 +3608,143 @@ def _get_boot_disk():
     return None
 
 
+# --- Block-device inventory -------------------------------------------------
+# Storage checks used to fork blkid/lsblk per device per cycle. The inventory
+# below is built once from sysfs (size, partition, ro, removable — plain
+# file reads) plus a single `lsblk -J -b -O` for filesystem type and UUID,
+# and is shared by every storage check until it is invalidated: once per
+# main-loop cycle, and whenever udev reports a block add/remove/change (a
+# hotplugged disk, a mkfs, a partition rescan).
+_SYS_CLASS_BLOCK_PATH = "/sys/class/block"
+_block_inventory_lock = threading.Lock()
+_block_inventory_cache = None
+_block_event_thread = None
+
+
+def _lsblk_fs_info():
+    """{name: {"fstype", "uuid"}} from one `lsblk -J -b -O`. {} on failure."""
+    info = {}
+    try:
+        result = subprocess.run(["lsblk", "-J", "-b", "-O"],
+                                capture_output=True, text=True, timeout=15)
+        if result.returncode != 0:
+            return info
+        pending = list(json.loads(result.stdout).get("blockdevices") or [])
+    except (Exception, _SubprocessTimeoutExpired) as e:
+        logging.debug(f"lsblk -J failed: {e}")
+        return info
+    while pending:
+        dev = pending.pop()
+        name = dev.get("kname") or dev.get("name")
+        if name:
+            info[name] = {"fstype": dev.get("fstype") or None, "uuid": dev.get("uuid") or None}
+        pending.extend(dev.get("children") or [])
+    return info
+
+
+def _build_block_inventory():
+    """Walk /sys/class/block and merge in lsblk's fstype/UUID.
+
+    Returns {name: {"name", "type" ("disk"|"part"), "parent", "size_bytes",
+    "ro", "removable", "fstype", "uuid"}}. Partitions inherit "removable"
+    from their disk (the attribute only exists on whole disks).
+    """
+    inventory = {}
+    try:
+        names = sorted(os.listdir(_SYS_CLASS_BLOCK_PATH))
+    except OSError as e:
+        logging.debug(f"Could not list {_SYS_CLASS_BLOCK_PATH}: {e}")
+        return inventory
+    for name in names:
+        path = os.path.realpath(os.path.join(_SYS_CLASS_BLOCK_PATH, name))
+        is_part = os.path.exists(os.path.join(path, "partition"))
+        try:
+            size = int(_read_first_line(os.path.join(path, "size")) or 0) * _SECTOR_BYTES
+        except ValueError:
+            size = 0
+        disk_path = os.path.dirname(path) if is_part else path
+        inventory[name] = {
+            "name": name,
+            "type": "part" if is_part else "disk",
+            "parent": os.path.basename(disk_path) if is_part else None,
+            "size_bytes": size,
+            "ro": _read_first_line(os.path.join(path, "ro")) == "1",
+            "removable": _read_first_line(os.path.join(disk_path, "removable")) == "1",
+            "fstype": None,
+            "uuid": None,
+        }
+    for name, fs in _lsblk_fs_info().items():
+        if name in inventory:
+            inventory[name].update(fs)
+    return inventory
+
+
+def get_block_inventory():
+    """Return the cached block inventory, building it if it was invalidated."""
+    global _block_inventory_cache
+    with _block_inventory_lock:
+        if _block_inventory_cache is None:
+            _block_inventory_cache = _build_block_inventory()
+        return _block_inventory_cache
+
+
+def invalidate_block_inventory():
+    global _block_inventory_cache
+    with _block_inventory_lock:
+        _block_inventory_cache = None
+
+
+def _start_block_event_monitor():
+    """Invalidate the inventory on every udev block event. One long-lived
+    `udevadm monitor` per process; if it exits the per-cycle invalidation
+    still keeps the inventory fresh enough."""
+    global _block_event_thread
+    if _block_event_thread is not None and _block_event_thread.is_alive():
+        return
+
+    def _worker():
+        try:
+            proc = subprocess.Popen(
+                ["udevadm", "monitor", "--udev", "--subsystem-match=block"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        except OSError as e:
+            logging.debug(f"udevadm monitor unavailable: {e}")
+            return
+        for line in proc.stdout:
+            if line.startswith("UDEV"):
+                invalidate_block_inventory()
+        logging.debug("udevadm monitor exited; block inventory refreshes per cycle only")
+
+    _block_event_thread = threading.Thread(target=_worker, name="block-events", daemon=True)
+    _block_event_thread.start()
+
+
 def _list_external_ext4_partitions():
     """List ext4 partitions on external (sd*/nvme*) drives, excluding the boot disk.
 
-    Returns list of (device, partition_name) tuples. Uses lsblk for
-    enumeration and blkid for filesystem type. Skips zero-size and read-only
-    block devices (e.g. /dev/sdb in the user-reported case where lsblk shows
-    SIZE 0B — the kernel never enumerated the disk and probing it would hang).
+    Returns list of (device, partition_name) tuples, read from the shared
+    block inventory. Skips zero-size and read-only block devices (e.g.
+    /dev/sdb in the user-reported case where lsblk shows SIZE 0B — the
+    kernel never enumerated the disk and probing it would hang).
     """
     boot_disk = _get_boot_disk()
     results = []
-    try:
-        lsblk = subprocess.run(
-            ["lsblk", "-rno", "NAME,TYPE,SIZE,RO"],
-            capture_output=True, text=True, timeout=15
-        )
-        if lsblk.returncode != 0:
-            return results
-        for line in lsblk.stdout.strip().split('\n'):
-            parts = line.split()
-            if len(parts) < 4:
-                continue
-            name, dev_type, size, ro = parts[0], parts[1], parts[2], parts[3]
-            if dev_type != 'part':
-                continue
-            if not re.match(r'(sd[a-z]+\d+|nvme\d+n\d+p\d+)$', name):
-                continue
-            # Skip partitions whose parent is the boot disk
-            parent_match = re.match(r'(sd[a-z]+|nvme\d+n\d+)', name)
-            if not parent_match:
-                continue
-            parent = parent_match.group(1)
-            if boot_disk and parent == boot_disk:
-                continue
-            # Skip 0B / read-only partitions — they're either unenumerated
-            # ghost devices (sdb in the user log) or write-protected media
-            # that fsck can't repair anyway.
-            if size in ('0', '0B'):
-                continue
-            if ro == '1':
-                continue
-            device = f"/dev/{name}"
-            try:
-                blkid = subprocess.run(
-                    ["sudo", "blkid", "-o", "value", "-s", "TYPE", device],
-                    capture_output=True, text=True, timeout=10
-                )
-                fstype = blkid.stdout.strip()
-            except Exception:
-                continue
-            if fstype != 'ext4':
-                continue
-            results.append((device, name))
-    except Exception as e:
-        logging.debug(f"Error enumerating external ext4 partitions: {e}")
+    for name, dev in get_block_inventory().items():
+        if dev["type"] != "part":
+            continue
+        if not re.match(r'(sd[a-z]+\d+|nvme\d+n\d+p\d+)$', name):
+            continue
+        # Skip partitions whose parent is the boot disk
+        if boot_disk and dev["parent"] == boot_disk:
+            continue
+        # Skip 0B / read-only partitions — they're either unenumerated
+        # ghost devices (sdb in the user log) or write-protected media
+        # that fsck can't repair anyway.
+        if dev["size_bytes"] == 0 or dev["ro"]:
+            continue
+        if dev["fstype"] != "ext4":
+            continue
+        results.append((f"/dev/{name}", name))
     return results
 
 
@@ -1865,53 +3828,810 @@ def _detect_unmountable_corrupt_ext4():
     """Detect ext4 partitions that are present (lsblk + blkid agree) but
     cannot be mounted under /media/pi/ because of corruption.
 
-    Returns list of (device, partition_name) tuples. Triggers when:
-      1. The partition is on /dev/sd*/nvme* (not the boot disk)
-      2. blkid reports ext4
-      3. The partition is NOT currently mounted under /media/pi/
-      4. EITHER dmesg has a strict ext4-error pattern matching the
-         partition, OR dumpe2fs -h fails with a known-corruption marker
+    Returns list of (device, partition_name) tuples. Triggers when:
+      1. The partition is on /dev/sd*/nvme* (not the boot disk)
+      2. blkid reports ext4
+      3. The partition is NOT currently mounted under /media/pi/
+      4. EITHER dmesg has a strict ext4-error pattern matching the
+         partition, OR dumpe2fs -h fails with a known-corruption marker
+
+    Mirrors the discipline of _detect_io_dead_drive: requires positive
+    corruption evidence, not just "didn't mount." A drive that simply
+    hasn't been plugged in long enough produces neither dmesg errors nor
+    dumpe2fs failures.
+    """
+    results = []
+    seen = set()
+    for device, partition_name in _list_external_ext4_partitions():
+        if device in seen:
+            continue
+        if _is_partition_mounted_under_media_pi(partition_name):
+            continue
+        if _dmesg_has_ext4_error(partition_name):
+            logging.warning(
+                f"Unmountable ext4 partition {device} — dmesg shows ext4 "
+                "corruption errors. Triggering fsck repair."
+            )
+            results.append((device, partition_name))
+            seen.add(device)
+            continue
+        if _dumpe2fs_indicates_corruption(device):
+            logging.warning(
+                f"Unmountable ext4 partition {device} — dumpe2fs reports "
+                "superblock corruption. Triggering fsck repair."
+            )
+            results.append((device, partition_name))
+            seen.add(device)
+    return results
+
+
+def _rm_stderr_reports_ebadmsg(stderr_text):
+    """True if an rm/chown stderr blob contains the EBADMSG textual signature.
+
+    Used as a fallback when proactive probing missed the corruption but a wipe
+    attempt caught it. Both 'Bad message' (EBADMSG strerror) and the raw
+    'Input/output error' (EIO — commonly co-emitted) count.
+    """
+    if not stderr_text:
+        return False
+    return "Bad message" in stderr_text or "Input/output error" in stderr_text
+
+
+# --- Rename-to-trash wipes --------------------------------------------------
+# Recovering a corrupt pebble/datastore used to mean a synchronous
+# `rm -rf` of tens of thousands of files with fula stopped the whole time.
+# Instead, each branch's copy of the directory is renamed into
+# <branch>/.fula-trash/ — rename(2) on the same filesystem is O(1) no matter
+# how much is inside — the empty directory is recreated through mergerfs,
+# and the service can start straight away. A background reaper then deletes
+# the trash at idle I/O priority and reports what it reclaimed.
+#
+# The rename goes through the /media/pi/<branch> mounts rather than
+# /uniondrive: a directory can live on several branches at once, and
+# mergerfs may EXDEV a rename it can't satisfy on a single branch.
+UNIONDRIVE_PATH = "/uniondrive"
+TRASH_DIR_NAME = ".fula-trash"
+TRASH_REAP_TIMEOUT = 3600  # per entry; the reaper is idle-priority so may be slow
+# How long the disk-reclaim trash tier waits on the reaper before moving on.
+TRASH_RECLAIM_WAIT_SEC = 120
+_trash_lock = threading.Lock()
+_trash_reaper_thread = None
+# Set while disk space is short: the reaper runs at best-effort rather than
+# idle I/O priority until it has drained the trash.
+_trash_urgent = threading.Event()
+
+
+def _branch_copies(target_dir):
+    """Return [(branch_mountpoint, path_on_branch)] for every branch that
+    holds a copy of target_dir. Empty if target_dir isn't under /uniondrive
+    or no branch has it."""
+    rel = os.path.relpath(target_dir, UNIONDRIVE_PATH)
+    if rel.startswith(os.pardir) or rel == os.curdir:
+        return []
+    copies = []
+    for mountpoint in sorted(_list_mounted_branches()):
+        path = os.path.join(mountpoint, rel)
+        if os.path.lexists(path):
+            copies.append((mountpoint, path))
+    return copies
+
+
+def _trash_dir(target_dir, timeout=60):
+    """Empty target_dir by renaming it into each branch's .fula-trash/.
+
+    Falls back to a synchronous `rm -rf` when target_dir isn't backed by a
+    mounted branch or a rename fails. The caller recreates the directory
+    (and fixes ownership) exactly as after an rm.
+
+    Returns (ok, stderr) — stderr carries the rm/mv error text so callers
+    can keep routing EBADMSG to check_and_repair_ext4().
+    """
+    copies = _branch_copies(target_dir)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    label = os.path.relpath(target_dir, UNIONDRIVE_PATH).replace(os.sep, "_")
+    moved = 0
+    for mountpoint, path in copies:
+        trash_root = os.path.join(mountpoint, TRASH_DIR_NAME)
+        dest = os.path.join(trash_root, f"{stamp}-{label}")
+        suffix = 1
+        while os.path.lexists(dest):
+            dest = os.path.join(trash_root, f"{stamp}-{label}.{suffix}")
+            suffix += 1
+        subprocess.run(["sudo", "mkdir", "-p", trash_root], capture_output=True, timeout=10)
+        mv_result = subprocess.run(["sudo", "mv", "-T", path, dest],
+                                   capture_output=True, text=True, timeout=30)
+        if mv_result.returncode != 0:
+            logging.warning(f"Could not move {path} to trash: {mv_result.stderr.strip()}")
+            break
+        moved += 1
+        logging.info(f"Moved {path} to {dest}")
+
+    if moved:
+        _start_trash_reaper()
+    if copies and moved == len(copies):
+        return True, ""
+
+    # Not on a branch (or a rename failed part-way): delete whatever is left
+    # the old way so the caller still gets an empty directory.
+    if not os.path.lexists(target_dir):
+        return True, ""
+    rm_result = subprocess.run(["sudo", "rm", "-rf", target_dir],
+                               capture_output=True, text=True, timeout=timeout)
+    return rm_result.returncode == 0, rm_result.stderr or ""
+
+
+def _list_trash_entries():
+    """Every entry in every branch's .fula-trash/, oldest first by name."""
+    entries = []
+    for mountpoint in sorted(_list_mounted_branches()):
+        trash_root = os.path.join(mountpoint, TRASH_DIR_NAME)
+        try:
+            names = sorted(os.listdir(trash_root))
+        except OSError:
+            continue
+        entries.extend((mountpoint, os.path.join(trash_root, n)) for n in names)
+    return entries
+
+
+def _free_bytes(path):
+    try:
+        st = os.statvfs(path)
+        return st.f_bavail * st.f_frsize
+    except OSError:
+        return None
+
+
+def _reap_trash_entry(mountpoint, entry, urgent=False):
+    """Delete one trash entry at idle I/O + CPU priority (lowest best-effort
+    I/O priority when urgent); log the result to events.jsonl. Reclaimed
+    space is the branch's free-space delta, which avoids a second full tree
+    walk just to size the entry."""
+    before = _free_bytes(mountpoint)
+    started = time.monotonic()
+    io_class = ["-c2", "-n7"] if urgent else ["-c3"]
+    try:
+        result = subprocess.run(
+            ["sudo", "ionice", *io_class, "nice", "-n", "19", "rm", "-rf", entry],
+            capture_output=True, text=True, timeout=TRASH_REAP_TIMEOUT
+        )
+        ok = result.returncode == 0
+        error = (result.stderr or "").strip()[:200]
+    except _SubprocessTimeoutExpired:
+        ok, error = False, f"timed out after {TRASH_REAP_TIMEOUT}s"
+    after = _free_bytes(mountpoint)
+    reclaimed = max(after - before, 0) if before is not None and after is not None else None
+    duration = round(time.monotonic() - started, 1)
+    if ok:
+        logging.info(f"Trash reaper removed {entry} in {duration}s"
+                     + (f", reclaimed {reclaimed / (1024**2):.1f}MB" if reclaimed is not None else ""))
+    else:
+        logging.warning(f"Trash reaper could not remove {entry}: {error}")
+    detail = {"path": entry, "ok": ok, "duration_s": duration, "reclaimed_bytes": reclaimed,
+              "urgent": urgent}
+    if not ok:
+        detail["error"] = error
+    _append_event("trash-reaped", detail)
+    return ok
+
+
+def _start_trash_reaper():
+    """Start the background trash reaper if it isn't already running.
+
+    The reaper drains every .fula-trash/ and exits; it re-checks for new
+    entries under _trash_lock before exiting, so an entry trashed while it
+    winds down is never stranded. Entries it can't delete (EBADMSG, dead
+    branch) are skipped for this run and retried on the next start.
+    _trash_urgent (set by the disk-reclaim trash tier) raises the I/O
+    priority of the entries it deletes next; it's cleared once drained.
+    """
+    global _trash_reaper_thread
+    with _trash_lock:
+        if _trash_reaper_thread and _trash_reaper_thread.is_alive():
+            return
+
+        def trash_reaper_worker():
+            global _trash_reaper_thread
+            failed = set()
+            while True:
+                entries = [e for e in _list_trash_entries() if e[1] not in failed]
+                if not entries:
+                    with _trash_lock:
+                        if not [e for e in _list_trash_entries() if e[1] not in failed]:
+                            _trash_reaper_thread = None
+                            _trash_urgent.clear()
+                            return
+                    continue
+                for mountpoint, entry in entries:
+                    try:
+                        if not _reap_trash_entry(mountpoint, entry, urgent=_trash_urgent.is_set()):
+                            failed.add(entry)
+                    except Exception as e:
+                        logging.debug(f"trash reaper error on {entry}: {e}")
+                        failed.add(entry)
+
+        _trash_reaper_thread = threading.Thread(target=trash_reaper_worker, daemon=True)
+        _trash_reaper_thread.start()
+
+
+# --- Targeted flatfs repair ---------------------------------------------------
+# kubo's blocks store is go-ds-flatfs: <blocks>/SHARDING names the shard
+# function, and each block lives at <blocks>/<shard>/<KEY>.data. The
+# "invalid or no prefix in shard identifier", "directory missing SHARDING
+# file" and "mkdir .../blocks/X3: no such file" failures are all layout
+# damage — a truncated SHARDING file or a missing directory — not lost data.
+# Rewriting SHARDING from datastore_spec, recreating missing shard dirs and
+# quarantining only what can't be read takes seconds; wiping blocks/ threw
+# away every local block and forced a re-fetch of the whole pinset.
+FLATFS_SHARDING_FILE = "SHARDING"
+FLATFS_SHARD_PREFIX = "/repo/flatfs/shard/v1/"
+FLATFS_DEFAULT_SHARD_FUNC = "/repo/flatfs/shard/v1/next-to-last/2"
+FLATFS_QUARANTINE_DIR_NAME = ".fula-quarantine"
+# Block keys are RFC 4648 base32 without padding, as written by go-ds-flatfs.
+_FLATFS_KEY_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+
+
+def _parse_flatfs_shard_func(shard_func):
+    """Return (kind, n) for '/repo/flatfs/shard/v1/<kind>/<n>', or None."""
+    if not shard_func or not shard_func.startswith(FLATFS_SHARD_PREFIX):
+        return None
+    parts = shard_func[len(FLATFS_SHARD_PREFIX):].strip("/").split("/")
+    if len(parts) != 2 or parts[0] not in ("prefix", "suffix", "next-to-last"):
+        return None
+    try:
+        n = int(parts[1])
+    except ValueError:
+        return None
+    if n < 1:
+        return None
+    return parts[0], n
+
+
+def _flatfs_shard_of(key, kind, n):
+    """Shard directory name go-ds-flatfs uses for key (underscore-padded)."""
+    if kind == "prefix":
+        return (key + "_" * n)[:n]
+    padded = "_" * n + key
+    if kind == "suffix":
+        return padded[-n:]
+    return padded[-n - 1:-1]  # next-to-last
+
+
+def _flatfs_shard_func_from_spec(spec_path, blocks_dir):
+    """shardFunc for the flatfs mount at blocks_dir in kubo's datastore_spec,
+    or FLATFS_DEFAULT_SHARD_FUNC if the spec is unreadable / has no match."""
+    try:
+        with open(spec_path, "r") as f:
+            spec = json.load(f)
+        for mount in spec.get("mounts", []):
+            if mount.get("type") == "flatfs" and mount.get("path") == blocks_dir:
+                if _parse_flatfs_shard_func(mount.get("shardFunc")):
+                    return mount["shardFunc"]
+    except (OSError, ValueError, AttributeError) as e:
+        logging.debug(f"Could not read shardFunc from {spec_path}: {e}")
+    return FLATFS_DEFAULT_SHARD_FUNC
+
+
+def _chown_if(path, owner):
+    if owner is not None:
+        try:
+            os.chown(path, owner[0], owner[1])
+        except OSError as e:
+            logging.debug(f"chown {path} failed: {e}")
+
+
+@instrumented
+def repair_flatfs_blocks(blocks_dir, shard_func, owner=None):
+    """Repair a flatfs blocks directory in place.
+
+    - recreates blocks_dir if it's gone
+    - rewrites SHARDING when missing or unparseable (a SHARDING file naming
+      a *different* valid function is left alone — existing blocks are laid
+      out for it, so "fixing" it would orphan them; returns ok=False)
+    - creates any missing shard directories (only enumerated for n <= 2)
+    - moves .data files sitting in the wrong shard to the right one
+    - quarantines entries/shard dirs that fail with EIO/EBADMSG into
+      <branch>/.fula-quarantine/flatfs/<ts>/ instead of deleting anything
+
+    Scanning runs per mergerfs branch so quarantine renames never cross
+    filesystems. owner=(uid, gid) is applied to anything created; by default
+    new entries inherit the owner of blocks_dir (or its parent) so kubo's
+    unprivileged user can still write to them.
+    Returns a summary dict (also logged to events.jsonl as "flatfs-repair").
+    """
+    started = time.monotonic()
+    summary = {
+        "path": blocks_dir, "shard_func": shard_func, "ok": False,
+        "blocks_dir_created": False, "sharding_rewritten": False,
+        "shards_created": 0, "misplaced_moved": 0, "quarantined": 0, "scanned": 0,
+    }
+    parsed = _parse_flatfs_shard_func(shard_func)
+    try:
+        if parsed is None:
+            summary["error"] = "unparseable shard_func"
+            return summary
+        kind, n = parsed
+
+        if owner is None:
+            for candidate in (blocks_dir, os.path.dirname(blocks_dir)):
+                try:
+                    st = os.stat(candidate)
+                    owner = (st.st_uid, st.st_gid)
+                    break
+                except OSError:
+                    continue
+
+        if not os.path.isdir(blocks_dir):
+            os.makedirs(blocks_dir, exist_ok=True)
+            _chown_if(blocks_dir, owner)
+            summary["blocks_dir_created"] = True
+
+        sharding_path = os.path.join(blocks_dir, FLATFS_SHARDING_FILE)
+        current = None
+        try:
+            with open(sharding_path, "r") as f:
+                current = f.read().strip()
+        except OSError:
+            pass
+        if current != shard_func:
+            if current and _parse_flatfs_shard_func(current):
+                logging.error(f"flatfs: {sharding_path} names {current}, datastore_spec expects "
+                              f"{shard_func} — not rewriting a valid but different layout")
+                summary["error"] = "shard_func mismatch"
+                return summary
+            logging.warning(f"flatfs: rewriting {sharding_path} (was {current!r})")
+            tmp = sharding_path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(shard_func + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, sharding_path)
+            _chown_if(sharding_path, owner)
+            summary["sharding_rewritten"] = True
+
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        roots = [(m, p) for m, p in _branch_copies(blocks_dir) if os.path.isdir(p)]
+        if not roots:
+            roots = [(os.path.dirname(blocks_dir), blocks_dir)]
+
+        def quarantine(root, src, rel):
+            dest = os.path.join(root, FLATFS_QUARANTINE_DIR_NAME, "flatfs", stamp, rel)
+            try:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.rename(src, dest)
+                summary["quarantined"] += 1
+                logging.warning(f"flatfs: quarantined {src} -> {dest}")
+            except OSError as e:
+                logging.error(f"flatfs: could not quarantine {src}: {e}")
+
+        for root, branch_blocks in roots:
+            try:
+                shard_entries = list(os.scandir(branch_blocks))
+            except OSError as e:
+                logging.error(f"flatfs: cannot list {branch_blocks}: {e}")
+                continue
+            for shard in shard_entries:
+                try:
+                    if not shard.is_dir(follow_symlinks=False):
+                        continue
+                    files = list(os.scandir(shard.path))
+                except OSError as e:
+                    if e.errno in (errno.EIO, errno.EBADMSG):
+                        quarantine(root, shard.path, shard.name)
+                    continue
+                for entry in files:
+                    summary["scanned"] += 1
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                    except OSError as e:
+                        if e.errno in (errno.EIO, errno.EBADMSG):
+                            quarantine(root, entry.path, os.path.join(shard.name, entry.name))
+                        continue
+                    if not entry.name.endswith(".data"):
+                        continue
+                    want = _flatfs_shard_of(entry.name[:-len(".data")], kind, n)
+                    if want == shard.name:
+                        continue
+                    dest_dir = os.path.join(branch_blocks, want)
+                    try:
+                        os.makedirs(dest_dir, exist_ok=True)
+                        _chown_if(dest_dir, owner)
+                        os.rename(entry.path, os.path.join(dest_dir, entry.name))
+                        summary["misplaced_moved"] += 1
+                    except OSError as e:
+                        if e.errno in (errno.EIO, errno.EBADMSG):
+                            quarantine(root, entry.path, os.path.join(shard.name, entry.name))
+                        else:
+                            logging.debug(f"flatfs: could not move {entry.path}: {e}")
+
+        if n <= 2:
+            # flatfs mkdirs a shard lazily on Put, but only if blocks/ itself
+            # is intact; pre-creating the full set (1024 for n=2) is cheap and
+            # means a half-restored tree can't fail that mkdir again.
+            names = [""]
+            for _ in range(n):
+                names = [p + c for p in names for c in _FLATFS_KEY_ALPHABET]
+            for name in names:
+                path = os.path.join(blocks_dir, name)
+                if not os.path.isdir(path):
+                    os.makedirs(path, exist_ok=True)
+                    _chown_if(path, owner)
+                    summary["shards_created"] += 1
+
+        summary["ok"] = True
+        return summary
+    except Exception as e:
+        logging.error(f"flatfs repair of {blocks_dir} failed: {e}")
+        summary["error"] = "{}: {}".format(type(e).__name__, str(e)[:100])
+        return summary
+    finally:
+        summary["duration_s"] = round(time.monotonic() - started, 1)
+        logging.info(f"flatfs repair summary: {summary}")
+        _append_event("flatfs-repair", summary)
+
+
+# --- Pebble salvage -----------------------------------------------------------
+# "failed to open pebble database" is usually a pointer problem, not lost data:
+# a crash mid-rotation leaves CURRENT (or the newer marker.manifest.* file)
+# naming a MANIFEST that's empty, truncated, or references an sstable that
+# never hit the disk. Pebble keeps the previous MANIFEST around
+# (Options.NumPrevManifest, default 1), so pointing back at it usually opens
+# the last consistent version. Anything we take out of play is renamed in
+# place with a "salvaged-" prefix — pebble ignores filenames it can't parse,
+# and a same-directory rename can't EXDEV across mergerfs branches.
+# A manifest is only pointed at after checking that every sstable it
+# references is still on disk, and the kubo datastores are never rolled back
+# (a stale version drops recent pin roots, which repo GC then reclaims).
+# Salvage is tried once per PEBBLE_SALVAGE_WINDOW; if the database still
+# won't open after that, the caller falls back to the wipe. The attempt time
+# is recorded in a marker file (a rename keeps the old mtime, and a
+# pointer-only repair leaves no salvaged- file behind), with the stamp in
+# salvaged-<stamp>- names as a fallback for directories salvaged earlier.
+PEBBLE_SALVAGE_WINDOW = 3600
+_PEBBLE_SALVAGED_PREFIX = "salvaged-"
+_PEBBLE_SALVAGE_MARKER = "salvage-attempted"
+_PEBBLE_STAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+_PEBBLE_MANIFEST_RE = re.compile(r'^MANIFEST-(\d+)$')
+_PEBBLE_OPTIONS_RE = re.compile(r'^OPTIONS-(\d+)$')
+_PEBBLE_MARKER_RE = re.compile(r'^marker\.manifest\.(\d+)\.(MANIFEST-\d+)$')
+# Log fragments that mean "the MANIFEST CURRENT points at is unusable".
+_PEBBLE_BAD_MANIFEST_SIGNS = (
+    "could not open manifest file",
+    ".sst: no such file or directory",
+    "unknown to the objstorage provider: file does not exist",
+    "pebble: corrupt",
+    "checksum mismatch",
+)
+
 
-    Mirrors the discipline of _detect_io_dead_drive: requires positive
-    corruption evidence, not just "didn't mount." A drive that simply
-    hasn't been plugged in long enough produces neither dmesg errors nor
-    dumpe2fs failures.
+def inspect_pebble_dir(pebble_dir):
+    """Summarise a pebble directory without touching it.
+
+    Returns dict with: manifests (sorted [(num, name, size)]), options
+    ([(name, size)]), current (manifest named by CURRENT or None),
+    marker ((iteration, manifest) of the newest manifest marker or None),
+    active (the manifest pebble will open — marker wins over CURRENT),
+    ssts (count), salvaged (names already set aside by an earlier salvage).
     """
-    results = []
-    seen = set()
-    for device, partition_name in _list_external_ext4_partitions():
-        if device in seen:
+    info = {"manifests": [], "options": [], "current": None, "marker": None,
+            "active": None, "ssts": 0, "salvaged": []}
+    for name in sorted(os.listdir(pebble_dir)):
+        path = os.path.join(pebble_dir, name)
+        m = _PEBBLE_MANIFEST_RE.match(name)
+        if m:
+            info["manifests"].append((int(m.group(1)), name, os.path.getsize(path)))
             continue
-        if _is_partition_mounted_under_media_pi(partition_name):
+        if _PEBBLE_OPTIONS_RE.match(name):
+            info["options"].append((name, os.path.getsize(path)))
             continue
-        if _dmesg_has_ext4_error(partition_name):
-            logging.warning(
-                f"Unmountable ext4 partition {device} — dmesg shows ext4 "
-                "corruption errors. Triggering fsck repair."
-            )
-            results.append((device, partition_name))
-            seen.add(device)
+        m = _PEBBLE_MARKER_RE.match(name)
+        if m:
+            it = int(m.group(1))
+            if info["marker"] is None or it > info["marker"][0]:
+                info["marker"] = (it, m.group(2))
             continue
-        if _dumpe2fs_indicates_corruption(device):
-            logging.warning(
-                f"Unmountable ext4 partition {device} — dumpe2fs reports "
-                "superblock corruption. Triggering fsck repair."
-            )
-            results.append((device, partition_name))
-            seen.add(device)
-    return results
+        if name.endswith(".sst"):
+            info["ssts"] += 1
+        elif name.startswith(_PEBBLE_SALVAGED_PREFIX):
+            info["salvaged"].append(name)
+        elif name == "CURRENT":
+            try:
+                with open(path, "r") as f:
+                    info["current"] = f.read().strip() or None
+            except (OSError, UnicodeDecodeError):
+                info["current"] = None
+    info["manifests"].sort()
+    info["active"] = info["marker"][1] if info["marker"] else info["current"]
+    return info
+
+
+# VersionEdit tags (pebble/internal/manifest/version_edit.go) that
+# _pebble_manifest_tables understands. Anything else makes the manifest
+# "unverifiable", which salvage treats the same as a missing sstable.
+_PEBBLE_TAG_COMPARATOR = 1
+_PEBBLE_UVARINT_TAGS = (2, 3, 4, 9)       # log number, next file, last seq, prev log
+_PEBBLE_TAG_COMPACT_POINTER = 5
+_PEBBLE_TAG_DELETED_FILE = 6
+_PEBBLE_NEW_FILE_TAGS = (7, 100, 102, 103)  # tagNewFile .. tagNewFile4
+_PEBBLE_TAG_CREATED_BACKING = 105
+_PEBBLE_TAG_REMOVED_BACKING = 106
+_PEBBLE_CUSTOM_TERMINATE = 1
+_PEBBLE_CUSTOM_VIRTUAL = 66
+_PEBBLE_CUSTOM_NON_SAFE_IGNORE = 1 << 6
+
+
+def _pebble_log_records(data):
+    """Reassembled records of a LevelDB-format log (32 KiB blocks, 7-byte
+    chunk headers; 11 bytes for the recyclable chunk types), or None if the
+    log is torn or isn't one. Checksums are not verified."""
+    records, pending, pos = [], b"", 0
+    while pos < len(data):
+        block_left = 32768 - pos % 32768
+        if block_left < 7:
+            pos += block_left
+            continue
+        length, ctype = struct.unpack_from("<HB", data, pos + 4)
+        if ctype == 0 and length == 0:
+            pos += block_left  # zero-filled block tail
+            continue
+        if not 1 <= ctype <= 8:
+            return None
+        start = pos + (11 if ctype >= 5 else 7)
+        if start + length > len(data):
+            return None
+        pending += data[start:start + length]
+        pos = start + length
+        if ctype in (1, 4, 5, 8):  # full / last
+            records.append(pending)
+            pending = b""
+    return records if records and not pending else None
+
+
+def _pebble_manifest_tables(path):
+    """Physical sstable numbers the final version of MANIFEST path needs, or
+    None if the file can't be read or holds an edit we can't decode."""
+    def uvarint(buf, i):
+        shift = value = 0
+        while True:
+            b = buf[i]
+            i += 1
+            value |= (b & 0x7F) << shift
+            if b < 0x80:
+                return value, i
+            shift += 7
+
+    def skip_bytes(buf, i):
+        n, i = uvarint(buf, i)
+        if i + n > len(buf):
+            raise IndexError
+        return i + n
+
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    records = _pebble_log_records(data)
+    if records is None:
+        return None
+    live = {}  # file number -> physical sstable it lives in
+    try:
+        for rec in records:
+            i = 0
+            while i < len(rec):
+                tag, i = uvarint(rec, i)
+                if tag == _PEBBLE_TAG_COMPARATOR:
+                    i = skip_bytes(rec, i)
+                elif tag in _PEBBLE_UVARINT_TAGS or tag == _PEBBLE_TAG_REMOVED_BACKING:
+                    _v, i = uvarint(rec, i)
+                elif tag == _PEBBLE_TAG_COMPACT_POINTER:
+                    _level, i = uvarint(rec, i)
+                    i = skip_bytes(rec, i)
+                elif tag == _PEBBLE_TAG_DELETED_FILE:
+                    _level, i = uvarint(rec, i)
+                    num, i = uvarint(rec, i)
+                    live.pop(num, None)
+                elif tag == _PEBBLE_TAG_CREATED_BACKING:
+                    _num, i = uvarint(rec, i)
+                    _size, i = uvarint(rec, i)
+                elif tag in _PEBBLE_NEW_FILE_TAGS:
+                    _level, i = uvarint(rec, i)
+                    num, i = uvarint(rec, i)
+                    if tag == 102:
+                        _path_id, i = uvarint(rec, i)
+                    _size, i = uvarint(rec, i)
+                    i = skip_bytes(rec, i)  # smallest key
+                    i = skip_bytes(rec, i)  # largest key
+                    if tag != 7:
+                        _seq, i = uvarint(rec, i)
+                        _seq, i = uvarint(rec, i)
+                    backing = num
+                    if tag == 103:
+                        while True:
+                            custom, i = uvarint(rec, i)
+                            if custom == _PEBBLE_CUSTOM_TERMINATE:
+                                break
+                            if custom == _PEBBLE_CUSTOM_VIRTUAL:
+                                backing, i = uvarint(rec, i)
+                            elif custom & _PEBBLE_CUSTOM_NON_SAFE_IGNORE:
+                                return None
+                            else:
+                                i = skip_bytes(rec, i)
+                    live[num] = backing
+                else:
+                    return None
+    except IndexError:
+        return None
+    return set(live.values())
 
 
-def _rm_stderr_reports_ebadmsg(stderr_text):
-    """True if an rm/chown stderr blob contains the EBADMSG textual signature.
+def _pebble_missing_tables(pebble_dir, manifest):
+    """Sstables manifest references that aren't on disk; None if the
+    manifest can't be verified."""
+    tables = _pebble_manifest_tables(os.path.join(pebble_dir, manifest))
+    if tables is None:
+        return None
+    return sorted(n for n in tables
+                  if not os.path.exists(os.path.join(pebble_dir, f"{n:06d}.sst")))
 
-    Used as a fallback when proactive probing missed the corruption but a wipe
-    attempt caught it. Both 'Bad message' (EBADMSG strerror) and the raw
-    'Input/output error' (EIO — commonly co-emitted) count.
+
+def _pebble_last_salvage(pebble_dir, info):
+    """Epoch of the most recent salvage of pebble_dir, or None."""
+    times = []
+    try:
+        with open(os.path.join(pebble_dir, _PEBBLE_SALVAGE_MARKER), "r") as f:
+            times.append(float(f.read().strip()))
+    except (OSError, ValueError):
+        pass
+    for name in info["salvaged"]:
+        stamp = name[len(_PEBBLE_SALVAGED_PREFIX):].split("-", 1)[0]
+        try:
+            times.append(datetime.strptime(stamp, _PEBBLE_STAMP_FORMAT)
+                         .replace(tzinfo=timezone.utc).timestamp())
+        except ValueError:
+            continue
+    return max(times) if times else None
+
+
+def _pebble_set_aside(pebble_dir, name, stamp):
+    os.rename(os.path.join(pebble_dir, name),
+              os.path.join(pebble_dir, f"{_PEBBLE_SALVAGED_PREFIX}{stamp}-{name}"))
+
+
+def _pebble_point_at(pebble_dir, info, manifest):
+    """Make manifest the one pebble opens: rewrite CURRENT, and advance the
+    manifest marker when the database uses markers instead of CURRENT."""
+    current_path = os.path.join(pebble_dir, "CURRENT")
+    if info["current"] is not None or info["marker"] is None:
+        data = manifest + "\n"
+        tmp = current_path + ".salvage-tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, current_path)
+        except OSError:
+            # mergerfs can refuse the cross-branch replace; CURRENT is tiny,
+            # rewrite it in place instead.
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            with open(current_path, "w") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+    if info["marker"] is not None:
+        it, old = info["marker"]
+        new_marker = os.path.join(pebble_dir, f"marker.manifest.{it + 1:06d}.{manifest}")
+        with open(new_marker, "w") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.remove(os.path.join(pebble_dir, f"marker.manifest.{it:06d}.{old}"))
+        except OSError:
+            pass  # pebble removes obsolete markers itself on open
+
+
+def _pebble_tables_present(pebble_dir, manifest, summary):
+    """True if every sstable manifest needs exists; otherwise records why in
+    summary["reason"]."""
+    missing = _pebble_missing_tables(pebble_dir, manifest)
+    if missing is None:
+        summary["reason"] = f"cannot verify sstables of {manifest}"
+    elif missing:
+        summary["reason"] = f"{manifest} references {len(missing)} missing sstable(s)"
+        summary["missing_ssts"] = missing[:10]
+    return missing == []
+
+
+@instrumented
+def salvage_pebble_dir(pebble_dir, log_text="", allow_rollback=True):
+    """Try a non-destructive recovery of a pebble database that won't open.
+
+    1. Set aside zero-length MANIFEST/OPTIONS files (crash right after
+       creation).
+    2. If the active manifest is missing/empty, point at the newest intact one.
+    3. Otherwise, if log_text says the active manifest is unusable (missing
+       sstable, unreadable/corrupt manifest), roll back to the previous
+       MANIFEST and set the bad one aside. allow_rollback=False skips this
+       step: an older version of kubo's datastore can silently drop recent
+       pin roots, and repo GC would then delete their blocks.
+
+    A manifest is only pointed at once every sstable it references is on
+    disk (compaction usually deleted the ones an older manifest needs);
+    otherwise the caller wipes.
+
+    Returns a summary dict with ok=True when something was changed and the
+    service is worth restarting, ok=False when the caller should wipe (no
+    previous manifest, nothing to fix, or salvage already tried within
+    PEBBLE_SALVAGE_WINDOW). Logged to events.jsonl as "pebble-salvage".
     """
-    if not stderr_text:
-        return False
-    return "Bad message" in stderr_text or "Input/output error" in stderr_text
+    summary = {"path": pebble_dir, "ok": False, "actions": []}
+    try:
+        if not os.path.isdir(pebble_dir):
+            summary["reason"] = "missing"
+            return summary
+        info = inspect_pebble_dir(pebble_dir)
+        now = time.time()
+        last = _pebble_last_salvage(pebble_dir, info)
+        if last is not None and now - last < PEBBLE_SALVAGE_WINDOW:
+            summary["reason"] = "salvage already attempted"
+            return summary
+
+        stamp = datetime.utcfromtimestamp(now).strftime(_PEBBLE_STAMP_FORMAT)
+        for _num, name, size in info["manifests"]:
+            if size == 0:
+                _pebble_set_aside(pebble_dir, name, stamp)
+                summary["actions"].append(f"set aside empty {name}")
+        for name, size in info["options"]:
+            if size == 0:
+                _pebble_set_aside(pebble_dir, name, stamp)
+                summary["actions"].append(f"set aside empty {name}")
+        intact = [name for _num, name, size in info["manifests"] if size > 0]
+        summary["manifests"] = intact
+        summary["active"] = info["active"]
+
+        if not intact:
+            summary["reason"] = "no intact MANIFEST"
+            return summary
+
+        if info["active"] not in intact:
+            target = intact[-1]
+            if not _pebble_tables_present(pebble_dir, target, summary):
+                return summary
+            _pebble_point_at(pebble_dir, info, target)
+            summary["actions"].append(f"pointed at {target} (was {info['active']!r})")
+        elif any(sign in log_text for sign in _PEBBLE_BAD_MANIFEST_SIGNS):
+            if not allow_rollback:
+                summary["reason"] = "rollback disabled for this database"
+                return summary
+            idx = intact.index(info["active"])
+            if idx == 0:
+                summary["reason"] = "no previous MANIFEST to roll back to"
+                return summary
+            target = intact[idx - 1]
+            if not _pebble_tables_present(pebble_dir, target, summary):
+                return summary
+            _pebble_point_at(pebble_dir, info, target)
+            _pebble_set_aside(pebble_dir, info["active"], stamp)
+            summary["actions"].append(f"rolled back {info['active']} -> {target}")
+        elif not summary["actions"]:
+            summary["reason"] = "nothing to salvage"
+            return summary
+
+        with open(os.path.join(pebble_dir, _PEBBLE_SALVAGE_MARKER), "w") as f:
+            f.write(f"{now}\n")
+        summary["ok"] = True
+        return summary
+    except Exception as e:
+        logging.error(f"pebble salvage of {pebble_dir} failed: {e}")
+        summary["reason"] = "{}: {}".format(type(e).__name__, str(e)[:100])
+        return summary
+    finally:
+        logging.info(f"pebble salvage summary: {summary}")
+        _append_event("pebble-salvage", summary)
 
 
 def _log_dead_branch_diagnostic(target_dir, phantoms):
@@ -1944,10 +4664,255 @@ def _log_dead_branch_diagnostic(target_dir, phantoms):
         logging.error(f"Could not stop fula.service: {e}")
 
 
+def _disk_of_partition(partition_name):
+    """Physical disk a partition lives on: sda1 -> sda, nvme0n1p2 -> nvme0n1."""
+    m = re.match(r'(mmcblk\d+|nvme\d+n\d+|sd[a-z]+)', partition_name)
+    return m.group(1) if m else partition_name
+
+
+def _collect_ext4_repair_targets():
+    """Run every ext4 detector and return one repair target per partition.
+
+    All detectors run on every call. Detector order sets priority when a
+    partition is flagged twice: RO mount
+    first, then I/O dead drive, then EBADMSG (metadata checksum failure on
+    ext4 — filesystem still rw, individual inodes fail stat/rm with 'Bad
+    message' until e2fsck rebuilds checksums), then unmountable-corrupt (drive
+    is plugged in and blkid says ext4 but mount fails because of
+    journal/superblock damage — uniondrive can never bring up mergerfs in
+    this state, so fula never starts).
+
+    Each target is a dict: device, partition_name, mountpoint (None when not
+    mounted), disk_name, io_dead, reason.
+    """
+    targets = []
+    seen = set()
+
+    def add(device, partition_name, mountpoint, reason, io_dead=False):
+        if partition_name in seen:
+            return
+        seen.add(partition_name)
+        targets.append({
+            "device": device,
+            "partition_name": partition_name,
+            "mountpoint": mountpoint,
+            "disk_name": _disk_of_partition(partition_name),
+            "io_dead": io_dead,
+            "reason": reason,
+        })
+
+    for device, mountpoint in _find_ro_ext4_partitions():
+        add(device, device.split('/')[-1], mountpoint, "read_only")
+    for device, partition_name, _disk in _detect_io_dead_drives():
+        add(device, partition_name, f"/media/pi/{partition_name}", "io_dead", io_dead=True)
+    for device, mountpoint in _detect_ebadmsg_ext4_partitions():
+        logging.warning(
+            f"ext4 metadata corruption (EBADMSG) detected on {device} — "
+            "filesystem remains rw but individual inodes fail checksum. "
+            "Triggering fsck repair."
+        )
+        add(device, device.split('/')[-1], mountpoint, "ebadmsg")
+    # Every detector runs in the same pass: an unmountable partition found
+    # alongside an RO/EBADMSG one joins the same repair window (the caller
+    # groups targets per disk) instead of waiting out FSCK_COOLDOWN.
+    for device, partition_name in _detect_unmountable_corrupt_ext4():
+        add(device, partition_name, None, "unmountable")
+    return targets
+
+
+def _release_ext4_target(target, scsi_reset):
+    """Unmount target's partition and free its block device for e2fsck.
+
+    scsi_reset(disk_name) performs (at most once per disk) a SCSI delete +
+    rescan; it's the fallback whenever umount/fuser can't get the device
+    free. Returns True if the device is ready for fsck.
+    """
+    device = target["device"]
+    partition_name = target["partition_name"]
+    mountpoint = target["mountpoint"]
+    scsi_disk = target["disk_name"] if target["disk_name"].startswith("sd") else None
+    device_ready = False
+
+    if target["io_dead"] and scsi_disk:
+        # Drive is I/O dead — umount/fuser would hang. SCSI reset first.
+        logging.warning(f"Drive I/O dead, performing SCSI reset on {scsi_disk}")
+        if scsi_reset(scsi_disk):
+            device_ready = True
+        else:
+            logging.error("SCSI reset failed — drive may need physical intervention")
+            return False
+    else:
+        # Normal path: unmount, then release block device holders.
+        # mountpoint is None when the partition was never mounted (the
+        # _detect_unmountable_corrupt_ext4 case) — skip the umount block
+        # and go straight to releasing block-device holders before fsck.
+        if mountpoint is not None:
+            # Verify partition is unmounted; force-unmount if needed
+            mounted = subprocess.run(["mountpoint", "-q", mountpoint],
+                                     capture_output=True, timeout=10).returncode == 0
+            if mounted:
+                logging.info(f"Unmounting {device} from {mountpoint}")
+                result = subprocess.run(["sudo", "umount", device],
+                                        capture_output=True, timeout=30)
+                if result.returncode != 0:
+                    logging.warning(f"umount failed, trying lazy unmount: {result.stderr}")
+                    result = subprocess.run(["sudo", "umount", "-l", device],
+                                            capture_output=True, timeout=10)
+                    if result.returncode != 0:
+                        logging.warning("Lazy umount failed, killing users and retrying")
+                        subprocess.run(["sudo", "fuser", "-km", mountpoint],
+                                       capture_output=True, timeout=30)
+                        time.sleep(2)
+                        subprocess.run(["sudo", "umount", device],
+                                       capture_output=True, timeout=30)
+
+                # Final mount check
+                still_mounted = subprocess.run(["mountpoint", "-q", mountpoint],
+                                               capture_output=True, timeout=10).returncode == 0
+                if still_mounted:
+                    logging.error(f"Cannot unmount {device} — trying SCSI reset as fallback")
+                    if scsi_disk and scsi_reset(scsi_disk):
+                        device_ready = True
+                    # If SCSI reset also failed, fall through — device_ready stays False
+
+        if not device_ready:
+            # Kill processes holding the block device (stale blkid, etc.)
+            try:
+                fuser_result = subprocess.run(
+                    ["sudo", "fuser", "-v", device],
+                    capture_output=True, text=True, timeout=10
+                )
+                if fuser_result.returncode == 0:
+                    logging.warning(f"Processes holding {device} open:\n"
+                                    f"{fuser_result.stdout}{fuser_result.stderr}")
+                    subprocess.run(["sudo", "fuser", "-k", device],
+                                   capture_output=True, timeout=15)
+                    time.sleep(2)
+                    # Verify released
+                    recheck = subprocess.run(
+                        ["sudo", "fuser", device],
+                        capture_output=True, timeout=10
+                    )
+                    if recheck.returncode == 0:
+                        # fuser -k failed — processes likely in D-state. Try SCSI reset.
+                        logging.warning("fuser -k failed (D-state?), trying SCSI reset")
+                        if scsi_disk and scsi_reset(scsi_disk):
+                            device_ready = True
+                        else:
+                            logging.error(f"Cannot release {device} — all methods exhausted")
+                    else:
+                        logging.info(f"Released all processes holding {device}")
+                        device_ready = True
+                else:
+                    device_ready = True  # Nothing holding it — good to go
+            except _SubprocessTimeoutExpired:
+                # fuser itself hung — drive is likely I/O dead
+                logging.warning(f"fuser on {device} timed out — trying SCSI reset")
+                if scsi_disk and scsi_reset(scsi_disk):
+                    device_ready = True
+            except Exception as e:
+                logging.warning(f"Error checking device holders: {e}")
+                device_ready = True  # Optimistically try e2fsck
+
+    if not device_ready:
+        logging.error(f"Could not make {device} available for fsck")
+        return False
+
+    # Defensive umount: even if detection saw the partition unmounted,
+    # union-drive.sh retries continuously and could have raced a successful
+    # mount in between. e2fsck on a mounted ext4 corrupts it. Both calls
+    # are no-ops when nothing is mounted.
+    subprocess.run(["sudo", "umount", device],
+                   capture_output=True, timeout=15)
+    subprocess.run(["sudo", "umount", f"/media/pi/{partition_name}"],
+                   capture_output=True, timeout=15)
+
+    # Verify device node exists after possible SCSI reset
+    if not os.path.exists(device):
+        logging.error(f"Device {device} does not exist after reset")
+        return False
+    return True
+
+
+def _run_e2fsck(device):
+    """Run e2fsck -p -f on device. Returns the exit code, or None on timeout.
+
+    Exit codes: 0=no errors, 1=errors corrected, 2=reboot needed,
+    4=errors left uncorrected, 8=operational error.
+    """
+    logging.info(f"Running e2fsck -p -f {device} (timeout 1800s)")
+    try:
+        fsck_result = subprocess.run(
+            ["sudo", "e2fsck", "-p", "-f", device],
+            capture_output=True, text=True, timeout=1800
+        )
+    except _SubprocessTimeoutExpired:
+        logging.error(f"e2fsck timed out after 1800s on {device}")
+        return None
+    logging.info(f"e2fsck exit code on {device}: {fsck_result.returncode}")
+    if fsck_result.stdout:
+        for line in fsck_result.stdout.strip().split('\n')[-20:]:
+            logging.info(f"e2fsck {device}: {line}")
+    if fsck_result.stderr:
+        for line in fsck_result.stderr.strip().split('\n')[-10:]:
+            logging.warning(f"e2fsck {device} stderr: {line}")
+    if fsck_result.returncode in (0, 1):
+        logging.info(f"e2fsck completed successfully on {device}")
+    elif fsck_result.returncode & 2:
+        logging.warning(f"e2fsck requests reboot for {device}")
+    else:
+        logging.error(f"e2fsck reported uncorrected errors on {device} (exit {fsck_result.returncode})")
+    return fsck_result.returncode
+
+
+def _repair_ext4_disk(disk_targets):
+    """Release and fsck every target partition on one physical disk, in order.
+
+    Partitions on the same disk run sequentially (they share a spindle /
+    USB bridge); different disks get their own worker thread. Returns a list
+    of per-partition result dicts for the events.jsonl record.
+    """
+    reset_result = {}
+
+    def scsi_reset(disk_name):
+        # One SCSI delete + rescan per disk per window: it re-enumerates
+        # every partition on the disk, so a second reset buys nothing.
+        if disk_name not in reset_result:
+            reset_result[disk_name] = _reset_scsi_drive(disk_name)
+        return reset_result[disk_name]
+
+    results = []
+    for target in disk_targets:
+        started = time.monotonic()
+        result = {"device": target["device"], "reason": target["reason"]}
+        try:
+            if _release_ext4_target(target, scsi_reset):
+                released = time.monotonic()
+                result["release_s"] = round(released - started, 1)
+                result["fsck_exit"] = _run_e2fsck(target["device"])
+                result["fsck_s"] = round(time.monotonic() - released, 1)
+            else:
+                result["fsck_exit"] = "unavailable"
+        except Exception as e:
+            logging.error(f"Exception during ext4 repair of {target['device']}: {e}")
+            result["fsck_exit"] = "exception"
+            result["error"] = "{}: {}".format(type(e).__name__, str(e)[:100])
+        result["duration_s"] = round(time.monotonic() - started, 1)
+        results.append(result)
+    return results
+
+
+@instrumented
 def check_and_repair_ext4():
-    """Detect and repair ext4 filesystem corruption (read-only remount or error count).
+    """Detect and repair ext4 filesystem corruption on every affected partition.
+
+    Plans the whole incident up front: collects all flagged partitions, stops
+    fula/docker/uniondrive ONCE, runs e2fsck concurrently across physical
+    disks (sequentially within a disk), then restarts the stack once. A box
+    with two bad branches gets one outage instead of two cooldown-separated
+    ones. Each step's duration lands in a single "ext4-repair" event in
+    events.jsonl so per-incident downtime can be measured.
 
-    Stops services, unmounts, runs e2fsck, restarts services.
     Uses lockfile and cooldown to prevent races and rapid re-runs.
 
     Returns True if repair was attempted, False if skipped.
@@ -1960,44 +4925,9 @@ def check_and_repair_ext4():
         logging.info("ext4 fsck cooldown active, skipping")
         return False
 
-    # Detect issues — RO mount first, then I/O dead drive, then EBADMSG
-    # (metadata checksum failure on ext4 — filesystem still rw, individual
-    # inodes fail stat/rm with 'Bad message' until e2fsck rebuilds checksums),
-    # then unmountable-corrupt (drive is plugged in and blkid says ext4 but
-    # mount fails because of journal/superblock damage — uniondrive can never
-    # bring up mergerfs in this state, so fula never starts).
-    ro_partitions = _find_ro_ext4_partitions()
-    io_dead = False
-
-    if ro_partitions:
-        device, mountpoint = ro_partitions[0]
-        partition_name = device.split('/')[-1]
-    else:
-        dead_device, dead_part, dead_disk = _detect_io_dead_drive()
-        if dead_device is not None:
-            device, partition_name = dead_device, dead_part
-            mountpoint = f"/media/pi/{partition_name}"
-            io_dead = True
-        else:
-            ebadmsg_partitions = _detect_ebadmsg_ext4_partitions()
-            if ebadmsg_partitions:
-                device, mountpoint = ebadmsg_partitions[0]
-                partition_name = device.split('/')[-1]
-                logging.warning(
-                    f"ext4 metadata corruption (EBADMSG) detected on {device} — "
-                    "filesystem remains rw but individual inodes fail checksum. "
-                    "Triggering fsck repair."
-                )
-            else:
-                unmountable = _detect_unmountable_corrupt_ext4()
-                if not unmountable:
-                    return False
-                device, partition_name = unmountable[0]
-                mountpoint = None  # not currently mounted — skip the umount path
-
-    # Extract base disk name (sda from sda1) for SCSI reset
-    disk_match = re.match(r'(sd[a-z]+)', partition_name)
-    disk_name = disk_match.group(1) if disk_match else None
+    targets = _collect_ext4_repair_targets()
+    if not targets:
+        return False
 
     # Check if e2fsck is already running
     try:
@@ -2012,9 +4942,28 @@ def check_and_repair_ext4():
     if not _acquire_fsck_lock():
         return False
 
-    mountpoint_label = mountpoint if mountpoint else "(unmounted)"
-    logging.warning(f"Starting ext4 repair for {device} at {mountpoint_label}"
-                    f"{' (I/O dead — SCSI reset needed)' if io_dead else ''}")
+    by_disk = {}
+    for target in targets:
+        by_disk.setdefault(target["disk_name"], []).append(target)
+    for target in targets:
+        logging.warning(
+            f"Planning ext4 repair for {target['device']} at "
+            f"{target['mountpoint'] or '(unmounted)'} ({target['reason']}"
+            f"{', SCSI reset needed' if target['io_dead'] else ''})"
+        )
+    logging.warning(f"ext4 repair window: {len(targets)} partition(s) on "
+                    f"{len(by_disk)} disk(s)")
+
+    window_start = time.monotonic()
+    steps = []
+    results = []
+
+    def run_step(name, args, timeout, settle=0):
+        started = time.monotonic()
+        subprocess.run(args, capture_output=True, timeout=timeout)
+        if settle:
+            time.sleep(settle)
+        steps.append({"step": name, "duration_s": round(time.monotonic() - started, 1)})
 
     repair_attempted = False
     try:
@@ -2023,173 +4972,53 @@ def check_and_repair_ext4():
 
         # Stop fula first (explicit, even though uniondrive stop cascades via Requires)
         logging.info("Stopping fula.service for ext4 repair")
-        subprocess.run(["sudo", "systemctl", "stop", "fula.service"],
-                       capture_output=True, timeout=120)
-        time.sleep(5)
+        run_step("stop_fula", ["sudo", "systemctl", "stop", "fula.service"], 120, settle=5)
 
         # Stop Docker — containers hold file handles on SSD paths through mergerfs
         logging.info("Stopping docker.service for ext4 repair")
-        subprocess.run(["sudo", "systemctl", "stop", "docker.service"],
-                       capture_output=True, timeout=120)
-        time.sleep(5)
+        run_step("stop_docker", ["sudo", "systemctl", "stop", "docker.service"], 120, settle=5)
 
         # Stop uniondrive (kills union-drive.sh, cascade-stops fula via Requires)
         logging.info("Stopping uniondrive.service for ext4 repair")
-        subprocess.run(["sudo", "systemctl", "stop", "uniondrive.service"],
-                       capture_output=True, timeout=120)
-        time.sleep(5)
-
-        # Stop automount for this partition
-        automount_unit = f"automount@{partition_name}.service"
-        logging.info(f"Stopping {automount_unit} for ext4 repair")
-        subprocess.run(["sudo", "systemctl", "stop", automount_unit],
-                       capture_output=True, timeout=120)
+        run_step("stop_uniondrive", ["sudo", "systemctl", "stop", "uniondrive.service"], 120, settle=5)
+
+        # Stop automount for every partition in the plan
+        started = time.monotonic()
+        for target in targets:
+            automount_unit = f"automount@{target['partition_name']}.service"
+            logging.info(f"Stopping {automount_unit} for ext4 repair")
+            subprocess.run(["sudo", "systemctl", "stop", automount_unit],
+                           capture_output=True, timeout=120)
         time.sleep(2)
-
-        # --- Make the device available for fsck ---
-        device_ready = False
-
-        if io_dead and disk_name:
-            # Drive is I/O dead — umount/fuser would hang. SCSI reset first.
-            logging.warning(f"Drive I/O dead, performing SCSI reset on {disk_name}")
-            if _reset_scsi_drive(disk_name):
-                device = f"/dev/{partition_name}"
-                device_ready = True
-            else:
-                logging.error("SCSI reset failed — drive may need physical intervention")
+        steps.append({"step": "stop_automount", "duration_s": round(time.monotonic() - started, 1)})
+
+        # --- Release + e2fsck, one worker per physical disk ---
+        started = time.monotonic()
+        per_disk = {}
+        workers = []
+        for disk_name, disk_targets in by_disk.items():
+            def worker(disk_name=disk_name, disk_targets=disk_targets):
+                per_disk[disk_name] = _repair_ext4_disk(disk_targets)
+            t = threading.Thread(target=worker, name=f"ext4-repair-{disk_name}", daemon=True)
+            t.start()
+            workers.append(t)
+        for t in workers:
+            t.join()
+        for disk_name in by_disk:
+            results.extend(per_disk.get(disk_name, []))
+        steps.append({"step": "fsck", "duration_s": round(time.monotonic() - started, 1)})
+
+        if all(r["fsck_exit"] in (0, 1) for r in results):
+            consecutive_fsck_attempts = 0
         else:
-            # Normal path: unmount, then release block device holders.
-            # mountpoint is None when the partition was never mounted (the
-            # _detect_unmountable_corrupt_ext4 case) — skip the umount block
-            # and go straight to releasing block-device holders before fsck.
-            if mountpoint is not None:
-                # Verify partition is unmounted; force-unmount if needed
-                mounted = subprocess.run(["mountpoint", "-q", mountpoint],
-                                         capture_output=True, timeout=10).returncode == 0
-                if mounted:
-                    logging.info(f"Unmounting {device} from {mountpoint}")
-                    result = subprocess.run(["sudo", "umount", device],
-                                            capture_output=True, timeout=30)
-                    if result.returncode != 0:
-                        logging.warning(f"umount failed, trying lazy unmount: {result.stderr}")
-                        result = subprocess.run(["sudo", "umount", "-l", device],
-                                                capture_output=True, timeout=10)
-                        if result.returncode != 0:
-                            logging.warning("Lazy umount failed, killing users and retrying")
-                            subprocess.run(["sudo", "fuser", "-km", mountpoint],
-                                           capture_output=True, timeout=30)
-                            time.sleep(2)
-                            subprocess.run(["sudo", "umount", device],
-                                           capture_output=True, timeout=30)
-
-                    # Final mount check
-                    still_mounted = subprocess.run(["mountpoint", "-q", mountpoint],
-                                                   capture_output=True, timeout=10).returncode == 0
-                    if still_mounted:
-                        logging.error(f"Cannot unmount {device} — trying SCSI reset as fallback")
-                        if disk_name and _reset_scsi_drive(disk_name):
-                            device = f"/dev/{partition_name}"
-                            device_ready = True
-                        # If SCSI reset also failed, fall through — device_ready stays False
-
-            if not device_ready:
-                # Kill processes holding the block device (stale blkid, etc.)
-                try:
-                    fuser_result = subprocess.run(
-                        ["sudo", "fuser", "-v", device],
-                        capture_output=True, text=True, timeout=10
-                    )
-                    if fuser_result.returncode == 0:
-                        logging.warning(f"Processes holding {device} open:\n"
-                                        f"{fuser_result.stdout}{fuser_result.stderr}")
-                        subprocess.run(["sudo", "fuser", "-k", device],
-                                       capture_output=True, timeout=15)
-                        time.sleep(2)
-                        # Verify released
-                        recheck = subprocess.run(
-                            ["sudo", "fuser", device],
-                            capture_output=True, timeout=10
-                        )
-                        if recheck.returncode == 0:
-                            # fuser -k failed — processes likely in D-state. Try SCSI reset.
-                            logging.warning("fuser -k failed (D-state?), trying SCSI reset")
-                            if disk_name and _reset_scsi_drive(disk_name):
-                                device = f"/dev/{partition_name}"
-                                device_ready = True
-                            else:
-                                logging.error(f"Cannot release {device} — all methods exhausted")
-                        else:
-                            logging.info(f"Released all processes holding {device}")
-                            device_ready = True
-                    else:
-                        device_ready = True  # Nothing holding it — good to go
-                except subprocess.TimeoutExpired:
-                    # fuser itself hung — drive is likely I/O dead
-                    logging.warning(f"fuser on {device} timed out — trying SCSI reset")
-                    if disk_name and _reset_scsi_drive(disk_name):
-                        device = f"/dev/{partition_name}"
-                        device_ready = True
-                except Exception as e:
-                    logging.warning(f"Error checking device holders: {e}")
-                    device_ready = True  # Optimistically try e2fsck
-
-        if not device_ready:
-            logging.error("Could not make device available for fsck")
-            repair_attempted = True
-            last_fsck_time = time.time()
-            # fall through to finally — restart services
-            return repair_attempted
-
-        # Defensive umount: even if detection saw the partition unmounted,
-        # union-drive.sh retries continuously and could have raced a successful
-        # mount in between. e2fsck on a mounted ext4 corrupts it. Both calls
-        # are no-ops when nothing is mounted.
-        subprocess.run(["sudo", "umount", device],
-                       capture_output=True, timeout=15)
-        subprocess.run(["sudo", "umount", f"/media/pi/{partition_name}"],
-                       capture_output=True, timeout=15)
-
-        # Verify device node exists after possible SCSI reset
-        if not os.path.exists(device):
-            logging.error(f"Device {device} does not exist after reset")
-            repair_attempted = True
-            last_fsck_time = time.time()
-            return repair_attempted
-
-        # --- Run e2fsck ---
-        logging.info(f"Running e2fsck -p -f {device} (timeout 1800s)")
-        try:
-            fsck_result = subprocess.run(
-                ["sudo", "e2fsck", "-p", "-f", device],
-                capture_output=True, text=True, timeout=1800
-            )
-            logging.info(f"e2fsck exit code: {fsck_result.returncode}")
-            if fsck_result.stdout:
-                for line in fsck_result.stdout.strip().split('\n')[-20:]:
-                    logging.info(f"e2fsck: {line}")
-            if fsck_result.stderr:
-                for line in fsck_result.stderr.strip().split('\n')[-10:]:
-                    logging.warning(f"e2fsck stderr: {line}")
-            # Exit codes: 0=no errors, 1=errors corrected, 2=reboot needed,
-            # 4=errors left uncorrected, 8=operational error
-            if fsck_result.returncode in (0, 1):
-                logging.info(f"e2fsck completed successfully on {device}")
-                consecutive_fsck_attempts = 0
-            elif fsck_result.returncode & 2:
-                logging.warning(f"e2fsck requests reboot for {device}")
-                consecutive_fsck_attempts += 1
-            else:
-                logging.error(f"e2fsck reported uncorrected errors on {device} (exit {fsck_result.returncode})")
-                consecutive_fsck_attempts += 1
-        except subprocess.TimeoutExpired:
-            logging.error(f"e2fsck timed out after 1800s on {device}")
             consecutive_fsck_attempts += 1
 
         if consecutive_fsck_attempts >= REPLACE_DISK_THRESHOLD:
+            failing = [r["device"] for r in results if r["fsck_exit"] not in (0, 1)]
             logging.error(
                 f"e2fsck has run {consecutive_fsck_attempts} times in a row on "
-                f"{device} without a clean exit — the disk may be physically "
-                "failing and require replacement."
+                f"{', '.join(failing)} without a clean exit — the disk may be "
+                "physically failing and require replacement."
             )
 
         repair_attempted = True
@@ -2198,44 +5027,55 @@ def check_and_repair_ext4():
     except Exception as e:
         logging.error(f"Exception during ext4 repair: {e}")
         repair_attempted = True  # Still restart services
+        last_fsck_time = time.time()
     finally:
         # ALWAYS restart services, even on failure
         logging.info("Restarting services after ext4 repair")
 
         # Restart automount
-        automount_unit = f"automount@{partition_name}.service"
-        subprocess.run(["sudo", "systemctl", "reset-failed", automount_unit],
-                       capture_output=True, timeout=20)
-        subprocess.run(["sudo", "systemctl", "start", automount_unit],
-                       capture_output=True, timeout=60)
+        started = time.monotonic()
+        for target in targets:
+            automount_unit = f"automount@{target['partition_name']}.service"
+            subprocess.run(["sudo", "systemctl", "reset-failed", automount_unit],
+                           capture_output=True, timeout=20)
+            subprocess.run(["sudo", "systemctl", "start", automount_unit],
+                           capture_output=True, timeout=60)
         time.sleep(5)
+        steps.append({"step": "start_automount", "duration_s": round(time.monotonic() - started, 1)})
 
         # Restart Docker (must be up before uniondrive/fula)
         subprocess.run(["sudo", "systemctl", "reset-failed", "docker.service"],
                        capture_output=True, timeout=20)
-        subprocess.run(["sudo", "systemctl", "start", "docker.service"],
-                       capture_output=True, timeout=120)
-        time.sleep(5)
+        run_step("start_docker", ["sudo", "systemctl", "start", "docker.service"], 120, settle=5)
 
         # Restart uniondrive (blocks until READY/mergerfs or WatchdogSec timeout)
         subprocess.run(["sudo", "systemctl", "reset-failed", "uniondrive.service"],
                        capture_output=True, timeout=20)
-        subprocess.run(["sudo", "systemctl", "start", "uniondrive.service"],
-                       capture_output=True, timeout=150)
+        run_step("start_uniondrive", ["sudo", "systemctl", "start", "uniondrive.service"], 150)
 
         # Start fula (has ExecStartPre=/bin/sleep 60 — don't wait for full startup)
+        started = time.monotonic()
         safe_start_fula(capture_output=True, timeout=120)
+        steps.append({"step": "start_fula", "duration_s": round(time.monotonic() - started, 1)})
 
         # Clear LED
         subprocess.run(["sudo", "python", LED_PATH, "green", "1"],
                        capture_output=True, timeout=20)
 
         _release_fsck_lock()
-        logging.info("ext4 repair sequence complete")
+        downtime_s = round(time.monotonic() - window_start, 1)
+        _append_event("ext4-repair", {
+            "partitions": results,
+            "disks": sorted(by_disk),
+            "steps": steps,
+            "downtime_s": downtime_s,
+        })
+        logging.info(f"ext4 repair sequence complete ({downtime_s}s)")
 
     return repair_attempted
 
 
+@instrumented
 def check_proxy_health():
     """Check if go-fula proxy ports (4020/4021) are reachable.
     These ports handle kubo->go-fula p2p stream forwarding for blockchain and ping.
@@ -2252,6 +5092,7 @@ def check_proxy_health():
     return ports_ok
 
 
+@instrumented
 def check_peerid_collision():
     """Detect if kubo and ipfs-cluster have the same PeerID (known failure mode)."""
     try:
@@ -2344,44 +5185,325 @@ def stop_led_flash():
         led_flash_thread = None
         led_flash_stop_event = None
 
-def get_wifi_info_and_ping():
+# --- NetworkManager link monitor + gateway RTT sampler -----------------------
+# Link state (active connections, SSID, signal, bitrate, gateway) is read
+# from NetworkManager over D-Bus instead of parsing three nmcli invocations,
+# and cached until NM signals a state/property change. python3-dbus (and gi
+# for the signal loop) are imported lazily: without them the cache falls back
+# to a single `nmcli` call and simply expires after NETWORK_LINK_MAX_AGE_SEC.
+#
+# A daemon thread probes the default gateway every NETWORK_SAMPLE_INTERVAL_SEC
+# with one ICMP echo (unprivileged datagram socket, raw socket as root, or a
+# UDP probe answered by ICMP port-unreachable as a last resort) and keeps a
+# rolling RTT/loss series in /run/fula-network.state. That replaces the
+# blocking `ping -c 6` whose output was thrown away every cycle.
+NETWORK_STATE_PATH = "/run/fula-network.state"
+NETWORK_SAMPLE_INTERVAL_SEC = 10
+NETWORK_RTT_WINDOW = 90  # samples (~15 min at the default interval)
+NETWORK_LINK_MAX_AGE_SEC = 60
+_NM_BUS_NAME = "org.freedesktop.NetworkManager"
+_NM_PATH = "/org/freedesktop/NetworkManager"
+_DBUS_PROPS_IFACE = "org.freedesktop.DBus.Properties"
+_NM_CONN_TYPES = {"802-11-wireless": "wifi", "802-3-ethernet": "ethernet"}
+_PROC_NET_ROUTE = "/proc/net/route"
+_PROC_NET_WIRELESS = "/proc/net/wireless"
+_link_lock = threading.Lock()
+_link_state = None
+_link_state_ts = 0.0
+_link_gen = 0  # bumped on every invalidation; a read that raced one isn't cached
+_nm_reader_bus = None
+_rtt_samples = deque(maxlen=NETWORK_RTT_WINDOW)  # (epoch ts, rtt_ms | None)
+_nm_signal_thread = None
+
+
+def _nm_get(bus, path, iface, prop):
+    obj = bus.get_object(_NM_BUS_NAME, path)
+    return obj.Get(_NM_BUS_NAME + iface, prop, dbus_interface=_DBUS_PROPS_IFACE)
+
+
+def _nm_link_snapshot_dbus(bus):
+    """Read the link snapshot over D-Bus. Raises on any D-Bus error."""
+    state = {"source": "dbus", "connections": [], "primary": None, "ssid": None,
+             "signal_pct": None, "bitrate_kbps": None, "gateway": None}
+    primary_path = str(_nm_get(bus, _NM_PATH, "", "PrimaryConnection"))
+    for path in _nm_get(bus, _NM_PATH, "", "ActiveConnections"):
+        path = str(path)
+        ctype = str(_nm_get(bus, path, ".Connection.Active", "Type"))
+        devices = [str(d) for d in _nm_get(bus, path, ".Connection.Active", "Devices")]
+        conn = {
+            "id": str(_nm_get(bus, path, ".Connection.Active", "Id")),
+            "type": _NM_CONN_TYPES.get(ctype, ctype),
+            "device": str(_nm_get(bus, devices[0], ".Device", "Interface")) if devices else None,
+        }
+        state["connections"].append(conn)
+        if path != primary_path:
+            continue
+        state["primary"] = conn
+        ip4 = str(_nm_get(bus, path, ".Connection.Active", "Ip4Config"))
+        if ip4 != "/":
+            state["gateway"] = str(_nm_get(bus, ip4, ".IP4Config", "Gateway")) or None
+        if conn["type"] == "wifi" and devices:
+            state["bitrate_kbps"] = int(_nm_get(bus, devices[0], ".Device.Wireless", "Bitrate"))
+            ap = str(_nm_get(bus, devices[0], ".Device.Wireless", "ActiveAccessPoint"))
+            if ap != "/":
+                state["ssid"] = bytes(_nm_get(bus, ap, ".AccessPoint", "Ssid")).decode("utf-8", "replace")
+                state["signal_pct"] = int(_nm_get(bus, ap, ".AccessPoint", "Strength"))
+    return state
+
+
+def _nm_link_snapshot_nmcli():
+    """Fallback when python3-dbus is unavailable: one nmcli call for the
+    active connections; the gateway comes from /proc/net/route."""
+    state = {"source": "nmcli", "connections": [], "primary": None, "ssid": None,
+             "signal_pct": None, "bitrate_kbps": None, "gateway": _default_gateway()}
+    output = subprocess.run(["sudo", "nmcli", "-t", "-f", "NAME,TYPE,DEVICE", "con", "show", "--active"],
+                            capture_output=True, text=True, timeout=15).stdout
+    for line in output.splitlines():
+        # nmcli -t escapes ':' inside fields as '\:'
+        parts = [p.replace("\\:", ":") for p in re.split(r'(?<!\\):', line)]
+        if len(parts) < 3:
+            continue
+        ctype = _NM_CONN_TYPES.get(parts[1], parts[1])
+        state["connections"].append({"id": parts[0], "type": ctype, "device": parts[2] or None})
+    if state["connections"]:
+        state["primary"] = state["connections"][0]
+    return state
+
+
+def _default_gateway():
+    """IPv4 default gateway from /proc/net/route, or None."""
     try:
-        # Get the list of connections
-        nmcli_output = subprocess.check_output(["sudo", "nmcli", "con", "show"], universal_newlines=True)
-        
-        # Find the non-FxBlox WiFi connection
-        wifi_connection = None
-        for line in nmcli_output.split('\n'):
-            if 'wifi' in line.lower() and 'fxblox' not in line.lower():
-                wifi_connection = line.split()[0]
-                break
-        
-        if not wifi_connection:
-            return "No non-FxBlox WiFi connection found."
-        
-        # Get the device for this connection
-        device_output = subprocess.check_output(["sudo", "nmcli", "con", "show", wifi_connection], universal_newlines=True)
-        device_match = re.search(r'GENERAL.DEVICES:\s+(\S+)', device_output)
-        if not device_match:
-            return f"Could not find device for connection {wifi_connection}"
-        
-        device = device_match.group(1)
-        
-        # Get the router IP (gateway)
-        gateway_output = subprocess.check_output(["sudo", "nmcli", "dev", "show", device], universal_newlines=True)
-        gateway_match = re.search(r'IP4.GATEWAY:\s+(\S+)', gateway_output)
-        if not gateway_match:
-            return f"Could not find gateway IP for device {device}"
-        
-        gateway_ip = gateway_match.group(1)
-        
-        # Ping the router 6 times
-        ping_output = subprocess.check_output(["ping", "-c", "6", gateway_ip], universal_newlines=True)
-        
-        return f"Connection: {wifi_connection}\nDevice: {device}\nGateway IP: {gateway_ip}\nPing results:\n{ping_output}"
-    
-    except subprocess.CalledProcessError as e:
-        return f"An error occurred: {str(e)}"
+        with open(_PROC_NET_ROUTE, "r") as f:
+            next(f, None)
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[1] == "00000000" and parts[2] != "00000000":
+                    return socket.inet_ntoa(struct.pack("<I", int(parts[2], 16)))
+    except (OSError, ValueError) as e:
+        logging.debug(f"Could not read {_PROC_NET_ROUTE}: {e}")
+    return None
+
+
+def _wireless_rssi_dbm(interface):
+    """Signal level in dBm for interface from /proc/net/wireless, or None."""
+    try:
+        with open(_PROC_NET_WIRELESS, "r") as f:
+            for line in f:
+                name, sep, rest = line.partition(":")
+                if sep and name.strip() == interface:
+                    return int(float(rest.split()[2].rstrip(".")))
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _invalidate_link_state(*_args, **_kwargs):
+    global _link_state, _link_gen
+    with _link_lock:
+        _link_state = None
+        _link_gen += 1
+
+
+def get_link_state(max_age=NETWORK_LINK_MAX_AGE_SEC):
+    """Return the cached link snapshot, re-reading it if NM signalled a change
+    or it is older than max_age seconds.
+
+    The D-Bus read (or the nmcli fallback, up to 15s) runs outside _link_lock
+    so the RTT sampler and the log summary never queue behind it; the result
+    is swapped in afterwards unless an NM signal invalidated it mid-read.
+    """
+    global _link_state, _link_state_ts, _nm_reader_bus
+    with _link_lock:
+        now = time.monotonic()
+        if _link_state is not None and now - _link_state_ts <= max_age:
+            return _link_state
+        bus, gen = _nm_reader_bus, _link_gen
+    state = None
+    try:
+        import dbus  # python3-dbus; lazily so the watchdog runs without it
+        if bus is None:
+            bus = dbus.SystemBus(private=True)
+        state = _nm_link_snapshot_dbus(bus)
+    except ImportError:
+        pass
+    except Exception as e:
+        logging.debug(f"NetworkManager D-Bus read failed: {e}")
+        bus = None
+    if state is None:
+        try:
+            state = _nm_link_snapshot_nmcli()
+        except (Exception, _SubprocessTimeoutExpired) as e:
+            logging.debug(f"nmcli fallback failed: {e}")
+            state = {"source": None, "connections": [], "primary": None, "ssid": None,
+                     "signal_pct": None, "bitrate_kbps": None, "gateway": None}
+    device = (state["primary"] or {}).get("device")
+    state["rssi_dbm"] = (_wireless_rssi_dbm(device)
+                         if (state["primary"] or {}).get("type") == "wifi" else None)
+    with _link_lock:
+        _nm_reader_bus = bus
+        if gen == _link_gen:
+            _link_state, _link_state_ts = state, now
+    return state
+
+
+def _start_nm_signal_monitor():
+    """Invalidate the link cache on NetworkManager signals. Needs dbus + gi;
+    without them the cache just ages out."""
+    global _nm_signal_thread
+    if _nm_signal_thread is not None and _nm_signal_thread.is_alive():
+        return
+
+    def _worker():
+        try:
+            import dbus
+            import dbus.mainloop.glib
+            from gi.repository import GLib
+        except ImportError as e:
+            logging.debug(f"NetworkManager signal monitor unavailable: {e}")
+            return
+        try:
+            dbus.mainloop.glib.threads_init()
+            bus = dbus.SystemBus(mainloop=dbus.mainloop.glib.DBusGMainLoop(), private=True)
+            bus.add_signal_receiver(_invalidate_link_state, signal_name="StateChanged",
+                                    dbus_interface=_NM_BUS_NAME)
+            bus.add_signal_receiver(
+                lambda iface, *_a: iface.startswith(_NM_BUS_NAME) and _invalidate_link_state(),
+                signal_name="PropertiesChanged", dbus_interface=_DBUS_PROPS_IFACE,
+                bus_name=_NM_BUS_NAME)
+            GLib.MainLoop().run()
+        except Exception as e:
+            logging.debug(f"NetworkManager signal monitor stopped: {e}")
+
+    _nm_signal_thread = threading.Thread(target=_worker, name="nm-signals", daemon=True)
+    _nm_signal_thread.start()
+
+
+def _icmp_checksum(data):
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _probe_gateway_rtt(gateway, timeout=1.0, seq=1):
+    """One ICMP echo to gateway; RTT in ms, or None on loss. Falls back to a
+    UDP probe (ICMP port-unreachable counts as the reply) when ICMP sockets
+    aren't permitted."""
+    for kind in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+            break
+        except OSError:
+            continue
+    else:
+        return _probe_gateway_udp(gateway, timeout)
+    ident = os.getpid() & 0xFFFF
+    payload = struct.pack("!d", time.monotonic())
+    header = struct.pack("!BBHHH", 8, 0, 0, ident, seq)
+    packet = struct.pack("!BBHHH", 8, 0, _icmp_checksum(header + payload), ident, seq) + payload
+    try:
+        sock.settimeout(timeout)
+        t0 = time.monotonic()
+        deadline = t0 + timeout
+        sock.sendto(packet, (gateway, 0))
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            sock.settimeout(remaining)
+            data, addr = sock.recvfrom(1024)
+            if kind == socket.SOCK_RAW:
+                data = data[(data[0] & 0x0F) * 4:]  # strip the IP header
+            # Datagram sockets rewrite the id, so match on type + sequence only.
+            if addr[0] == gateway and len(data) >= 8 and data[0] == 0 \
+                    and struct.unpack("!H", data[6:8])[0] == seq:
+                return round((time.monotonic() - t0) * 1000, 2)
+    except (socket.timeout, OSError):
+        return None
+    finally:
+        sock.close()
+
+
+def _probe_gateway_udp(gateway, timeout=1.0):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect((gateway, 33434))
+            t0 = time.monotonic()
+            sock.send(b"fula")
+            sock.recv(64)
+        except ConnectionRefusedError:
+            pass  # ICMP port unreachable came back — that's the round trip
+        except (socket.timeout, OSError):
+            return None
+        return round((time.monotonic() - t0) * 1000, 2)
+
+
+def _rtt_summary(samples):
+    rtts = sorted(r for _ts, r in samples if r is not None)
+    if not samples:
+        return {"samples": 0, "loss_pct": None, "rtt_avg_ms": None,
+                "rtt_p50_ms": None, "rtt_max_ms": None}
+    return {
+        "samples": len(samples),
+        "loss_pct": round(100.0 * (len(samples) - len(rtts)) / len(samples), 1),
+        "rtt_avg_ms": round(sum(rtts) / len(rtts), 2) if rtts else None,
+        "rtt_p50_ms": rtts[len(rtts) // 2] if rtts else None,
+        "rtt_max_ms": rtts[-1] if rtts else None,
+    }
+
+
+@instrumented
+def sample_network(now=None):
+    """Probe the gateway once and rewrite /run/fula-network.state."""
+    if now is None:
+        now = time.time()
+    link = get_link_state()
+    gateway = link.get("gateway")
+    rtt = _probe_gateway_rtt(gateway) if gateway else None
+    with _link_lock:
+        if gateway:
+            _rtt_samples.append((int(now), rtt))
+        samples = list(_rtt_samples)
+    recent = [s for s in samples if s[0] >= now - 60]
+    _atomic_write_state(NETWORK_STATE_PATH, {
+        "last_sample_ts": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "interval_s": NETWORK_SAMPLE_INTERVAL_SEC,
+        "link": link,
+        "gateway_rtt": {"1m": _rtt_summary(recent), "window": _rtt_summary(samples)},
+        "series": [[ts, r] for ts, r in samples],
+    })
+    return rtt
+
+
+def start_network_sampler():
+    _start_nm_signal_monitor()
+    _start_periodic("network-sampler", sample_network, NETWORK_SAMPLE_INTERVAL_SEC)
+
+
+@instrumented
+def get_wifi_info_and_ping():
+    """One-line link summary for the logs, from the cached link state and the
+    gateway RTT series — no nmcli and no blocking ping. Reports the
+    non-FxBlox WiFi connection; SSID/signal/bitrate are only known when it is
+    also the primary connection."""
+    link = get_link_state()
+    wifi = next((c for c in link["connections"]
+                 if c["type"] == "wifi" and "fxblox" not in c["id"].lower()), None)
+    if not wifi:
+        return "No non-FxBlox WiFi connection found."
+    if wifi != link["primary"]:
+        link = {"ssid": None, "signal_pct": None, "bitrate_kbps": None,
+                "rssi_dbm": _wireless_rssi_dbm(wifi["device"]), "gateway": link["gateway"]}
+    with _link_lock:
+        summary = _rtt_summary(list(_rtt_samples))
+    return (f"Connection: {wifi['id']}\nDevice: {wifi['device']}\n"
+            f"SSID: {link['ssid']} signal={link['signal_pct']}% rssi={link['rssi_dbm']}dBm "
+            f"bitrate={link['bitrate_kbps']}kb/s\nGateway IP: {link['gateway']}\n"
+            f"Gateway RTT: avg={summary['rtt_avg_ms']}ms max={summary['rtt_max_ms']}ms "
+            f"loss={summary['loss_pct']}% over {summary['samples']} samples")
 
 def check_fs_type(mount_path, expected_type):
     if not os.path.exists(mount_path):
@@ -2394,6 +5516,7 @@ def check_fs_type(mount_path, expected_type):
     except subprocess.CalledProcessError:
         return False
 
+@instrumented
 def check_conditions():
     # Check all required conditions
     conditions = [
@@ -2409,13 +5532,15 @@ def check_conditions():
     ]
     return all(conditions)
 
+@instrumented
 def check_wifi_connection():
-    # Check the active WiFi connection
-    output = subprocess.getoutput("sudo nmcli con show --active")
-    logging.info(f"Active connections: {output}")  # Log the output for debugging
-    if "FxBlox" in output:
+    # Check the active WiFi connection. Hotspot decisions hang off this, so
+    # don't trust a link snapshot older than one main-loop cycle.
+    connections = get_link_state(max_age=10)["connections"]
+    logging.info(f"Active connections: {connections}")  # Log the output for debugging
+    if any("FxBlox" in c["id"] for c in connections):
         return "FxBlox"
-    elif "wifi" in output or "ethernet" in output:
+    elif any(c["type"] in ("wifi", "ethernet") for c in connections):
         return "other"
     return None
 
@@ -2445,9 +5570,9 @@ def attempt_wifi_connection():
                 # LED flashing blue code here to indicate connection successful
                 start_led_flash("blue")
                 
-                # Verify internet connectivity by probing public DNS resolvers
-                # in priority order (Cloudflare → Google → Quad9 → OpenDNS).
-                # Returns the first reachable IP, or None if all six fail.
+                # Verify internet connectivity by racing the public DNS
+                # resolvers (fastest known-good first). Returns the first
+                # reachable IP, or None if all of them fail.
                 working_dns = check_dns_reachable()
 
                 if working_dns is not None:
@@ -2525,6 +5650,7 @@ def attempt_wifi_connection():
 
     return None
 
+@instrumented
 def check_and_fix_ipfs_cluster():
     try:
         # Widened from 15 to 80 lines: pebble can emit dozens of per-sstable "stat ... no
@@ -2556,51 +5682,57 @@ def check_and_fix_ipfs_cluster():
             logging.warning("ipfs-cluster identity.json is a DIRECTORY (Docker "
                             "bind-mount artifact). Removing + restarting fula so it "
                             "can be regenerated.")
-            try:
-                # Every call carries a timeout so a container wedged in 'D'
-                # (uninterruptible IO wait — common on the flaky storage that
-                # triggers this bug) can never hang the watchdog itself. A
-                # timeout raises TimeoutExpired (NOT CalledProcessError), so
-                # catch both and retry next cycle rather than killing the loop.
-                subprocess.run(["sudo", "systemctl", "stop", "blox-ai.service"],
-                               capture_output=True, timeout=90)
-                subprocess.run(["sudo", "systemctl", "stop", "fula.service"],
-                               capture_output=True, timeout=150, check=True)
-                time.sleep(10)
-                subprocess.run(["sudo", "rm", "-rf", identity_path],
-                               capture_output=True, timeout=60)
-                subprocess.run(["sudo", "sync"], capture_output=True, timeout=60)
-                safe_start_fula(capture_output=True, timeout=150, check=True)
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
-                logging.error("cluster identity.json dir repair: a command failed "
-                              "or timed out (%s); will retry next cycle.", e)
-                return True
-            # go-fula rewrites identity.json during startup. Wait for it to reappear
-            # as a regular FILE before bringing blox-ai back (up to ~180s).
-            identity_restored = False
-            for _ in range(36):
-                time.sleep(5)
-                if os.path.isfile(identity_path):
-                    identity_restored = True
-                    break
-            if identity_restored:
+
+            def repair_identity_dir():
                 try:
-                    subprocess.run(["sudo", "systemctl", "start", "blox-ai.service"],
+                    # Every call carries a timeout so a container wedged in 'D'
+                    # (uninterruptible IO wait — common on the flaky storage that
+                    # triggers this bug) can never hang the watchdog itself. A
+                    # timeout raises TimeoutExpired (NOT CalledProcessError), so
+                    # catch both and retry next cycle rather than killing the loop.
+                    subprocess.run(["sudo", "systemctl", "stop", "blox-ai.service"],
                                    capture_output=True, timeout=90)
-                except subprocess.TimeoutExpired:
-                    logging.warning("blox-ai start timed out; it will start on the "
-                                    "next cycle/boot (identity.json is a file, so safe).")
-            else:
-                logging.warning("identity.json not regenerated within timeout; leaving "
-                                "blox-ai stopped to avoid re-creating the directory. It "
-                                "will come back on the next stack start once the file exists.")
-            _append_event("restart", {
-                "unit": "fula.service",
-                "action": "cluster_identity_dir_repair",
-                "remediation": "rm_identity_dir+restart_fula",
-                "identity_restored": identity_restored,
-            })
-            return True
+                    subprocess.run(["sudo", "systemctl", "stop", "fula.service"],
+                                   capture_output=True, timeout=150, check=True)
+                    time.sleep(10)
+                    subprocess.run(["sudo", "rm", "-rf", identity_path],
+                                   capture_output=True, timeout=60)
+                    subprocess.run(["sudo", "sync"], capture_output=True, timeout=60)
+                    safe_start_fula(capture_output=True, timeout=150, check=True)
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                    logging.error("cluster identity.json dir repair: a command failed "
+                                  "or timed out (%s); will retry next cycle.", e)
+                    return False
+                # go-fula rewrites identity.json during startup. Wait for it to reappear
+                # as a regular FILE before bringing blox-ai back (up to ~180s).
+                identity_restored = False
+                for _ in range(36):
+                    time.sleep(5)
+                    if os.path.isfile(identity_path):
+                        identity_restored = True
+                        break
+                if identity_restored:
+                    try:
+                        subprocess.run(["sudo", "systemctl", "start", "blox-ai.service"],
+                                       capture_output=True, timeout=90)
+                    except subprocess.TimeoutExpired:
+                        logging.warning("blox-ai start timed out; it will start on the "
+                                        "next cycle/boot (identity.json is a file, so safe).")
+                else:
+                    logging.warning("identity.json not regenerated within timeout; leaving "
+                                    "blox-ai stopped to avoid re-creating the directory. It "
+                                    "will come back on the next stack start once the file exists.")
+                _append_event("restart", {
+                    "unit": "fula.service",
+                    "action": "cluster_identity_dir_repair",
+                    "remediation": "rm_identity_dir+restart_fula",
+                    "identity_restored": identity_restored,
+                })
+                return identity_restored
+
+            return run_remediation("ipfs_cluster:identity-dir",
+                                   [("identity-dir-repair", repair_identity_dir)],
+                                   "identity.json is a directory") is not None
 
         # Empty or unparseable service.json — triggers "unexpected end of JSON input" /
         # "error loading configurations" in the daemon. Root cause is the init-script jq
@@ -2618,14 +5750,13 @@ def check_and_fix_ipfs_cluster():
             svc_empty = False
         if svc_config_error or svc_empty:
             logging.warning("IPFS Cluster service.json empty or unparseable. Removing for regeneration.")
-            subprocess.run(["sudo", "systemctl", "stop", "fula.service"],
-                           capture_output=True, check=True)
-            time.sleep(10)
-            subprocess.run(["sudo", "rm", "-f", service_json, service_temp],
-                           capture_output=True)
-            safe_start_fula(capture_output=True, check=True)
-            time.sleep(30)
-            cluster_error_found = True
+            # The cluster entrypoint regenerates service.json; kubo keeps running.
+            reason = "service.json empty or unparseable"
+            cluster_error_found = run_remediation(
+                "ipfs_cluster:service-json",
+                restart_ladder("ipfs_cluster", reason, while_stopped=lambda: subprocess.run(
+                    ["sudo", "rm", "-f", service_json, service_temp], capture_output=True)),
+                reason) is not None
         elif (
             "error creating datastore: failed to open pebble database" in ipfs_cluster_logs
             or "failed to open pebble database: pebble:" in ipfs_cluster_logs
@@ -2638,12 +5769,11 @@ def check_and_fix_ipfs_cluster():
             # Check disk space first — pebble fix is pointless if disk is full
             has_space, free_gb = check_disk_space("/uniondrive", min_gb=0.5)
             if not has_space:
-                logging.warning(f"Low disk ({free_gb:.2f}GB). Running docker prune before pebble fix.")
-                subprocess.run(["sudo", "docker", "system", "prune", "-f"],
-                               capture_output=True, timeout=120)
+                logging.warning(f"Low disk ({free_gb:.2f}GB). Reclaiming space before pebble fix.")
+                reclaim_disk_space("/uniondrive", target_free_gb=0.5)
                 has_space, free_gb = check_disk_space("/uniondrive", min_gb=0.1)
                 if not has_space:
-                    logging.error("Disk still full after prune. Skipping pebble fix to avoid escalation.")
+                    logging.error("Disk still full after reclaim. Skipping pebble fix to avoid escalation.")
                     return False  # Don't count toward restart_attempts
 
             # Pre-check: if the pebble dir has EBADMSG inodes, no amount of rm
@@ -2658,62 +5788,80 @@ def check_and_fix_ipfs_cluster():
                 check_and_repair_ext4()
                 return False
 
-            subprocess.run(["sudo", "systemctl", "stop", "fula.service"], capture_output=True, check=True)
-            time.sleep(10)
-            if os.path.exists(pebble_dir):
-                rm_result = subprocess.run(["sudo", "rm", "-rf", pebble_dir],
-                                           capture_output=True, text=True, timeout=60)
-                if rm_result.returncode != 0 and _rm_stderr_reports_ebadmsg(rm_result.stderr):
-                    logging.warning(
-                        f"ipfs_cluster: rm of {pebble_dir} hit EBADMSG — "
-                        "ext4 metadata corrupt. Triggering fsck repair."
-                    )
-                    check_and_repair_ext4()
-                    return False
-                # Flush mergerfs/union buffers so the delete actually lands on the backing fs
-                # before kubo re-mounts the volume (union-mount issues have silently masked
-                # deletes in the past — see MEMORY.md "Docker Compose bridge != docker0").
-                subprocess.run(["sudo", "sync"], capture_output=True, timeout=30)
-                subprocess.run(["sudo", "mkdir", "-p", pebble_dir], capture_output=True, check=True)
-                # Verify the wipe actually took effect — union-mount inconsistencies can
-                # hide the rm from some layers, leaving stale MANIFEST/sst files visible.
-                try:
-                    remaining = os.listdir(pebble_dir)
-                    if remaining:
-                        logging.error(f"Pebble dir non-empty after wipe ({len(remaining)} entries); attempting per-entry rm")
-                        for entry in remaining:
-                            subprocess.run(["sudo", "rm", "-rf", os.path.join(pebble_dir, entry)],
-                                           capture_output=True, timeout=30)
-                        subprocess.run(["sudo", "sync"], capture_output=True, timeout=30)
-                        # If entries still survive per-entry rm AND stat returns ENOENT on
-                        # them, a backing disk is dead. No auto-fix possible — surface it
-                        # and bail before fula.service restarts into the same loop.
-                        phantoms = _detect_phantom_mergerfs_entries(pebble_dir)
-                        if phantoms:
-                            _log_dead_branch_diagnostic(pebble_dir, phantoms)
-                            return False
-                except OSError as e:
-                    logging.warning(f"Could not list pebble dir after wipe: {e}")
-                logging.info("Pebble directory contents removed.")
-            else:
-                logging.warning("Pebble directory not found.")
-            safe_start_fula(capture_output=True, check=True)
-            time.sleep(30)
-            cluster_error_found = True
+            # Set when the repair finds something no restart can fix; the
+            # attempt still counts as failed, but not toward restart_attempts.
+            dead_end = False
+
+            def repair_pebble():
+                nonlocal dead_end
+                subprocess.run(["sudo", "systemctl", "stop", "fula.service"], capture_output=True, check=True)
+                time.sleep(10)
+                # Wiping cluster pebble means a full pinset resync from peers —
+                # try pointing it back at the last consistent MANIFEST first.
+                if salvage_pebble_dir(pebble_dir, ipfs_cluster_logs)["ok"]:
+                    logging.info("Pebble directory salvaged without a wipe.")
+                elif os.path.exists(pebble_dir):
+                    wiped, wipe_err = _trash_dir(pebble_dir)
+                    if not wiped and _rm_stderr_reports_ebadmsg(wipe_err):
+                        logging.warning(
+                            f"ipfs_cluster: wipe of {pebble_dir} hit EBADMSG — "
+                            "ext4 metadata corrupt. Triggering fsck repair."
+                        )
+                        check_and_repair_ext4()
+                        dead_end = True
+                        return False
+                    # Flush mergerfs/union buffers so the delete actually lands on the backing fs
+                    # before kubo re-mounts the volume (union-mount issues have silently masked
+                    # deletes in the past — see MEMORY.md "Docker Compose bridge != docker0").
+                    subprocess.run(["sudo", "sync"], capture_output=True, timeout=30)
+                    subprocess.run(["sudo", "mkdir", "-p", pebble_dir], capture_output=True, check=True)
+                    # Verify the wipe actually took effect — union-mount inconsistencies can
+                    # hide the rm from some layers, leaving stale MANIFEST/sst files visible.
+                    try:
+                        remaining = os.listdir(pebble_dir)
+                        if remaining:
+                            logging.error(f"Pebble dir non-empty after wipe ({len(remaining)} entries); attempting per-entry rm")
+                            for entry in remaining:
+                                subprocess.run(["sudo", "rm", "-rf", os.path.join(pebble_dir, entry)],
+                                               capture_output=True, timeout=30)
+                            subprocess.run(["sudo", "sync"], capture_output=True, timeout=30)
+                            # If entries still survive per-entry rm AND stat returns ENOENT on
+                            # them, a backing disk is dead. No auto-fix possible — surface it
+                            # and bail before fula.service restarts into the same loop.
+                            phantoms = _detect_phantom_mergerfs_entries(pebble_dir)
+                            if phantoms:
+                                _log_dead_branch_diagnostic(pebble_dir, phantoms)
+                                dead_end = True
+                                return False
+                    except OSError as e:
+                        logging.warning(f"Could not list pebble dir after wipe: {e}")
+                    logging.info("Pebble directory contents removed.")
+                else:
+                    logging.warning("Pebble directory not found.")
+                safe_start_fula(capture_output=True, check=True)
+                return wait_until_healthy("check_and_fix_ipfs_cluster")
+
+            ran = run_remediation("ipfs_cluster:pebble", [("pebble-repair", repair_pebble)],
+                                  "pebble database unreadable") is not None
+            if dead_end:
+                return False
+            cluster_error_found = ran
         elif "error obtaining execution lock: cannot acquire lock:" in ipfs_cluster_logs:
             logging.warning("IPFS Cluster lock issue detected. Attempting to fix.")
-            subprocess.run(["sudo", "systemctl", "stop", "fula.service"], capture_output=True, check=True)
-            time.sleep(10)
-            subprocess.run(["sudo", "rm", "-f", "/uniondrive/ipfs-cluster/cluster.lock"], capture_output=True, check=True)
-            logging.info("IPFS Cluster lock file removed.")
-            safe_start_fula(capture_output=True, check=True)
-            time.sleep(30)
-            cluster_error_found = True
+
+            def remove_lock():
+                subprocess.run(["sudo", "rm", "-f", "/uniondrive/ipfs-cluster/cluster.lock"],
+                               capture_output=True, timeout=20)
+                logging.info("IPFS Cluster lock file removed.")
+
+            cluster_error_found = run_remediation(
+                "ipfs_cluster:lock", restart_ladder("ipfs_cluster", "stale cluster.lock", while_stopped=remove_lock),
+                "stale cluster.lock") is not None
         elif "status_code=000" in ipfs_cluster_logs and "Request failed, retrying in 60 seconds" in ipfs_cluster_logs:
-            logging.warning("IPFS Cluster status code issue detected. Attempting to restart fula.")
-            safe_restart_fula(capture_output=True, check=True)
-            time.sleep(30)
-            cluster_error_found = True
+            logging.warning("IPFS Cluster status code issue detected. Attempting to restart ipfs_cluster.")
+            reason = "cluster API requests failing (status_code=000)"
+            cluster_error_found = run_remediation(
+                "ipfs_cluster:api-000", restart_ladder("ipfs_cluster", reason), reason) is not None
         
         # Try to clear logs only if the container exists
         if cluster_error_found:
@@ -2731,6 +5879,7 @@ def check_and_fix_ipfs_cluster():
         return False
 
 
+@instrumented
 def check_and_fix_ipfs_host():
     ipfs_host_logs = subprocess.getoutput("sudo docker logs ipfs_host --tail 17 2>&1")
     
@@ -2792,9 +5941,8 @@ def check_and_fix_ipfs_host():
 
         # Restart fula service
         logging.info("Restarting fula service after fixing error loading plugins issue.")
-        safe_restart_fula(capture_output=True, check=True)
-        time.sleep(30)
-        return True
+        return remediate_with_stack_restart("ipfs_host:error-loading-plugins", "error loading plugins",
+                                            "check_and_fix_ipfs_host")
     
     # Check for deprecated Provider config field (kubo 0.40+ FATAL)
     if "Deprecated configuration detected" in ipfs_host_logs and "Provider" in ipfs_host_logs:
@@ -2809,7 +5957,7 @@ def check_and_fix_ipfs_host():
         logging.info("Restarting ipfs_host after removing deprecated Provider field.")
         subprocess.run(["sudo", "docker", "restart", "ipfs_host"],
                        capture_output=True, timeout=60)
-        time.sleep(15)
+        wait_until_healthy("check_and_fix_ipfs_host", checks=("kubo",), deadline=60)
         return True
 
     # Check for migration permission error
@@ -2825,9 +5973,9 @@ def check_and_fix_ipfs_host():
 
             # Restart fula service
             logging.info("Restarting fula service after fixing migration permission issue.")
-            safe_restart_fula(capture_output=True, check=True)
-            time.sleep(30)
-            return True
+            return remediate_with_stack_restart("ipfs_host:migration-permission",
+                                                "fs-repo-16-to-17 migration permission denied",
+                                                "check_and_fix_ipfs_host")
         except Exception as e:
             logging.error(f"Error fixing migration permission issue: {str(e)}")
 
@@ -2847,7 +5995,7 @@ def check_and_fix_ipfs_host():
                 logging.info(f"Successfully wrote 18 to {version_file_path}")
                 subprocess.run(["sudo", "docker", "restart", "ipfs_host"],
                                capture_output=True, check=True, timeout=60)
-                time.sleep(30)
+                wait_until_healthy("check_and_fix_ipfs_host", checks=("kubo",))
                 return True
             else:
                 logging.warning(f"IPFS Host: 'invalid data in repo version file' but {version_file_path} size={file_size}. Not auto-fixing.")
@@ -2879,7 +6027,7 @@ def check_and_fix_ipfs_host():
                 logging.info(f"Successfully wrote standard datastore_spec to {datastore_spec_path}")
                 subprocess.run(["sudo", "docker", "restart", "ipfs_host"],
                                capture_output=True, check=True, timeout=60)
-                time.sleep(30)
+                wait_until_healthy("check_and_fix_ipfs_host", checks=("kubo",))
                 return True
             else:
                 logging.warning(f"IPFS Host: 'datastore configuration mismatch' but {datastore_spec_path} size={file_size}. Not auto-fixing (legitimate non-empty mismatches like path changes need manual review).")
@@ -2899,7 +6047,7 @@ def check_and_fix_ipfs_host():
             # Restart fula service
             logging.info("Restarting fula service after fixing version mismatch.")
             subprocess.run(["sudo", "docker", "restart", "ipfs_host"], capture_output=True, check=True)
-            time.sleep(30)
+            wait_until_healthy("check_and_fix_ipfs_host", checks=("kubo",))
             return True
         except Exception as e:
             logging.error(f"Error fixing version mismatch (17): {str(e)}")
@@ -2915,23 +6063,28 @@ def check_and_fix_ipfs_host():
             # Restart fula service
             logging.info("Restarting fula service after fixing version mismatch.")
             subprocess.run(["sudo", "docker", "restart", "ipfs_host"], capture_output=True, check=True)
-            time.sleep(30)
+            wait_until_healthy("check_and_fix_ipfs_host", checks=("kubo",))
             return True
         except Exception as e:
             logging.error(f"Error fixing version mismatch (16): {str(e)}")
     
     if "Error: invalid or no prefix in shard identifier:" in ipfs_host_logs or "Error: directory missing SHARDING file:" in ipfs_host_logs or "mkdir /uniondrive/ipfs_datastore/blocks/X3: no such file or directory" in ipfs_host_logs:
-        logging.warning("IPFS Host issue 1 detected. Attempting to fix.")
+        logging.warning("IPFS Host issue 1 detected (flatfs layout damage). Attempting to fix.")
         subprocess.run(["sudo", "systemctl", "stop", "fula.service"], capture_output=True)
         time.sleep(10)
         ipfs_dir = "/uniondrive/ipfs_datastore/blocks"
-        if os.path.exists(ipfs_dir):
-            subprocess.run(["sudo", "rm", "-rf", ipfs_dir], capture_output=True, check=True)
+        shard_func = _flatfs_shard_func_from_spec(
+            "/home/pi/.internal/ipfs_data/datastore_spec", ipfs_dir)
+        if repair_flatfs_blocks(ipfs_dir, shard_func)["ok"]:
+            logging.info("Ipfs Blocks directory repaired in place.")
+        elif os.path.exists(ipfs_dir):
+            # Repair couldn't reconcile the layout — last resort is the old wipe.
+            _trash_dir(ipfs_dir)
             logging.info("Ipfs Blocks directory removed.")
         else:
             logging.warning("Ipfs Blocks directory not found.")
         safe_start_fula(capture_output=True)
-        time.sleep(30)
+        wait_until_healthy("check_and_fix_ipfs_host")
         return True
 
     if "could not get pinset from IPFS: Post" in ipfs_host_logs and "context deadline exceeded" in ipfs_host_logs:
@@ -2944,23 +6097,30 @@ def check_and_fix_ipfs_host():
         subprocess.run(["sudo", "docker", "stop", "ipfs_host"], capture_output=True)
 
         time.sleep(10)
+        if salvage_pebble_dir("/uniondrive/ipfs_datastore/datastore", ipfs_host_logs,
+                              allow_rollback=False)["ok"]:
+            logging.info("Ipfs Datastore salvaged without a wipe.")
+            safe_start_fula(capture_output=True)
+            wait_until_healthy("check_and_fix_ipfs_host")
+            return True
+
         ipfs_dir = "/uniondrive/ipfs_datastore/blocks"
         if os.path.exists(ipfs_dir):
-            subprocess.run(["sudo", "rm", "-rf", ipfs_dir], capture_output=True, check=True)
+            _trash_dir(ipfs_dir)
             logging.info("Ipfs Blocks directory removed.")
         else:
             logging.warning("Ipfs Blocks directory not found.")
 
         ipfs_datastore_dir = "/uniondrive/ipfs_datastore/datastore"
         if os.path.exists(ipfs_datastore_dir):
-            subprocess.run(["sudo", "rm", "-rf", ipfs_datastore_dir], capture_output=True, check=True)
+            _trash_dir(ipfs_datastore_dir)
             subprocess.run(["sudo", "mkdir", "-p", ipfs_datastore_dir], capture_output=True, check=True)
             logging.info("Ipfs Datastore directory contents removed.")
         else:
             logging.warning("Ipfs Datastore directory not found.")
 
         safe_start_fula(capture_output=True)
-        time.sleep(30)
+        wait_until_healthy("check_and_fix_ipfs_host")
         return True
 
     if "'path' field is missing" in ipfs_host_logs:
@@ -2970,7 +6130,7 @@ def check_and_fix_ipfs_host():
             subprocess.run(["sudo", "rm", "-f", ipfs_config_path], capture_output=True, check=True)
             logging.info(f"Deleted corrupted IPFS config: {ipfs_config_path}")
         safe_restart_fula(capture_output=True, timeout=120)
-        time.sleep(30)
+        wait_until_healthy("check_and_fix_ipfs_host")
         return True
 
     # Relay connection check
@@ -2993,7 +6153,9 @@ def check_and_fix_ipfs_host():
     # Iterate over all configured relays from kubo's StaticRelays — the failure
     # path that escalates fula.service restart only triggers when ALL of them
     # are unreachable, so a single relay outage no longer counts as a failure.
-    configured_relays = get_relay_multiaddrs()
+    # Closest healthy relay first (see score_relays) so the common case is
+    # one fast dial instead of waiting out dead relays' timeouts.
+    configured_relays = rank_relay_multiaddrs(get_relay_multiaddrs())
     any_relay_success = False
     last_failure_detail = ""
     for relay_addr in configured_relays:
@@ -3051,9 +6213,11 @@ def check_and_fix_ipfs_host():
             "Restarting fula.service."
         )
         relay_fail_count = 0
-        safe_restart_fula(capture_output=True)
-        time.sleep(30)
-        return True
+        # A restart that doesn't bring the relays back recurs within the hour
+        # and backs off instead of repeating every fifth cycle.
+        return run_remediation("relay-swarm-down",
+                               [("stack-restart", lambda: _restart_stack("check_and_fix_ipfs_host"))],
+                               "relays and bootstrap peers unreachable") is not None
 
     logging.info(
         f"Relay and swarm connectivity failed ({relay_fail_count}/5). "
@@ -3062,6 +6226,19 @@ def check_and_fix_ipfs_host():
     return False
 
 
+@instrumented
+def regenerate_cluster_identity():
+    """Remove ipfs-cluster's service.json so it mints a new PeerID. Only the
+    cluster identity changes; kubo keeps its swarm. True once the collision
+    is gone."""
+    service_json = "/uniondrive/ipfs-cluster/service.json"
+    if os.path.exists(service_json):
+        subprocess.run(["sudo", "rm", "-f", service_json], capture_output=True, check=True, timeout=20)
+        logging.info(f"Deleted {service_json} to force PeerID regeneration.")
+    return restart_containers("ipfs_cluster", "PeerID collision with kubo") and not check_peerid_collision()
+
+
+@instrumented
 def check_and_fix_kubo_local():
     """Check kubo-local (ipfs_local) container for common errors and fix them.
 
@@ -3133,6 +6310,14 @@ def check_and_fix_kubo_local():
                            capture_output=True, timeout=60)
             time.sleep(5)
 
+            if salvage_pebble_dir("/uniondrive/ipfs_datastore_local/datastore", ipfs_local_logs,
+                                  allow_rollback=False)["ok"]:
+                logging.info("kubo-local: datastore salvaged without a wipe.")
+                subprocess.run(["sudo", "docker", "start", "ipfs_local"],
+                               capture_output=True, timeout=60)
+                time.sleep(15)
+                return True
+
             dead_branch = [False]
             ebadmsg_hit = [False]
 
@@ -3140,15 +6325,14 @@ def check_and_fix_kubo_local():
                 """Wipe + recreate + chown; verify the wipe stuck. /uniondrive is mergerfs
                 and has historically left pebble's CURRENT/MANIFEST pointer files behind
                 on one of the underlying branches, making the restart fail the same way.
-                If entries remain after rm -rf, retry per-entry. If they STILL remain and
+                If entries remain after the wipe, retry per-entry. If they STILL remain and
                 stat() returns ENOENT, a backing disk has failed — flag dead_branch so the
                 caller can bail instead of restarting into the same error."""
                 if os.path.exists(target_dir):
-                    rm_result = subprocess.run(["sudo", "rm", "-rf", target_dir],
-                                               capture_output=True, text=True, timeout=60)
-                    if rm_result.returncode != 0 and _rm_stderr_reports_ebadmsg(rm_result.stderr):
+                    wiped, wipe_err = _trash_dir(target_dir)
+                    if not wiped and _rm_stderr_reports_ebadmsg(wipe_err):
                         logging.warning(
-                            f"kubo-local: rm of {target_dir} hit EBADMSG — "
+                            f"kubo-local: wipe of {target_dir} hit EBADMSG — "
                             "ext4 metadata corrupt. Aborting wipe for fsck repair."
                         )
                         ebadmsg_hit[0] = True
@@ -3214,16 +6398,19 @@ def check_and_fix_kubo_local():
         if ("Error: invalid or no prefix in shard identifier:" in ipfs_local_logs or
                 "Error: directory missing SHARDING file:" in ipfs_local_logs or
                 "no such file or directory" in ipfs_local_logs and "ipfs_datastore_local/blocks" in ipfs_local_logs):
-            logging.warning("kubo-local: Flatfs blocks issue. Clearing blocks and restarting.")
+            logging.warning("kubo-local: Flatfs blocks issue. Repairing blocks layout and restarting.")
             subprocess.run(["sudo", "docker", "stop", "ipfs_local"],
                            capture_output=True, timeout=60)
             time.sleep(5)
             blocks_dir = "/uniondrive/ipfs_datastore_local/blocks"
-            if os.path.exists(blocks_dir):
-                subprocess.run(["sudo", "rm", "-rf", blocks_dir], capture_output=True, timeout=30)
-            subprocess.run(["sudo", "mkdir", "-p", blocks_dir], capture_output=True, timeout=10)
-            subprocess.run(["sudo", "chown", "-R", "1000:1000", blocks_dir],
-                           capture_output=True, timeout=20)
+            shard_func = _flatfs_shard_func_from_spec(
+                "/home/pi/.internal/ipfs_data_local/datastore_spec", blocks_dir)
+            if not repair_flatfs_blocks(blocks_dir, shard_func, owner=(1000, 1000))["ok"]:
+                if os.path.exists(blocks_dir):
+                    _trash_dir(blocks_dir, timeout=30)
+                subprocess.run(["sudo", "mkdir", "-p", blocks_dir], capture_output=True, timeout=10)
+                subprocess.run(["sudo", "chown", "-R", "1000:1000", blocks_dir],
+                               capture_output=True, timeout=20)
             subprocess.run(["sudo", "docker", "start", "ipfs_local"],
                            capture_output=True, timeout=60)
             time.sleep(15)
@@ -3303,6 +6490,7 @@ def check_and_fix_kubo_local():
         return False
 
 
+@instrumented
 def check_and_fix_config_yaml():
     """Check fula_go container logs for config.yaml errors and fix them.
 
@@ -3316,7 +6504,8 @@ def check_and_fix_config_yaml():
     - initipfs/initipfscluster exit code errors
 
     Returns:
-        bool: True if an issue was detected and fixed, False otherwise
+        bool: True if an issue was detected and fula.service restarted,
+        False otherwise (including while that restart is backing off)
     """
     try:
         # Check fula_go container logs for config errors
@@ -3354,9 +6543,8 @@ def check_and_fix_config_yaml():
             logging.info(f"Config file does not exist: {config_yaml_path}")
             # Restart fula service to regenerate config
             logging.info("Restarting fula service to regenerate config.")
-            safe_restart_fula(capture_output=True, check=True)
-            time.sleep(30)
-            return True
+            return remediate_with_stack_restart("config-yaml:missing", matched_pattern,
+                                                "check_and_fix_config_yaml")
 
         # Check for invalid control characters
         try:
@@ -3375,20 +6563,14 @@ def check_and_fix_config_yaml():
                 # Try to restore from backup first
                 if restore_config_from_backup(config_yaml_path):
                     logging.info("Config restored from backup. Restarting fula service.")
-                    safe_restart_fula(capture_output=True, check=True)
-                    time.sleep(30)
-                    return True
-
-                # No valid backup, delete corrupted config
-                logging.warning(f"No valid backup available. Deleting corrupted config: {config_yaml_path}")
-                subprocess.run(["sudo", "rm", "-f", config_yaml_path], capture_output=True, check=True)
-                logging.info(f"Deleted corrupted config.yaml: {config_yaml_path}")
-
-                # Restart fula service
-                logging.info("Restarting fula service after removing corrupted config.")
-                safe_restart_fula(capture_output=True, check=True)
-                time.sleep(30)
-                return True
+                else:
+                    # No valid backup, delete corrupted config
+                    logging.warning(f"No valid backup available. Deleting corrupted config: {config_yaml_path}")
+                    subprocess.run(["sudo", "rm", "-f", config_yaml_path], capture_output=True, check=True)
+                    logging.info(f"Deleted corrupted config.yaml: {config_yaml_path}")
+                    logging.info("Restarting fula service after removing corrupted config.")
+                return remediate_with_stack_restart("config-yaml:control-chars", matched_pattern,
+                                                    "check_and_fix_config_yaml")
 
         except Exception as e:
             logging.error(f"Error checking config.yaml for invalid chars: {e}")
@@ -3401,26 +6583,21 @@ def check_and_fix_config_yaml():
             # Try to restore from backup first
             if restore_config_from_backup(config_yaml_path):
                 logging.info("Config restored from backup after YAML syntax error. Restarting fula service.")
-                safe_restart_fula(capture_output=True, check=True)
-                time.sleep(30)
-                return True
-
-            # No valid backup, delete corrupted config
-            logging.warning(f"No valid backup available. Deleting config with syntax error: {config_yaml_path}")
-            subprocess.run(["sudo", "rm", "-f", config_yaml_path], capture_output=True, check=True)
-            logging.info(f"Deleted config.yaml with syntax error: {config_yaml_path}")
-
-            # Restart fula service
-            logging.info("Restarting fula service after removing config with syntax error.")
-            safe_restart_fula(capture_output=True, check=True)
-            time.sleep(30)
-            return True
-
-        # Config appears valid but error was still detected - try restart anyway
+            else:
+                # No valid backup, delete corrupted config
+                logging.warning(f"No valid backup available. Deleting config with syntax error: {config_yaml_path}")
+                subprocess.run(["sudo", "rm", "-f", config_yaml_path], capture_output=True, check=True)
+                logging.info(f"Deleted config.yaml with syntax error: {config_yaml_path}")
+                logging.info("Restarting fula service after removing config with syntax error.")
+            return remediate_with_stack_restart("config-yaml:syntax", matched_pattern,
+                                                "check_and_fix_config_yaml")
+
+        # Config appears valid but error was still detected - try restart anyway.
+        # The pattern may be left over from before the last restart, so each
+        # one backs off on its own signature.
         logging.info("Config appears valid but error was detected. Restarting fula service.")
-        safe_restart_fula(capture_output=True, check=True)
-        time.sleep(30)
-        return True
+        return remediate_with_stack_restart(pattern_signature("config-yaml", matched_pattern),
+                                            matched_pattern, "check_and_fix_config_yaml")
 
     except subprocess.CalledProcessError as e:
         logging.error(f"Error during config.yaml fix: {str(e)}")
@@ -3442,6 +6619,7 @@ ENV_FILE_DEFAULT = {
 }
 
 
+@instrumented
 def check_and_repair_dpkg():
     """Repair broken dpkg state if pending configurations exist."""
     try:
@@ -3463,6 +6641,7 @@ def check_and_repair_dpkg():
     return False
 
 
+@instrumented
 def check_and_fix_env_file():
     """Check /usr/bin/fula/.env for corruption (null bytes, binary garbage) and repair.
 
@@ -3478,9 +6657,11 @@ def check_and_fix_env_file():
     Repair:
       - Attempt to salvage the existing tag (release, test*, etc.) from readable lines
       - Rewrite the file with correct KEY=VALUE content using the salvaged or default tag
+      - Restart fula.service, unless that restart is backing off for this kind
+        of corruption (the file is rewritten either way)
 
     Returns:
-        bool: True if corruption was detected and fixed, False otherwise
+        bool: True if corruption was fixed and fula.service restarted, False otherwise
     """
     try:
         if not os.path.exists(ENV_FILE_PATH):
@@ -3488,9 +6669,7 @@ def check_and_fix_env_file():
             # Regenerate with default tag
             _write_env_file("release")
             logging.info(f"Regenerated missing .env with tag 'release'")
-            safe_restart_fula(capture_output=True, timeout=120)
-            time.sleep(30)
-            return True
+            return remediate_with_stack_restart("env-file:missing", ".env missing", "check_and_fix_env_file")
 
         # Read raw bytes to detect binary corruption
         with open(ENV_FILE_PATH, 'rb') as f:
@@ -3503,9 +6682,7 @@ def check_and_fix_env_file():
             tag = _salvage_env_tag(raw)
             _write_env_file(tag)
             logging.info(f"Rewrote .env with tag '{tag}' after null-byte corruption")
-            safe_restart_fula(capture_output=True, timeout=120)
-            time.sleep(30)
-            return True
+            return remediate_with_stack_restart("env-file:null-bytes", ".env null bytes", "check_and_fix_env_file")
 
         # Check 2: non-text bytes (binary garbage that isn't null)
         try:
@@ -3515,9 +6692,7 @@ def check_and_fix_env_file():
             tag = _salvage_env_tag(raw)
             _write_env_file(tag)
             logging.info(f"Rewrote .env with tag '{tag}' after encoding corruption")
-            safe_restart_fula(capture_output=True, timeout=120)
-            time.sleep(30)
-            return True
+            return remediate_with_stack_restart("env-file:encoding", ".env encoding", "check_and_fix_env_file")
 
         # Check 3: validate every non-empty, non-comment line is KEY=VALUE
         is_valid = True
@@ -3534,9 +6709,7 @@ def check_and_fix_env_file():
             tag = _salvage_env_tag(raw)
             _write_env_file(tag)
             logging.info(f"Rewrote .env with tag '{tag}' after format corruption")
-            safe_restart_fula(capture_output=True, timeout=120)
-            time.sleep(30)
-            return True
+            return remediate_with_stack_restart("env-file:format", ".env format", "check_and_fix_env_file")
 
         # Check 4: ensure minimum required keys exist
         required_keys = {"GO_FULA", "FX_SUPPROT"}
@@ -3553,9 +6726,7 @@ def check_and_fix_env_file():
             tag = _salvage_env_tag(raw)
             _write_env_file(tag)
             logging.info(f"Rewrote .env with tag '{tag}' after missing keys")
-            safe_restart_fula(capture_output=True, timeout=120)
-            time.sleep(30)
-            return True
+            return remediate_with_stack_restart("env-file:missing-keys", ".env missing keys", "check_and_fix_env_file")
 
         return False
 
@@ -3620,12 +6791,20 @@ def _write_env_file(tag):
         logging.info(f"Wrote .env file via sudo: {ENV_FILE_PATH}")
 
 
+def _internet_reachable(timeout=5):
+    """Race the HTTPS targets and the public resolvers; first answer wins."""
+    return race_reachability(
+        [("https", url) for url in REACHABILITY_HTTPS_TARGETS]
+        + [("icmp", dns) for dns in FULA_DNS_LIST], timeout)
+
+
+@instrumented
 def check_internet_connection():
-    try:
-        requests.head("https://www.google.com", timeout=5)
-        logging.info("Internet connection is available.")
+    winner = _internet_reachable()
+    if winner:
+        logging.info(f"Internet connection is available (via {winner[1]}).")
         return True
-    except requests.RequestException:
+    else:
         logging.error("No internet connection available. Checking NetworkManager status...")
         try:
             result = subprocess.run(
@@ -3641,12 +6820,10 @@ def check_internet_connection():
                 )
                 time.sleep(10)
                 # Retry internet check after restarting NetworkManager
-                try:
-                    requests.head("https://www.google.com", timeout=5)
+                if _internet_reachable():
                     logging.info("Internet connection restored after restarting NetworkManager.")
                     return True
-                except requests.RequestException:
-                    logging.error("Internet still unavailable after restarting NetworkManager.")
+                logging.error("Internet still unavailable after restarting NetworkManager.")
             else:
                 logging.info("NetworkManager is active, internet issue is not due to NetworkManager.")
         except Exception as e:
@@ -3681,20 +6858,17 @@ def format_drive(drive):
         logging.error(f'Error during formatting the drive {drive}: {e}')
         return False
 
+@instrumented
 def check_external_drive():
     logging.info("Checking external drives for correct formatting")
     try:
-        blkid_output = subprocess.check_output(["sudo", "blkid"], universal_newlines=True)
-        drives = [line.split(':') for line in blkid_output.splitlines() if line.startswith('/dev/sd') or line.startswith('/dev/nvme')]
-        
-        for drive_info in drives:
-            drive = drive_info[0]
-            fstype = next((item.split('=')[1].strip('"') for item in drive_info[1].split() if item.startswith('TYPE=')), None)
-            
-            # Check the disk size
-            size_output = subprocess.check_output(["sudo", "lsblk", "-b", "-n", "-o", "SIZE", drive], universal_newlines=True)
-            disk_size = int(size_output.split()[0])  # Size in bytes
-            disk_size_gb = disk_size / (1024 ** 3)  # Convert to GB
+        drives = [dev for name, dev in get_block_inventory().items()
+                  if name.startswith(('sd', 'nvme')) and dev["fstype"]]
+
+        for dev in drives:
+            drive = f"/dev/{dev['name']}"
+            fstype = dev["fstype"]
+            disk_size_gb = dev["size_bytes"] / (1024 ** 3)  # Convert to GB
 
             if fstype and (fstype.lower() != 'ext4') and (disk_size_gb > 500):
                 logging.warning(f"Drive {drive} is formatted as {fstype} and is larger than 500GB. Attempting to fix.")
@@ -3726,6 +6900,7 @@ def check_external_drive():
 
                 # Format the drive as ext4
                 format_drive(drive)
+                invalidate_block_inventory()
 
                 return True
 
@@ -3842,6 +7017,7 @@ def activate_wireguard_support():
         _append_event("wg-activate", {"result": "exception", "error": "{}: {}".format(type(e).__name__, str(e)[:100])})
 
 
+@instrumented
 def check_wireguard_health():
     """Verify WireGuard installation integrity when system is healthy."""
     try:
@@ -3868,19 +7044,294 @@ def check_wireguard_health():
         logging.error(f"Error checking WireGuard health: {e}")
 
 
+# --- Container cgroup telemetry ------------------------------------------------
+# check_container_oom() only sees memory trouble as OOMKilled, after the kill.
+# This sampler reads each fula container's cgroup v2 files every
+# CONTAINER_SAMPLE_INTERVAL_SEC into a short ring (CONTAINER_WINDOW_SEC) and
+# publishes memory (current/anon/peak and the high/max limits), memory PSI,
+# memory.events counters and CPU / I/O rates over the window as "resources"
+# on each /run/fula-containers.state entry. Early warnings go to events.jsonl
+# while there is still time to act:
+#   container_memory_pressure  memory.pressure some avg60 >= CONTAINER_PSI_WARN_PCT
+#   container_memory_events    memory.events high/max/oom_kill counters climbed
+# Cgroup directories are found from one `docker ps --no-trunc` (name -> id),
+# refreshed at most every _CONTAINER_ID_REFRESH_SEC when a lookup misses.
+CONTAINER_NAMES = ("fula_go", "ipfs_host", "ipfs_cluster", "fula_fxsupport",
+                   "fula_updater", "fula_pinning", "fula_gateway", "ipfs_local",
+                   "blox-ai")
+CONTAINER_SAMPLE_INTERVAL_SEC = int(os.environ.get("CONTAINER_SAMPLE_INTERVAL_SEC", "15"))
+CONTAINER_WINDOW_SEC = int(os.environ.get("CONTAINER_WINDOW_SEC", "300"))
+CONTAINER_PSI_WARN_PCT = float(os.environ.get("CONTAINER_PSI_WARN_PCT", "10"))
+# Per container and category, so a container stuck at its limit logs one
+# warning per cooldown rather than one per sample.
+CONTAINER_WARN_COOLDOWN_SEC = 600
+_CONTAINER_ID_REFRESH_SEC = 60
+_SYS_FS_CGROUP = "/sys/fs/cgroup"
+_container_lock = threading.Lock()
+_container_ids = {}               # container name -> full id, for cgroup lookup
+_container_ids_refreshed = 0.0
+_container_samples = {}           # name -> deque of sample dicts
+_container_warned = {}            # (name, category) -> ts of last warning
+_container_inspect = None         # last check_container_oom() entries
+
+
+def _refresh_container_ids(now=None):
+    global _container_ids, _container_ids_refreshed
+    _container_ids_refreshed = time.time() if now is None else now
+    try:
+        res = subprocess.run(["sudo", "docker", "ps", "--no-trunc", "--format", "{{.Names}} {{.ID}}"],
+                             capture_output=True, text=True, timeout=10)
+    except (_SubprocessTimeoutExpired, OSError) as e:
+        logging.debug(f"docker ps for cgroup lookup failed: {e}")
+        return
+    if res.returncode != 0:
+        return
+    ids = {}
+    for line in (res.stdout or "").splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            ids[parts[0]] = parts[1]
+    _container_ids = ids
+
+
+def _container_scope(cid):
+    if not cid:
+        return None
+    # systemd cgroup driver first (Debian/Armbian default), then cgroupfs.
+    for path in (os.path.join(_SYS_FS_CGROUP, "system.slice", f"docker-{cid}.scope"),
+                 os.path.join(_SYS_FS_CGROUP, "docker", cid)):
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def _container_cgroup_dir(name, now=None):
+    """cgroup v2 directory of a running container, or None."""
+    path = _container_scope(_container_ids.get(name))
+    if path is None:
+        now = time.time() if now is None else now
+        if now - _container_ids_refreshed >= _CONTAINER_ID_REFRESH_SEC:
+            _refresh_container_ids(now)
+            path = _container_scope(_container_ids.get(name))
+    return path
+
+
+def _read_cgroup_flat(path):
+    """"key value" lines (cpu.stat, memory.stat, memory.events) -> {key: int}."""
+    out = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1].isdigit():
+                    out[parts[0]] = int(parts[1])
+    except OSError:
+        pass
+    return out
+
+
+def _read_cgroup_psi(path):
+    """memory.pressure -> {"some": {"avg10": .., "avg60": .., "avg300": .., "total": ..}, "full": {...}}."""
+    out = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if not parts or parts[0] not in ("some", "full"):
+                    continue
+                fields = {}
+                for item in parts[1:]:
+                    key, _sep, value = item.partition("=")
+                    try:
+                        fields[key] = int(value) if key == "total" else float(value)
+                    except ValueError:
+                        pass
+                out[parts[0]] = fields
+    except OSError:
+        pass
+    return out
+
+
+def _read_cgroup_io(path):
+    """io.stat summed over devices -> {rbytes, wbytes, rios, wios}."""
+    out = {"rbytes": 0, "wbytes": 0, "rios": 0, "wios": 0}
+    try:
+        with open(path) as f:
+            for line in f:
+                for item in line.split()[1:]:
+                    key, _sep, value = item.partition("=")
+                    if key in out and value.isdigit():
+                        out[key] += int(value)
+    except OSError:
+        pass
+    return out
+
+
+def _read_cgroup_int(path):
+    """Single-value cgroup file; "max" (no limit) and errors are None."""
+    value = _read_first_line(path)
+    return int(value) if value and value.isdigit() else None
+
+
+def _sample_cgroup(path, now):
+    memory_stat = _read_cgroup_flat(os.path.join(path, "memory.stat"))
+    cpu = _read_cgroup_flat(os.path.join(path, "cpu.stat"))
+    sample = {
+        "ts": now,
+        "path": path,
+        "memory_bytes": _read_cgroup_int(os.path.join(path, "memory.current")),
+        "anon_bytes": memory_stat.get("anon"),
+        "peak_bytes": _read_cgroup_int(os.path.join(path, "memory.peak")),
+        "memory_high_bytes": _read_cgroup_int(os.path.join(path, "memory.high")),
+        "memory_max_bytes": _read_cgroup_int(os.path.join(path, "memory.max")),
+        "events": _read_cgroup_flat(os.path.join(path, "memory.events")),
+        "psi": _read_cgroup_psi(os.path.join(path, "memory.pressure")),
+        "cpu_usec": cpu.get("usage_usec"),
+        "throttled_usec": cpu.get("throttled_usec"),
+    }
+    sample.update(_read_cgroup_io(os.path.join(path, "io.stat")))
+    return sample
+
+
+def _container_warn(name, category, now, detail):
+    key = (name, category)
+    if now - _container_warned.get(key, 0) < CONTAINER_WARN_COOLDOWN_SEC:
+        return
+    _container_warned[key] = now
+    logging.warning(f"{category}: {name} {detail}")
+    _append_event(category, dict(detail, name=name))
+
+
+def _check_container_warnings(name, ring, now):
+    latest = ring[-1]
+    some60 = (latest["psi"].get("some") or {}).get("avg60")
+    if some60 is not None and some60 >= CONTAINER_PSI_WARN_PCT:
+        _container_warn(name, "container_memory_pressure", now, {
+            "some_avg60": some60,
+            "full_avg60": (latest["psi"].get("full") or {}).get("avg60"),
+            "memory_bytes": latest["memory_bytes"],
+            "memory_max_bytes": latest["memory_max_bytes"],
+        })
+    if len(ring) >= 2:
+        prev = ring[-2]["events"]
+        climbed = {k: latest["events"].get(k, 0) - prev.get(k, 0) for k in ("high", "max", "oom_kill")}
+        climbed = {k: v for k, v in climbed.items() if v > 0}
+        if climbed:
+            _container_warn(name, "container_memory_events", now, {
+                "climbed": climbed,
+                "memory_bytes": latest["memory_bytes"],
+                "memory_high_bytes": latest["memory_high_bytes"],
+                "memory_max_bytes": latest["memory_max_bytes"],
+            })
+
+
+@instrumented
+def sample_containers(now=None):
+    """Take one cgroup sample per running fula container into the rings."""
+    if now is None:
+        now = time.time()
+    maxlen = max(2, CONTAINER_WINDOW_SEC // CONTAINER_SAMPLE_INTERVAL_SEC + 1)
+    for name in CONTAINER_NAMES:
+        path = _container_cgroup_dir(name, now)
+        with _container_lock:
+            if path is None:
+                _container_samples.pop(name, None)
+                continue
+            sample = _sample_cgroup(path, now)
+            ring = _container_samples.get(name)
+            # A recreated container has a new cgroup and fresh counters.
+            if ring is None or ring[-1]["path"] != path:
+                ring = _container_samples[name] = deque(maxlen=maxlen)
+            ring.append(sample)
+        _check_container_warnings(name, ring, now)
+
+
+def container_resources(name):
+    """Latest memory/PSI figures plus CPU and I/O rates over the ring, or
+    None if the container hasn't been sampled."""
+    with _container_lock:
+        ring = list(_container_samples.get(name) or ())
+    if not ring:
+        return None
+    first, last = ring[0], ring[-1]
+    some = last["psi"].get("some") or {}
+    full = last["psi"].get("full") or {}
+    out = {
+        "memory_bytes": last["memory_bytes"],
+        "anon_bytes": last["anon_bytes"],
+        "peak_bytes": last["peak_bytes"],
+        "memory_high_bytes": last["memory_high_bytes"],
+        "memory_max_bytes": last["memory_max_bytes"],
+        "memory_events": {k: last["events"].get(k, 0) for k in ("low", "high", "max", "oom", "oom_kill")},
+        "memory_pressure": {"some_avg10": some.get("avg10"), "some_avg60": some.get("avg60"),
+                            "full_avg60": full.get("avg60")},
+        "samples": len(ring),
+        "window_s": int(last["ts"] - first["ts"]),
+    }
+    span = last["ts"] - first["ts"]
+    if span > 0:
+        def rate(key):
+            if first[key] is None or last[key] is None:
+                return None
+            return max(0, last[key] - first[key]) / span
+
+        cpu = rate("cpu_usec")
+        throttled = rate("throttled_usec")
+        out["cpu_cores"] = round(cpu / 1e6, 3) if cpu is not None else None
+        out["cpu_throttled_pct"] = round(100.0 * throttled / 1e6, 1) if throttled is not None else None
+        out["read_bps"] = int(rate("rbytes"))
+        out["write_bps"] = int(rate("wbytes"))
+        out["read_iops"] = round(rate("rios"), 1)
+        out["write_iops"] = round(rate("wios"), 1)
+        out["memory_events_window"] = {
+            k: max(0, last["events"].get(k, 0) - first["events"].get(k, 0)) for k in ("high", "max", "oom_kill")
+        }
+    if out["peak_bytes"] is None:
+        # memory.peak is 5.19+; fall back to the window's high-water mark.
+        seen = [s["memory_bytes"] for s in ring if s["memory_bytes"] is not None]
+        out["peak_bytes"] = max(seen) if seen else None
+    return {k: v for k, v in out.items() if v is not None}
+
+
+def _write_containers_state():
+    """check_container_oom()'s entries with each container's resources."""
+    with _container_lock:
+        entries = [dict(e) for e in _container_inspect or ()]
+    for entry in entries:
+        resources = container_resources(entry["name"])
+        if resources:
+            entry["resources"] = resources
+    _atomic_write_state(CONTAINERS_STATE_PATH, {"containers": entries})
+
+
+def _sample_containers_and_publish():
+    sample_containers()
+    # Republish between check_container_oom() runs so the rates stay
+    # current; wait for its first inspect pass.
+    if _container_inspect is not None:
+        _write_containers_state()
+    maybe_apply_memory_policy()
+
+
+def start_container_sampler():
+    """Start the background container cgroup sampler. Idempotent."""
+    _start_periodic("container-sampler", _sample_containers_and_publish, CONTAINER_SAMPLE_INTERVAL_SEC)
+
+
+@instrumented
 def check_container_oom():
     """Phase 13 Layer 1.5 — write /run/fula-containers.state matching Phase 9
     diag_responses.containers schema. On OOMKilled=true append a
     container_oom event for forensic record.
 
     Schema (from Phase 9):
-      {containers: [{name, state, oom_killed, restart_count, image, started_at}]}
+      {containers: [{name, state, oom_killed, restart_count, image, started_at,
+                     resources?}]}
+    resources comes from the cgroup sampler (container_resources()).
     """
-    candidates = ["fula_go", "ipfs_host", "ipfs_cluster", "fula_fxsupport",
-                  "fula_updater", "fula_pinning", "fula_gateway", "ipfs_local",
-                  "blox-ai"]
+    global _container_inspect
     out = []
-    for name in candidates:
+    for name in CONTAINER_NAMES:
         try:
             res = subprocess.run(
                 ["sudo", "docker", "inspect", "--format",
@@ -3923,7 +7374,229 @@ def check_container_oom():
                 _append_event("container_oom", {"name": name, "restart_count": restart_count_int, "image": image})
             except Exception:
                 pass
-    _atomic_write_state(CONTAINERS_STATE_PATH, {"containers": out})
+    with _container_lock:
+        _container_inspect = out
+    _write_containers_state()
+
+
+# --- Memory policy -------------------------------------------------------------
+# The core containers run without compose memory limits, so a large DAG import
+# in kubo grows until the kernel OOM killer picks something. Every
+# MEMORY_POLICY_INTERVAL_SEC this sizes memory.high per container within a
+# budget of total RAM minus a host reserve, and writes it straight to the
+# container's cgroup (docker update has no memory.high). Past memory.high the
+# kernel throttles and reclaims instead of killing, and the zram swap device
+# gives reclaim somewhere cheap to go, so kubo slows down under pressure
+# rather than dying.
+#
+# A container starts at the budget minus the other containers' peaks: enough
+# to keep it from starving the rest, nowhere near its startup footprint. Only
+# after MEMORY_OBSERVE_SEC of observation is it tightened to its measured peak
+# (memory.peak via the container sampler, kept across restarts for the life
+# of the watchdog) times MEMORY_HIGH_HEADROOM. A throttled container can't
+# show a higher peak, so when its memory.events "high" counter climbs the
+# container sampler re-runs the policy at once, memory.high goes back to the
+# budget-derived ceiling and the observation window starts over.
+# memory.max is deliberately left at "max": a hard cap would OOM-kill the next
+# import that outgrows it long before a retune could react. Each applied
+# change is a "memory-policy" event; creating zram is a "zram" event.
+#
+# Containers whose memory.max was set by compose (blox-ai: 4g with swap off on
+# purpose) are left alone. memory.high is never set below current usage, and
+# only rewritten when the target moves by more than MEMORY_RETUNE_PCT.
+#
+# Gated behind MEMORY_POLICY=1 like CPU_PROFILES; unset, the targets are still
+# computed into /run/fula-memory-policy.state but nothing is written.
+_MEMORY_POLICY_ENABLED = os.environ.get("MEMORY_POLICY", "") == "1"
+MEMORY_POLICY_INTERVAL_SEC = int(os.environ.get("MEMORY_POLICY_INTERVAL_SEC", "300"))
+MEMORY_POLICY_CONTAINERS = ("fula_go", "ipfs_host", "ipfs_cluster", "fula_pinning",
+                            "fula_gateway", "ipfs_local", "blox-ai")
+MEMORY_HOST_RESERVE_PCT = 15
+MEMORY_HOST_RESERVE_MIN_BYTES = 512 << 20
+MEMORY_HIGH_HEADROOM = 1.3        # memory.high = peak * headroom, once observed
+MEMORY_OBSERVE_SEC = int(os.environ.get("MEMORY_OBSERVE_SEC", "86400"))
+MEMORY_MIN_HIGH_BYTES = 128 << 20
+MEMORY_RETUNE_PCT = 10
+ZRAM_SIZE_PCT = int(os.environ.get("ZRAM_SIZE_PCT", "50"))
+ZRAM_ALGORITHM = os.environ.get("ZRAM_ALGORITHM", "zstd")
+ZRAM_SWAP_PRIORITY = 100
+_PROC_MEMINFO = "/proc/meminfo"
+_PROC_SWAPS = "/proc/swaps"
+_memory_peaks = {}                # name -> highest peak_bytes seen
+_memory_applied = {}              # name -> memory.high we wrote
+_memory_observed_since = {}       # name -> start of the current observation window
+_memory_high_events = {}          # name -> memory.events "high" count last seen
+_memory_policy_last = 0.0
+_zram_attempted = False
+
+
+def _mem_total_bytes():
+    try:
+        with open(_PROC_MEMINFO) as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def _mib_floor(n):
+    return int(n) >> 20 << 20
+
+
+def compute_memory_limits(peaks, total_bytes, settled=()):
+    """{name: peak} + total RAM -> ({name: {memory_high_bytes}}, budget).
+    Every container is capped at the budget minus the other containers'
+    peaks. Those in settled (observed for MEMORY_OBSERVE_SEC) are tightened
+    to peak * MEMORY_HIGH_HEADROOM, scaled down together if that doesn't fit
+    the budget."""
+    budget = total_bytes - max(total_bytes * MEMORY_HOST_RESERVE_PCT // 100, MEMORY_HOST_RESERVE_MIN_BYTES)
+    total_peak = sum(peaks.values())
+    ceilings = {n: max(MEMORY_MIN_HIGH_BYTES, budget - (total_peak - p)) for n, p in peaks.items()}
+    highs = {n: max(MEMORY_MIN_HIGH_BYTES, p * MEMORY_HIGH_HEADROOM) for n, p in peaks.items() if n in settled}
+    total_high = sum(highs.values())
+    if total_high > budget > 0:
+        highs = {n: max(MEMORY_MIN_HIGH_BYTES, h * budget / total_high) for n, h in highs.items()}
+    limits = {n: {"memory_high_bytes": _mib_floor(min(highs.get(n, c), c))} for n, c in ceilings.items()}
+    return limits, budget
+
+
+def _needs_retune(current, target):
+    return current is None or abs(current - target) * 100 > target * MEMORY_RETUNE_PCT
+
+
+def _read_swaps():
+    """[(device, size_bytes)] from /proc/swaps."""
+    out = []
+    try:
+        with open(_PROC_SWAPS) as f:
+            for line in f.readlines()[1:]:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2].isdigit():
+                    out.append((parts[0], int(parts[2]) * 1024))
+    except OSError:
+        pass
+    return out
+
+
+def ensure_zram_swap(total_bytes):
+    """Make sure a zram swap device is active, sized to ZRAM_SIZE_PCT of RAM.
+    An existing one (e.g. Armbian's zram-config) is left as is. Returns
+    {device, size_bytes, created} or None."""
+    global _zram_attempted
+    for device, size in _read_swaps():
+        if "/zram" in device:
+            return {"device": device, "size_bytes": size, "created": False}
+    if not _MEMORY_POLICY_ENABLED or _zram_attempted:
+        return None
+    # One attempt per watchdog run: a kernel without zram won't grow it.
+    _zram_attempted = True
+    size = _mib_floor(total_bytes * ZRAM_SIZE_PCT // 100)
+    try:
+        subprocess.run(["sudo", "modprobe", "zram"], capture_output=True, timeout=20)
+        res = subprocess.run(["sudo", "zramctl", "--find", "--size", str(size), "--algorithm", ZRAM_ALGORITHM],
+                             capture_output=True, text=True, timeout=20)
+        device = (res.stdout or "").strip()
+        if res.returncode != 0 or not device.startswith("/dev/zram"):
+            logging.warning(f"zram: zramctl failed: {(res.stderr or '').strip()}")
+            return None
+        for cmd in (["sudo", "mkswap", device], ["sudo", "swapon", "-p", str(ZRAM_SWAP_PRIORITY), device]):
+            res = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            if res.returncode != 0:
+                logging.warning(f"zram: {' '.join(cmd[1:])} failed: {(res.stderr or '').strip()}")
+                return None
+    except (_SubprocessTimeoutExpired, OSError) as e:
+        logging.warning(f"zram: setup failed: {e}")
+        return None
+    logging.info(f"zram: {device} active as swap ({size >> 20} MiB, {ZRAM_ALGORITHM})")
+    _append_event("zram", {"device": device, "size_bytes": size, "algorithm": ZRAM_ALGORITHM})
+    return {"device": device, "size_bytes": size, "created": True}
+
+
+def _memory_high_count(res):
+    return ((res or {}).get("memory_events") or {}).get("high", 0)
+
+
+def _memory_throttled(name, res):
+    """True if name's memory.events "high" counter climbed since the policy
+    last looked. A recreated container's counter restarts from zero."""
+    last = _memory_high_events.get(name)
+    return last is not None and _memory_high_count(res) > last
+
+
+@instrumented
+def apply_memory_policy(now=None):
+    """Compute per-container memory targets and, when enabled, write them.
+    Writes /run/fula-memory-policy.state either way."""
+    now = time.time() if now is None else now
+    total = _mem_total_bytes()
+    if not total:
+        return
+    current = {}
+    throttled = set()
+    for name in MEMORY_POLICY_CONTAINERS:
+        res = container_resources(name)
+        if res and res.get("peak_bytes"):
+            current[name] = res
+            _memory_peaks[name] = max(_memory_peaks.get(name, 0), res["peak_bytes"])
+            _memory_observed_since.setdefault(name, now)
+            if _memory_throttled(name, res):
+                # The peak was held down by memory.high; start observing again.
+                throttled.add(name)
+                _memory_observed_since[name] = now
+            _memory_high_events[name] = _memory_high_count(res)
+    settled = {n for n in current if now - _memory_observed_since[n] >= MEMORY_OBSERVE_SEC}
+    limits, budget = compute_memory_limits({n: _memory_peaks[n] for n in current}, total, settled)
+    rows = {}
+    for name, target in limits.items():
+        res = current[name]
+        usage = res.get("memory_bytes") or 0
+        # Never set memory.high under what the container already uses.
+        target["memory_high_bytes"] = max(target["memory_high_bytes"], _mib_floor(usage) + (1 << 20))
+        cur_high, cur_max = res.get("memory_high_bytes"), res.get("memory_max_bytes")
+        row = {"peak_bytes": _memory_peaks[name], "memory_bytes": usage,
+               "basis": "peak" if name in settled else "budget",
+               "target": target, "current": {"memory_high_bytes": cur_high, "memory_max_bytes": cur_max}}
+        if name in throttled:
+            row["throttled"] = True
+        rows[name] = row
+        if cur_max is not None:
+            row["skipped"] = "memory.max set outside the policy"
+            continue
+        if not _MEMORY_POLICY_ENABLED:
+            continue
+        changed = {}
+        path = _container_cgroup_dir(name)
+        high = target["memory_high_bytes"]
+        if path and _needs_retune(cur_high, high) and _write_sysfs(os.path.join(path, "memory.high"), high):
+            changed["memory_high_bytes"] = {"from": cur_high, "to": high}
+        if changed:
+            _memory_applied[name] = high
+            logging.info(f"memory policy: {name} {changed}")
+            _append_event("memory-policy", {"name": name, "peak_bytes": _memory_peaks[name],
+                                            "budget_bytes": budget, "basis": row["basis"],
+                                            "throttled": name in throttled, "changed": changed})
+    _atomic_write_state(MEMORY_POLICY_STATE_PATH, {
+        "enabled": _MEMORY_POLICY_ENABLED,
+        "total_bytes": total,
+        "budget_bytes": budget,
+        "zram": ensure_zram_swap(total),
+        "containers": rows,
+    })
+
+
+def maybe_apply_memory_policy(now=None):
+    """Called every container sample: runs the policy every
+    MEMORY_POLICY_INTERVAL_SEC, or at once if a container whose memory.high
+    we set is being throttled."""
+    global _memory_policy_last
+    now = time.time() if now is None else now
+    if now - _memory_policy_last < MEMORY_POLICY_INTERVAL_SEC and not any(
+            _memory_throttled(n, container_resources(n)) for n in _memory_applied):
+        return
+    _memory_policy_last = now
+    apply_memory_policy(now)
 
 
 def _read_first_line(path):
@@ -3943,6 +7616,7 @@ def _glob_paths(pattern):
     return _g.glob(pattern)
 
 
+@instrumented
 def check_power_health():
     """Phase 13 Layer 1.6 — sysfs + dmesg + uptime → /run/fula-power.state.
 
@@ -4035,9 +7709,491 @@ def check_power_health():
         # If we can't read /proc/uptime, write 0 — never omit the required field.
         state["uptime_s"] = 0
 
+    # The power sampler (start_power_sampler) adds its rolling window
+    # aggregates to the same file.
+    with _power_lock:
+        _power_snapshot.clear()
+        _power_snapshot.update(state)
+    _write_power_state()
+
+
+# --- Power/thermal sampler -----------------------------------------------------
+# check_power_health() sees one temperature and one rail voltage per ~450s
+# cycle, which misses short thermal spikes and brownouts in between. This
+# sampler reads the thermal zones, the SoC regulator and each cpufreq policy
+# every POWER_SAMPLE_INTERVAL_SEC into fixed-size rings (POWER_WINDOW_SEC of
+# history) and folds min/p50/p95/max, time past threshold and CPU frequency
+# cap residency into /run/fula-power.state every POWER_PUBLISH_INTERVAL_SEC.
+# The sysfs files are opened once and re-read with seek(0), so a sample is a
+# handful of pread()s.
+POWER_SAMPLE_INTERVAL_SEC = int(os.environ.get("POWER_SAMPLE_INTERVAL_SEC", "2"))
+POWER_WINDOW_SEC = int(os.environ.get("POWER_WINDOW_SEC", "900"))
+POWER_PUBLISH_INTERVAL_SEC = 30
+# Matches the runbook's thermal-throttling (max_temp_c > 80) and SoC rail
+# (soc_voltage_ratio < 0.9) triage thresholds.
+POWER_THERMAL_THRESHOLD_C = float(os.environ.get("POWER_THERMAL_THRESHOLD_C", "80"))
+POWER_VOLTAGE_RATIO_THRESHOLD = 0.9
+_SYS_THERMAL_GLOB = "/sys/class/thermal/thermal_zone*/temp"
+_SYS_REGULATOR_GLOB = "/sys/class/regulator/regulator.*"
+_SYS_CPUFREQ_GLOB = "/sys/devices/system/cpu/cpufreq/policy*"
+_power_lock = threading.Lock()
+_power_sources = None     # {"thermal": [...], "regulator": (uv, min_uv) | None, "cpufreq": [...]}
+_power_files = {}         # sysfs path -> open file, re-read with seek(0)
+_power_temps = deque(maxlen=max(1, POWER_WINDOW_SEC // POWER_SAMPLE_INTERVAL_SEC))
+_power_ratios = deque(maxlen=max(1, POWER_WINDOW_SEC // POWER_SAMPLE_INTERVAL_SEC))
+_power_caps = {}          # policy -> deque of (ts, capped bool)
+_power_tis = {}           # policy -> deque of (ts, {khz: 10ms ticks})
+_power_snapshot = {}      # last check_power_health() fields
+_power_last_publish = 0.0
+
+
+def _read_sysfs_text(path):
+    """Re-read a sysfs attribute through a cached open file. None on error
+    (the handle is dropped and reopened next time)."""
+    f = _power_files.get(path)
+    try:
+        if f is None:
+            f = open(path, "r")
+            _power_files[path] = f
+        f.seek(0)
+        return f.read()
+    except OSError:
+        if f is not None:
+            try:
+                f.close()
+            except OSError:
+                pass
+        _power_files.pop(path, None)
+        return None
+
+
+def _read_sysfs_int(path):
+    text = _read_sysfs_text(path)
+    try:
+        return int(text.split()[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _discover_power_sources():
+    regulator = None
+    # Same rail check_power_health() reports: the first regulator exposing
+    # both microvolts and min_microvolts.
+    for reg in sorted(_glob_paths(_SYS_REGULATOR_GLOB)):
+        if _read_first_line(reg + "/microvolts") and _read_first_line(reg + "/min_microvolts"):
+            regulator = (reg + "/microvolts", reg + "/min_microvolts")
+            break
+    return {
+        "thermal": sorted(_glob_paths(_SYS_THERMAL_GLOB)),
+        "regulator": regulator,
+        "cpufreq": sorted(_glob_paths(_SYS_CPUFREQ_GLOB)),
+    }
+
+
+def _parse_time_in_state(text):
+    out = {}
+    for line in (text or "").splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+            out[int(parts[0])] = int(parts[1])
+    return out
+
+
+@instrumented
+def sample_power(now=None):
+    """Take one power/thermal sample into the rings."""
+    global _power_sources
+    if now is None:
+        now = time.time()
+    with _power_lock:
+        if _power_sources is None:
+            _power_sources = _discover_power_sources()
+        temps = [v for v in (_read_sysfs_int(p) for p in _power_sources["thermal"]) if v is not None]
+        if temps:
+            _power_temps.append((now, max(temps) / 1000.0))
+        if _power_sources["regulator"]:
+            uv, min_uv = (_read_sysfs_int(p) for p in _power_sources["regulator"])
+            if uv is not None and min_uv:
+                _power_ratios.append((now, uv / min_uv))
+        for policy in _power_sources["cpufreq"]:
+            name = os.path.basename(policy)
+            cap = _read_sysfs_int(policy + "/scaling_max_freq")
+            hw_max = _read_sysfs_int(policy + "/cpuinfo_max_freq")
+            if cap is not None and hw_max:
+                _power_caps.setdefault(name, deque(maxlen=_power_temps.maxlen)).append(
+                    (now, cap < hw_max))
+            tis = _parse_time_in_state(_read_sysfs_text(policy + "/stats/time_in_state"))
+            if tis:
+                _power_tis.setdefault(name, deque(maxlen=_power_temps.maxlen)).append((now, tis))
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already-sorted list."""
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def _window_stats(samples, threshold, above, ndigits):
+    """min/p50/p95/max plus seconds spent past threshold (above=True: v >
+    threshold, else v < threshold) for a ring of (ts, value)."""
+    values = sorted(v for _ts, v in samples)
+    past = sum(1 for _ts, v in samples if (v > threshold if above else v < threshold))
+    return {
+        "samples": len(values),
+        "min": round(values[0], ndigits),
+        "p50": round(_percentile(values, 50), ndigits),
+        "p95": round(_percentile(values, 95), ndigits),
+        "max": round(values[-1], ndigits),
+        "threshold": threshold,
+        "past_threshold_s": past * POWER_SAMPLE_INTERVAL_SEC,
+    }
+
+
+def power_summary():
+    """Window aggregates for /run/fula-power.state; {} before the first sample."""
+    out = {}
+    with _power_lock:
+        if _power_temps:
+            out["thermal"] = _window_stats(_power_temps, POWER_THERMAL_THRESHOLD_C, True, 1)
+        if _power_ratios:
+            out["soc_voltage"] = _window_stats(_power_ratios, POWER_VOLTAGE_RATIO_THRESHOLD, False, 3)
+        throttle = {}
+        for name, caps in _power_caps.items():
+            entry = {"capped_pct": round(100.0 * sum(1 for _ts, c in caps if c) / len(caps), 1)}
+            tis = _power_tis.get(name)
+            if tis and len(tis) >= 2:
+                first, last = tis[0][1], tis[-1][1]
+                delta = {khz: last[khz] - first.get(khz, 0) for khz in last}
+                total = sum(d for d in delta.values() if d > 0)
+                if total > 0:
+                    top = max(delta)
+                    entry["below_max_pct"] = round(
+                        100.0 * sum(d for khz, d in delta.items() if khz < top and d > 0) / total, 1)
+            throttle[name] = entry
+        if throttle:
+            out["cpu_throttle"] = throttle
+        if out:
+            out["window_s"] = POWER_WINDOW_SEC
+            out["sample_interval_s"] = POWER_SAMPLE_INTERVAL_SEC
+    return out
+
+
+def _write_power_state():
+    """Merge check_power_health()'s snapshot with the sampler aggregates."""
+    with _power_lock:
+        state = dict(_power_snapshot)
+    state.update(power_summary())
+    state.setdefault("uptime_s", 0)
     _atomic_write_state(POWER_STATE_PATH, state)
 
 
+def _sample_power_and_publish():
+    global _power_last_publish
+    now = time.time()
+    sample_power(now)
+    if now - _power_last_publish >= POWER_PUBLISH_INTERVAL_SEC:
+        _write_power_state()
+        _power_last_publish = now
+        maybe_switch_cpu_profile(now)
+
+
+def start_power_sampler():
+    """Start the background power/thermal sampler. Idempotent."""
+    _start_periodic("power-sampler", _sample_power_and_publish, POWER_SAMPLE_INTERVAL_SEC)
+
+
+# --- CPU performance profiles --------------------------------------------------
+# kubo, ipfs-cluster, fula_go and the blox-ai model share the RK3588's cores
+# with no policy, and fix_freq_rk3588.sh is a one-shot pin. Every power publish
+# tick this picks a profile from the sampler's thermal window and blox-ai's
+# measured CPU share, then sets cpufreq governor/min/max per core class and the
+# containers' CPU shares/cpusets (docker update; docker maps --cpu-shares onto
+# cgroup v2 cpu.weight). Each switch is appended to events.jsonl as
+# "cpu-profile" with the metrics that drove it, so throughput before/after can
+# be compared.
+#
+# Gated behind CPU_PROFILES=1 like KUBO_HANG_ESCALATION: with it unset the
+# selection still runs and /run/fula-cpu-profile.state shows the recommended
+# profile, but nothing is changed.
+#
+# Core classes come from cpufreq topology: the policies with the highest
+# cpuinfo_max_freq are "big" (policy4/policy6, A76 on RK3588), the rest
+# "little" (policy0, A55). Policies left on the userspace governor were pinned
+# on purpose (fix_freq_rk3588.sh) and are not touched.
+_CPU_PROFILES_ENABLED = os.environ.get("CPU_PROFILES", "") == "1"
+# Thermal: enter thermal_limited when the window p95 is within the margin of
+# POWER_THERMAL_THRESHOLD_C (or a minute was spent past it); leave once p95 is
+# two margins below.
+CPU_PROFILE_THERMAL_MARGIN_C = 5.0
+CPU_PROFILE_THERMAL_PAST_SEC = 60
+# AI: blox-ai using this % of the whole machine (all cores) means inference is
+# running; half of it keeps the profile (hysteresis).
+CPU_PROFILE_AI_LOAD_PCT = float(os.environ.get("CPU_PROFILE_AI_LOAD_PCT", "15"))
+# Minimum time in a profile before switching again, except into
+# thermal_limited which is immediate.
+CPU_PROFILE_MIN_DWELL_SEC = int(os.environ.get("CPU_PROFILE_MIN_DWELL_SEC", "300"))
+# governor/max_pct per core class; cpuset per container is a core class or
+# absent (all cores); shares are docker --cpu-shares (1024 = default).
+_SERVING_SHARES = {"ipfs_host": 2048, "fula_gateway": 2048, "ipfs_cluster": 1024,
+                   "fula_go": 1024, "fula_pinning": 512, "blox-ai": 256}
+CPU_PROFILES = {
+    "serving": {
+        "governor": {"big": "schedutil", "little": "schedutil"},
+        "max_pct": {"big": 100, "little": 100},
+        "cpuset": {},
+        "shares": _SERVING_SHARES,
+    },
+    "ai_inference": {
+        "governor": {"big": "performance", "little": "schedutil"},
+        "max_pct": {"big": 100, "little": 100},
+        "cpuset": {"blox-ai": "big"},
+        "shares": {"blox-ai": 2048, "ipfs_host": 1024, "fula_gateway": 1024,
+                   "ipfs_cluster": 512, "fula_go": 512, "fula_pinning": 256},
+    },
+    "thermal_limited": {
+        "governor": {"big": "schedutil", "little": "schedutil"},
+        "max_pct": {"big": 70, "little": 100},
+        "cpuset": {"blox-ai": "little"},
+        "shares": _SERVING_SHARES,
+    },
+}
+_cpu_profile = None           # active profile name; None until the first switch
+_cpu_profile_since = 0.0
+_cpu_profile_ai_usage = None  # (ts, blox-ai cpu.stat usage_usec) from the last tick
+
+
+def _cpu_list(cpus):
+    """[0, 1, 2, 3, 6] -> "0-3,6" (the cpuset list format)."""
+    out = []
+    for cpu in sorted(set(cpus)):
+        if out and cpu == out[-1][1] + 1:
+            out[-1][1] = cpu
+        else:
+            out.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in out)
+
+
+def _cpu_topology():
+    """{"policies": {policy dir: "big"|"little"}, "big": cpus, "little": cpus,
+    "all": cpus}. A homogeneous SoC is all "big"."""
+    policies = {}
+    for policy in sorted(_glob_paths(_SYS_CPUFREQ_GLOB)):
+        hw_max = _read_first_line(policy + "/cpuinfo_max_freq")
+        cpus = (_read_first_line(policy + "/related_cpus") or "").split()
+        if hw_max and hw_max.isdigit() and cpus and all(c.isdigit() for c in cpus):
+            policies[policy] = (int(hw_max), [int(c) for c in cpus])
+    top = max((m for m, _cpus in policies.values()), default=0)
+    topo = {"policies": {}, "big": [], "little": [], "all": []}
+    for policy, (hw_max, cpus) in policies.items():
+        cls = "big" if hw_max == top else "little"
+        topo["policies"][policy] = cls
+        topo[cls] += cpus
+        topo["all"] += cpus
+    for key in ("big", "little", "all"):
+        topo[key] = _cpu_list(topo[key])
+    if not topo["little"]:
+        topo["little"] = topo["big"]
+    return topo
+
+
+def _write_sysfs(path, value):
+    try:
+        with open(path, "w") as f:
+            f.write(str(value))
+        return True
+    except OSError as e:
+        logging.warning(f"could not write {value} to {path}: {e}")
+        return False
+
+
+def _profile_max_freq(policy, pct):
+    """Highest available frequency at or below pct% of cpuinfo_max_freq."""
+    hw_max = int(_read_first_line(policy + "/cpuinfo_max_freq"))
+    if pct >= 100:
+        return hw_max
+    target = hw_max * pct // 100
+    avail = [int(f) for f in (_read_first_line(policy + "/scaling_available_frequencies") or "").split()
+             if f.isdigit()]
+    below = [f for f in avail if f <= target]
+    if below:
+        return max(below)
+    return min(avail) if avail else target
+
+
+def _apply_cpufreq(profile, topo):
+    """Set governor and min/max per policy; returns {policy: settings} for
+    the policies that were changed."""
+    applied = {}
+    for policy, cls in topo["policies"].items():
+        name = os.path.basename(policy)
+        if _read_first_line(policy + "/scaling_governor") == "userspace":
+            logging.info(f"cpu profile: {name} pinned on userspace governor, leaving it")
+            continue
+        governor = profile["governor"][cls]
+        available = (_read_first_line(policy + "/scaling_available_governors") or "").split()
+        settings = {}
+        if governor in available and _write_sysfs(policy + "/scaling_governor", governor):
+            settings["governor"] = governor
+        # Floor first (to the hardware minimum) so the new ceiling never
+        # lands below the current floor.
+        hw_min = _read_first_line(policy + "/cpuinfo_min_freq")
+        if hw_min and _write_sysfs(policy + "/scaling_min_freq", hw_min):
+            settings["min_khz"] = int(hw_min)
+        max_khz = _profile_max_freq(policy, profile["max_pct"][cls])
+        if _write_sysfs(policy + "/scaling_max_freq", max_khz):
+            settings["max_khz"] = max_khz
+        applied[name] = settings
+    return applied
+
+
+def _apply_container_cpu(profile, topo):
+    """docker update each container's CPU shares and cpuset; returns the
+    containers that were updated (missing ones are skipped)."""
+    applied = {}
+    for name, shares in profile["shares"].items():
+        cpus = topo[profile["cpuset"].get(name, "all")]
+        cmd = ["sudo", "docker", "update", "--cpu-shares", str(shares)]
+        if cpus:
+            cmd += ["--cpuset-cpus", cpus]
+        try:
+            res = subprocess.run(cmd + [name], capture_output=True, text=True, timeout=20)
+        except (_SubprocessTimeoutExpired, OSError) as e:
+            logging.debug(f"cpu profile: docker update {name} failed: {e}")
+            continue
+        if res.returncode != 0:
+            logging.debug(f"cpu profile: docker update {name}: {(res.stderr or '').strip()}")
+            continue
+        applied[name] = {"cpu_shares": shares, "cpuset": cpus}
+    return applied
+
+
+def _container_cpu_usage_usec(name):
+    path = _container_cgroup_dir(name)
+    if path is None:
+        return None
+    return _read_cgroup_flat(os.path.join(path, "cpu.stat")).get("usage_usec")
+
+
+def _blox_ai_cpu_pct(now):
+    """blox-ai CPU use since the previous call, as % of all cores; None on
+    the first call or when the container isn't running."""
+    global _cpu_profile_ai_usage
+    usage = _container_cpu_usage_usec("blox-ai")
+    prev = _cpu_profile_ai_usage
+    _cpu_profile_ai_usage = (now, usage) if usage is not None else None
+    if usage is None or prev is None or now <= prev[0] or usage < prev[1]:
+        return None
+    elapsed_usec = (now - prev[0]) * 1e6 * (os.cpu_count() or 1)
+    return round(100.0 * (usage - prev[1]) / elapsed_usec, 1)
+
+
+def select_cpu_profile(summary, ai_cpu_pct, current=None):
+    """Pick (profile, reason) from power_summary() and blox-ai's CPU share,
+    with hysteresis against the current profile."""
+    thermal = summary.get("thermal") or {}
+    p95 = thermal.get("p95")
+    past = thermal.get("past_threshold_s") or 0
+    if p95 is not None:
+        if p95 >= POWER_THERMAL_THRESHOLD_C - CPU_PROFILE_THERMAL_MARGIN_C or past >= CPU_PROFILE_THERMAL_PAST_SEC:
+            return "thermal_limited", f"thermal p95 {p95}C, {past}s past {POWER_THERMAL_THRESHOLD_C}C"
+        if current == "thermal_limited" and p95 >= POWER_THERMAL_THRESHOLD_C - 2 * CPU_PROFILE_THERMAL_MARGIN_C:
+            return "thermal_limited", f"cooling, thermal p95 {p95}C"
+    if ai_cpu_pct is not None:
+        if ai_cpu_pct >= CPU_PROFILE_AI_LOAD_PCT:
+            return "ai_inference", f"blox-ai at {ai_cpu_pct}% CPU"
+        if current == "ai_inference" and ai_cpu_pct >= CPU_PROFILE_AI_LOAD_PCT / 2:
+            return "ai_inference", f"blox-ai still at {ai_cpu_pct}% CPU"
+    return "serving", "no thermal or AI pressure"
+
+
+def _load1():
+    try:
+        return float((_read_first_line("/proc/loadavg") or "").split()[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def apply_cpu_profile(name, reason="", metrics=None, now=None):
+    """Apply a CPU_PROFILES entry and record the switch as a cpu-profile event."""
+    global _cpu_profile, _cpu_profile_since
+    topo = _cpu_topology()
+    profile = CPU_PROFILES[name]
+    cpufreq = _apply_cpufreq(profile, topo)
+    containers = _apply_container_cpu(profile, topo)
+    previous = _cpu_profile
+    _cpu_profile, _cpu_profile_since = name, time.time() if now is None else now
+    logging.info(f"cpu profile: {previous} -> {name} ({reason})")
+    _append_event("cpu-profile", {
+        "from": previous,
+        "to": name,
+        "reason": reason,
+        "metrics": metrics or {},
+        "cpufreq": cpufreq,
+        "containers": containers,
+    })
+
+
+@instrumented
+def maybe_switch_cpu_profile(now=None):
+    """Select a profile and, when enabled and past the dwell time, apply it.
+    Writes /run/fula-cpu-profile.state either way."""
+    if now is None:
+        now = time.time()
+    summary = power_summary()
+    metrics = {
+        "thermal_p95_c": (summary.get("thermal") or {}).get("p95"),
+        "thermal_past_threshold_s": (summary.get("thermal") or {}).get("past_threshold_s"),
+        "blox_ai_cpu_pct": _blox_ai_cpu_pct(now),
+        "load1": _load1(),
+    }
+    selected, reason = select_cpu_profile(summary, metrics["blox_ai_cpu_pct"], _cpu_profile)
+    if _CPU_PROFILES_ENABLED and selected != _cpu_profile:
+        dwell = now - _cpu_profile_since
+        if (_cpu_profile is None or selected == "thermal_limited"
+                or dwell >= CPU_PROFILE_MIN_DWELL_SEC):
+            apply_cpu_profile(selected, reason, metrics, now)
+        else:
+            reason = f"{reason}; holding {_cpu_profile} ({int(dwell)}s < {CPU_PROFILE_MIN_DWELL_SEC}s dwell)"
+    _atomic_write_state(CPU_PROFILE_STATE_PATH, {
+        "enabled": _CPU_PROFILES_ENABLED,
+        "profile": _cpu_profile,
+        "since": (datetime.utcfromtimestamp(_cpu_profile_since).isoformat(timespec="seconds") + "Z"
+                  if _cpu_profile else None),
+        "recommended": selected,
+        "reason": reason,
+        "metrics": metrics,
+    })
+
+
+# --- OpenMetrics exporter ------------------------------------------------------
+# metrics_exporter.py renders the state sections and the watchdog timing
+# metrics as OpenMetrics, serves them on METRICS_EXPORTER_PORT and/or
+# rewrites METRICS_TEXTFILE_PATH for node_exporter (both opt-in, see that
+# module). The watchdog supplies its live timing metrics and the state file
+# paths (which tests move at runtime).
+
+
+def render_openmetrics(eof=True):
+    """OpenMetrics text for the state files and watchdog metrics. eof=False
+    renders Prometheus text format for node_exporter's textfile collector."""
+    paths = {section: globals()[const] for const, section in _STATE_SECTIONS.items()}
+    return metrics_exporter.render(paths, watchdog_metrics(), eof)
+
+
+def write_metrics_textfile():
+    metrics_exporter.write_textfile(render_openmetrics(eof=False))
+
+
+def start_metrics_exporter():
+    """Start the HTTP exporter and/or textfile writer if configured. Idempotent."""
+    if metrics_exporter is None:
+        return
+    if metrics_exporter.PORT:
+        metrics_exporter.serve(render_openmetrics)
+    if metrics_exporter.TEXTFILE_PATH:
+        _start_periodic("metrics-textfile", write_metrics_textfile, metrics_exporter.TEXTFILE_INTERVAL_SEC)
+
+
 def _record_api_timeout(component):
     """Phase 13 Layer 1.7 — track consecutive API timeouts. component is
     'kubo' or 'cluster'. Returns True if escalation should fire (counter
@@ -4121,23 +8277,16 @@ def _escalate_kubo_hang(component):
 
 def monitor_docker_logs_and_restart():
     # Phase 3 diagnostic gates: run BEFORE the generic-internet early-return so
-    # /run/fula-discovery.state and /run/fula-time.state stay fresh even when
-    # google.com is unreachable. Per Codex post-implementation review: without
-    # this ordering, the BLE diag layer can't distinguish "no internet at all"
-    # from "Google blocked but Fula reachable" or "clock bad". Both checks are
-    # best-effort and never raise into the caller.
+    # /run/fula-discovery.state stays fresh even when google.com is
+    # unreachable. Per Codex post-implementation review: without this
+    # ordering, the BLE diag layer can't distinguish "no internet at all"
+    # from "Google blocked but Fula reachable". Best-effort; never raises into
+    # the caller. /run/fula-time.state and /run/fula-wireguard.state are kept
+    # fresh by start_time_monitor() and start_wireguard_monitor().
     try:
         check_discovery_https_reachable()
     except Exception as e:
         logging.debug(f"check_discovery_https_reachable raised: {e}")
-    try:
-        check_ntp_sync()
-    except Exception as e:
-        logging.debug(f"check_ntp_sync raised: {e}")
-    try:
-        check_wireguard_handshake_age()
-    except Exception as e:
-        logging.debug(f"check_wireguard_handshake_age raised: {e}")
     # Phase 13 — Layer 1.5 + 1.6 additions (run at cold entry so state files
     # are fresh even when google.com is unreachable, same pattern as the
     # Phase 3 checks above).
@@ -4173,6 +8322,8 @@ def monitor_docker_logs_and_restart():
         restart_attempts = 4
 
     while restart_attempts < 4:
+        # A monitor cycle is the work after the 450s idle, up to the next one.
+        watchdog_cycle_end("monitor")
         logging.info("Entered into monitor while loop")
         try:
             post_heartbeat()
@@ -4190,15 +8341,8 @@ def monitor_docker_logs_and_restart():
             check_discovery_https_reachable()
         except Exception as e:
             logging.debug(f"check_discovery_https_reachable raised in monitor: {e}")
-        try:
-            check_ntp_sync()
-        except Exception as e:
-            logging.debug(f"check_ntp_sync raised in monitor: {e}")
-        try:
-            check_wireguard_handshake_age()
-        except Exception as e:
-            logging.debug(f"check_wireguard_handshake_age raised in monitor: {e}")
         time.sleep(450)
+        watchdog_cycle_begin("monitor")
         get_wifi_info_and_ping()
         # Check if Docker service is running
         docker_service_status = subprocess.getoutput("sudo systemctl is-active docker.service")
@@ -4206,20 +8350,19 @@ def monitor_docker_logs_and_restart():
             logging.error("conditions not pass")
             if check_and_repair_ext4():
                 logging.info("ext4 repair attempted inside monitor loop.")
-                time.sleep(30)
+                wait_until_healthy("ext4-repair")
                 continue
             subprocess.run(["sudo", "python", LED_PATH, "yellow", "5"], capture_output=True, timeout=20)
             subprocess.run(["sudo", "systemctl", "stop", "fula.service"], capture_output=True, timeout=120)
             subprocess.run(["sudo", "systemctl", "stop", "docker.service"], capture_output=True, timeout=120)
+            # Let containers release their handles on the uniondrive mounts.
             time.sleep(15)
             subprocess.run(["sudo", "systemctl", "restart", "uniondrive.service"], capture_output=True, timeout=120)
-            # Wait a moment to let Docker restart
-            time.sleep(15)
+            wait_until_healthy("uniondrive-restart", checks=("mergerfs",), deadline=60)
             subprocess.run(["sudo", "systemctl", "start", "docker.service"], capture_output=True, timeout=120)
-            # Wait a moment to let Docker restart
-            time.sleep(20)
+            wait_until_healthy("docker-start", checks=("docker",), deadline=60)
             safe_start_fula(capture_output=True, timeout=120)
-            time.sleep(35)
+            wait_until_healthy("stack-restart")
             restart_attempts += 1
             continue
         else:
@@ -4229,10 +8372,9 @@ def monitor_docker_logs_and_restart():
             logging.error("Docker service is not running. Attempting to restart Docker service.")
             subprocess.run(["sudo", "python", LED_PATH, "yellow", "5"], capture_output=True, timeout=20)
             subprocess.run(["sudo", "systemctl", "restart", "docker.service"], capture_output=True, timeout=120)
-            # Wait a moment to let Docker restart
-            time.sleep(15)
+            wait_until_healthy("docker-restart", checks=("docker",), deadline=60)
             safe_restart_fula(capture_output=True, timeout=120)
-            time.sleep(35)
+            wait_until_healthy("docker-restart:fula")
             restart_attempts += 1
             docker_service_status = subprocess.getoutput("sudo systemctl is-active docker.service")
 
@@ -4251,17 +8393,14 @@ def monitor_docker_logs_and_restart():
                 all_containers_running = False
                 logging.error(f"{container} is not running or logs contain ERROR:. Attempting to restart fula.service")
                 subprocess.run(["sudo", "python", LED_PATH, "yellow", "5"], capture_output=True, timeout=20)
-                result = safe_restart_fula(capture_output=True, timeout=120)
-                time.sleep(5)
-                if result.returncode == 0:
-                    logging.info(f"fula.service restarted successfully for {container}.")
+                if run_remediation(f"container-down:{container}",
+                                   restart_ladder(container, f"{container} not running"),
+                                   f"{container} not running"):
+                    logging.info(f"{container} restarted successfully.")
                     subprocess.run(["sudo", "python", LED_PATH, "blue", "5"], capture_output=True, timeout=20)
                 else:
-                    logging.error(f"Failed to restart fula.service for {container}.")
+                    logging.error(f"Failed to recover {container}.")
                     subprocess.run(["sudo", "python", LED_PATH, "red", "5"], capture_output=True, timeout=20)
-                    if result.stderr:
-                        logging.error(f"Restart error: {result.stderr}")
-                time.sleep(60)  # Delay between restart attempts
                 break  # Break to re-check all containers after an attempt
             
         # Run fix checks BEFORE proxy health check so they can't be short-circuited
@@ -4287,7 +8426,7 @@ def monitor_docker_logs_and_restart():
             if restore_config_from_backup(config_yaml_path):
                 logging.info("config.yaml restored from backup. Restarting fula.service.")
                 safe_restart_fula(capture_output=True, timeout=120)
-                time.sleep(30)
+                wait_until_healthy("config-yaml-restore")
                 restart_attempts += 1
                 continue
             else:
@@ -4296,21 +8435,17 @@ def monitor_docker_logs_and_restart():
         if all_containers_running:
             # Check go-fula proxy health
             if not check_proxy_health():
-                logging.warning("go-fula proxy ports unreachable. Restarting fula.service.")
-                safe_restart_fula(capture_output=True, timeout=120)
-                time.sleep(30)
+                logging.warning("go-fula proxy ports unreachable. Restarting fula_go.")
+                run_remediation("proxy-down", restart_ladder("fula_go", "proxy ports 4020/4021 unreachable"),
+                                "proxy ports 4020/4021 unreachable")
                 restart_attempts += 1
                 continue
 
             # Check for PeerID collision between kubo and ipfs-cluster
             if check_peerid_collision():
                 logging.warning("PeerID collision detected. Removing ipfs-cluster identity to regenerate.")
-                service_json = "/uniondrive/ipfs-cluster/service.json"
-                if os.path.exists(service_json):
-                    subprocess.run(["sudo", "rm", "-f", service_json], capture_output=True, check=True, timeout=20)
-                    logging.info(f"Deleted {service_json} to force PeerID regeneration.")
-                safe_restart_fula(capture_output=True, timeout=120)
-                time.sleep(30)
+                run_remediation("peerid-collision", [("regenerate-cluster-identity", regenerate_cluster_identity)],
+                                "PeerID collision with kubo")
                 restart_attempts += 1
                 continue
 
@@ -4329,12 +8464,13 @@ def monitor_docker_logs_and_restart():
             restart_attempts += 1
 
         # Check disk space before running fixes (low disk can cause corruption)
-        has_space, free_gb = check_disk_space("/uniondrive", min_gb=1)
-        if not has_space:
-            logging.warning(f"Low disk space detected ({free_gb:.2f}GB). Running docker prune.")
-            subprocess.run(["sudo", "docker", "system", "prune", "-f"],
-                           capture_output=True, timeout=120)
+        for disk_path in ("/uniondrive", "/"):
+            has_space, free_gb = check_disk_space(disk_path, min_gb=1)
+            if not has_space:
+                logging.warning(f"Low disk space on {disk_path} ({free_gb:.2f}GB). Reclaiming space.")
+                reclaim_disk_space(disk_path, target_free_gb=1)
 
+    watchdog_cycle_end("monitor")
     if restart_attempts >= 4:
         if check_and_repair_ext4():
             logging.info("ext4 repair attempted at escalation boundary.")
@@ -4399,18 +8535,31 @@ def main():
     subprocess.run(['sudo', 'rm', '-f', gave_up_path], timeout=20)
     fula_restart_attempts = 0
     cycles_with_no_wifi = 0
-    while True:
-        # Discovery API integration — both are internally rate-limited (60s and
-        # 3600s respectively), so safe to call on every iteration regardless of
-        # main-loop cadence. Failures are non-fatal and logged.
+    # _start_trash_reaper finishes deleting anything trashed before the
+    # last restart/reboot.
+    for start in (start_io_sampler, _start_trash_reaper, _start_block_event_monitor,
+                  start_network_sampler, start_heartbeat_loop, start_time_monitor,
+                  start_wireguard_monitor, start_power_sampler, start_container_sampler,
+                  start_metrics_exporter):
         try:
-            post_heartbeat()
+            start()
         except Exception as e:
-            logging.debug(f"post_heartbeat raised: {e}")
+            logging.debug(f"{start.__name__} raised: {e}")
+    while True:
+        # Storage checks share one block-device inventory per cycle.
+        invalidate_block_inventory()
+        # Discovery API integration — internally rate-limited (3600s), so
+        # safe to call on every iteration regardless of main-loop cadence.
+        # Heartbeats run on their own thread (start_heartbeat_loop).
+        # Failures are non-fatal and logged.
         try:
             maybe_refresh_relays()
         except Exception as e:
             logging.debug(f"maybe_refresh_relays raised: {e}")
+        try:
+            maybe_score_relays()
+        except Exception as e:
+            logging.debug(f"maybe_score_relays raised: {e}")
 
         if check_conditions():
             logging.info("check_conditions passed")
@@ -4440,18 +8589,19 @@ def main():
             if check_and_repair_ext4():
                 logging.info("ext4 repair attempted. Re-evaluating conditions.")
                 fula_restart_attempts = 0
-                time.sleep(90)  # fula.service needs 60s+ (ExecStartPre=sleep 60)
+                # fula.service needs 60s+ (ExecStartPre=sleep 60) after a repair.
+                wait_until_healthy("ext4-repair", checks=_CONDITION_CHECKS, deadline=_REPAIR_WAIT_DEADLINE_SEC)
                 continue
             # Check .env corruption early — a corrupt .env prevents all containers from starting
             if check_and_fix_env_file():
                 logging.info(".env file repaired. Re-evaluating conditions.")
                 fula_restart_attempts = 0
-                time.sleep(90)
+                wait_until_healthy("env-file-repair", checks=_CONDITION_CHECKS, deadline=_REPAIR_WAIT_DEADLINE_SEC)
                 continue
             if check_and_repair_dpkg():
                 logging.info("dpkg repair attempted. Re-evaluating conditions.")
                 fula_restart_attempts = 0
-                time.sleep(90)
+                wait_until_healthy("dpkg-repair", checks=_CONDITION_CHECKS, deadline=_REPAIR_WAIT_DEADLINE_SEC)
                 continue
             # Check if 'fula_go' exists in `docker ps -a`
             docker_ps_a_output = subprocess.getoutput("sudo docker ps -a --format '{{.Names}}'")
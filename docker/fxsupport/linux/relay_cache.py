@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Discovery /relays cache
+
+Shared by readiness-check.py (drift detection + discovery reachability probe)
+and update_kubo_config.py (relay override on `fula.sh start`). Keeps the last
+known-good relay list on disk together with the server's ETag and a content
+hash, so:
+
+  - a fresh copy (validated within max_age) is served without any request;
+  - a stale copy is revalidated with If-None-Match, and a 304 costs no body
+    and no disk write (the new validation time is kept in memory);
+  - if the Worker is unreachable, a copy up to STALE_MAX_SEC old is still
+    served (stale-if-error), so `fula.sh start` works offline;
+  - long-running callers can ask for stale-while-revalidate: the stale copy
+    is returned immediately and revalidation happens on a background thread.
+
+It also owns the relay scoreboard format (relay_scores.json, written by
+readiness-check.py's score_relays) and the ranking rule both callers apply
+to StaticRelays / Peering.Peers.
+
+Environment (or defaults):
+    HOME_DIR                    /home/pi
+    RELAY_CACHE_TTL_SEC         3600
+    RELAY_CACHE_STALE_MAX_SEC   604800 (7 days)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+HOME_DIR = os.environ.get("HOME_DIR", "/home/pi")
+CACHE_PATH = os.path.join(HOME_DIR, ".internal", "discovery_relays.json")
+SCORES_PATH = os.path.join(HOME_DIR, ".internal", "relay_scores.json")
+TTL_SEC = int(os.environ.get("RELAY_CACHE_TTL_SEC", "3600"))
+STALE_MAX_SEC = int(os.environ.get("RELAY_CACHE_STALE_MAX_SEC", str(7 * 86400)))
+
+_logger = logging.getLogger(__name__)
+_revalidate_lock = threading.Lock()
+# cache path -> (hash, ts) of the latest 304. Kept in memory so a revalidation
+# that changes nothing doesn't rewrite the file on flash; a new process just
+# revalidates once more.
+_validated_at = {}
+
+
+def validate_relays(data):
+    """Return the well-formed relay records from a /relays payload, or None."""
+    if not isinstance(data, list):
+        return None
+    valid = [r for r in data
+             if isinstance(r, dict) and all(k in r for k in ("peerId", "addr", "multiaddr"))]
+    return valid or None
+
+
+def relays_hash(relays):
+    return hashlib.sha256(json.dumps(relays, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_cache(path=None):
+    """Return the cache record {relays, etag, hash, fetched_at, validated_at}
+    or None if missing/corrupt."""
+    try:
+        with open(path or CACHE_PATH) as f:
+            record = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(record, dict) or not validate_relays(record.get("relays")):
+        return None
+    return record
+
+
+def save_cache(record, path=None):
+    """Atomically write the cache record. Best-effort: never raises."""
+    path = path or CACHE_PATH
+    tmp = "{}.tmp.{}".format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp, path)
+    except (IOError, OSError) as e:
+        _logger.warning("relay cache: could not write %s: %s", path, e)
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def validated_at(cache, path=None):
+    """When the cached list was last confirmed by the server: the on-disk
+    stamp, or a later in-memory 304 for the same content."""
+    digest, ts = _validated_at.get(path or CACHE_PATH, (None, 0))
+    return max(cache.get("validated_at", 0), ts if digest == cache.get("hash") else 0)
+
+
+def store_response(status, etag, data, path=None, now=None):
+    """Fold one /relays response into the cache.
+
+    Returns (relays, outcome) where outcome is "not-modified", "unchanged",
+    "changed", or "invalid"/"http_<status>" with relays None. Callers that
+    make their own request (the reachability probe) use this directly.
+    """
+    now = time.time() if now is None else now
+    cache = load_cache(path)
+    if status == 304 and cache:
+        _validated_at[path or CACHE_PATH] = (cache.get("hash"), now)
+        return cache["relays"], "not-modified"
+    if status != 200:
+        return None, "http_{}".format(status)
+    relays = validate_relays(data)
+    if not relays:
+        return None, "invalid"
+    digest = relays_hash(relays)
+    outcome = "unchanged" if cache and cache.get("hash") == digest else "changed"
+    save_cache({
+        "relays": relays,
+        "etag": etag if isinstance(etag, str) else None,
+        "hash": digest,
+        "fetched_at": cache["fetched_at"] if outcome == "unchanged" else now,
+        "validated_at": now,
+    }, path)
+    return relays, outcome
+
+
+def conditional_headers(path=None):
+    cache = load_cache(path)
+    if cache and cache.get("etag"):
+        return {"if-none-match": cache["etag"]}
+    return {}
+
+
+def urllib_fetch(url, headers, timeout):
+    """Default fetcher: (status, etag, parsed JSON or None). urllib raises
+    HTTPError for 304 and other non-2xx codes; those are returned as statuses."""
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = resp.read().decode("utf-8")
+            return resp.status, resp.headers.get("ETag"), json.loads(body) if resp.status == 200 else None
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("ETag") if e.headers else None, None
+
+
+def revalidate(url, fetch=None, timeout=5, user_agent="fula-relay-cache/1.0", path=None):
+    """Conditional GET against url; returns (relays, outcome). Raises on
+    network errors so callers can fall back to the stale copy."""
+    headers = {
+        "accept": "application/json",
+        # Cloudflare's Bot Fight Mode flags default library UAs.
+        "user-agent": user_agent,
+        # X-Fula-Client gates a WAF rule that blocks unknown traffic.
+        "x-fula-client": "edge",
+    }
+    headers.update(conditional_headers(path))
+    with _revalidate_lock:
+        status, etag, data = (fetch or urllib_fetch)(url, headers, timeout)
+        return store_response(status, etag, data, path)
+
+
+def get_relays(url, max_age=TTL_SEC, fetch=None, timeout=5, user_agent="fula-relay-cache/1.0",
+               path=None, allow_stale=True, background=False, logger=None):
+    """Return the relay list, touching the network only when the cached copy
+    is older than max_age.
+
+    allow_stale: serve a copy up to STALE_MAX_SEC old if revalidation fails.
+    background:  with a stale copy, return it now and revalidate on a daemon
+                 thread (stale-while-revalidate). Only useful to long-running
+                 callers.
+    """
+    log = logger or _logger
+    cache = load_cache(path)
+    age = time.time() - validated_at(cache, path) if cache else None
+    if cache and age <= max_age:
+        return cache["relays"]
+    usable_stale = cache is not None and allow_stale and age <= STALE_MAX_SEC
+    if usable_stale and background:
+        threading.Thread(target=_revalidate_quietly, name="relay-cache-revalidate",
+                         args=(url, fetch, timeout, user_agent, path, log), daemon=True).start()
+        return cache["relays"]
+    relays = _revalidate_quietly(url, fetch, timeout, user_agent, path, log)
+    if relays:
+        return relays
+    if usable_stale:
+        log.info("relay cache: serving last known-good list (%ds old)", int(age))
+        return cache["relays"]
+    return None
+
+
+def _revalidate_quietly(url, fetch, timeout, user_agent, path, log):
+    try:
+        relays, outcome = revalidate(url, fetch, timeout, user_agent, path)
+    except Exception as e:
+        log.info("relay cache: %s fetch failed: %s", url, e)
+        return None
+    log.info("relay cache: %s -> %s", url, outcome)
+    return relays
+
+
+def load_relay_scores(path=None):
+    """Return the scoreboard {multiaddr: {ewma_ms, success_ewma, ...}}, or {}
+    if missing/corrupt."""
+    try:
+        with open(path or SCORES_PATH) as f:
+            scores = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    return scores if isinstance(scores, dict) else {}
+
+
+def rank_by_score(items, scores, multiaddr=lambda item: item):
+    """Order items: healthy relays (success EWMA >= 0.5) fastest first, then
+    unscored ones, then unhealthy ones. Ties keep the input order.
+    multiaddr maps an item to its scoreboard key."""
+    def key(pair):
+        idx, item = pair
+        s = scores.get(multiaddr(item))
+        if not s or (s.get("ewma_ms") is None and s.get("success_ewma") is None):
+            return (1, 0, idx)
+        if (s.get("success_ewma") or 0) >= 0.5 and s.get("ewma_ms") is not None:
+            return (0, s["ewma_ms"], idx)
+        return (2, -(s.get("success_ewma") or 0), idx)
+
+    return [item for _i, item in sorted(enumerate(items), key=key)]
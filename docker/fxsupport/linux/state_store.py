@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Consolidated device state store
+
+Shared by readiness-check.py (the only writer) and anything that needs more
+than one of the /run/fula-*.state files at once. Every section readiness-check
+publishes lives in one versioned JSON document on tmpfs:
+
+    {"format": 1, "generation": 812, "updated": "2026-10-18T07:00:00Z",
+     "sections": {"heartbeat": {"generation": 811, "updated": "...",
+                                "updated_epoch": 1792306800.0, "data": {...}},
+                  ...}}
+
+The document is replaced with a temp write + rename, so one open() + read
+is a consistent snapshot of every section (no torn mix of old heartbeat and
+new discovery state), and it works through the read-only /run bind mount the
+blox-ai container uses. SQLite in WAL mode was the alternative, but its
+readers need a writable -shm next to the database, and with a single writer
+process an atomic rename already gives snapshot isolation.
+
+The per-file /run/fula-*.state outputs are still written alongside as
+compatibility views (SECTIONS maps each section to its file), so existing
+readers keep working unchanged.
+
+Environment (or defaults):
+    FULA_STATE_STORE_PATH       /run/fula-state.json
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+STORE_PATH = os.environ.get("FULA_STATE_STORE_PATH", "/run/fula-state.json")
+FORMAT_VERSION = 1
+
+# section -> compatibility view written next to the store
+SECTIONS = {
+    "heartbeat": "/run/fula-heartbeat.state",
+    "discovery": "/run/fula-discovery.state",
+    "time": "/run/fula-time.state",
+    "wireguard": "/run/fula-wireguard.state",
+    "containers": "/run/fula-containers.state",
+    "power": "/run/fula-power.state",
+    "cpu_profile": "/run/fula-cpu-profile.state",
+    "memory_policy": "/run/fula-memory-policy.state",
+    "io": "/run/fula-io.state",
+    "storage": "/run/fula-storage.state",
+    "network": "/run/fula-network.state",
+    "reachability": "/run/fula-reachability.state",
+    "watchdog_metrics": "/run/fula-watchdog-metrics.json",
+}
+
+_logger = logging.getLogger(__name__)
+_lock = threading.Lock()
+_doc = None  # writer's in-memory copy, loaded from STORE_PATH on first update
+
+
+def _empty():
+    return {"format": FORMAT_VERSION, "generation": 0, "updated": None, "sections": {}}
+
+
+def load(path=None):
+    """Return the whole document (a consistent snapshot), or an empty one if
+    the store is missing, corrupt or from another format version."""
+    try:
+        with open(path or STORE_PATH) as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return _empty()
+    if not isinstance(doc, dict) or doc.get("format") != FORMAT_VERSION \
+            or not isinstance(doc.get("sections"), dict):
+        return _empty()
+    return doc
+
+
+def snapshot(path=None):
+    """{section: data} for every section, from a single read."""
+    return {name: s.get("data") for name, s in load(path)["sections"].items()}
+
+
+def section(name, path=None):
+    """Data of one section, or None if it was never published."""
+    entry = load(path)["sections"].get(name)
+    return entry.get("data") if isinstance(entry, dict) else None
+
+
+def update(name, data, now=None):
+    """Publish data as section name and rewrite the store atomically.
+
+    Unknown sections and non-object data are programming errors and raise
+    ValueError (TypeError if data isn't JSON-serialisable); I/O failures
+    are logged and swallowed, since the caller is the watchdog and must
+    never crash on a state write.
+    """
+    global _doc
+    if name not in SECTIONS:
+        raise ValueError("unknown state section: {}".format(name))
+    if not isinstance(data, dict):
+        raise ValueError("state section {} must be an object".format(name))
+    # A private copy: callers keep mutating their state dicts after writing.
+    data = json.loads(json.dumps(data))
+    now = time.time() if now is None else now
+    ts = datetime.utcfromtimestamp(now).isoformat(timespec="seconds") + "Z"
+    with _lock:
+        if _doc is None:
+            _doc = load()
+        _doc["generation"] += 1
+        _doc["updated"] = ts
+        _doc["sections"][name] = {
+            "generation": _doc["generation"],
+            "updated": ts,
+            "updated_epoch": round(now, 3),
+            "data": data,
+        }
+        tmp = "{}.tmp.{}".format(STORE_PATH, os.getpid())
+        try:
+            with open(tmp, "w") as f:
+                json.dump(_doc, f, separators=(",", ":"))
+            os.replace(tmp, STORE_PATH)
+        except OSError as e:
+            _logger.warning("could not write state store %s: %s", STORE_PATH, e)
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+def reset():
+    """Forget the writer's in-memory copy (tests, or after STORE_PATH moves)."""
+    global _doc
+    with _lock:
+        _doc = None
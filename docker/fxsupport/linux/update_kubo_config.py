@@ -26,6 +26,11 @@ import urllib.error
 from datetime import datetime
 from copy import deepcopy
 
+try:
+    import relay_cache  # shared /relays cache, shipped alongside by fula.sh
+except ImportError:
+    relay_cache = None
+
 FULA_PATH = os.environ.get("FULA_PATH", "/usr/bin/fula")
 HOME_DIR = os.environ.get("HOME_DIR", "/home/pi")
 
@@ -40,6 +45,10 @@ TEMPLATE_COPY = os.path.join(HOME_DIR, ".internal", "ipfs_config")
 
 LOG_PATH = os.path.join(HOME_DIR, "fula.sh.log")
 
+# Relay latency/success scoreboard maintained by readiness-check.py
+# (score_relays). Used only to order relays; missing file = discovery order.
+RELAY_SCORES_PATH = os.path.join(HOME_DIR, ".internal", "relay_scores.json")
+
 # Fields that should be merged from template -> deployed.
 # Dot-separated paths into the JSON object.
 MANAGED_FIELDS = [
@@ -171,12 +180,24 @@ def merge_configs(template, deployed, logger):
 def fetch_relays_from_discovery_api(logger):
     """Fetch the live relay list from the Cloudflare Workers discovery API.
 
+    Goes through the shared relay_cache when available: a list validated
+    within its TTL is used without a request, and when the Worker can't be
+    reached the last known-good list is used instead of template defaults.
+
     Returns a list of relay records (see schema/kv-layout.md), or None on
     any failure. Failure is non-fatal — caller falls back to template defaults.
     """
     if not DISCOVERY_API_URL:
         return None
     url = DISCOVERY_API_URL.rstrip("/") + "/relays"
+    if relay_cache is not None:
+        relays = relay_cache.get_relays(url, timeout=DISCOVERY_TIMEOUT_SEC,
+                                        user_agent="fula-ota-kubo-config/1.0", logger=logger)
+        if relays:
+            logger.info("discovery: using %d relay(s) for %s", len(relays), url)
+        else:
+            logger.info("discovery: no relay list available — falling back to template defaults")
+        return relays
     try:
         req = urllib.request.Request(url, headers={
             "accept": "application/json",
@@ -214,12 +235,28 @@ def fetch_relays_from_discovery_api(logger):
     return valid
 
 
-def apply_relays_from_discovery(config, relays, logger):
-    """Override Swarm.RelayClient.StaticRelays + Peering.Peers with discovery values.
+def load_relay_scores(path=None):
+    if relay_cache is None:
+        return {}
+    return relay_cache.load_relay_scores(path or RELAY_SCORES_PATH)
+
+
+def rank_relays(relays, scores):
+    """Order relay records by the readiness-check scoreboard
+    (relay_cache.rank_by_score); discovery order if relay_cache is missing."""
+    if relay_cache is None:
+        return list(relays)
+    return relay_cache.rank_by_score(relays, scores, multiaddr=lambda r: r["multiaddr"])
+
+
+def apply_relays_from_discovery(config, relays, logger, scores=None):
+    """Override Swarm.RelayClient.StaticRelays + Peering.Peers with discovery values,
+    ordered closest-healthy-first by the relay scoreboard.
 
     Returns list of (field, action) changes for logging.
     """
     changes = []
+    relays = rank_relays(relays, load_relay_scores() if scores is None else scores)
 
     new_static = [r["multiaddr"] for r in relays]
     cur_static, _ = get_nested(config, "Swarm.RelayClient.StaticRelays")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+WireGuard support-tunnel status
+
+Shared by readiness-check.py (handshake-age watchdog), local_command_server.py
+and bluetooth.py (the `wireguard/status` command). Produces the same JSON shape
+as wireguard/status.sh:
+
+    installed, registered, active, endpoint, assigned_ip, peer_id_registered,
+    last_handshake_age_sec, rx_bytes, tx_bytes, persistent_keepalive_sec
+
+plus "peers", the per-peer rows behind the aggregates. Instead of status.sh's
+bash + three `wg show` calls + `ip link` + python3, peer state comes from a
+single `wg show <if> dump`, installed/active from the filesystem, and the
+registration fields from the state file. Results are cached for TTL_SEC so
+several callers in one cycle share one read.
+
+Aggregation matches status.sh (defensive multi-peer, single-peer today):
+newest non-zero handshake, summed transfer, smallest non-off keepalive.
+Handshake age is NOT clamped — readiness-check.py reads a negative age as
+clock skew and suppresses remediation.
+
+Environment (or defaults):
+    WG_STATUS_TTL_SEC   5
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+INTERFACE = "support"
+REGISTRATION_STATE_PATH = "/home/pi/.internal/wireguard/registration.state"
+KEY_PATHS = ("/etc/wireguard/support_private.key", "/etc/wireguard/support_public.key")
+SYS_CLASS_NET = "/sys/class/net"
+TTL_SEC = float(os.environ.get("WG_STATUS_TTL_SEC", "5"))
+
+_logger = logging.getLogger(__name__)
+_cache_lock = threading.Lock()
+_cache = None  # (monotonic ts, status dict)
+
+
+def parse_dump(text):
+    """Parse `wg show <if> dump` into a list of peer dicts.
+
+    The first line describes the interface (private-key, public-key,
+    listen-port, fwmark); each following line is a peer: public-key,
+    preshared-key, endpoint, allowed-ips, latest-handshake, transfer-rx,
+    transfer-tx, persistent-keepalive. Malformed lines are skipped.
+    """
+    peers = []
+    for line in (text or "").splitlines()[1:]:
+        fields = line.split("\t")
+        if len(fields) < 8:
+            continue
+        try:
+            handshake = int(fields[4])
+            rx, tx = int(fields[5]), int(fields[6])
+        except ValueError:
+            continue
+        keepalive = fields[7]
+        peers.append({
+            "public_key": fields[0],
+            "endpoint": None if fields[2] == "(none)" else fields[2],
+            "latest_handshake": handshake,
+            "rx_bytes": rx,
+            "tx_bytes": tx,
+            "persistent_keepalive_sec": int(keepalive) if keepalive.isdigit() else None,
+        })
+    return peers
+
+
+def read_registration(path=None):
+    """key=value pairs from the registration state file; None if missing."""
+    out = {}
+    try:
+        with open(path or REGISTRATION_STATE_PATH) as f:
+            for line in f:
+                key, sep, value = line.rstrip("\n").partition("=")
+                if sep and key not in out:
+                    out[key] = value
+    except (IOError, OSError):
+        return None
+    return out
+
+
+def _wg_dump(interface, timeout=5):
+    """Raw `wg show <if> dump` output, or None if wg is missing/fails."""
+    try:
+        r = subprocess.run(["wg", "show", interface, "dump"],
+                           capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        _logger.debug("wg show %s dump failed: %s", interface, e)
+        return None
+    if r.returncode != 0:
+        return None
+    return r.stdout
+
+
+def aggregate(peers, now=None):
+    """Fold peer rows into status.sh's aggregate fields."""
+    now = time.time() if now is None else now
+    out = {"last_handshake_age_sec": None, "rx_bytes": None, "tx_bytes": None,
+           "persistent_keepalive_sec": None}
+    if not peers:
+        return out
+    newest = max(p["latest_handshake"] for p in peers)
+    if newest > 0:
+        out["last_handshake_age_sec"] = int(now) - newest
+    out["rx_bytes"] = sum(p["rx_bytes"] for p in peers)
+    out["tx_bytes"] = sum(p["tx_bytes"] for p in peers)
+    keepalives = [p["persistent_keepalive_sec"] for p in peers if p["persistent_keepalive_sec"]]
+    if keepalives:
+        out["persistent_keepalive_sec"] = min(keepalives)
+    return out
+
+
+def read_status(interface=INTERFACE, now=None, read_dump=None):
+    """Read the tunnel status now (no cache). Never raises; anything that
+    can't be read is left False/""/None, as status.sh does."""
+    registration = read_registration()
+    active = os.path.exists(os.path.join(SYS_CLASS_NET, interface))
+    status = {
+        "installed": shutil.which("wg") is not None and all(os.path.isfile(p) for p in KEY_PATHS),
+        "registered": registration is not None,
+        "active": active,
+        "endpoint": (registration or {}).get("endpoint", ""),
+        "assigned_ip": (registration or {}).get("assigned_ip", ""),
+        "peer_id_registered": (registration or {}).get("peer_id", ""),
+        "peers": [],
+    }
+    if active:
+        text = (read_dump or _wg_dump)(interface)
+        if text is not None:
+            status["peers"] = parse_dump(text)
+    status.update(aggregate(status["peers"], now))
+    return status
+
+
+def get_status(max_age=None):
+    """Cached read_status(): a result younger than max_age (default TTL_SEC)
+    is reused. Returns a copy callers may modify."""
+    global _cache
+    max_age = TTL_SEC if max_age is None else max_age
+    with _cache_lock:
+        if _cache is not None and time.monotonic() - _cache[0] <= max_age:
+            return dict(_cache[1])
+        status = read_status()
+        _cache = (time.monotonic(), status)
+        return dict(status)
+
+
+def invalidate():
+    """Drop the cached status (call after bringing the tunnel up or down)."""
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+if __name__ == "__main__":
+    import json
+    print(json.dumps(get_status()))
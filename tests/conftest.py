@@ -8,8 +8,12 @@ symmetry, so tests can `from conftest import local_command_server`.
 """
 
 import importlib.util
+import json
 import os
 import sys
+from types import SimpleNamespace
+
+import pytest
 
 _LINUX_DIR = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
@@ -18,6 +22,7 @@ _LINUX_DIR = os.path.join(
 SCRIPT_PATH = os.path.join(_LINUX_DIR, "readiness-check.py")
 LOCAL_COMMAND_SERVER_PATH = os.path.join(_LINUX_DIR, "local_command_server.py")
 RECOVER_PATH = os.path.join(_LINUX_DIR, "readiness-check-recover.py")
+UPDATE_KUBO_CONFIG_PATH = os.path.join(_LINUX_DIR, "update_kubo_config.py")
 
 
 def _load_module(name, path):
@@ -30,9 +35,91 @@ def _load_module(name, path):
     return mod
 
 
+# Sibling modules (relay_cache) are imported by name, as they are when the
+# scripts run from /usr/bin/fula.
+sys.path.insert(0, _LINUX_DIR)
+
 # Load once at collection time so failures surface immediately.
 readiness = _load_module("readiness_check", SCRIPT_PATH)
 local_command_server = _load_module("local_command_server", LOCAL_COMMAND_SERVER_PATH)
 # readiness-check-recover.py executes time.sleep(30) inside main(). Loading the
 # module here only imports definitions — main() runs only under __name__ == __main__.
 recover = _load_module("readiness_check_recover", RECOVER_PATH)
+update_kubo_config = _load_module("update_kubo_config", UPDATE_KUBO_CONFIG_PATH)
+
+import metrics_exporter  # noqa: E402
+import relay_cache  # noqa: E402  (needs the sys.path insert above)
+import state_store  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _isolated_relay_cache(tmp_path, monkeypatch):
+    """Keep every test off the real ~/.internal/discovery_relays.json."""
+    monkeypatch.setattr(relay_cache, "CACHE_PATH", str(tmp_path / "discovery_relays.json"))
+    monkeypatch.setattr(relay_cache, "_validated_at", {})
+
+
+@pytest.fixture(autouse=True)
+def _isolated_remediation_ledger(tmp_path, monkeypatch):
+    """Keep every test off the real ~/.internal/remediation.json."""
+    monkeypatch.setattr(readiness, "REMEDIATION_STATE_PATH", str(tmp_path / "remediation.json"))
+    monkeypatch.setattr(readiness, "_remediation_state", None)
+
+
+@pytest.fixture(autouse=True)
+def _isolated_watchdog_metrics(tmp_path, monkeypatch):
+    """Instrumented checks write their metrics snapshot under tmp_path."""
+    monkeypatch.setattr(readiness, "WATCHDOG_METRICS_PATH", str(tmp_path / "watchdog-metrics.json"))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_state_store(tmp_path, monkeypatch):
+    """Keep every test off the real /run/fula-state.json."""
+    monkeypatch.setattr(state_store, "STORE_PATH", str(tmp_path / "fula-state.json"))
+    state_store.reset()
+    yield
+    state_store.reset()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_metrics_cache(monkeypatch):
+    """Every test parses the state files it wrote, not a cached earlier copy."""
+    monkeypatch.setattr(metrics_exporter, "_cache", {})
+
+
+class RecordingRun:
+    """Stand-in for subprocess.run. Every argv lands in .calls; .respond(cmd)
+    returns None (exit 0, no output) or a (returncode, stdout) pair."""
+
+    def __init__(self):
+        self.calls = []
+        self.respond = lambda cmd: None
+
+    def __call__(self, cmd, **kwargs):
+        self.calls.append(cmd)
+        returncode, stdout = self.respond(cmd) or (0, "")
+        return SimpleNamespace(returncode=returncode, stdout=stdout,
+                               stderr="" if returncode == 0 else "error")
+
+
+@pytest.fixture
+def recorded_run(monkeypatch):
+    """Replace readiness.subprocess.run with a RecordingRun."""
+    run = RecordingRun()
+    monkeypatch.setattr(readiness.subprocess, "run", run)
+    return run
+
+
+@pytest.fixture
+def events_log(tmp_path, monkeypatch):
+    """Point events.jsonl at tmp_path; call the fixture to read the entries
+    back, optionally only those of one category."""
+    path = tmp_path / "events.jsonl"
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(path))
+
+    def read(category=None):
+        if not path.exists():
+            return []
+        events = [json.loads(line) for line in path.read_text().splitlines()]
+        return [e for e in events if category is None or e["category"] == category]
+    return read
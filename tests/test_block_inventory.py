@@ -0,0 +1,106 @@
+"""Shared block-device inventory — get_block_inventory() in readiness-check.py.
+
+A fake /sys/class/block (symlinks into a fake /sys/devices tree) is built
+under tmp_path; subprocess.run is replaced so lsblk returns canned JSON and
+every launch is counted.
+"""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from conftest import readiness
+
+LSBLK = {"blockdevices": [
+    {"name": "mmcblk0", "fstype": None, "uuid": None, "children": [
+        {"name": "mmcblk0p2", "fstype": "ext4", "uuid": "root-uuid"}]},
+    {"name": "sda", "fstype": None, "uuid": None, "children": [
+        {"name": "sda1", "fstype": "ext4", "uuid": "sda1-uuid"},
+        {"name": "sda2", "fstype": "vfat", "uuid": "sda2-uuid"}]},
+    {"name": "sdb", "fstype": None, "uuid": None, "children": [
+        {"name": "sdb1", "fstype": "ext4", "uuid": "sdb1-uuid"}]},
+    {"name": "nvme0n1", "fstype": "exfat", "uuid": "nvme-uuid"},
+]}
+
+
+def _dev(root, rel, size, ro=0, removable=None, partition=False):
+    d = root / "devices" / rel
+    d.mkdir(parents=True)
+    (d / "size").write_text(f"{size}\n")
+    (d / "ro").write_text(f"{ro}\n")
+    if removable is not None:
+        (d / "removable").write_text(f"{removable}\n")
+    if partition:
+        (d / "partition").write_text("1\n")
+    (root / "class_block" / d.name).symlink_to(d)
+
+
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    (tmp_path / "class_block").mkdir()
+    _dev(tmp_path, "mmcblk0", 1000, removable=0)
+    _dev(tmp_path, "mmcblk0/mmcblk0p2", 900, partition=True)
+    _dev(tmp_path, "sda", 2 * 1024 ** 3, removable=1)
+    _dev(tmp_path, "sda/sda1", 1024 ** 3, partition=True)
+    _dev(tmp_path, "sda/sda2", 1024, partition=True)
+    _dev(tmp_path, "sdb", 0, removable=0)
+    _dev(tmp_path, "sdb/sdb1", 0, partition=True)
+    _dev(tmp_path, "nvme0n1", 2 * 1024 ** 3, ro=1, removable=0)
+    monkeypatch.setattr(readiness, "_SYS_CLASS_BLOCK_PATH", str(tmp_path / "class_block"))
+    monkeypatch.setattr(readiness, "_block_inventory_cache", None)
+    monkeypatch.setattr(readiness, "_get_boot_disk", lambda: "mmcblk0")
+    calls = []
+
+    def fake_run(args, **kwargs):
+        calls.append(list(args))
+        return MagicMock(returncode=0, stdout=json.dumps(LSBLK), stderr="")
+
+    monkeypatch.setattr(readiness.subprocess, "run", fake_run)
+    return calls
+
+
+def test_inventory_merges_sysfs_and_lsblk(sysfs):
+    inv = readiness.get_block_inventory()
+    assert inv["sda1"] == {
+        "name": "sda1", "type": "part", "parent": "sda", "size_bytes": 512 * 1024 ** 3,
+        "ro": False, "removable": True, "fstype": "ext4", "uuid": "sda1-uuid",
+    }
+    assert inv["sda"]["type"] == "disk" and inv["sda"]["parent"] is None
+    assert inv["nvme0n1"]["ro"] is True
+    assert inv["nvme0n1"]["fstype"] == "exfat"
+
+
+def test_inventory_is_cached_until_invalidated(sysfs):
+    readiness.get_block_inventory()
+    readiness._list_external_ext4_partitions()
+    readiness._list_external_ext4_partitions()
+    assert sysfs == [["lsblk", "-J", "-b", "-O"]]
+    readiness.invalidate_block_inventory()
+    readiness.get_block_inventory()
+    assert len(sysfs) == 2
+
+
+def test_external_ext4_partitions_skip_boot_zero_size_and_non_ext4(sysfs):
+    assert readiness._list_external_ext4_partitions() == [("/dev/sda1", "sda1")]
+
+
+def test_lsblk_failure_leaves_fstype_unknown(sysfs, monkeypatch):
+    monkeypatch.setattr(readiness.subprocess, "run",
+                        lambda *a, **kw: MagicMock(returncode=1, stdout="", stderr="boom"))
+    inv = readiness.get_block_inventory()
+    assert inv["sda1"]["fstype"] is None
+    assert inv["sda1"]["size_bytes"] == 512 * 1024 ** 3
+    assert readiness._list_external_ext4_partitions() == []
+
+
+def test_check_external_drive_uses_inventory(sysfs, monkeypatch):
+    formatted = []
+    monkeypatch.setattr(readiness, "format_drive", lambda d: formatted.append(d))
+    monkeypatch.setattr(readiness, "safe_run", lambda *a, **kw: None)
+    monkeypatch.setattr(readiness.time, "sleep", lambda s: None)
+    # nvme0n1: 1TiB exfat -> reformat. sda2 is vfat but tiny, so left alone.
+    assert readiness.check_external_drive() is True
+    assert formatted == ["/dev/nvme0n1"]
+    assert not any(c[:2] == ["sudo", "blkid"] for c in sysfs)
+    assert readiness._block_inventory_cache is None
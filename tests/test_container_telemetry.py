@@ -0,0 +1,116 @@
+"""Container cgroup telemetry — sample_containers() / container_resources()
+in readiness-check.py and the resources block on /run/fula-containers.state.
+
+A fake cgroup v2 tree (systemd driver layout) lives in tmp_path; counters are
+rewritten between samples. `docker ps` / `docker inspect` go through
+conftest's recorded_run.
+"""
+
+import json
+import os
+
+import jsonschema
+import pytest
+
+from conftest import readiness, _LINUX_DIR
+
+_DIAG_SCHEMA_PATH = os.path.join(_LINUX_DIR, "plugins", "blox-ai", "api", "diag_responses.schema.json")
+
+
+@pytest.fixture
+def scope(tmp_path, monkeypatch, recorded_run, events_log):
+    """cgroup directory of the one running container, ipfs_host."""
+    scope = tmp_path / "cgroup" / "system.slice" / "docker-aaa111.scope"
+    scope.mkdir(parents=True)
+
+    def respond(cmd):
+        if cmd[:3] == ["sudo", "docker", "ps"]:
+            return 0, "ipfs_host aaa111\n"
+        if cmd[-1] == "ipfs_host":
+            return 0, "running|false|0|ipfs/kubo:latest|2026-10-18T07:00:00Z"
+        return 1, ""
+
+    recorded_run.respond = respond
+    monkeypatch.setattr(readiness, "_SYS_FS_CGROUP", str(tmp_path / "cgroup"))
+    monkeypatch.setattr(readiness, "CONTAINERS_STATE_PATH", str(tmp_path / "containers.state"))
+    monkeypatch.setattr(readiness, "CONTAINER_SAMPLE_INTERVAL_SEC", 15)
+    monkeypatch.setattr(readiness, "CONTAINER_WINDOW_SEC", 60)
+    monkeypatch.setattr(readiness, "_container_ids", {})
+    monkeypatch.setattr(readiness, "_container_ids_refreshed", 0.0)
+    monkeypatch.setattr(readiness, "_container_samples", {})
+    monkeypatch.setattr(readiness, "_container_warned", {})
+    monkeypatch.setattr(readiness, "_container_inspect", None)
+    return scope
+
+
+def _write(scope, usage_usec, rbytes, wbytes, memory, high=0, max_=0, some60=0.0):
+    (scope / "memory.current").write_text(f"{memory}\n")
+    (scope / "memory.peak").write_text(f"{memory + 1000}\n")
+    (scope / "memory.high").write_text("max\n")
+    (scope / "memory.max").write_text("1073741824\n")
+    (scope / "memory.stat").write_text(f"anon {memory // 2}\nfile {memory // 2}\n")
+    (scope / "memory.events").write_text(f"low 0\nhigh {high}\nmax {max_}\noom 0\noom_kill 0\n")
+    (scope / "memory.pressure").write_text(
+        f"some avg10=0.00 avg60={some60:.2f} avg300=0.00 total=100\n"
+        "full avg10=0.00 avg60=0.00 avg300=0.00 total=10\n")
+    (scope / "cpu.stat").write_text(f"usage_usec {usage_usec}\nuser_usec 1\nsystem_usec 1\n"
+                                     "nr_throttled 0\nthrottled_usec 0\n")
+    (scope / "io.stat").write_text(
+        f"179:0 rbytes={rbytes} wbytes={wbytes} rios=10 wios=20 dbytes=0 dios=0\n"
+        "8:0 rbytes=0 wbytes=0 rios=0 wios=0 dbytes=0 dios=0\n")
+
+
+def test_rates_over_window(scope, recorded_run):
+    _write(scope, usage_usec=0, rbytes=0, wbytes=0, memory=100 << 20)
+    readiness.sample_containers(now=1000)
+    _write(scope, usage_usec=30_000_000, rbytes=3_000_000, wbytes=6_000_000, memory=200 << 20)
+    readiness.sample_containers(now=1030)
+    res = readiness.container_resources("ipfs_host")
+    assert res["cpu_cores"] == 1.0
+    assert (res["read_bps"], res["write_bps"]) == (100_000, 200_000)
+    assert res["memory_bytes"] == 200 << 20 and res["anon_bytes"] == 100 << 20
+    assert res["memory_max_bytes"] == 1073741824 and "memory_high_bytes" not in res
+    assert (res["samples"], res["window_s"]) == (2, 30)
+    # Only one docker ps for the lookup; other containers are absent.
+    assert sum(1 for c in recorded_run.calls if c[:3] == ["sudo", "docker", "ps"]) == 1
+    assert readiness.container_resources("fula_go") is None
+
+
+def test_memory_events_and_psi_warn_once_per_cooldown(scope, events_log):
+    _write(scope, 0, 0, 0, memory=100 << 20)
+    readiness.sample_containers(now=1000)
+    _write(scope, 0, 0, 0, memory=900 << 20, high=4, some60=25.0)
+    readiness.sample_containers(now=1015)
+    _write(scope, 0, 0, 0, memory=950 << 20, high=9, some60=30.0)
+    readiness.sample_containers(now=1030)
+    events = events_log()
+    assert [e["category"] for e in events] == ["container_memory_pressure", "container_memory_events"]
+    assert events[1]["detail"]["climbed"] == {"high": 4}
+    assert events[0]["detail"]["name"] == "ipfs_host"
+    assert readiness.container_resources("ipfs_host")["memory_events_window"]["high"] == 9
+
+
+def test_recreated_container_starts_a_new_ring(scope, tmp_path):
+    _write(scope, 50_000_000, 0, 0, memory=100 << 20)
+    readiness.sample_containers(now=1000)
+    new_scope = scope.parent / "docker-bbb222.scope"
+    new_scope.mkdir()
+    _write(new_scope, 1_000_000, 0, 0, memory=100 << 20)
+    scope.rename(tmp_path / "gone")
+    readiness._container_ids = {"ipfs_host": "bbb222"}
+    readiness.sample_containers(now=1015)
+    assert readiness.container_resources("ipfs_host")["samples"] == 1
+
+
+def test_containers_state_carries_resources_and_matches_schema(scope, tmp_path):
+    _write(scope, 0, 0, 0, memory=100 << 20)
+    readiness.sample_containers(now=1000)
+    _write(scope, 15_000_000, 0, 1_500_000, memory=120 << 20)
+    readiness.sample_containers(now=1015)
+    readiness.check_container_oom()
+    state = json.loads((tmp_path / "containers.state").read_text())
+    assert [c["name"] for c in state["containers"]] == ["ipfs_host"]
+    assert state["containers"][0]["resources"]["write_bps"] == 100_000
+    with open(_DIAG_SCHEMA_PATH) as f:
+        schema = json.load(f)
+    jsonschema.validate(state, {**schema, "$ref": "#/$defs/containers"})
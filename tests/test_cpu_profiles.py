@@ -0,0 +1,139 @@
+"""CPU performance profiles — select_cpu_profile() / maybe_switch_cpu_profile()
+in readiness-check.py.
+
+A fake RK3588 cpufreq tree (policy0 little, policy4/policy6 big) lives in
+tmp_path; docker update / inspect go through conftest's recorded_run.
+"""
+
+import json
+
+import pytest
+
+from conftest import readiness
+
+LITTLE_FREQS = "408000 600000 816000 1008000 1200000 1416000 1608000 1800000"
+BIG_FREQS = "408000 816000 1200000 1608000 2016000 2208000 2352000"
+
+
+@pytest.fixture
+def cpufreq(tmp_path, monkeypatch, recorded_run, events_log):
+    root = tmp_path / "cpufreq"
+    for name, cpus, freqs in (("policy0", "0 1 2 3", LITTLE_FREQS),
+                              ("policy4", "4 5", BIG_FREQS),
+                              ("policy6", "6 7", BIG_FREQS)):
+        p = root / name
+        p.mkdir(parents=True)
+        (p / "related_cpus").write_text(cpus + "\n")
+        (p / "cpuinfo_min_freq").write_text("408000\n")
+        (p / "cpuinfo_max_freq").write_text(freqs.split()[-1] + "\n")
+        (p / "scaling_available_frequencies").write_text(freqs + "\n")
+        (p / "scaling_available_governors").write_text("ondemand userspace performance schedutil\n")
+        (p / "scaling_governor").write_text("schedutil\n")
+        (p / "scaling_min_freq").write_text("408000\n")
+        (p / "scaling_max_freq").write_text(freqs.split()[-1] + "\n")
+    # fula_gateway is not running on this box.
+    recorded_run.respond = lambda cmd: (1, "") if cmd[-1] == "fula_gateway" else None
+    monkeypatch.setattr(readiness, "_SYS_CPUFREQ_GLOB", str(root / "policy*"))
+    monkeypatch.setattr(readiness, "CPU_PROFILE_STATE_PATH", str(tmp_path / "cpu-profile.state"))
+    monkeypatch.setattr(readiness, "_CPU_PROFILES_ENABLED", True)
+    monkeypatch.setattr(readiness, "_cpu_profile", None)
+    monkeypatch.setattr(readiness, "_cpu_profile_since", 0.0)
+    monkeypatch.setattr(readiness, "_cpu_profile_ai_usage", None)
+    monkeypatch.setattr(readiness, "_container_ids", {})
+    monkeypatch.setattr(readiness, "_blox_ai_cpu_pct", lambda now: None)
+    return root
+
+
+def _summary(p95, past=0):
+    return {"thermal": {"p95": p95, "past_threshold_s": past}}
+
+
+def _state(tmp_path):
+    return json.loads((tmp_path / "cpu-profile.state").read_text())
+
+
+def test_topology_splits_big_and_little(cpufreq):
+    topo = readiness._cpu_topology()
+    assert (topo["big"], topo["little"], topo["all"]) == ("4-7", "0-3", "0-7")
+    assert topo["policies"][str(cpufreq / "policy0")] == "little"
+
+
+@pytest.mark.parametrize("summary,ai,current,expected", [
+    ({}, None, None, "serving"),
+    (_summary(60.0), 30.0, None, "ai_inference"),
+    (_summary(60.0), 10.0, "ai_inference", "ai_inference"),   # hysteresis
+    (_summary(60.0), 5.0, "ai_inference", "serving"),
+    (_summary(76.0), 30.0, "ai_inference", "thermal_limited"),
+    (_summary(60.0, past=120), None, None, "thermal_limited"),
+    (_summary(72.0), None, "thermal_limited", "thermal_limited"),  # cooling
+    (_summary(68.0), None, "thermal_limited", "serving"),
+])
+def test_select_cpu_profile(summary, ai, current, expected):
+    assert readiness.select_cpu_profile(summary, ai, current)[0] == expected
+
+
+def test_thermal_profile_caps_big_cores_and_moves_ai(cpufreq, recorded_run, events_log, tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "power_summary", lambda: _summary(78.0))
+    readiness.maybe_switch_cpu_profile(now=1000)
+    big, little = cpufreq / "policy4", cpufreq / "policy0"
+    # 70% of 2352000 -> highest available at or below 1646400.
+    assert (big / "scaling_max_freq").read_text() == "1608000"
+    assert (little / "scaling_max_freq").read_text() == "1800000"
+    assert ["sudo", "docker", "update", "--cpu-shares", "256", "--cpuset-cpus", "0-3",
+            "blox-ai"] in recorded_run.calls
+    event = events_log("cpu-profile")[-1]
+    assert (event["detail"]["from"], event["detail"]["to"]) == (None, "thermal_limited")
+    assert event["detail"]["metrics"]["thermal_p95_c"] == 78.0
+    # Missing containers are skipped rather than failing the switch.
+    assert "fula_gateway" not in event["detail"]["containers"]
+    state = _state(tmp_path)
+    assert (state["profile"], state["recommended"]) == ("thermal_limited", "thermal_limited")
+
+
+def test_userspace_pinned_policy_is_left_alone(cpufreq, events_log):
+    (cpufreq / "policy6" / "scaling_governor").write_text("userspace\n")
+    readiness.apply_cpu_profile("ai_inference", now=1000)
+    assert (cpufreq / "policy4" / "scaling_governor").read_text() == "performance"
+    assert (cpufreq / "policy6" / "scaling_governor").read_text() == "userspace\n"
+    assert set(events_log("cpu-profile")[-1]["detail"]["cpufreq"]) == {"policy0", "policy4"}
+
+
+def test_dwell_time_holds_profile_except_for_thermal(cpufreq, events_log, tmp_path, monkeypatch):
+    summary = {"value": {}}
+    ai = {"value": 40.0}
+    monkeypatch.setattr(readiness, "power_summary", lambda: summary["value"])
+    monkeypatch.setattr(readiness, "_blox_ai_cpu_pct", lambda now: ai["value"])
+    readiness.maybe_switch_cpu_profile(now=1000)
+    assert readiness._cpu_profile == "ai_inference"
+    ai["value"] = 0.0
+    readiness.maybe_switch_cpu_profile(now=1060)
+    assert readiness._cpu_profile == "ai_inference"
+    state = _state(tmp_path)
+    assert state["recommended"] == "serving" and "dwell" in state["reason"]
+    summary["value"] = _summary(79.0)
+    readiness.maybe_switch_cpu_profile(now=1090)
+    assert readiness._cpu_profile == "thermal_limited"
+    assert [e["detail"]["to"] for e in events_log("cpu-profile")] == ["ai_inference", "thermal_limited"]
+
+
+def test_disabled_only_recommends(cpufreq, recorded_run, events_log, tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "_CPU_PROFILES_ENABLED", False)
+    monkeypatch.setattr(readiness, "power_summary", lambda: _summary(79.0))
+    readiness.maybe_switch_cpu_profile(now=1000)
+    assert recorded_run.calls == [] and events_log() == []
+    state = _state(tmp_path)
+    assert (state["enabled"], state["profile"], state["recommended"]) == (False, None, "thermal_limited")
+
+
+def test_blox_ai_cpu_share_from_cgroup(tmp_path, monkeypatch):
+    scope = tmp_path / "system.slice" / "docker-abc123.scope"
+    scope.mkdir(parents=True)
+    monkeypatch.setattr(readiness, "_SYS_FS_CGROUP", str(tmp_path))
+    monkeypatch.setattr(readiness, "_container_ids", {"blox-ai": "abc123"})
+    monkeypatch.setattr(readiness, "_cpu_profile_ai_usage", None)
+    monkeypatch.setattr(readiness.os, "cpu_count", lambda: 8)
+    (scope / "cpu.stat").write_text("usage_usec 1000000\nuser_usec 900000\n")
+    assert readiness._blox_ai_cpu_pct(100.0) is None
+    # 4 CPU-seconds over 2s on 8 cores = 25% of the machine.
+    (scope / "cpu.stat").write_text("usage_usec 5000000\nuser_usec 4500000\n")
+    assert readiness._blox_ai_cpu_pct(102.0) == 25.0
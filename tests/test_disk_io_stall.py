@@ -0,0 +1,244 @@
+"""/proc/diskstats sampler in readiness-check.py — I/O stall detection and
+per-branch rolling aggregates.
+
+diskstats and /sys/block are redirected to tmp_path fixtures; sample times
+are passed explicitly so stall durations are deterministic.
+"""
+
+import json
+
+import pytest
+
+from conftest import readiness
+
+
+def _diskstats_line(name, reads=0, sectors_read=0, read_ms=0, writes=0,
+                    sectors_written=0, write_ms=0, in_flight=0, io_ms=0):
+    # major minor name + 11 classic fields (+ discard/flush fields on newer kernels)
+    fields = [reads, 0, sectors_read, read_ms, writes, 0, sectors_written,
+              write_ms, in_flight, io_ms, read_ms + write_ms, 0, 0, 0, 0]
+    return "   8       0 %s %s\n" % (name, " ".join(str(v) for v in fields))
+
+
+@pytest.fixture
+def io_env(tmp_path, monkeypatch):
+    diskstats = tmp_path / "diskstats"
+    sys_block = tmp_path / "block"
+    sys_block.mkdir()
+    state_path = tmp_path / "fula-io.state"
+    monkeypatch.setattr(readiness, "_DISKSTATS_PATH", str(diskstats))
+    monkeypatch.setattr(readiness, "_SYS_BLOCK_PATH", str(sys_block))
+    monkeypatch.setattr(readiness, "IO_STATE_PATH", str(state_path))
+    monkeypatch.setattr(readiness, "IO_STALL_THRESHOLD_SEC", 60)
+    monkeypatch.setattr(readiness, "_get_boot_disk", lambda: "mmcblk0")
+    monkeypatch.setattr(readiness, "_io_prev_sample", {})
+    monkeypatch.setattr(readiness, "_io_stall_since", {})
+
+    class Env:
+        def write(self, *lines):
+            diskstats.write_text("".join(lines))
+
+        def inflight(self, disk, reads, writes, partitions=()):
+            d = sys_block / disk
+            d.mkdir(exist_ok=True)
+            (d / "inflight").write_text(f"{reads} {writes}\n")
+            for p in partitions:
+                (d / p).mkdir(exist_ok=True)
+
+        def state(self):
+            return json.loads(state_path.read_text())
+
+    return Env()
+
+
+def test_sample_computes_rates(io_env):
+    io_env.write(_diskstats_line("sda", reads=100, sectors_read=800, read_ms=100,
+                                 writes=50, sectors_written=400, write_ms=50, io_ms=0))
+    readiness.sample_disk_io(now=1000.0)
+    io_env.write(_diskstats_line("sda", reads=200, sectors_read=1800, read_ms=300,
+                                 writes=150, sectors_written=2400, write_ms=250, io_ms=5000))
+    disks = readiness.sample_disk_io(now=1010.0)
+    sda = disks["sda"]
+    assert sda["read_iops"] == 10.0
+    assert sda["write_iops"] == 10.0
+    assert sda["read_bps"] == 1000 * 512 // 10
+    assert sda["write_bps"] == 2000 * 512 // 10
+    assert sda["await_ms"] == 2.0  # 400ms over 200 I/Os
+    assert sda["util_pct"] == 50.0
+    assert sda["stalled_sec"] == 0
+
+
+def test_sample_skips_boot_disk_partitions_and_loops(io_env):
+    io_env.write(
+        _diskstats_line("mmcblk0"),
+        _diskstats_line("sda"),
+        _diskstats_line("sda1"),
+        _diskstats_line("nvme0n1"),
+        _diskstats_line("loop0"),
+    )
+    disks = readiness.sample_disk_io(now=1.0)
+    assert sorted(disks) == ["nvme0n1", "sda"]
+
+
+def test_stall_tracked_and_written_to_state(io_env):
+    io_env.inflight("sda", 3, 1)
+    line = _diskstats_line("sda", reads=500, writes=200, in_flight=4)
+    io_env.write(line)
+    readiness.sample_disk_io(now=100.0)
+    readiness.sample_disk_io(now=130.0)
+    assert io_env.state()["disks"]["sda"]["stalled_sec"] == 30
+    assert io_env.state()["stalled"] == []
+    readiness.sample_disk_io(now=165.0)
+    state = io_env.state()
+    assert state["disks"]["sda"]["in_flight"] == 4
+    assert state["disks"]["sda"]["stalled_sec"] == 65
+    assert state["stalled"] == ["sda"]
+
+
+def test_completions_clear_stall(io_env):
+    io_env.inflight("sda", 1, 0)
+    io_env.write(_diskstats_line("sda", reads=500, in_flight=1))
+    readiness.sample_disk_io(now=0.0)
+    readiness.sample_disk_io(now=70.0)
+    assert "sda" in readiness._io_stall_since
+    io_env.write(_diskstats_line("sda", reads=501, in_flight=1))
+    disks = readiness.sample_disk_io(now=75.0)
+    assert disks["sda"]["stalled_sec"] == 0
+    assert "sda" not in readiness._io_stall_since
+
+
+def test_idle_disk_is_not_stalled(io_env):
+    io_env.inflight("sda", 0, 0)
+    io_env.write(_diskstats_line("sda", reads=500))
+    readiness.sample_disk_io(now=0.0)
+    disks = readiness.sample_disk_io(now=600.0)
+    assert disks["sda"]["stalled_sec"] == 0
+
+
+def test_removed_disk_history_is_dropped(io_env):
+    io_env.inflight("sdb", 1, 0)
+    io_env.write(_diskstats_line("sdb", in_flight=1))
+    readiness.sample_disk_io(now=0.0)
+    readiness.sample_disk_io(now=90.0)
+    io_env.write(_diskstats_line("sda"))
+    readiness.sample_disk_io(now=95.0)
+    assert "sdb" not in readiness._io_prev_sample
+    assert "sdb" not in readiness._io_stall_since
+
+
+def test_detect_io_dead_drive_returns_stalled_sd_disk(io_env, monkeypatch):
+    io_env.inflight("sdb", 2, 0, partitions=("sdb2", "sdb10"))
+    io_env.write(_diskstats_line("sdb", reads=7, in_flight=2))
+    readiness.sample_disk_io(now=0.0)
+    monkeypatch.setattr(readiness.time, "monotonic", lambda: 120.0)
+    assert readiness._detect_io_dead_drive() == ("/dev/sdb2", "sdb2", "sdb")
+
+
+def test_detect_io_dead_drive_ignores_nvme_and_short_stalls(io_env, monkeypatch):
+    io_env.inflight("nvme0n1", 1, 0)
+    io_env.inflight("sda", 1, 0)
+    io_env.write(_diskstats_line("nvme0n1", in_flight=1), _diskstats_line("sda", in_flight=1))
+    readiness.sample_disk_io(now=0.0)
+    readiness._io_stall_since["sda"] = 100.0
+    monkeypatch.setattr(readiness.time, "monotonic", lambda: 120.0)
+    assert readiness._detect_io_dead_drive() == (None, None, None)
+
+
+def test_detect_io_dead_drive_defaults_partition(io_env, monkeypatch):
+    io_env.inflight("sdc", 1, 0)
+    io_env.write(_diskstats_line("sdc", in_flight=1))
+    readiness.sample_disk_io(now=0.0)
+    monkeypatch.setattr(readiness.time, "monotonic", lambda: 61.0)
+    assert readiness._detect_io_dead_drive() == ("/dev/sdc1", "sdc1", "sdc")
+
+
+def test_missing_diskstats_writes_empty_state(io_env):
+    assert readiness.sample_disk_io(now=0.0) == {}
+    assert io_env.state()["disks"] == {}
+
+
+# ---------------------------------------------------------------------------
+# Per-branch rolling aggregates — /run/fula-storage.state
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def branch_env(tmp_path, monkeypatch):
+    state_path = tmp_path / "fula-storage.state"
+    monkeypatch.setattr(readiness, "STORAGE_STATE_PATH", str(state_path))
+    monkeypatch.setattr(readiness, "_branch_fine", {})
+    monkeypatch.setattr(readiness, "_branch_coarse", {})
+    monkeypatch.setattr(readiness, "_branch_devices", {})
+    monkeypatch.setattr(readiness, "_last_storage_state_write", None)
+    mounts = {"/media/pi/disk1": "sda1", "/media/pi/disk2": "sdb1"}
+    monkeypatch.setattr(readiness, "_list_mounted_branches", lambda: dict(mounts))
+    return mounts, state_path
+
+
+def _counters(reads=0, writes=0, sectors_read=0, sectors_written=0,
+              read_ms=0, write_ms=0, io_ms=0):
+    return {"reads": reads, "sectors_read": sectors_read, "read_ms": read_ms,
+            "writes": writes, "sectors_written": sectors_written,
+            "write_ms": write_ms, "in_flight": 0, "io_ms": io_ms}
+
+
+def test_branch_windows_use_trailing_span(branch_env):
+    # sda1 does 1 read/s for 30 min; windows report rates over their own span.
+    for t in range(0, 1801, 5):
+        readiness.sample_branch_io(now=float(t), stats={
+            "sda1": _counters(reads=t, sectors_read=t * 8, read_ms=t * 4, io_ms=t * 100),
+            "sdb1": _counters(),
+        })
+    branches = readiness.sample_branch_io(now=1805.0, stats={
+        "sda1": _counters(reads=1805, sectors_read=1805 * 8, read_ms=1805 * 4, io_ms=1805 * 100),
+        "sdb1": _counters(),
+    })
+    w = branches["/media/pi/disk1"]["windows"]
+    assert branches["/media/pi/disk1"]["device"] == "/dev/sda1"
+    assert w["1m"]["span_s"] == 60
+    assert w["15m"]["span_s"] == 900
+    assert w["24h"]["span_s"] == 1805
+    for label in ("1m", "15m", "24h"):
+        assert w[label]["read_iops"] == 1.0
+        assert w[label]["read_bps"] == 8 * 512
+        assert w[label]["await_ms"] == 4.0
+        assert w[label]["util_pct"] == 10.0
+    idle = branches["/media/pi/disk2"]["windows"]["1m"]
+    assert idle["read_iops"] == 0.0 and idle["await_ms"] is None
+
+
+def test_branch_state_write_is_throttled(branch_env):
+    _mounts, state_path = branch_env
+    stats = {"sda1": _counters(), "sdb1": _counters()}
+    readiness.sample_branch_io(now=0.0, stats=stats)
+    first = json.loads(state_path.read_text())
+    assert first["branches"]["/media/pi/disk1"]["windows"]["1m"] is None
+    readiness.sample_branch_io(now=10.0, stats=stats)
+    assert json.loads(state_path.read_text()) == first
+    readiness.sample_branch_io(now=30.0, stats=stats)
+    assert json.loads(state_path.read_text())["branches"]["/media/pi/disk1"]["windows"]["1m"]["span_s"] == 30
+
+
+def test_branch_history_resets_when_device_changes(branch_env):
+    mounts, _state_path = branch_env
+    readiness.sample_branch_io(now=0.0, stats={"sda1": _counters(reads=900)})
+    mounts["/media/pi/disk1"] = "sdc1"
+    branches = readiness.sample_branch_io(now=5.0, stats={"sdc1": _counters(reads=3)})
+    assert branches["/media/pi/disk1"]["device"] == "/dev/sdc1"
+    assert branches["/media/pi/disk1"]["windows"]["1m"] is None
+    assert "/media/pi/disk2" not in readiness._branch_devices
+
+
+def test_branch_state_validates_against_diag_storage_schema(branch_env):
+    jsonschema = pytest.importorskip("jsonschema")
+    import os
+    schema_path = os.path.join(os.path.dirname(readiness.__file__),
+                               "plugins", "blox-ai", "api", "diag_responses.schema.json")
+    with open(schema_path) as f:
+        diag = json.load(f)
+    readiness.sample_branch_io(now=0.0, stats={"sda1": _counters(), "sdb1": _counters()})
+    branches = readiness.sample_branch_io(now=60.0, stats={
+        "sda1": _counters(reads=60, writes=30, sectors_read=480, io_ms=6000),
+        "sdb1": _counters(),
+    })
+    payload = {"df": {}, "ext4_errors_count": 0, "dmesg_io_errors_1h": 0, "branches": branches}
+    jsonschema.validate(payload, {**diag["$defs"]["storage"], "$defs": diag["$defs"]})
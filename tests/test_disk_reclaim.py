@@ -0,0 +1,155 @@
+"""Tiered disk reclamation — reclaim_disk_space() in readiness-check.py.
+
+Tier selection/ordering is driven with fake tiers and a scripted free-space
+counter; the docker image and container-log tiers are exercised against a
+fake `docker image ls` and a docker root under tmp_path.
+"""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from conftest import readiness
+
+GB = 1024 ** 3
+
+
+@pytest.fixture
+def reclaim_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(tmp_path / "events.jsonl"))
+    monkeypatch.setattr(readiness, "UNIONDRIVE_PATH", str(tmp_path / "uniondrive"))
+    monkeypatch.setattr(readiness, "_list_mounted_branches", lambda: {})
+    full = tmp_path / "full"
+    other = tmp_path / "other"
+    full.mkdir()
+    other.mkdir()
+    free = {"bytes": 0}
+    monkeypatch.setattr(readiness, "_free_bytes", lambda path: free["bytes"])
+    real_stat = readiness.os.stat
+
+    def stat(path, *a, **kw):
+        st = real_stat(path, *a, **kw)
+        if str(path).startswith(str(other)):
+            return MagicMock(st_dev=st.st_dev + 1)
+        return st
+
+    monkeypatch.setattr(readiness.os, "stat", stat)
+    ran = []
+
+    def tier(name, data_dir, estimate, frees):
+        def run(done):
+            ran.append(name)
+            free["bytes"] += frees
+        return (name, lambda: str(data_dir), lambda: estimate, run)
+
+    def events():
+        return [json.loads(l) for l in (tmp_path / "events.jsonl").read_text().splitlines()]
+
+    return {"full": full, "other": other, "free": free, "ran": ran,
+            "tier": tier, "events": events, "monkeypatch": monkeypatch}
+
+
+def _tiers(env, *tiers):
+    env["monkeypatch"].setattr(readiness, "_RECLAIM_TIERS", tiers)
+
+
+def test_stops_once_target_reached(reclaim_env):
+    t = reclaim_env["tier"]
+    full = reclaim_env["full"]
+    _tiers(reclaim_env, t("a", full, 2 * GB, 2 * GB), t("b", full, GB, GB))
+    summary = readiness.reclaim_disk_space(str(full), target_free_gb=1)
+    assert summary["ok"] is True
+    assert reclaim_env["ran"] == ["a"]
+    assert summary["tiers"] == [{"tier": "a", "estimate_bytes": 2 * GB,
+                                 "duration_s": summary["tiers"][0]["duration_s"],
+                                 "reclaimed_bytes": 2 * GB}]
+
+
+def test_other_filesystem_and_empty_tiers_are_skipped(reclaim_env):
+    t = reclaim_env["tier"]
+    full = reclaim_env["full"]
+    _tiers(reclaim_env,
+           t("elsewhere", reclaim_env["other"], 5 * GB, 5 * GB),
+           t("empty", full, 0, 0),
+           t("small", full, GB // 2, GB // 2))
+    summary = readiness.reclaim_disk_space(str(full), target_free_gb=1)
+    assert summary["ok"] is False
+    assert reclaim_env["ran"] == ["small"]
+    assert [(r["tier"], r.get("skipped")) for r in summary["tiers"]] == [
+        ("elsewhere", "other filesystem"), ("empty", "nothing to reclaim"), ("small", None),
+    ]
+    (event,) = reclaim_env["events"]()
+    assert event["category"] == "disk-reclaim"
+    assert event["detail"]["end_free_bytes"] == GB // 2
+
+
+def test_unknown_estimate_still_runs_and_errors_are_recorded(reclaim_env):
+    t = reclaim_env["tier"]
+    full = reclaim_env["full"]
+
+    def boom(done):
+        raise RuntimeError("api down")
+
+    _tiers(reclaim_env, ("broken", lambda: str(full), lambda: 1, boom),
+           t("gc", full, None, 2 * GB))
+    summary = readiness.reclaim_disk_space(str(full), target_free_gb=1)
+    assert summary["ok"] is True
+    assert summary["tiers"][0]["error"] == "RuntimeError: api down"
+    assert summary["tiers"][1]["estimate_bytes"] is None
+    assert reclaim_env["ran"] == ["gc"]
+
+
+def test_enough_space_is_a_no_op(reclaim_env):
+    reclaim_env["free"]["bytes"] = 2 * GB
+    _tiers(reclaim_env, reclaim_env["tier"]("a", reclaim_env["full"], GB, GB))
+    assert readiness.reclaim_disk_space(str(reclaim_env["full"]), 1)["ok"] is True
+    assert reclaim_env["ran"] == []
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("1.2GB", 1_200_000_000), ("512MB", 512_000_000), ("7.5kB", 7500), ("0B", 0), ("??", 0),
+])
+def test_parse_docker_size(text, expected):
+    assert readiness._parse_docker_size(text) == expected
+
+
+def test_stale_images_are_old_tags_of_env_repos_only(tmp_path, monkeypatch):
+    env = tmp_path / ".env"
+    env.write_text("GO_FULA=functionland/go-fula:release\n"
+                   "FX_SUPPROT=functionland/fxsupport:release\n"
+                   "CURRENT_USER=pi\n")
+    monkeypatch.setattr(readiness, "ENV_FILE_PATH", str(env))
+    listing = "\n".join([
+        "aaa|functionland/go-fula|release|300MB",
+        "bbb|functionland/go-fula|test147|310MB",
+        "ccc|<none>|<none>|120MB",
+        "ddd|ipfs/kubo|release|90MB",
+        "eee|functionland/fxsupport|release|20MB",
+        "fff|functionland/fxsupport|<none>|19MB",
+        "ggg|functionland/blox-ai|<none>|2GB",
+    ])
+    monkeypatch.setattr(readiness.subprocess, "run",
+                        lambda *a, **kw: MagicMock(returncode=0, stdout=listing, stderr=""))
+    assert readiness._stale_fula_images() == [
+        ("bbb", 310_000_000, "functionland/go-fula:test147"),
+        ("fff", 19_000_000, "functionland/fxsupport:<none>"),
+    ]
+
+
+def test_container_log_tier_truncates_largest_first(tmp_path, monkeypatch):
+    root = tmp_path / "docker"
+    for cid, size in (("c1", 300), ("c2", 50), ("c3", 500)):
+        (root / "containers" / cid).mkdir(parents=True)
+        (root / "containers" / cid / f"{cid}-json.log").write_bytes(b"x" * size)
+    monkeypatch.setattr(readiness, "_docker_root_dir", lambda: str(root))
+    monkeypatch.setattr(readiness, "CONTAINER_LOG_CAP_BYTES", 100)
+    logs = readiness._oversized_container_logs()
+    assert [p.split("/")[-2] for p, _s in logs] == ["c3", "c1"]
+
+    biggest = root / "containers" / "c3" / "c3-json.log"
+    # Target counts as reached once the largest log is gone: c1 survives.
+    readiness._reclaim_container_logs(lambda: biggest.stat().st_size == 0)
+    assert biggest.stat().st_size == 0
+    assert (root / "containers" / "c1" / "c1-json.log").stat().st_size == 300
+    assert (root / "containers" / "c2" / "c2-json.log").stat().st_size == 50
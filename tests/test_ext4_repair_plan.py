@@ -0,0 +1,212 @@
+"""ext4 repair planner — check_and_repair_ext4() in readiness-check.py.
+
+Detectors, lockfile and the device-release step are stubbed; subprocess.run
+is replaced with a recorder so the tests can assert how often the stack is
+stopped/started and which partitions reached e2fsck.
+"""
+
+import json
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from conftest import readiness
+
+
+def _target(partition, reason="read_only", io_dead=False, mountpoint="auto"):
+    return {
+        "device": f"/dev/{partition}",
+        "partition_name": partition,
+        "mountpoint": f"/media/pi/{partition}" if mountpoint == "auto" else mountpoint,
+        "disk_name": readiness._disk_of_partition(partition),
+        "io_dead": io_dead,
+        "reason": reason,
+    }
+
+
+@pytest.fixture
+def repair_env(tmp_path, monkeypatch):
+    events_path = tmp_path / "events.jsonl"
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(events_path))
+    monkeypatch.setattr(readiness, "last_fsck_time", 0)
+    monkeypatch.setattr(readiness, "consecutive_fsck_attempts", 0)
+    monkeypatch.setattr(readiness, "_acquire_fsck_lock", lambda: True)
+    monkeypatch.setattr(readiness, "_release_fsck_lock", lambda: None)
+    monkeypatch.setattr(readiness, "safe_start_fula", lambda **kw: MagicMock(returncode=0))
+    monkeypatch.setattr(readiness, "_release_ext4_target", lambda target, scsi_reset: True)
+    monkeypatch.setattr(readiness.time, "sleep", lambda s: None)
+
+    calls = []
+    fsck_exit = {}
+    fsck_hook = []
+
+    def fake_run(args, **kwargs):
+        calls.append(list(args))
+        m = MagicMock(stdout="", stderr="")
+        m.returncode = 0
+        if args[:2] == ["pgrep", "-x"]:
+            m.returncode = 1
+        elif args[:2] == ["sudo", "e2fsck"]:
+            for hook in fsck_hook:
+                hook(args[-1])
+            m.returncode = fsck_exit.get(args[-1], 0)
+        return m
+
+    monkeypatch.setattr(readiness.subprocess, "run", fake_run)
+
+    class Env:
+        def plan(self, targets):
+            monkeypatch.setattr(readiness, "_collect_ext4_repair_targets", lambda: targets)
+
+        def events(self):
+            return [json.loads(l) for l in events_path.read_text().splitlines()]
+
+    env = Env()
+    env.calls = calls
+    env.fsck_exit = fsck_exit
+    env.fsck_hook = fsck_hook
+    return env
+
+
+def _count(calls, *args):
+    return sum(1 for c in calls if c[:len(args)] == list(args))
+
+
+def _fsck_devices(calls):
+    return [c[-1] for c in calls if c[:2] == ["sudo", "e2fsck"]]
+
+
+def test_collect_targets_dedupes_in_priority_order(monkeypatch):
+    monkeypatch.setattr(readiness, "_find_ro_ext4_partitions",
+                        lambda: [("/dev/sda1", "/media/pi/sda1")])
+    monkeypatch.setattr(readiness, "_detect_io_dead_drives",
+                        lambda: [("/dev/sdb1", "sdb1", "sdb")])
+    monkeypatch.setattr(readiness, "_detect_ebadmsg_ext4_partitions",
+                        lambda: [("/dev/sda1", "/media/pi/sda1"), ("/dev/nvme0n1p1", "/media/pi/nvme0n1p1")])
+    monkeypatch.setattr(readiness, "_detect_unmountable_corrupt_ext4",
+                        lambda: [("/dev/sdc1", "sdc1"), ("/dev/sdb1", "sdb1")])
+
+    targets = readiness._collect_ext4_repair_targets()
+    assert [(t["partition_name"], t["reason"], t["disk_name"]) for t in targets] == [
+        ("sda1", "read_only", "sda"),
+        ("sdb1", "io_dead", "sdb"),
+        ("nvme0n1p1", "ebadmsg", "nvme0n1"),
+        ("sdc1", "unmountable", "sdc"),
+    ]
+    assert targets[1]["io_dead"] is True
+
+
+def test_unmountable_joins_the_same_window(repair_env, monkeypatch):
+    """An RO partition and an unmountable one on the same disk are fixed in
+    one outage, not two FSCK_COOLDOWN-separated ones."""
+    monkeypatch.setattr(readiness, "_find_ro_ext4_partitions",
+                        lambda: [("/dev/sda1", "/media/pi/sda1")])
+    monkeypatch.setattr(readiness, "_detect_io_dead_drives", lambda: [])
+    monkeypatch.setattr(readiness, "_detect_ebadmsg_ext4_partitions", lambda: [])
+    monkeypatch.setattr(readiness, "_detect_unmountable_corrupt_ext4",
+                        lambda: [("/dev/sda2", "sda2")])
+
+    assert readiness.check_and_repair_ext4() is True
+    assert _count(repair_env.calls, "sudo", "systemctl", "stop", "docker.service") == 1
+    assert _fsck_devices(repair_env.calls) == ["/dev/sda1", "/dev/sda2"]
+
+
+def test_collect_targets_falls_back_to_unmountable(monkeypatch):
+    monkeypatch.setattr(readiness, "_find_ro_ext4_partitions", lambda: [])
+    monkeypatch.setattr(readiness, "_detect_io_dead_drives", lambda: [])
+    monkeypatch.setattr(readiness, "_detect_ebadmsg_ext4_partitions", lambda: [])
+    monkeypatch.setattr(readiness, "_detect_unmountable_corrupt_ext4",
+                        lambda: [("/dev/sda2", "sda2")])
+    targets = readiness._collect_ext4_repair_targets()
+    assert targets == [_target("sda2", reason="unmountable", mountpoint=None)]
+
+
+def test_two_disks_share_one_window_and_fsck_concurrently(repair_env):
+    repair_env.plan([_target("sda1"), _target("sdb1", reason="ebadmsg")])
+    # Both e2fsck calls must be in flight at once or the barrier times out.
+    barrier = threading.Barrier(2, timeout=5)
+    repair_env.fsck_hook.append(lambda device: barrier.wait())
+
+    assert readiness.check_and_repair_ext4() is True
+
+    calls = repair_env.calls
+    for unit in ("fula.service", "docker.service", "uniondrive.service"):
+        assert _count(calls, "sudo", "systemctl", "stop", unit) == 1
+    assert _count(calls, "sudo", "systemctl", "start", "docker.service") == 1
+    assert _count(calls, "sudo", "systemctl", "start", "uniondrive.service") == 1
+    for part in ("sda1", "sdb1"):
+        assert _count(calls, "sudo", "systemctl", "stop", f"automount@{part}.service") == 1
+        assert _count(calls, "sudo", "systemctl", "start", f"automount@{part}.service") == 1
+    assert sorted(_fsck_devices(calls)) == ["/dev/sda1", "/dev/sdb1"]
+
+    (event,) = repair_env.events()
+    assert event["category"] == "ext4-repair"
+    detail = event["detail"]
+    assert detail["disks"] == ["sda", "sdb"]
+    assert [p["fsck_exit"] for p in detail["partitions"]] == [0, 0]
+    assert [s["step"] for s in detail["steps"]] == [
+        "stop_fula", "stop_docker", "stop_uniondrive", "stop_automount", "fsck",
+        "start_automount", "start_docker", "start_uniondrive", "start_fula",
+    ]
+    assert detail["downtime_s"] >= 0
+    assert readiness.consecutive_fsck_attempts == 0
+    assert readiness.last_fsck_time > 0
+
+
+def test_partitions_on_same_disk_run_sequentially(repair_env):
+    repair_env.plan([_target("sda1"), _target("sda2")])
+    threads = []
+    repair_env.fsck_hook.append(lambda device: threads.append(threading.current_thread().name))
+    readiness.check_and_repair_ext4()
+    assert _fsck_devices(repair_env.calls) == ["/dev/sda1", "/dev/sda2"]
+    assert threads == ["ext4-repair-sda", "ext4-repair-sda"]
+
+
+def test_unclean_fsck_counts_toward_replace_threshold(repair_env):
+    repair_env.plan([_target("sda1"), _target("sdb1")])
+    repair_env.fsck_exit["/dev/sdb1"] = 4
+    readiness.check_and_repair_ext4()
+    assert readiness.consecutive_fsck_attempts == 1
+    (event,) = repair_env.events()
+    assert {p["device"]: p["fsck_exit"] for p in event["detail"]["partitions"]} == {
+        "/dev/sda1": 0, "/dev/sdb1": 4,
+    }
+
+
+def test_unreleasable_partition_is_skipped_but_others_repaired(repair_env, monkeypatch):
+    repair_env.plan([_target("sda1"), _target("sdb1")])
+    monkeypatch.setattr(readiness, "_release_ext4_target",
+                        lambda target, scsi_reset: target["partition_name"] != "sda1")
+    assert readiness.check_and_repair_ext4() is True
+    assert _fsck_devices(repair_env.calls) == ["/dev/sdb1"]
+    (event,) = repair_env.events()
+    assert {p["device"]: p["fsck_exit"] for p in event["detail"]["partitions"]} == {
+        "/dev/sda1": "unavailable", "/dev/sdb1": 0,
+    }
+
+
+def test_scsi_reset_runs_once_per_disk(monkeypatch):
+    resets = []
+    monkeypatch.setattr(readiness, "_reset_scsi_drive", lambda disk: resets.append(disk) or True)
+    monkeypatch.setattr(readiness, "_run_e2fsck", lambda device: 0)
+
+    def release(target, scsi_reset):
+        return scsi_reset(target["disk_name"])
+
+    monkeypatch.setattr(readiness, "_release_ext4_target", release)
+    results = readiness._repair_ext4_disk([
+        _target("sda1", reason="io_dead", io_dead=True),
+        _target("sda2", reason="io_dead", io_dead=True),
+    ])
+    assert resets == ["sda"]
+    assert [r["fsck_exit"] for r in results] == [0, 0]
+
+
+def test_no_targets_or_cooldown_skips(repair_env, monkeypatch):
+    repair_env.plan([])
+    assert readiness.check_and_repair_ext4() is False
+    repair_env.plan([_target("sda1")])
+    monkeypatch.setattr(readiness, "last_fsck_time", readiness.time.time())
+    assert readiness.check_and_repair_ext4() is False
+    assert repair_env.calls == []
@@ -0,0 +1,146 @@
+"""Targeted flatfs repair — repair_flatfs_blocks() in readiness-check.py.
+
+Runs against a real blocks tree under tmp_path (no mergerfs branches, so the
+repair scans blocks_dir itself and quarantines next to it).
+"""
+
+import errno
+import json
+import os
+
+import pytest
+
+from conftest import readiness
+
+SHARD_FUNC = "/repo/flatfs/shard/v1/next-to-last/2"
+
+
+@pytest.fixture
+def flatfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(tmp_path / "events.jsonl"))
+    monkeypatch.setattr(readiness, "UNIONDRIVE_PATH", str(tmp_path / "uniondrive"))
+    monkeypatch.setattr(readiness, "_list_mounted_branches", lambda: {})
+    blocks = tmp_path / "ipfs_datastore" / "blocks"
+    blocks.mkdir(parents=True)
+    return blocks
+
+
+def _put(blocks, key, shard=None, data=b"block"):
+    shard = shard or readiness._flatfs_shard_of(key, "next-to-last", 2)
+    d = blocks / shard
+    d.mkdir(exist_ok=True)
+    (d / f"{key}.data").write_bytes(data)
+    return d / f"{key}.data"
+
+
+@pytest.mark.parametrize("kind,key,expected", [
+    ("next-to-last", "CIQABCDEFGHX3Z", "X3"),
+    ("next-to-last", "A", "__"),
+    ("prefix", "CIQA", "CI"),
+    ("prefix", "C", "C_"),
+    ("suffix", "CIQAXY", "XY"),
+])
+def test_shard_of_matches_go_ds_flatfs(kind, key, expected):
+    assert readiness._flatfs_shard_of(key, kind, 2) == expected
+
+
+@pytest.mark.parametrize("value,expected", [
+    (SHARD_FUNC, ("next-to-last", 2)),
+    ("/repo/flatfs/shard/v1/prefix/4", ("prefix", 4)),
+    ("/repo/flatfs/shard/v1/bogus/2", None),
+    ("next-to-last/2", None),
+    ("/repo/flatfs/shard/v1/suffix/x", None),
+    ("", None),
+])
+def test_parse_shard_func(value, expected):
+    assert readiness._parse_flatfs_shard_func(value) == expected
+
+
+def test_shard_func_read_from_datastore_spec(tmp_path):
+    spec = tmp_path / "datastore_spec"
+    spec.write_text(json.dumps({"mounts": [
+        {"mountpoint": "/blocks", "path": "/uniondrive/ipfs_datastore/blocks",
+         "shardFunc": "/repo/flatfs/shard/v1/prefix/3", "type": "flatfs"},
+        {"mountpoint": "/", "path": "/uniondrive/ipfs_datastore/datastore", "type": "pebbleds"},
+    ], "type": "mount"}))
+    assert readiness._flatfs_shard_func_from_spec(
+        str(spec), "/uniondrive/ipfs_datastore/blocks") == "/repo/flatfs/shard/v1/prefix/3"
+    assert readiness._flatfs_shard_func_from_spec(
+        str(spec), "/other/blocks") == readiness.FLATFS_DEFAULT_SHARD_FUNC
+    assert readiness._flatfs_shard_func_from_spec(
+        str(tmp_path / "missing"), "/x") == readiness.FLATFS_DEFAULT_SHARD_FUNC
+
+
+def test_missing_sharding_file_is_rewritten_and_blocks_kept(flatfs):
+    block = _put(flatfs, "CIQAAAAAX3Z")
+    summary = readiness.repair_flatfs_blocks(str(flatfs), SHARD_FUNC)
+    assert summary["ok"] is True
+    assert summary["sharding_rewritten"] is True
+    assert (flatfs / "SHARDING").read_text() == SHARD_FUNC + "\n"
+    assert block.read_bytes() == b"block"
+    assert summary["shards_created"] == 1024 - 1
+    assert (flatfs / "AA").is_dir() and (flatfs / "77").is_dir()
+
+
+def test_garbage_sharding_file_is_rewritten(flatfs):
+    (flatfs / "SHARDING").write_text("\x00\x00garbage")
+    summary = readiness.repair_flatfs_blocks(str(flatfs), SHARD_FUNC)
+    assert summary["sharding_rewritten"] is True
+    assert (flatfs / "SHARDING").read_text().strip() == SHARD_FUNC
+
+
+def test_valid_but_different_sharding_is_not_touched(flatfs):
+    (flatfs / "SHARDING").write_text("/repo/flatfs/shard/v1/prefix/2\n")
+    summary = readiness.repair_flatfs_blocks(str(flatfs), SHARD_FUNC)
+    assert summary["ok"] is False
+    assert summary["error"] == "shard_func mismatch"
+    assert (flatfs / "SHARDING").read_text() == "/repo/flatfs/shard/v1/prefix/2\n"
+
+
+def test_missing_blocks_dir_is_recreated(flatfs):
+    flatfs.rmdir()
+    summary = readiness.repair_flatfs_blocks(str(flatfs), SHARD_FUNC)
+    assert summary["ok"] is True
+    assert summary["blocks_dir_created"] is True
+    assert (flatfs / "X3").is_dir()
+    assert (flatfs / "SHARDING").exists()
+
+
+def test_misplaced_block_is_moved_to_its_shard(flatfs):
+    (flatfs / "SHARDING").write_text(SHARD_FUNC + "\n")
+    _put(flatfs, "CIQAAAAAX3Z", shard="AB")
+    summary = readiness.repair_flatfs_blocks(str(flatfs), SHARD_FUNC)
+    assert summary["misplaced_moved"] == 1
+    assert (flatfs / "X3" / "CIQAAAAAX3Z.data").exists()
+    assert not (flatfs / "AB" / "CIQAAAAAX3Z.data").exists()
+
+
+def test_unreadable_shard_is_quarantined_not_deleted(flatfs, monkeypatch):
+    (flatfs / "SHARDING").write_text(SHARD_FUNC + "\n")
+    _put(flatfs, "CIQAAAAAX3Z")
+    bad = _put(flatfs, "CIQBBBBBQQZ")
+    real_scandir = os.scandir
+
+    def scandir(path):
+        if os.path.basename(path) == "QQ":
+            raise OSError(errno.EBADMSG, "Bad message", path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(readiness.os, "scandir", scandir)
+    summary = readiness.repair_flatfs_blocks(str(flatfs), SHARD_FUNC)
+    assert summary["quarantined"] == 1
+    assert (flatfs / "X3" / "CIQAAAAAX3Z.data").exists()
+    (stamp,) = os.listdir(flatfs.parent / ".fula-quarantine" / "flatfs")
+    moved = flatfs.parent / ".fula-quarantine" / "flatfs" / stamp / "QQ" / bad.name
+    assert moved.read_bytes() == b"block"
+    # The shard dir is recreated empty so flatfs can write to it again.
+    assert (flatfs / "QQ").is_dir()
+
+
+def test_repair_logs_summary_event(flatfs, tmp_path):
+    readiness.repair_flatfs_blocks(str(flatfs), SHARD_FUNC)
+    (event,) = [json.loads(l) for l in (tmp_path / "events.jsonl").read_text().splitlines()]
+    assert event["category"] == "flatfs-repair"
+    assert event["detail"]["ok"] is True
+    assert event["detail"]["path"] == str(flatfs)
+    assert "duration_s" in event["detail"]
@@ -0,0 +1,79 @@
+"""Health-gated waits — wait_until_healthy() in readiness-check.py.
+
+A fake clock drives time.monotonic()/time.sleep(); probes are scripted per
+signal through _HEALTH_PROBES.
+"""
+
+import json
+
+import pytest
+
+from conftest import readiness
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    now = {"t": 1000.0, "sleeps": []}
+
+    def sleep(sec):
+        now["sleeps"].append(sec)
+        now["t"] += sec
+
+    monkeypatch.setattr(readiness.time, "monotonic", lambda: now["t"])
+    monkeypatch.setattr(readiness.time, "sleep", sleep)
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(tmp_path / "events.jsonl"))
+    now["events"] = lambda: [json.loads(l) for l in (tmp_path / "events.jsonl").read_text().splitlines()]
+    return now
+
+
+def _probes(monkeypatch, clock, ready_at):
+    """Each signal turns healthy once the fake clock reaches ready_at[name]."""
+    for name in readiness.HEALTH_CHECKS:
+        monkeypatch.setitem(readiness._HEALTH_PROBES, name,
+                            lambda n=name: clock["t"] >= ready_at.get(n, 0))
+
+
+def test_returns_as_soon_as_healthy(clock, monkeypatch):
+    _probes(monkeypatch, clock, {"kubo": 1005.0})
+    assert readiness.wait_until_healthy("proxy-restart") is True
+    # 2s, then 4s: healthy at t=1006, well before the old fixed 30s.
+    assert clock["sleeps"] == [2, 4]
+    event = clock["events"]()[-1]
+    assert event["category"] == "time-to-healthy"
+    assert event["detail"]["remediation"] == "proxy-restart"
+    assert (event["detail"]["healthy"], event["detail"]["elapsed_s"]) == (True, 6.0)
+
+
+def test_backoff_caps_and_deadline_is_hard(clock, monkeypatch):
+    _probes(monkeypatch, clock, {"cluster": 10_000.0})
+    assert readiness.wait_until_healthy("stack-restart", deadline=60) is False
+    assert clock["sleeps"] == [2, 4, 8, 15, 15, 15, 1]
+    detail = clock["events"]()[-1]["detail"]
+    assert (detail["failing"], detail["elapsed_s"]) == ("cluster", 60.0)
+
+
+def test_only_requested_checks_are_probed(clock, monkeypatch):
+    called = []
+    for name in readiness.HEALTH_CHECKS:
+        monkeypatch.setitem(readiness._HEALTH_PROBES, name,
+                            lambda n=name: called.append(n) or True)
+    assert readiness.wait_until_healthy("uniondrive-restart", checks=("mergerfs",), deadline=60)
+    assert called == ["mergerfs"]
+
+
+def test_raising_probe_counts_as_unhealthy(clock, monkeypatch):
+    def boom():
+        raise RuntimeError("docker socket gone")
+
+    monkeypatch.setitem(readiness._HEALTH_PROBES, "docker", boom)
+    assert readiness.wait_until_healthy("docker-start", checks=("docker",), deadline=10) is False
+
+
+def test_bounded_when_sleep_is_a_noop(tmp_path, monkeypatch):
+    """Suites that patch time.sleep out must not spin until the wall-clock deadline."""
+    monkeypatch.setattr(readiness.time, "sleep", lambda s: None)
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(tmp_path / "events.jsonl"))
+    probes = []
+    monkeypatch.setitem(readiness._HEALTH_PROBES, "kubo", lambda: probes.append(1) and False)
+    assert readiness.wait_until_healthy("check_and_fix_ipfs_host", checks=("kubo",), deadline=120) is False
+    assert len(probes) < 20
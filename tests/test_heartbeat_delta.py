@@ -0,0 +1,148 @@
+"""Change-driven heartbeats — post_heartbeat() schedule in readiness-check.py.
+
+kubo's /api/v0/id and the Worker POST are faked; the clock is driven through
+readiness.time so backoff intervals can be stepped without sleeping.
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from conftest import readiness
+
+A = "/dns/relay.dev.fx.land/tcp/4001/p2p/QmR/p2p-circuit/p2p/QmBox"
+B = "/dns/relay2.dev.fx.land/tcp/4001/p2p/QmS/p2p-circuit/p2p/QmBox"
+
+
+@pytest.fixture
+def hb(tmp_path, monkeypatch):
+    state = tmp_path / "hb.state"
+    monkeypatch.setattr(readiness, "HEARTBEAT_STATE_PATH", str(state))
+    monkeypatch.setattr(readiness, "HEARTBEAT_CHECK_INTERVAL_SEC", 15)
+    monkeypatch.setattr(readiness, "HEARTBEAT_INTERVAL_SEC", 300)
+    monkeypatch.setattr(readiness, "HEARTBEAT_MAX_INTERVAL_SEC", 1200)
+    monkeypatch.setattr(readiness, "HEARTBEAT_KEEPALIVE_RETRY_SEC", 86400)
+    monkeypatch.setattr(readiness, "_last_heartbeat", 0.0)
+    monkeypatch.setattr(readiness, "_heartbeat_sending", False)
+    monkeypatch.setattr(readiness, "_keepalive_rejected_until", 0.0)
+    readiness._reset_heartbeat_schedule()
+    clock = {"now": 100000.0}
+    monkeypatch.setattr(readiness.time, "time", lambda: clock["now"])
+    env = {"circuits": [A], "status": 200, "posts": [], "clock": clock, "state": state}
+    key = MagicMock()
+    key.sign.return_value = b"sig"
+
+    def post(url, json=None, timeout=None, headers=None):
+        env["posts"].append(json["data"])
+        r = MagicMock()
+        r.status_code = env["status"]
+        r.text = ""
+        return r
+
+    monkeypatch.setattr(readiness, "_load_kubo_ed25519_key", lambda: (key, "QmBox"))
+    monkeypatch.setattr(readiness, "_kubo_id_addresses", lambda: ("QmBox", env["circuits"]))
+    monkeypatch.setattr(readiness, "_read_cluster_peer_id", lambda: None)
+    with patch.object(readiness.requests, "post", side_effect=post):
+        yield env
+
+
+def _at(env, t):
+    env["clock"]["now"] = 100000.0 + t
+    readiness.post_heartbeat()
+
+
+def test_stable_circuits_back_off_to_max_interval(hb):
+    _at(hb, 0)
+    assert hb["posts"][0]["libp2pAddrs"] == [A]
+    digest = readiness._heartbeat_data_digest(hb["posts"][0])
+    _at(hb, 30)
+    _at(hb, 299)
+    assert len(hb["posts"]) == 1
+    sent_at = [300, 900, 2100, 3300]  # intervals 300, 600, 1200, 1200 (capped)
+    for t in range(300, 3400, 15):
+        _at(hb, t)
+    assert hb["posts"][1:] == [{"type": "box", "unchangedSince": digest}] * len(sent_at)
+    state = json.loads(hb["state"].read_text())
+    assert state["kind"] == "keepalive" and state["last_circuit_count"] == 1
+
+
+def test_circuit_change_is_sent_on_next_check(hb):
+    _at(hb, 0)
+    _at(hb, 300)  # keep-alive
+    hb["circuits"] = [B]
+    _at(hb, 315)
+    assert hb["posts"][-1]["reservedOn"] == ["relay2.dev.fx.land"]
+    # Backoff restarts from the base interval after a change.
+    _at(hb, 600)
+    assert len(hb["posts"]) == 3
+    _at(hb, 615)
+    assert "unchangedSince" in hb["posts"][-1]
+
+
+def test_rejected_keepalive_falls_back_to_full(hb):
+    _at(hb, 0)
+    hb["status"] = 400  # Worker without keep-alive support
+    _at(hb, 300)
+    assert json.loads(hb["state"].read_text())["error"] == "http_400"
+    hb["status"] = 200
+    _at(hb, 315)  # full payload on the very next check
+    assert len(hb["posts"]) == 3 and hb["posts"][-1]["libp2pAddrs"] == [A]
+    _at(hb, 330)
+    assert len(hb["posts"]) == 3  # acked again; back on the normal schedule
+    _at(hb, 615)
+    assert hb["posts"][-1]["libp2pAddrs"] == [A]  # full, not another keep-alive
+
+
+def test_worker_without_keepalives_costs_no_more_than_full_heartbeats(hb):
+    """A Worker that rejects keep-alives sees one rejected keep-alive, then
+    one full heartbeat per HEARTBEAT_INTERVAL_SEC until the retry window
+    ends — never a keep-alive plus a full every interval."""
+    def post(url, json=None, timeout=None, headers=None):
+        hb["posts"].append(json["data"])
+        r = MagicMock()
+        r.status_code = 400 if "unchangedSince" in json["data"] else 200
+        r.text = ""
+        return r
+
+    with patch.object(readiness.requests, "post", side_effect=post):
+        for t in range(0, 1300, 15):
+            _at(hb, t)
+        keepalives = [p for p in hb["posts"] if "unchangedSince" in p]
+        assert len(keepalives) == 1  # t=300
+        assert len(hb["posts"]) == 6  # full at t=0, 315, 615, 915, 1215
+        # Keep-alives are tried again once the window has passed.
+        _at(hb, 300 + 86400 + 15)
+    assert "unchangedSince" in hb["posts"][-1]
+
+
+def test_post_runs_outside_the_heartbeat_lock(hb):
+    def post(url, json=None, timeout=None, headers=None):
+        assert not readiness._heartbeat_lock.locked()
+        assert readiness._heartbeat_sending
+        hb["posts"].append(json["data"])
+        return MagicMock(status_code=200, text="")
+
+    with patch.object(readiness.requests, "post", side_effect=post):
+        _at(hb, 0)
+    assert len(hb["posts"]) == 1 and not readiness._heartbeat_sending
+
+
+def test_failed_full_heartbeat_retries_at_base_interval(hb):
+    hb["status"] = 503
+    _at(hb, 0)
+    _at(hb, 15)
+    assert len(hb["posts"]) == 1
+    hb["status"] = 200
+    _at(hb, 300)
+    assert hb["posts"][-1]["libp2pAddrs"] == [A]
+
+
+def test_circuits_returning_after_gap_are_sent_immediately(hb):
+    _at(hb, 0)
+    hb["circuits"] = []
+    _at(hb, 15)
+    assert json.loads(hb["state"].read_text())["error"] == "no_circuits"
+    hb["circuits"] = [A]
+    _at(hb, 30)
+    assert len(hb["posts"]) == 2 and hb["posts"][-1]["libp2pAddrs"] == [A]
@@ -0,0 +1,180 @@
+"""Memory policy — compute_memory_limits() / apply_memory_policy() /
+ensure_zram_swap() in readiness-check.py.
+
+container_resources() is stubbed per test; the cgroup directories,
+/proc/meminfo and /proc/swaps are tmp_path files, and zramctl/mkswap/swapon
+go through conftest's recorded_run.
+"""
+
+import json
+
+import pytest
+
+from conftest import readiness
+
+MiB = 1 << 20
+GiB = 1 << 30
+BUDGET = 8 * GiB - 8 * GiB * 15 // 100
+OBSERVE = 3600
+SETTLED = OBSERVE + 1  # a second apply at this time uses the measured peak
+
+
+@pytest.fixture
+def resources(tmp_path, monkeypatch, recorded_run, events_log):
+    """container_resources() answers from the returned dict."""
+    (tmp_path / "meminfo").write_text(f"MemTotal:       {8 * GiB // 1024} kB\nMemFree: 1 kB\n")
+    (tmp_path / "swaps").write_text("Filename\tType\tSize\tUsed\tPriority\n")
+    for name in ("ipfs_host", "ipfs_cluster", "blox-ai"):
+        (tmp_path / "cgroup" / name).mkdir(parents=True)
+    recorded_run.respond = lambda cmd: (0, "/dev/zram0\n") if cmd[1] == "zramctl" else None
+    resources = {}
+    monkeypatch.setattr(readiness, "_PROC_MEMINFO", str(tmp_path / "meminfo"))
+    monkeypatch.setattr(readiness, "_PROC_SWAPS", str(tmp_path / "swaps"))
+    monkeypatch.setattr(readiness, "MEMORY_POLICY_STATE_PATH", str(tmp_path / "memory-policy.state"))
+    monkeypatch.setattr(readiness, "container_resources", lambda name: resources.get(name))
+    monkeypatch.setattr(readiness, "_container_cgroup_dir",
+                        lambda name, now=None: str(tmp_path / "cgroup" / name))
+    monkeypatch.setattr(readiness, "_MEMORY_POLICY_ENABLED", True)
+    monkeypatch.setattr(readiness, "_memory_peaks", {})
+    monkeypatch.setattr(readiness, "_memory_applied", {})
+    monkeypatch.setattr(readiness, "_memory_observed_since", {})
+    monkeypatch.setattr(readiness, "_memory_high_events", {})
+    monkeypatch.setattr(readiness, "_memory_policy_last", 0.0)
+    monkeypatch.setattr(readiness, "MEMORY_OBSERVE_SEC", OBSERVE)
+    monkeypatch.setattr(readiness, "_zram_attempted", False)
+    return resources
+
+
+def _cgroup(tmp_path, name, knob):
+    return tmp_path / "cgroup" / name / knob
+
+
+def _state(tmp_path):
+    return json.loads((tmp_path / "memory-policy.state").read_text())
+
+
+def test_unobserved_containers_get_budget_minus_others():
+    limits, budget = readiness.compute_memory_limits({"a": 4 * GiB, "b": 1 * GiB}, 8 * GiB)
+    assert budget == BUDGET
+    assert limits["a"]["memory_high_bytes"] == readiness._mib_floor(BUDGET - 1 * GiB)
+    assert limits["b"]["memory_high_bytes"] == readiness._mib_floor(BUDGET - 4 * GiB)
+
+
+def test_limits_scale_to_budget():
+    limits, budget = readiness.compute_memory_limits({"a": 4 * GiB, "b": 2 * GiB}, 8 * GiB,
+                                                     settled={"a", "b"})
+    highs = [v["memory_high_bytes"] for v in limits.values()]
+    assert sum(highs) <= budget
+    # Proportions are kept when scaling down.
+    assert limits["a"]["memory_high_bytes"] == pytest.approx(2 * limits["b"]["memory_high_bytes"], rel=0.01)
+    # memory.high only; no hard cap is ever computed.
+    assert all(set(v) == {"memory_high_bytes"} for v in limits.values())
+
+
+def test_small_container_gets_floor():
+    limits, _budget = readiness.compute_memory_limits({"a": 10 * MiB}, 8 * GiB, settled={"a"})
+    assert limits["a"] == {"memory_high_bytes": 128 * MiB}
+
+
+def test_applies_limits_and_skips_compose_owned(resources, tmp_path, events_log):
+    resources["ipfs_host"] = {"peak_bytes": 1 * GiB, "memory_bytes": 900 * MiB}
+    resources["blox-ai"] = {"peak_bytes": 3 * GiB, "memory_bytes": 3 * GiB,
+                            "memory_max_bytes": 4 * GiB}
+    readiness.apply_memory_policy(now=0)
+    # Unobserved: whatever the budget leaves after the others' peaks.
+    ceiling = readiness._mib_floor(BUDGET - 3 * GiB)
+    assert int(_cgroup(tmp_path, "ipfs_host", "memory.high").read_text()) == ceiling
+    assert not _cgroup(tmp_path, "ipfs_host", "memory.max").exists()
+    assert not _cgroup(tmp_path, "blox-ai", "memory.high").exists()
+    state = _state(tmp_path)
+    assert state["containers"]["blox-ai"]["skipped"]
+    events = events_log("memory-policy")
+    assert [e["detail"]["name"] for e in events] == ["ipfs_host"]
+    assert events[0]["detail"]["changed"] == {"memory_high_bytes": {"from": None, "to": ceiling}}
+    assert events[0]["detail"]["basis"] == "budget"
+
+
+def test_tightened_to_peak_only_after_observation(resources, tmp_path):
+    resources["ipfs_host"] = {"peak_bytes": 1 * GiB, "memory_bytes": 900 * MiB}
+    readiness.apply_memory_policy(now=0)
+    readiness.apply_memory_policy(now=OBSERVE - 1)
+    assert int(_cgroup(tmp_path, "ipfs_host", "memory.high").read_text()) == readiness._mib_floor(BUDGET)
+    readiness.apply_memory_policy(now=SETTLED)
+    assert int(_cgroup(tmp_path, "ipfs_host", "memory.high").read_text()) == 1331 * MiB
+    assert _state(tmp_path)["containers"]["ipfs_host"]["basis"] == "peak"
+    assert not _cgroup(tmp_path, "ipfs_host", "memory.max").exists()
+
+
+def test_retune_only_on_significant_change(resources, events_log):
+    resources["ipfs_host"] = {"peak_bytes": 1 * GiB, "memory_bytes": 900 * MiB}
+    readiness.apply_memory_policy(now=0)
+    readiness.apply_memory_policy(now=SETTLED)
+    applied = readiness._memory_applied["ipfs_host"]
+    # Next sample reflects what was written; a slightly higher peak is within 10%.
+    resources["ipfs_host"] = {"peak_bytes": 1 * GiB + 50 * MiB, "memory_bytes": 900 * MiB,
+                              "memory_high_bytes": applied}
+    readiness.apply_memory_policy(now=SETTLED + 300)
+    assert len(events_log("memory-policy")) == 2
+    # A much larger peak (big DAG import) raises memory.high.
+    resources["ipfs_host"]["peak_bytes"] = 2 * GiB
+    readiness.apply_memory_policy(now=SETTLED + 600)
+    events = events_log("memory-policy")
+    assert len(events) == 3
+    assert events[2]["detail"]["changed"]["memory_high_bytes"]["to"] > applied
+
+
+def test_limit_never_below_current_usage(resources, tmp_path):
+    # Peak from memory.peak lags a fast-growing container.
+    resources["ipfs_host"] = {"peak_bytes": 200 * MiB, "memory_bytes": 600 * MiB}
+    readiness.apply_memory_policy(now=0)
+    readiness.apply_memory_policy(now=SETTLED)
+    assert int(_cgroup(tmp_path, "ipfs_host", "memory.high").read_text()) > 600 * MiB
+
+
+def test_throttling_raises_memory_high_at_once(resources, tmp_path, events_log):
+    """kubo settled at a 200 MiB peak; then a large DAG import runs into the
+    260 MiB memory.high. Usage can't pass it, so the peak can't show the
+    growth; the memory.events "high" counter does, and the very next
+    container sample lifts memory.high back to the budget ceiling."""
+    resources["ipfs_host"] = {"peak_bytes": 200 * MiB, "memory_bytes": 150 * MiB,
+                              "memory_events": {"high": 0}}
+    readiness.maybe_apply_memory_policy(now=1000)
+    readiness.maybe_apply_memory_policy(now=1000 + SETTLED)
+    high = int(_cgroup(tmp_path, "ipfs_host", "memory.high").read_text())
+    assert high == 260 * MiB
+    # Held at memory.high: usage and peak stay just under it.
+    resources["ipfs_host"] = {"peak_bytes": 259 * MiB, "memory_bytes": 259 * MiB,
+                              "memory_high_bytes": high, "memory_events": {"high": 42}}
+    readiness.maybe_apply_memory_policy(now=1000 + SETTLED + 15)  # well inside the interval
+    ceiling = readiness._mib_floor(BUDGET)
+    assert int(_cgroup(tmp_path, "ipfs_host", "memory.high").read_text()) == ceiling
+    assert events_log("memory-policy")[-1]["detail"]["throttled"] is True
+    # The observation window starts over, so the next retune doesn't
+    # tighten it straight back to the throttled peak.
+    resources["ipfs_host"]["memory_high_bytes"] = ceiling
+    readiness.maybe_apply_memory_policy(now=1000 + SETTLED + 400)
+    assert int(_cgroup(tmp_path, "ipfs_host", "memory.high").read_text()) == ceiling
+    assert not _cgroup(tmp_path, "ipfs_host", "memory.max").exists()
+
+
+def test_disabled_only_reports(resources, tmp_path, recorded_run, monkeypatch):
+    monkeypatch.setattr(readiness, "_MEMORY_POLICY_ENABLED", False)
+    resources["ipfs_host"] = {"peak_bytes": 1 * GiB, "memory_bytes": 900 * MiB}
+    readiness.apply_memory_policy(now=0)
+    readiness.apply_memory_policy(now=SETTLED)
+    assert not _cgroup(tmp_path, "ipfs_host", "memory.high").exists()
+    assert recorded_run.calls == []
+    state = _state(tmp_path)
+    assert state["enabled"] is False and state["zram"] is None
+    assert state["containers"]["ipfs_host"]["target"]["memory_high_bytes"] == 1331 * MiB
+
+
+def test_zram_created_once_and_existing_respected(resources, tmp_path, recorded_run, events_log):
+    info = readiness.ensure_zram_swap(8 * GiB)
+    assert info == {"device": "/dev/zram0", "size_bytes": 4 * GiB, "created": True}
+    assert [c[1] for c in recorded_run.calls] == ["modprobe", "zramctl", "mkswap", "swapon"]
+    assert events_log("zram")[0]["detail"]["algorithm"] == "zstd"
+    (tmp_path / "swaps").write_text("Filename\tType\tSize\tUsed\tPriority\n"
+                                    "/dev/zram0                              partition\t4194300\t0\t100\n")
+    assert readiness.ensure_zram_swap(8 * GiB)["created"] is False
+    assert len(recorded_run.calls) == 4
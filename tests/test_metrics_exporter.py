@@ -0,0 +1,124 @@
+"""OpenMetrics exporter — metrics_exporter.py (state cache, family renderer,
+/metrics server) and readiness-check.py's render_openmetrics() adapter.
+
+State files are tmp_path copies of what the watchdog writes; the HTTP test
+binds an ephemeral localhost port.
+"""
+
+import json
+import threading
+
+import pytest
+import requests
+
+from conftest import metrics_exporter, readiness
+
+
+@pytest.fixture
+def states(tmp_path, monkeypatch):
+    files = {}
+    for attr, name in (("HEARTBEAT_STATE_PATH", "heartbeat"), ("DISCOVERY_STATE_PATH", "discovery"),
+                       ("TIME_STATE_PATH", "time"), ("WIREGUARD_STATE_PATH", "wireguard"),
+                       ("CONTAINERS_STATE_PATH", "containers"), ("POWER_STATE_PATH", "power")):
+        files[name] = tmp_path / f"fula-{name}.state"
+        monkeypatch.setattr(readiness, attr, str(files[name]))
+    monkeypatch.setattr(readiness, "_metrics", {"checks": {}, "cycles": {}})
+
+    def write(name, data):
+        files[name].write_text(json.dumps(data))
+    return write
+
+
+def _samples(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+
+def test_renders_state_files(states):
+    states("heartbeat", {"last_attempt_ts": "2026-10-18T07:00:00Z", "http_status": 200,
+                         "last_circuit_count": 3, "latency_ms": 250, "kind": "keepalive"})
+    states("time", {"synced": True, "offset_ms": -12})
+    states("wireguard", {"active": True, "last_handshake_age_sec": 40, "rx_bytes": 1000, "tx_bytes": 2000})
+    states("containers", {"containers": [
+        {"name": "ipfs_host", "state": "running", "restart_count": 2, "oom_killed": False,
+         "resources": {"memory_bytes": 1048576, "cpu_cores": 0.25, "memory_pressure": {"some_avg60": 1.5}}},
+        {"name": "fula_go", "state": "exited", "restart_count": 5}]})
+    states("power", {"max_temp_c": 61.5, "thermal": {"p50": 55.0, "p95": 60.2, "max": 63.0},
+                     "cpu_throttle": {"policy4": {"capped_pct": 25.0}}})
+    text = readiness.render_openmetrics()
+    samples = _samples(text)
+    assert samples["fula_heartbeat_ok"] == "1"
+    assert samples["fula_heartbeat_latency_seconds"] == "0.25"
+    assert samples["fula_heartbeat_last_attempt_timestamp_seconds"] == "1792306800"
+    assert samples["fula_time_offset_seconds"] == "-0.012"
+    assert samples["fula_wireguard_receive_bytes_total"] == "1000"
+    assert samples['fula_container_restarts_total{name="fula_go"}'] == "5"
+    assert samples['fula_container_running{name="fula_go"}'] == "0"
+    assert samples['fula_container_memory_pressure_some_avg60{name="ipfs_host"}'] == "1.5"
+    assert samples['fula_power_temp_window_celsius{stat="p95"}'] == "60.2"
+    assert samples['fula_cpu_capped_ratio{policy="policy4"}'] == "0.25"
+    # Missing files and fields are simply absent.
+    assert not any(k.startswith("fula_discovery") for k in samples)
+    assert "# TYPE fula_container_restarts counter" in text
+    assert text.endswith("# EOF\n")
+
+
+def test_watchdog_timings_are_summaries(states):
+    with readiness.timed_check("check_conditions"):
+        pass
+    samples = _samples(readiness.render_openmetrics(eof=False))
+    assert samples['fula_watchdog_check_duration_seconds_count{check="check_conditions"}'] == "1"
+    assert 'fula_watchdog_check_duration_seconds{check="check_conditions",quantile="0.95"}' in samples
+    assert samples['fula_watchdog_check_errors_total{check="check_conditions"}'] == "0"
+
+
+def test_textfile_names_counter_families_for_prometheus(states, tmp_path, monkeypatch):
+    states("containers", {"containers": [{"name": "fula_go", "state": "running", "restart_count": 5}]})
+    monkeypatch.setattr(metrics_exporter, "TEXTFILE_PATH", str(tmp_path / "fula.prom"))
+    readiness.write_metrics_textfile()
+    text = (tmp_path / "fula.prom").read_text()
+    # Prometheus text format: the TYPE line names the samples it types.
+    assert "# TYPE fula_container_restarts_total counter" in text
+    assert "# TYPE fula_container_restarts counter" not in text
+    assert 'fula_container_restarts_total{name="fula_go"} 5' in text
+    assert "# TYPE fula_container_running gauge" in text
+    assert "# EOF" not in text
+
+
+def test_state_file_parsed_only_when_changed(states, monkeypatch):
+    states("time", {"synced": True, "offset_ms": 5})
+    loads = []
+    real_load = metrics_exporter.json.load
+    monkeypatch.setattr(metrics_exporter.json, "load", lambda f: loads.append(1) or real_load(f))
+    path = readiness.TIME_STATE_PATH
+    assert metrics_exporter.read_state_cached(path)["offset_ms"] == 5
+    assert metrics_exporter.read_state_cached(path)["offset_ms"] == 5
+    assert len(loads) == 1
+    states("time", {"synced": True, "offset_ms": 123})
+    assert metrics_exporter.read_state_cached(path)["offset_ms"] == 123
+    assert len(loads) == 2
+
+
+def test_http_handler_serves_metrics(states):
+    states("discovery", {"ok": True, "latency_ms": 80})
+    server = metrics_exporter.make_server(readiness.render_openmetrics, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        r = requests.get(base + "/metrics", timeout=5)
+        assert r.headers["Content-Type"].startswith("application/openmetrics-text")
+        assert _samples(r.text)["fula_discovery_latency_seconds"] == "0.08"
+        assert requests.get(base + "/", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_standalone_render_reads_watchdog_metrics_from_the_store():
+    metrics_exporter.state_store.update("watchdog_metrics", {
+        "subprocess_spawns": 7,
+        "checks": {"check_conditions": {"p50_s": 0.1, "p95_s": 0.4, "sum_s": 1.5, "count": 10,
+                                        "errors": 1, "spawns": 3}},
+        "cycles": {}})
+    samples = _samples(metrics_exporter.render())
+    assert samples["fula_watchdog_subprocess_spawns_total"] == "7"
+    assert samples['fula_watchdog_check_errors_total{check="check_conditions"}'] == "1"
@@ -0,0 +1,129 @@
+"""Subprocess-free NTP status — native readers behind check_ntp_sync() in
+readiness-check.py.
+
+chronyd's command socket is played by a unix datagram socket in tmp_path;
+/proc is a tmp_path tree. readiness.subprocess is replaced with a mock that
+fails the test if any process is launched.
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from conftest import readiness
+
+
+def _chrony_float_bytes(coef, exp):
+    """Inverse of _chrony_float for test fixtures: value = coef * 2**(exp - 25)."""
+    return ((exp & 0x7F) << 25) | (coef & 0x1FFFFFF)
+
+
+@pytest.mark.parametrize("coef,exp,expected", [
+    (0, 0, 0.0),
+    (1 << 23, 2, 1.0),
+    (-(1 << 23), 1, -0.5),
+    (3 << 20, -4, 3 * 2.0 ** -9),
+])
+def test_chrony_float_decoding(coef, exp, expected):
+    assert readiness._chrony_float(_chrony_float_bytes(coef, exp)) == pytest.approx(expected)
+
+
+def _fake_chronyd(path, correction_raw, reply_len=108, status=0):
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    srv.bind(str(path))
+    seen = {}
+
+    def serve():
+        req, addr = srv.recvfrom(1024)
+        seen["len"] = len(req)
+        seen["mode"] = os.stat(addr).st_mode & 0o777
+        version, pkt_type, _a, _b, command, _attempt, seq = struct.unpack_from("!BBBBHHI", req)
+        seen["command"] = command
+        reply = struct.pack("!BBBBHHHHHHIII", version, 2, 0, 0, command, 5, status,
+                            0, 0, 0, seq, 0, 0)
+        reply = reply.ljust(68, b"\0") + struct.pack("!I", correction_raw)
+        srv.sendto(reply.ljust(reply_len, b"\0"), addr)
+        srv.close()
+
+    t = threading.Thread(target=serve, daemon=True)
+    t.start()
+    return t, seen
+
+
+def test_chrony_socket_tracking_offset(tmp_path):
+    sock = tmp_path / "chronyd.sock"
+    # 12.5ms fast: -0.0125s
+    coef, exp = -(int(0.0125 * 2 ** 30)), -5
+    t, seen = _fake_chronyd(sock, _chrony_float_bytes(coef, exp))
+    assert readiness._chrony_tracking_offset_ms(str(sock)) == -12
+    t.join(timeout=2)
+    # chronyd runs unprivileged and must be able to answer the client socket.
+    assert seen == {"len": 108, "command": 33, "mode": 0o666}
+    assert list(tmp_path.iterdir()) == [sock]  # client socket cleaned up
+
+
+def test_chrony_socket_error_status_gives_none(tmp_path):
+    sock = tmp_path / "chronyd.sock"
+    t, _seen = _fake_chronyd(sock, 0, status=1)
+    assert readiness._chrony_tracking_offset_ms(str(sock)) is None
+    t.join(timeout=2)
+
+
+def test_chrony_socket_missing_gives_none(tmp_path):
+    assert readiness._chrony_tracking_offset_ms(str(tmp_path / "none.sock")) is None
+
+
+def test_ntp_daemon_from_proc_comm(tmp_path):
+    for pid, comm in (("1", "systemd"), ("412", "systemd-timesyn"), ("977", "chronyd")):
+        (tmp_path / pid).mkdir()
+        (tmp_path / pid / "comm").write_text(comm + "\n")
+    (tmp_path / "self").mkdir()
+    assert readiness._native_ntp_daemon(str(tmp_path)) == "chronyd"
+    (tmp_path / "977" / "comm").write_text("bash\n")
+    assert readiness._native_ntp_daemon(str(tmp_path)) == "systemd-timesyncd"
+
+
+def test_adjtimex_reads_kernel_clock_state():
+    timex = readiness._adjtimex()
+    if timex is None:
+        pytest.skip("adjtimex unavailable on this host")
+    assert set(timex) == {"state", "status", "offset_us", "maxerror_us"}
+    assert 0 <= timex["state"] <= 5
+    assert timex["maxerror_us"] >= 0
+
+
+def test_timedate1_fallback_reads_ntp_synchronized():
+    bus = MagicMock()
+    bus.get_object.return_value.Get.return_value = True
+    assert readiness._timedate1_synced(bus) is True
+    bus.get_object.assert_called_with("org.freedesktop.timedate1", "/org/freedesktop/timedate1")
+    bus.get_object.side_effect = RuntimeError("no bus")
+    assert readiness._timedate1_synced(bus) is None
+
+
+def test_check_ntp_sync_native_path_launches_no_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "TIME_STATE_PATH", str(tmp_path / "time.state"))
+    timex = {"state": 0, "status": readiness._STA_PLL, "offset_us": -2400.0, "maxerror_us": 1500}
+    monkeypatch.setattr(readiness, "_adjtimex", lambda: timex)
+    monkeypatch.setattr(readiness, "_native_ntp_daemon", lambda: "systemd-timesyncd")
+    with patch.object(readiness, "subprocess") as mock_sub:
+        assert readiness.check_ntp_sync() is True
+        mock_sub.run.assert_not_called()
+    state = json.loads((tmp_path / "time.state").read_text())
+    assert set(state) == {"last_check_ts", "synced", "service", "offset_ms",
+                          "remediation", "remediation_ok", "error"}
+    assert (state["synced"], state["service"], state["offset_ms"]) == (True, "systemd-timesyncd", -2)
+
+
+def test_large_maxerror_reads_as_unsynced(monkeypatch):
+    monkeypatch.setattr(readiness, "_adjtimex", lambda: {
+        "state": 5, "status": 0x40, "offset_us": 0.0, "maxerror_us": 16000000})
+    monkeypatch.setattr(readiness, "_native_ntp_daemon", lambda: None)
+    with patch.object(readiness, "subprocess") as mock_sub:
+        mock_sub.run.return_value = MagicMock(stdout="inactive\n")
+        assert readiness._read_time_status() == (False, None, None, None)
@@ -0,0 +1,169 @@
+"""NetworkManager link monitor + gateway RTT sampler in readiness-check.py.
+
+The D-Bus snapshot is read from a dict-backed fake bus; /proc/net files are
+tmp_path copies; the RTT probe is stubbed except for the UDP fallback, which
+runs against a closed loopback port.
+"""
+
+import json
+
+import pytest
+
+from conftest import readiness
+
+NM = "org.freedesktop.NetworkManager"
+PROPS = {
+    ("/org/freedesktop/NetworkManager", NM): {
+        "PrimaryConnection": "/ac/1",
+        "ActiveConnections": ["/ac/0", "/ac/1"],
+    },
+    ("/ac/0", NM + ".Connection.Active"): {
+        "Type": "802-3-ethernet", "Id": "Wired", "Devices": ["/dev/eth0"], "Ip4Config": "/",
+    },
+    ("/ac/1", NM + ".Connection.Active"): {
+        "Type": "802-11-wireless", "Id": "HomeNet", "Devices": ["/dev/wlan0"], "Ip4Config": "/ip4/1",
+    },
+    ("/dev/eth0", NM + ".Device"): {"Interface": "eth0"},
+    ("/dev/wlan0", NM + ".Device"): {"Interface": "wlan0"},
+    ("/dev/wlan0", NM + ".Device.Wireless"): {"Bitrate": 72200, "ActiveAccessPoint": "/ap/7"},
+    ("/ip4/1", NM + ".IP4Config"): {"Gateway": "192.168.1.1"},
+    ("/ap/7", NM + ".AccessPoint"): {"Ssid": [72, 111, 109, 101], "Strength": 64},
+}
+
+
+class _Obj:
+    def __init__(self, path):
+        self.path = path
+
+    def Get(self, iface, prop, dbus_interface=None):
+        assert dbus_interface == "org.freedesktop.DBus.Properties"
+        return PROPS[(self.path, iface)][prop]
+
+
+class _Bus:
+    def get_object(self, name, path):
+        assert name == NM
+        return _Obj(path)
+
+
+@pytest.fixture
+def link_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "NETWORK_STATE_PATH", str(tmp_path / "network.state"))
+    monkeypatch.setattr(readiness, "_link_state", None)
+    monkeypatch.setattr(readiness, "_rtt_samples", readiness.deque(maxlen=5))
+    return tmp_path
+
+
+def test_dbus_snapshot_reads_primary_wifi_link():
+    state = readiness._nm_link_snapshot_dbus(_Bus())
+    assert state["connections"] == [
+        {"id": "Wired", "type": "ethernet", "device": "eth0"},
+        {"id": "HomeNet", "type": "wifi", "device": "wlan0"},
+    ]
+    assert state["primary"]["id"] == "HomeNet"
+    assert (state["ssid"], state["signal_pct"], state["bitrate_kbps"], state["gateway"]) == (
+        "Home", 64, 72200, "192.168.1.1")
+
+
+def test_proc_net_parsers(tmp_path, monkeypatch):
+    route = tmp_path / "route"
+    route.write_text(
+        "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\n"
+        "wlan0\t0001A8C0\t00000000\t0001\t0\t0\t600\t00FFFFFF\n"
+        "wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\n")
+    wireless = tmp_path / "wireless"
+    wireless.write_text(
+        "Inter-| sta-|   Quality        |   Discarded packets\n"
+        " face | tus | link level noise |  nwid  crypt   frag\n"
+        " wlan0: 0000   47.  -63.  -256        0      0      0\n")
+    monkeypatch.setattr(readiness, "_PROC_NET_ROUTE", str(route))
+    monkeypatch.setattr(readiness, "_PROC_NET_WIRELESS", str(wireless))
+    assert readiness._default_gateway() == "192.168.1.1"
+    assert readiness._wireless_rssi_dbm("wlan0") == -63
+    assert readiness._wireless_rssi_dbm("wlan1") is None
+
+
+@pytest.mark.parametrize("connections,expected", [
+    ([{"id": "FxBlox", "type": "wifi", "device": "wlan0"}], "FxBlox"),
+    ([{"id": "HomeNet", "type": "wifi", "device": "wlan0"}], "other"),
+    ([{"id": "Wired", "type": "ethernet", "device": "eth0"}], "other"),
+    ([{"id": "lo", "type": "loopback", "device": "lo"}], None),
+    ([], None),
+])
+def test_check_wifi_connection_from_link_state(monkeypatch, connections, expected):
+    monkeypatch.setattr(readiness, "get_link_state", lambda max_age=60: {"connections": connections})
+    assert readiness.check_wifi_connection() == expected
+
+
+def test_link_state_is_cached_until_invalidated(link_env, monkeypatch):
+    reads = []
+
+    def snapshot():
+        reads.append(1)
+        return {"source": "nmcli", "connections": [], "primary": None, "ssid": None,
+                "signal_pct": None, "bitrate_kbps": None, "gateway": None}
+
+    monkeypatch.setattr(readiness, "_nm_link_snapshot_dbus",
+                        lambda bus: (_ for _ in ()).throw(RuntimeError("no bus")))
+    monkeypatch.setattr(readiness, "_nm_link_snapshot_nmcli", snapshot)
+    readiness.get_link_state()
+    readiness.get_link_state()
+    assert len(reads) == 1
+    readiness._invalidate_link_state()
+    readiness.get_link_state()
+    assert len(reads) == 2
+
+
+def test_link_read_that_races_an_invalidation_is_not_cached(link_env, monkeypatch):
+    reads = []
+
+    def snapshot():
+        reads.append(1)
+        if len(reads) == 1:
+            readiness._invalidate_link_state()  # NM signal lands mid-read
+        return {"source": "nmcli", "connections": [], "primary": None, "ssid": None,
+                "signal_pct": None, "bitrate_kbps": None, "gateway": None}
+
+    monkeypatch.setattr(readiness, "_nm_link_snapshot_dbus",
+                        lambda bus: (_ for _ in ()).throw(RuntimeError("no bus")))
+    monkeypatch.setattr(readiness, "_nm_link_snapshot_nmcli", snapshot)
+    readiness.get_link_state()
+    readiness.get_link_state()
+    readiness.get_link_state()
+    assert len(reads) == 2
+
+
+def test_wifi_summary_skips_the_fxblox_hotspot(link_env, monkeypatch):
+    hotspot = {"id": "FxBlox", "type": "wifi", "device": "wlan1"}
+    home = {"id": "HomeNet", "type": "wifi", "device": "wlan0"}
+    monkeypatch.setattr(readiness, "_wireless_rssi_dbm", lambda dev: -60)
+    monkeypatch.setattr(readiness, "get_link_state", lambda max_age=60: {
+        "connections": [hotspot, home], "primary": hotspot, "ssid": "FxBlox",
+        "signal_pct": 100, "bitrate_kbps": 1, "rssi_dbm": -20, "gateway": "10.42.0.1"})
+    summary = readiness.get_wifi_info_and_ping()
+    assert "Connection: HomeNet" in summary and "Device: wlan0" in summary
+    assert "SSID: None" in summary and "rssi=-60dBm" in summary
+    monkeypatch.setattr(readiness, "get_link_state", lambda max_age=60: {
+        "connections": [hotspot], "primary": hotspot})
+    assert readiness.get_wifi_info_and_ping() == "No non-FxBlox WiFi connection found."
+
+
+def test_sampler_keeps_rolling_rtt_and_loss(link_env, monkeypatch):
+    monkeypatch.setattr(readiness, "get_link_state", lambda max_age=60: {
+        "gateway": "192.168.1.1", "primary": None, "connections": []})
+    rtts = iter([2.0, None, 4.0, 6.0, None, 8.0])
+    monkeypatch.setattr(readiness, "_probe_gateway_rtt", lambda gw: next(rtts))
+    for i in range(6):
+        readiness.sample_network(now=1000 + 10 * i)
+    state = json.loads((link_env / "network.state").read_text())
+    # Window is capped at 5 samples: the first (2.0ms) has rolled off.
+    assert state["series"] == [[1010, None], [1020, 4.0], [1030, 6.0], [1040, None], [1050, 8.0]]
+    assert state["gateway_rtt"]["window"] == {
+        "samples": 5, "loss_pct": 40.0, "rtt_avg_ms": 6.0, "rtt_p50_ms": 6.0, "rtt_max_ms": 8.0,
+    }
+    assert state["gateway_rtt"]["1m"]["samples"] == 5
+
+
+def test_udp_probe_counts_port_unreachable_as_reply():
+    rtt = readiness._probe_gateway_udp("127.0.0.1", timeout=1.0)
+    assert rtt is not None and rtt >= 0
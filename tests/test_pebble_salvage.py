@@ -0,0 +1,230 @@
+"""Pebble salvage — salvage_pebble_dir() in readiness-check.py.
+
+Builds fake pebble directories (MANIFEST/CURRENT/marker/OPTIONS/sst files)
+under tmp_path and checks which manifest ends up active.
+"""
+
+import json
+import os
+import struct
+
+import pytest
+
+from conftest import readiness
+
+
+@pytest.fixture
+def pebble(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(tmp_path / "events.jsonl"))
+    d = tmp_path / "pebble"
+    d.mkdir()
+    (d / "000010.sst").write_bytes(b"sst")
+    (d / "OPTIONS-000003").write_text("[Version]\n")
+    return d
+
+
+def _uvarint(n):
+    out = b""
+    while n >= 0x80:
+        out += bytes([n & 0x7F | 0x80])
+        n >>= 7
+    return out + bytes([n])
+
+
+def _bytes(b):
+    return _uvarint(len(b)) + b
+
+
+def _manifest(d, num, ssts=(10,), deleted=(), size=None):
+    """A MANIFEST whose final version holds ssts (tagNewFile4 edits, one log
+    record); size=0 writes an empty file."""
+    if size == 0:
+        (d / f"MANIFEST-{num:06d}").write_bytes(b"")
+        return
+    edit = bytes([1]) + _bytes(b"pebble.internal.testkeys")
+    for sst in ssts:
+        edit += (_uvarint(103) + _uvarint(0) + _uvarint(sst) + _uvarint(100)
+                 + _bytes(b"a\x01") + _bytes(b"z\x01") + _uvarint(1) + _uvarint(2) + _uvarint(1))
+    for sst in deleted:
+        edit += _uvarint(6) + _uvarint(0) + _uvarint(sst)
+    header = struct.pack("<IHB", 0, len(edit), 1)
+    (d / f"MANIFEST-{num:06d}").write_bytes(header + edit)
+
+
+def _active(d):
+    return readiness.inspect_pebble_dir(str(d))["active"]
+
+
+def test_inspect_reports_layout(pebble):
+    _manifest(pebble, 5)
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    info = readiness.inspect_pebble_dir(str(pebble))
+    assert [n for _num, n, _s in info["manifests"]] == ["MANIFEST-000005", "MANIFEST-000007"]
+    assert info["current"] == "MANIFEST-000007"
+    assert info["active"] == "MANIFEST-000007"
+    assert info["ssts"] == 1
+    assert info["marker"] is None
+
+
+def test_manifest_tables_follow_deletions(pebble):
+    _manifest(pebble, 5, ssts=(9, 10, 11), deleted=(9,))
+    assert readiness._pebble_manifest_tables(str(pebble / "MANIFEST-000005")) == {10, 11}
+    (pebble / "MANIFEST-000006").write_bytes(b"m" * 64)
+    assert readiness._pebble_manifest_tables(str(pebble / "MANIFEST-000006")) is None
+
+
+def test_missing_sst_rolls_back_to_previous_manifest(pebble):
+    _manifest(pebble, 5)
+    _manifest(pebble, 7, ssts=(10, 12))
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    summary = readiness.salvage_pebble_dir(
+        str(pebble), "pebble: 000012.sst: no such file or directory")
+    assert summary["ok"] is True
+    assert (pebble / "CURRENT").read_text() == "MANIFEST-000005\n"
+    assert not (pebble / "MANIFEST-000007").exists()
+    salvaged = [n for n in os.listdir(pebble) if n.startswith("salvaged-")]
+    assert len(salvaged) == 1 and salvaged[0].endswith("-MANIFEST-000007")
+
+
+def test_rollback_refused_when_older_manifest_lost_its_ssts(pebble):
+    # Compaction already deleted 000008.sst, which MANIFEST-5 still needs.
+    _manifest(pebble, 5, ssts=(8, 10))
+    _manifest(pebble, 7, ssts=(10, 12))
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    summary = readiness.salvage_pebble_dir(
+        str(pebble), "pebble: 000012.sst: no such file or directory")
+    assert summary["ok"] is False
+    assert summary["missing_ssts"] == [8]
+    assert (pebble / "CURRENT").read_text() == "MANIFEST-000007\n"
+    assert (pebble / "MANIFEST-000007").exists()
+
+
+def test_unverifiable_manifest_is_not_pointed_at(pebble):
+    (pebble / "MANIFEST-000005").write_bytes(b"m" * 64)
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    summary = readiness.salvage_pebble_dir(str(pebble), "pebble: corrupt")
+    assert summary["ok"] is False
+    assert summary["reason"] == "cannot verify sstables of MANIFEST-000005"
+
+
+def test_kubo_datastore_is_never_rolled_back(pebble):
+    _manifest(pebble, 5)
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    summary = readiness.salvage_pebble_dir(str(pebble), "pebble: corrupt", allow_rollback=False)
+    assert summary["ok"] is False
+    assert summary["reason"] == "rollback disabled for this database"
+    assert (pebble / "CURRENT").read_text() == "MANIFEST-000007\n"
+
+
+def test_current_pointing_at_empty_manifest_is_repointed(pebble):
+    _manifest(pebble, 5)
+    _manifest(pebble, 7, size=0)
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    summary = readiness.salvage_pebble_dir(str(pebble), "")
+    assert summary["ok"] is True
+    assert _active(pebble) == "MANIFEST-000005"
+    assert not (pebble / "MANIFEST-000007").exists()
+
+
+def test_garbage_current_points_at_newest_intact_manifest(pebble):
+    _manifest(pebble, 5)
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_bytes(b"\xff\xfe")
+    summary = readiness.salvage_pebble_dir(str(pebble), "")
+    assert summary["ok"] is True
+    assert (pebble / "CURRENT").read_text() == "MANIFEST-000007\n"
+
+
+def test_marker_based_db_advances_marker(pebble):
+    _manifest(pebble, 5)
+    _manifest(pebble, 7)
+    (pebble / "marker.manifest.000002.MANIFEST-000007").write_text("")
+    summary = readiness.salvage_pebble_dir(str(pebble), "could not open manifest file")
+    assert summary["ok"] is True
+    assert (pebble / "marker.manifest.000003.MANIFEST-000005").exists()
+    assert not (pebble / "marker.manifest.000002.MANIFEST-000007").exists()
+    assert not (pebble / "CURRENT").exists()
+    assert _active(pebble) == "MANIFEST-000005"
+
+
+def test_no_previous_manifest_means_wipe(pebble):
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    summary = readiness.salvage_pebble_dir(str(pebble), "could not open manifest file")
+    assert summary["ok"] is False
+    assert summary["reason"] == "no previous MANIFEST to roll back to"
+    assert (pebble / "MANIFEST-000007").exists()
+
+
+def test_unrecognised_error_with_healthy_pointers_means_wipe(pebble):
+    _manifest(pebble, 5)
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    summary = readiness.salvage_pebble_dir(str(pebble), "some other pebble failure")
+    assert summary["ok"] is False
+    assert summary["reason"] == "nothing to salvage"
+
+
+def _age(d, seconds):
+    """Backdate every file in d, as on a database last written long ago."""
+    old = os.path.getmtime(d) - seconds
+    for name in os.listdir(d):
+        os.utime(d / name, (old, old))
+
+
+def test_salvage_runs_once_per_window(pebble):
+    _manifest(pebble, 3)
+    _manifest(pebble, 5)
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    # The renamed MANIFEST keeps its 2h-old mtime; the gate must not rely on it.
+    _age(pebble, 2 * 3600)
+    assert readiness.salvage_pebble_dir(str(pebble), "pebble: corrupt")["ok"] is True
+    second = readiness.salvage_pebble_dir(str(pebble), "pebble: corrupt")
+    assert second["ok"] is False
+    assert second["reason"] == "salvage already attempted"
+    assert (pebble / "CURRENT").read_text() == "MANIFEST-000005\n"
+
+
+def test_pointer_only_repair_also_gates(pebble):
+    _manifest(pebble, 5)
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_bytes(b"\xff\xfe")
+    _age(pebble, 2 * 3600)
+    assert readiness.salvage_pebble_dir(str(pebble), "")["ok"] is True
+    assert not [n for n in os.listdir(pebble) if n.startswith("salvaged-")]
+    (pebble / "CURRENT").write_bytes(b"\xff\xfe")
+    assert readiness.salvage_pebble_dir(str(pebble), "")["reason"] == "salvage already attempted"
+
+
+def test_salvage_allowed_again_after_window(pebble, monkeypatch):
+    _manifest(pebble, 3)
+    _manifest(pebble, 5)
+    _manifest(pebble, 7)
+    (pebble / "CURRENT").write_text("MANIFEST-000007\n")
+    assert readiness.salvage_pebble_dir(str(pebble), "pebble: corrupt")["ok"] is True
+    later = readiness.time.time() + readiness.PEBBLE_SALVAGE_WINDOW + 60
+    monkeypatch.setattr(readiness.time, "time", lambda: later)
+    assert readiness.salvage_pebble_dir(str(pebble), "pebble: corrupt")["ok"] is True
+    assert (pebble / "CURRENT").read_text() == "MANIFEST-000003\n"
+
+
+def test_empty_options_file_is_set_aside(pebble):
+    _manifest(pebble, 5)
+    (pebble / "CURRENT").write_text("MANIFEST-000005\n")
+    (pebble / "OPTIONS-000006").write_text("")
+    summary = readiness.salvage_pebble_dir(str(pebble), "")
+    assert summary["ok"] is True
+    assert not (pebble / "OPTIONS-000006").exists()
+    assert (pebble / "OPTIONS-000003").exists()
+
+
+def test_salvage_logs_event(pebble, tmp_path):
+    readiness.salvage_pebble_dir(str(pebble / "missing"), "")
+    (event,) = [json.loads(l) for l in (tmp_path / "events.jsonl").read_text().splitlines()]
+    assert event["category"] == "pebble-salvage"
+    assert event["detail"]["ok"] is False
+    assert event["detail"]["reason"] == "missing"
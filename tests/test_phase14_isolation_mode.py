@@ -84,6 +84,17 @@ def test_discovery_unreachable_returns_true_when_ok_is_false(monkeypatch, tmp_pa
     assert iso._discovery_unreachable() is True
 
 
+def test_discovery_unreachable_prefers_state_store(monkeypatch, tmp_path):
+    """The consolidated store wins over a stale compatibility file."""
+    path = tmp_path / "discovery.state"
+    path.write_text(json.dumps({"ok": True}))
+    store = tmp_path / "fula-state.json"
+    store.write_text(json.dumps({"format": 1, "sections": {"discovery": {"data": {"ok": False}}}}))
+    monkeypatch.setattr(iso, "DISCOVERY_STATE_PATH", str(path))
+    monkeypatch.setattr(iso, "STATE_STORE_PATH", str(store))
+    assert iso._discovery_unreachable() is True
+
+
 # ---------------------------------------------------------------------------
 # _filter_recommended_actions
 # ---------------------------------------------------------------------------
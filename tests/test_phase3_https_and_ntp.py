@@ -330,6 +330,10 @@ def time_state(tmp_path, monkeypatch):
     monkeypatch.setattr(readiness, "TIME_STATE_PATH", str(p))
     # Reset rate limiter each test
     monkeypatch.setattr(readiness, "_last_ntp_correct_attempt", 0.0)
+    # These tests drive the subprocess fallback; the native readers would
+    # otherwise answer from the host's real clock.
+    monkeypatch.setattr(readiness, "_native_ntp_synced", lambda: (None, None))
+    monkeypatch.setattr(readiness, "_native_ntp_daemon", lambda: None)
     return p
 
 
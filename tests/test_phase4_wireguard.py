@@ -12,8 +12,8 @@ Covers:
   - active + age > threshold + keepalive set → bounce
   - active + age > 300s + null keepalive → bounce
   - active + clock skew (age<0) → don't bounce
-  - rate-limited → skip
-  - 3-strike escalation → use longer cooldown
+  - rate-limited → skip (backoff kept in the remediation ledger)
+  - 3 failed bounces → refused for REMEDIATION_REFUSE_SEC, across restarts
   - bounce success → consec_failures resets
   - bounce up-failure → consec_failures increments
   - internet-down guard → skip when discovery state says ok=false recently
@@ -35,12 +35,19 @@ from conftest import readiness
 # _read_wireguard_status
 # ---------------------------------------------------------------------------
 
+@pytest.fixture
+def status_sh_fallback(monkeypatch):
+    """These tests cover the status.sh path used when wireguard_status.py
+    isn't installed."""
+    monkeypatch.setattr(readiness, "wireguard_status", None)
+
+
 def _mock_status_run(stdout, rc=0):
     r = MagicMock(); r.stdout = stdout; r.returncode = rc; r.stderr = ""
     return r
 
 
-def test_read_wireguard_status_parses_full_json():
+def test_read_wireguard_status_parses_full_json(status_sh_fallback):
     out = json.dumps({
         "installed": True, "registered": True, "active": True,
         "endpoint": "1.2.3.4:51820", "assigned_ip": "10.250.0.1",
@@ -57,7 +64,7 @@ def test_read_wireguard_status_parses_full_json():
     assert parsed["last_handshake_age_sec"] == 42
 
 
-def test_read_wireguard_status_returns_error_on_nonzero_rc():
+def test_read_wireguard_status_returns_error_on_nonzero_rc(status_sh_fallback):
     with patch.object(readiness, "subprocess") as mock_sub:
         mock_sub.run.return_value = _mock_status_run("", rc=1)
         mock_sub.TimeoutExpired = readiness.subprocess.TimeoutExpired
@@ -66,7 +73,7 @@ def test_read_wireguard_status_returns_error_on_nonzero_rc():
     assert "status_sh rc=1" in err
 
 
-def test_read_wireguard_status_returns_error_on_malformed_json():
+def test_read_wireguard_status_returns_error_on_malformed_json(status_sh_fallback):
     with patch.object(readiness, "subprocess") as mock_sub:
         mock_sub.run.return_value = _mock_status_run("{not json")
         mock_sub.TimeoutExpired = readiness.subprocess.TimeoutExpired
@@ -75,7 +82,7 @@ def test_read_wireguard_status_returns_error_on_malformed_json():
     assert "parse_error" in err
 
 
-def test_read_wireguard_status_handles_subprocess_oserror():
+def test_read_wireguard_status_handles_subprocess_oserror(status_sh_fallback):
     with patch.object(readiness, "subprocess") as mock_sub:
         mock_sub.run.side_effect = FileNotFoundError("no bash")
         mock_sub.TimeoutExpired = readiness.subprocess.TimeoutExpired
@@ -136,17 +143,23 @@ def test_internet_likely_down_tolerates_malformed_state(discovery_state):
 def wg_state(tmp_path, monkeypatch):
     p = tmp_path / "fula-wireguard.state"
     monkeypatch.setattr(readiness, "WIREGUARD_STATE_PATH", str(p))
-    # Always start with no rate-limit and fresh escalation counter
-    monkeypatch.setattr(readiness, "_last_wg_bounce_attempt", 0.0)
-    monkeypatch.setattr(readiness, "_consec_wg_bounce_failures", 0)
-    # Bypass the one-shot hydration so tests don't accidentally read leftover
-    # state from a sibling test (each test gets a fresh tmp_path so the state
-    # file is missing — but the flag persists across test invocations within
-    # the same module, so reset it explicitly here).
-    monkeypatch.setattr(readiness, "_wg_counter_hydrated", False)
+    # conftest gives every test an empty remediation ledger, so there's no
+    # rate-limit and no escalation to start with.
     return p
 
 
+def _seed_bounce_failures(count, at):
+    """Record count failed bounces at time at, as an earlier cycle would."""
+    for _ in range(count):
+        readiness.record_remediation(readiness.WG_BOUNCE_SIGNATURE, readiness.WG_BOUNCE_ACTION,
+                                     False, 1.0, now=at)
+
+
+def _bounce_entry():
+    return readiness.remediation_action_state(readiness.WG_BOUNCE_SIGNATURE,
+                                              readiness.WG_BOUNCE_ACTION)
+
+
 def _patch_status_returns(parsed, error=None):
     """Helper: makes _read_wireguard_status return the given parsed dict."""
     return patch.object(readiness, "_read_wireguard_status",
@@ -185,10 +198,10 @@ def test_wg_check_gives_grace_when_never_handshook(wg_state):
     assert state["remediation"] is None
 
 
-def test_wg_check_healthy_path_resets_escalation_counter(wg_state, monkeypatch):
+def test_wg_check_healthy_path_resets_escalation_counter(wg_state):
     """Fresh handshake (within keepalive window) resets consec_failures to 0
     so a recovered tunnel doesn't stay in backoff forever."""
-    monkeypatch.setattr(readiness, "_consec_wg_bounce_failures", 2)
+    _seed_bounce_failures(2, _time_mod.time())
     with _patch_status_returns({"installed": True, "registered": True,
                                 "active": True, "last_handshake_age_sec": 10,
                                 "persistent_keepalive_sec": 25}):
@@ -196,15 +209,16 @@ def test_wg_check_healthy_path_resets_escalation_counter(wg_state, monkeypatch):
     assert ok is True
     state = json.loads(wg_state.read_text())
     assert state["consec_failures"] == 0
-    # The module-level counter was reset
-    assert readiness._consec_wg_bounce_failures == 0
+    # The ledger entry was reset, backoff included
+    assert _bounce_entry()["consec_failures"] == 0
+    assert _bounce_entry()["next_allowed"] == 0
 
 
-def test_wg_check_does_not_reset_counter_when_age_is_between_keepalive_and_threshold(wg_state, monkeypatch):
+def test_wg_check_does_not_reset_counter_when_age_is_between_keepalive_and_threshold(wg_state):
     """If keepalive=25 and age=100, that's > 1 keepalive but < 3*keepalive
     threshold (still under 180s floor). Healthy enough not to bounce, but
     not fresh enough to confirm recovery — escalation counter unchanged."""
-    monkeypatch.setattr(readiness, "_consec_wg_bounce_failures", 2)
+    _seed_bounce_failures(2, _time_mod.time())
     with _patch_status_returns({"installed": True, "registered": True,
                                 "active": True, "last_handshake_age_sec": 100,
                                 "persistent_keepalive_sec": 25}):
@@ -212,6 +226,7 @@ def test_wg_check_does_not_reset_counter_when_age_is_between_keepalive_and_thres
     assert ok is True
     state = json.loads(wg_state.read_text())
     assert state["consec_failures"] == 2  # NOT reset
+    assert _bounce_entry()["consec_failures"] == 2
 
 
 def test_wg_check_clock_skew_negative_age_does_not_bounce(wg_state):
@@ -280,7 +295,7 @@ def test_wg_check_bounce_attempt_ok_but_no_fresh_handshake_counts_as_failure(wg_
     assert state["remediation_ok"] is False
     # CRITICAL: counter incremented (would have been a false-zero before fix)
     assert state["consec_failures"] == 1
-    assert readiness._consec_wg_bounce_failures == 1
+    assert _bounce_entry()["consec_failures"] == 1
 
 
 def test_wg_check_bounces_when_null_keepalive_and_age_over_300s(wg_state):
@@ -315,9 +330,9 @@ def test_wg_check_does_not_bounce_null_keepalive_age_under_300s(wg_state):
     assert state["remediation"] is None
 
 
-def test_wg_check_rate_limited_skips_bounce(wg_state, monkeypatch):
-    """Within cooldown window → no bounce even if stale."""
-    monkeypatch.setattr(readiness, "_last_wg_bounce_attempt", _time_mod.time())
+def test_wg_check_rate_limited_skips_bounce(wg_state):
+    """Within the backoff after a failed bounce → no bounce even if stale."""
+    _seed_bounce_failures(1, _time_mod.time())
     with _patch_status_returns({"installed": True, "registered": True,
                                 "active": True, "last_handshake_age_sec": 500,
                                 "persistent_keepalive_sec": 25}):
@@ -327,13 +342,11 @@ def test_wg_check_rate_limited_skips_bounce(wg_state, monkeypatch):
     assert state["remediation"] == "rate_limited"
 
 
-def test_wg_check_3_strike_escalates_to_longer_cooldown(wg_state, monkeypatch):
-    """After 3 consec failures, the cooldown should become WG_BOUNCE_BACKOFF_SEC
-    (30 min) rather than WG_BOUNCE_COOLDOWN_SEC (5 min)."""
-    monkeypatch.setattr(readiness, "_consec_wg_bounce_failures", 3)
-    # last bounce was 10 min ago — past the 5-min cooldown but inside the 30-min backoff
-    monkeypatch.setattr(readiness, "_last_wg_bounce_attempt",
-                        _time_mod.time() - 600)
+def test_wg_check_3_strike_escalates_to_longer_cooldown(wg_state):
+    """After REMEDIATION_REFUSE_AFTER failed bounces the tunnel is left alone
+    for REMEDIATION_REFUSE_SEC, well past the plain doubling backoff."""
+    # last bounce was 2h ago — past any backoff step but inside the refusal
+    _seed_bounce_failures(readiness.REMEDIATION_REFUSE_AFTER, _time_mod.time() - 7200)
     with _patch_status_returns({"installed": True, "registered": True,
                                 "active": True, "last_handshake_age_sec": 500,
                                 "persistent_keepalive_sec": 25}):
@@ -374,70 +387,47 @@ def test_wg_check_bounce_failure_increments_consec_failures(wg_state):
     assert state["remediation_ok"] is False
     assert state["consec_failures"] == 1
     assert "address in use" in state["remediation_stderr"]
-    assert readiness._consec_wg_bounce_failures == 1
-
-
-def test_wg_check_hydrates_counter_from_state_file_on_first_call(tmp_path, monkeypatch):
-    """Per built-in advisor: module-level counter resets on daemon restart
-    (Phase 2's recovery service triggers exactly that). Without hydration,
-    the 3-strike backoff would be silently wiped on every supervisor restart.
-    Must read consec_failures back from /run/fula-wireguard.state on the
-    first call after process start."""
-    state_path = tmp_path / "fula-wireguard.state"
-    # Pre-populate the state file as if a prior daemon instance left it
-    state_path.write_text(json.dumps({
-        "last_check_ts": "2026-05-24T00:00:00Z",
-        "installed": True, "registered": True, "active": True,
-        "last_handshake_age_sec": 500, "persistent_keepalive_sec": 25,
-        "consec_failures": 3,  # ← prior daemon recorded 3 failures
-    }))
-    monkeypatch.setattr(readiness, "WIREGUARD_STATE_PATH", str(state_path))
-    monkeypatch.setattr(readiness, "_last_wg_bounce_attempt", _time_mod.time() - 100)
-    # Process just (re)started: hydration flag is False, counter is 0
-    monkeypatch.setattr(readiness, "_consec_wg_bounce_failures", 0)
-    monkeypatch.setattr(readiness, "_wg_counter_hydrated", False)
-
-    # Stale tunnel + within normal cooldown (300s) but PAST backoff entry (since
-    # hydrated counter is 3, cooldown becomes 1800s; 100s elapsed → rate_limited_backoff)
+    assert _bounce_entry()["consec_failures"] == 1
+
+
+def test_wg_check_backoff_survives_a_daemon_restart(wg_state):
+    """Phase 2's recovery service restarts this daemon; the backoff lives in
+    the remediation ledger on disk, so a restart must not wipe it."""
+    _seed_bounce_failures(3, _time_mod.time() - 100)
+    # Process just (re)started: the ledger is read back from disk
+    readiness._remediation_state = None
+
     with _patch_status_returns({"installed": True, "registered": True,
                                 "active": True, "last_handshake_age_sec": 500,
                                 "persistent_keepalive_sec": 25}):
         ok = readiness.check_wireguard_handshake_age()
 
     assert ok is False
-    state = json.loads(state_path.read_text())
-    # Counter was hydrated to 3 → cooldown is the long backoff
+    state = json.loads(wg_state.read_text())
     assert state["remediation"] == "rate_limited_backoff"
     assert state["consec_failures"] == 3
-    # Confirm the module-level counter actually got hydrated
-    assert readiness._consec_wg_bounce_failures == 3
-
-
-def test_wg_check_hydration_runs_only_once(tmp_path, monkeypatch):
-    """Subsequent calls (within the same process) must NOT re-hydrate;
-    that would let a later state-file write get re-read and clobber the
-    current in-memory counter mid-process."""
-    state_path = tmp_path / "fula-wireguard.state"
-    monkeypatch.setattr(readiness, "WIREGUARD_STATE_PATH", str(state_path))
-    monkeypatch.setattr(readiness, "_consec_wg_bounce_failures", 0)
-    monkeypatch.setattr(readiness, "_wg_counter_hydrated", False)
-    monkeypatch.setattr(readiness, "_last_wg_bounce_attempt", 0.0)
-
-    # First call: no state file, counter stays at 0, hydration flag flips True
-    with _patch_status_returns({"installed": False, "registered": False,
-                                "active": False, "last_handshake_age_sec": None}):
-        readiness.check_wireguard_handshake_age()
-    assert readiness._wg_counter_hydrated is True
-    assert readiness._consec_wg_bounce_failures == 0
 
-    # Now write a state file with consec_failures=5 (simulating a parallel write)
-    state_path.write_text(json.dumps({"consec_failures": 5}))
 
-    # Second call: hydration is already done → counter must NOT be re-read
-    with _patch_status_returns({"installed": False, "registered": False,
-                                "active": False, "last_handshake_age_sec": None}):
-        readiness.check_wireguard_handshake_age()
-    assert readiness._consec_wg_bounce_failures == 0  # NOT 5
+def test_wg_check_bounces_again_once_the_refusal_expires(wg_state):
+    """A permanently broken upstream gets one probation bounce per
+    REMEDIATION_REFUSE_SEC rather than none ever again."""
+    _seed_bounce_failures(3, _time_mod.time() - readiness.REMEDIATION_REFUSE_SEC - 60)
+    status_calls = iter([
+        ({"installed": True, "registered": True, "active": True,
+          "last_handshake_age_sec": 500, "persistent_keepalive_sec": 25}, None),
+        ({"installed": True, "registered": True, "active": True,
+          "last_handshake_age_sec": 5, "persistent_keepalive_sec": 25}, None),
+    ])
+    with patch.object(readiness, "_read_wireguard_status",
+                      side_effect=lambda: next(status_calls)), \
+         patch.object(readiness, "subprocess") as mock_sub, \
+         patch.object(readiness.time, "sleep"):
+        mock_sub.run.return_value = _mock_status_run("", rc=0)
+        mock_sub.TimeoutExpired = readiness.subprocess.TimeoutExpired
+        ok = readiness.check_wireguard_handshake_age()
+    assert ok is True
+    assert _bounce_entry()["consec_failures"] == 0
+    assert _bounce_entry()["successes"] == 1
 
 
 def test_wg_check_internet_down_guard_skips_bounce(wg_state, tmp_path, monkeypatch):
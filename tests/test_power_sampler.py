@@ -0,0 +1,111 @@
+"""Power/thermal sampler — sample_power() / power_summary() in
+readiness-check.py.
+
+A fake sysfs tree (thermal zones, one regulator, one cpufreq policy) lives in
+tmp_path; values are rewritten between samples to simulate a spike, a
+brownout dip and a thermal frequency cap.
+"""
+
+import json
+import os
+from collections import deque
+
+import jsonschema
+import pytest
+
+from conftest import readiness, _LINUX_DIR
+
+_DIAG_SCHEMA_PATH = os.path.join(_LINUX_DIR, "plugins", "blox-ai", "api", "diag_responses.schema.json")
+
+
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    zones = [tmp_path / "thermal" / f"thermal_zone{i}" for i in range(2)]
+    reg = tmp_path / "regulator" / "regulator.3"
+    policy = tmp_path / "cpufreq" / "policy4"
+    for d in zones + [reg, policy / "stats"]:
+        d.mkdir(parents=True)
+    files = {
+        "t0": zones[0] / "temp", "t1": zones[1] / "temp",
+        "uv": reg / "microvolts", "min_uv": reg / "min_microvolts",
+        "cap": policy / "scaling_max_freq", "hw_max": policy / "cpuinfo_max_freq",
+        "tis": policy / "stats" / "time_in_state",
+    }
+    monkeypatch.setattr(readiness, "_SYS_THERMAL_GLOB", str(tmp_path / "thermal/thermal_zone*/temp"))
+    monkeypatch.setattr(readiness, "_SYS_REGULATOR_GLOB", str(tmp_path / "regulator/regulator.*"))
+    monkeypatch.setattr(readiness, "_SYS_CPUFREQ_GLOB", str(tmp_path / "cpufreq/policy*"))
+    monkeypatch.setattr(readiness, "POWER_STATE_PATH", str(tmp_path / "power.state"))
+    monkeypatch.setattr(readiness, "POWER_SAMPLE_INTERVAL_SEC", 2)
+    monkeypatch.setattr(readiness, "_power_sources", None)
+    monkeypatch.setattr(readiness, "_power_files", {})
+    monkeypatch.setattr(readiness, "_power_temps", deque(maxlen=10))
+    monkeypatch.setattr(readiness, "_power_ratios", deque(maxlen=10))
+    monkeypatch.setattr(readiness, "_power_caps", {})
+    monkeypatch.setattr(readiness, "_power_tis", {})
+    monkeypatch.setattr(readiness, "_power_snapshot", {})
+    yield files
+    for f in readiness._power_files.values():
+        f.close()
+
+
+def _set(files, **values):
+    for key, value in values.items():
+        files[key].write_text(f"{value}\n")
+
+
+def test_window_captures_spike_dip_and_cap(sysfs):
+    _set(sysfs, t0=50000, t1=55000, uv=900000, min_uv=800000, cap=2256000, hw_max=2256000,
+         tis="408000 100\n2256000 100\n")
+    for i in range(8):
+        readiness.sample_power(now=1000 + 2 * i)
+    _set(sysfs, t0=86500, uv=680000, cap=1608000, tis="408000 400\n2256000 200\n")
+    readiness.sample_power(now=1016)
+    _set(sysfs, t0=50000, uv=900000, cap=2256000)
+    readiness.sample_power(now=1018)
+
+    summary = readiness.power_summary()
+    assert summary["thermal"] == {
+        "samples": 10, "min": 55.0, "p50": 55.0, "p95": 86.5, "max": 86.5,
+        "threshold": 80.0, "past_threshold_s": 2,
+    }
+    assert summary["soc_voltage"]["min"] == 0.85
+    assert summary["soc_voltage"]["past_threshold_s"] == 2
+    # One of ten samples capped; 300 of 400 new ticks spent below 2.256GHz.
+    assert summary["cpu_throttle"] == {"policy4": {"capped_pct": 10.0, "below_max_pct": 75.0}}
+
+
+def test_ring_keeps_only_the_window(sysfs):
+    _set(sysfs, t0=90000, t1=20000)
+    readiness.sample_power(now=0)
+    _set(sysfs, t0=40000)
+    for i in range(1, 11):
+        readiness.sample_power(now=2 * i)
+    assert readiness.power_summary()["thermal"]["max"] == 40.0
+
+
+def test_sysfs_files_stay_open_between_samples(sysfs):
+    _set(sysfs, t0=40000, t1=41000)
+    readiness.sample_power(now=0)
+    handle = readiness._power_files[str(sysfs["t0"])]
+    _set(sysfs, t0=42000)
+    readiness.sample_power(now=2)
+    assert readiness._power_files[str(sysfs["t0"])] is handle
+    assert [v for _ts, v in readiness._power_temps] == [41.0, 42.0]
+
+
+def test_state_file_merges_snapshot_and_validates(sysfs):
+    _set(sysfs, t0=61000, t1=60000, uv=850000, min_uv=800000, cap=1800000, hw_max=2256000,
+         tis="1800000 10\n")
+    readiness.sample_power(now=0)
+    readiness._power_snapshot.update({"uptime_s": 1234, "max_temp_c": 61.0})
+    readiness._write_power_state()
+    state = json.loads(open(readiness.POWER_STATE_PATH).read())
+    assert state["uptime_s"] == 1234 and state["thermal"]["max"] == 61.0
+    with open(_DIAG_SCHEMA_PATH) as f:
+        schema = json.load(f)
+    jsonschema.validate(state, {**schema, "$ref": "#/$defs/power"})
+
+
+def test_no_sources_publishes_nothing_extra(sysfs):
+    readiness.sample_power(now=0)
+    assert readiness.power_summary() == {}
@@ -0,0 +1,81 @@
+"""DNS/HTTPS reachability race — race_reachability() in readiness-check.py.
+
+_probe_target is replaced with a table of (delay, ok) per target so the race
+runs for real on threads without touching the network.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from conftest import readiness
+
+
+@pytest.fixture
+def race(tmp_path, monkeypatch):
+    state = tmp_path / "reachability.state"
+    monkeypatch.setattr(readiness, "REACHABILITY_STATE_PATH", str(state))
+    monkeypatch.setattr(readiness, "_reachability_scores", None)
+    monkeypatch.setattr(readiness, "REACHABILITY_STAGGER_SEC", 0.05)
+    plan = {}
+    started = []
+    lock = threading.Lock()
+
+    def probe(kind, target, timeout):
+        with lock:
+            started.append(target)
+        delay, ok = plan.get(target, (0, False))
+        time.sleep(delay)
+        if isinstance(ok, Exception):
+            raise ok
+        return ok
+
+    monkeypatch.setattr(readiness, "_probe_target", probe)
+    return {"plan": plan, "started": started, "state": state}
+
+
+def _targets(*names):
+    return [("icmp", n) for n in names]
+
+
+def test_first_success_wins_without_waiting_for_slow_targets(race):
+    race["plan"].update({"a": (2.0, True), "b": (0.0, True)})
+    t0 = time.monotonic()
+    assert readiness.race_reachability(_targets("a", "b"), timeout=5) == ("icmp", "b")
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_failures_launch_next_target_immediately(race):
+    race["plan"].update({"a": (0, False), "b": (0, RuntimeError("boom")), "c": (0, True)})
+    assert readiness.race_reachability(_targets("a", "b", "c"), timeout=5) == ("icmp", "c")
+    assert race["started"] == ["a", "b", "c"]
+
+
+def test_all_failing_returns_none(race):
+    assert readiness.race_reachability(_targets("a", "b"), timeout=1) is None
+    state = json.loads(race["state"].read_text())
+    assert state["last_winner"] is None
+    assert state["targets"]["icmp:a"]["consecutive_fail"] == 1
+
+
+def test_scoreboard_puts_fastest_known_good_first(race):
+    readiness._record_reachability("icmp:slow", True, 400)
+    readiness._record_reachability("icmp:fast", True, 20)
+    readiness._record_reachability("icmp:dead", False, 5000)
+    ranked = readiness._rank_reachability_targets(_targets("dead", "new", "slow", "fast"))
+    assert ranked == _targets("fast", "slow", "new", "dead")
+
+
+def test_scoreboard_persists_across_restart(race, monkeypatch):
+    race["plan"]["a"] = (0, True)
+    readiness.race_reachability(_targets("a"), timeout=1)
+    monkeypatch.setattr(readiness, "_reachability_scores", None)
+    assert readiness._load_reachability_scores()["icmp:a"]["ok"] == 1
+    assert json.loads(race["state"].read_text())["last_winner"] == "icmp:a"
+
+
+def test_check_dns_reachable_keeps_google_fallback(race):
+    race["plan"]["google.com"] = (0, True)
+    assert readiness.check_dns_reachable(timeout=1) == "google.com"
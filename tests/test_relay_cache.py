@@ -0,0 +1,156 @@
+"""Shared discovery /relays cache — relay_cache.py and its two consumers.
+
+A scripted fetcher stands in for the network; CACHE_PATH is redirected to
+tmp_path by the autouse fixture in conftest.
+"""
+
+import json
+import logging
+import threading
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from conftest import readiness, update_kubo_config
+import relay_cache
+
+URL = "https://discovery.fula.network/relays"
+RELAYS = [{"peerId": "PA", "addr": "/dns/a/tcp/4001", "multiaddr": "/dns/a/tcp/4001/p2p/PA"}]
+NEWER = RELAYS + [{"peerId": "PB", "addr": "/dns/b/tcp/4001", "multiaddr": "/dns/b/tcp/4001/p2p/PB"}]
+
+
+class Fetcher:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, url, headers, timeout):
+        self.calls.append(dict(headers))
+        r = self.responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+def _age_cache(seconds):
+    record = relay_cache.load_cache()
+    record["validated_at"] -= seconds
+    relay_cache.save_cache(record)
+
+
+def test_fresh_cache_is_served_without_a_request():
+    fetch = Fetcher((200, '"v1"', RELAYS))
+    assert relay_cache.get_relays(URL, fetch=fetch) == RELAYS
+    assert relay_cache.get_relays(URL, fetch=fetch) == RELAYS
+    assert len(fetch.calls) == 1
+    assert relay_cache.load_cache()["etag"] == '"v1"'
+
+
+def test_stale_cache_revalidates_with_if_none_match():
+    fetch = Fetcher((200, '"v1"', RELAYS), (304, '"v1"', None))
+    relay_cache.get_relays(URL, fetch=fetch)
+    _age_cache(7200)
+    assert relay_cache.get_relays(URL, fetch=fetch) == RELAYS
+    assert fetch.calls[1]["if-none-match"] == '"v1"'
+    # The 304 refreshed validated_at, so the next call is served locally.
+    assert relay_cache.get_relays(URL, fetch=fetch) == RELAYS
+    assert len(fetch.calls) == 2
+
+
+def test_not_modified_does_not_rewrite_the_cache_file():
+    relay_cache.store_response(200, '"v1"', RELAYS, now=1000)
+    before = open(relay_cache.CACHE_PATH).read()
+    assert relay_cache.store_response(304, '"v1"', None, now=5000) == (RELAYS, "not-modified")
+    assert open(relay_cache.CACHE_PATH).read() == before
+    assert relay_cache.validated_at(relay_cache.load_cache()) == 5000
+    # A later content change invalidates the in-memory stamp.
+    relay_cache.store_response(200, '"v2"', NEWER, now=6000)
+    assert relay_cache.validated_at(relay_cache.load_cache()) == 6000
+
+
+def test_changed_list_replaces_cache_and_reports_outcome():
+    relay_cache.store_response(200, None, RELAYS)
+    relays, outcome = relay_cache.revalidate(URL, fetch=Fetcher((200, None, NEWER)))
+    assert (relays, outcome) == (NEWER, "changed")
+    _relays, outcome = relay_cache.revalidate(URL, fetch=Fetcher((200, None, NEWER)))
+    assert outcome == "unchanged"
+
+
+def test_stale_if_error_serves_last_known_good():
+    relay_cache.get_relays(URL, fetch=Fetcher((200, None, RELAYS)))
+    _age_cache(7200)
+    assert relay_cache.get_relays(URL, fetch=Fetcher(OSError("offline"))) == RELAYS
+    assert relay_cache.get_relays(URL, fetch=Fetcher(OSError("offline")), allow_stale=False) is None
+
+
+def test_too_old_cache_is_not_served(monkeypatch):
+    relay_cache.get_relays(URL, fetch=Fetcher((200, None, RELAYS)))
+    _age_cache(relay_cache.STALE_MAX_SEC + 10)
+    assert relay_cache.get_relays(URL, fetch=Fetcher((503, None, None))) is None
+
+
+def test_stale_while_revalidate_returns_immediately():
+    relay_cache.get_relays(URL, fetch=Fetcher((200, None, RELAYS)))
+    _age_cache(7200)
+    fetch = Fetcher((200, None, NEWER))
+    assert relay_cache.get_relays(URL, fetch=fetch, background=True) == RELAYS
+    for t in [t for t in threading.enumerate() if t.name == "relay-cache-revalidate"]:
+        t.join(timeout=5)
+    assert relay_cache.load_cache()["relays"] == NEWER
+
+
+def test_invalid_payload_leaves_cache_untouched():
+    relay_cache.store_response(200, None, RELAYS)
+    assert relay_cache.store_response(200, None, [{"peerId": "x"}]) == (None, "invalid")
+    assert relay_cache.load_cache()["relays"] == RELAYS
+
+
+def test_update_kubo_config_uses_cache_offline(monkeypatch):
+    relay_cache.store_response(200, None, RELAYS)
+    _age_cache(7200)
+    monkeypatch.setattr(relay_cache, "urllib_fetch", Fetcher(OSError("no route")))
+    assert update_kubo_config.fetch_relays_from_discovery_api(logging.getLogger("t")) == RELAYS
+
+
+def test_discovery_probe_revalidates_cache_with_304(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "DISCOVERY_STATE_PATH", str(tmp_path / "discovery.state"))
+    monkeypatch.setattr(readiness, "DISCOVERY_API_URL", "https://discovery.fula.network")
+    relay_cache.store_response(200, '"v1"', RELAYS)
+    _age_cache(7200)
+    r = MagicMock(status_code=304)
+    r.headers = {"ETag": '"v1"'}
+    with patch.object(readiness, "requests") as mock_req:
+        mock_req.get.return_value = r
+        mock_req.Timeout = requests.Timeout
+        mock_req.ConnectionError = requests.ConnectionError
+        assert readiness.check_discovery_https_reachable() is True
+        assert mock_req.get.call_args.kwargs["headers"]["if-none-match"] == '"v1"'
+        # Drift detection now reuses the just-validated list: no second GET.
+        mock_req.get.reset_mock()
+        assert readiness.fetch_discovery_relays() == RELAYS
+        mock_req.get.assert_not_called()
+
+
+def test_discovery_probe_skips_body_without_etag(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "DISCOVERY_STATE_PATH", str(tmp_path / "discovery.state"))
+    monkeypatch.setattr(readiness, "DISCOVERY_API_URL", "https://discovery.fula.network")
+    r = MagicMock(status_code=200)
+    r.headers = {}
+    with patch.object(readiness, "requests") as mock_req:
+        mock_req.get.return_value = r
+        mock_req.Timeout = requests.Timeout
+        mock_req.ConnectionError = requests.ConnectionError
+        assert readiness.check_discovery_https_reachable() is True
+    r.json.assert_not_called()
+    assert relay_cache.load_cache() is None
+
+
+def test_discovery_probe_without_etag_treats_304_as_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "DISCOVERY_STATE_PATH", str(tmp_path / "discovery.state"))
+    monkeypatch.setattr(readiness, "DISCOVERY_API_URL", "https://discovery.fula.network")
+    with patch.object(readiness, "requests") as mock_req:
+        mock_req.get.return_value = MagicMock(status_code=304)
+        mock_req.Timeout = requests.Timeout
+        mock_req.ConnectionError = requests.ConnectionError
+        assert readiness.check_discovery_https_reachable() is False
+    assert json.loads((tmp_path / "discovery.state").read_text())["error"] == "http_304"
@@ -0,0 +1,104 @@
+"""Relay scoreboard — score_relays() / rank_relay_multiaddrs() in
+readiness-check.py and rank_relays() in update_kubo_config.py, both thin
+adapters over relay_cache.load_relay_scores() / rank_by_score().
+
+The kubo API is faked per relay (swarm/connect + ping responses); scores
+land in a tmp_path file that both sides read.
+"""
+
+import json
+import logging
+from unittest.mock import MagicMock
+
+import pytest
+
+from conftest import readiness, update_kubo_config
+
+A = "/dns/a.relay/tcp/4001/p2p/PA"
+B = "/dns/b.relay/tcp/4001/p2p/PB"
+C = "/dns/c.relay/tcp/4001/p2p/PC"
+
+
+def _ping_body(*ms):
+    lines = [json.dumps({"Success": False, "Time": 0, "Text": "PING PX"})]
+    lines += [json.dumps({"Success": True, "Time": int(m * 1e6), "Text": ""}) for m in ms]
+    return "\n".join(lines)
+
+
+@pytest.fixture
+def kubo(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "RELAY_SCORES_PATH", str(tmp_path / "relay_scores.json"))
+    relays = {}  # peer id -> (connect ok, [ping ms])
+
+    def post(url, params=None, timeout=None):
+        m = MagicMock()
+        arg = params["arg"]
+        if url.endswith("/swarm/connect"):
+            ok, _ = relays[arg.rsplit("/p2p/", 1)[-1]]
+            if ok is None:
+                raise readiness.requests.Timeout("dial timeout")
+            m.json.return_value = {"Strings": [f"connect {arg} success" if ok else "failure"]}
+        else:
+            m.text = _ping_body(*relays[arg][1])
+        return m
+
+    monkeypatch.setattr(readiness.requests, "post", post)
+    return relays
+
+
+def test_probe_relay_reports_median_ping(kubo):
+    kubo["PA"] = (True, [30.0, 10.0, 20.0])
+    assert readiness._probe_relay(A) == (True, 20.0)
+
+
+def test_score_relays_updates_ewma_and_persists(kubo, tmp_path):
+    kubo.update({"PA": (True, [80.0]), "PB": (True, [20.0]), "PC": (None, [])})
+    readiness.score_relays([A, B, C])
+    kubo["PA"] = (True, [40.0])
+    scores = readiness.score_relays([A, B, C])
+    assert scores[A]["ewma_ms"] == pytest.approx(0.3 * 40 + 0.7 * 80)
+    assert scores[A]["samples"] == 2
+    assert scores[C]["success_ewma"] == 0.0 and scores[C]["ewma_ms"] is None
+    assert json.loads((tmp_path / "relay_scores.json").read_text()) == scores
+    assert readiness.rank_relay_multiaddrs([A, B, C]) == [B, A, C]
+
+
+def test_unconfigured_relays_drop_out(kubo):
+    kubo.update({"PA": (True, [10.0]), "PB": (True, [10.0])})
+    readiness.score_relays([A, B])
+    assert set(readiness.score_relays([A])) == {A}
+
+
+def test_rank_puts_unscored_between_healthy_and_failing():
+    scores = {
+        A: {"ewma_ms": 50.0, "success_ewma": 0.2},   # flaky
+        C: {"ewma_ms": 90.0, "success_ewma": 1.0},
+    }
+    assert readiness.rank_relay_multiaddrs([A, B, C], scores) == [C, B, A]
+
+
+def test_update_kubo_config_orders_relays_by_scoreboard(tmp_path):
+    scores_path = tmp_path / "relay_scores.json"
+    scores_path.write_text(json.dumps({
+        A: {"ewma_ms": 120.0, "success_ewma": 1.0},
+        B: {"ewma_ms": 15.0, "success_ewma": 0.9},
+        C: {"ewma_ms": None, "success_ewma": 0.0},
+    }))
+    relays = [{"peerId": p, "addr": m.rsplit("/p2p/", 1)[0], "multiaddr": m}
+              for p, m in (("PA", A), ("PB", B), ("PC", C))]
+    config = {}
+    scores = update_kubo_config.load_relay_scores(str(scores_path))
+    changes = update_kubo_config.apply_relays_from_discovery(
+        config, relays, logging.getLogger("test"), scores=scores)
+    assert config["Swarm"]["RelayClient"]["StaticRelays"] == [B, A, C]
+    assert [p["ID"] for p in config["Peering"]["Peers"]] == ["PB", "PA", "PC"]
+    assert len(changes) == 2
+    # Same ranking rule on both sides.
+    assert readiness.rank_relay_multiaddrs([A, B, C], scores) == [B, A, C]
+
+
+def test_missing_scoreboard_keeps_discovery_order(tmp_path):
+    relays = [{"peerId": "PA", "addr": "/a", "multiaddr": A},
+              {"peerId": "PB", "addr": "/b", "multiaddr": B}]
+    assert update_kubo_config.rank_relays(
+        relays, update_kubo_config.load_relay_scores(str(tmp_path / "none"))) == relays
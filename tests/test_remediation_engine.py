@@ -0,0 +1,149 @@
+"""Remediation engine — run_remediation() and the per-signature ledger in
+readiness-check.py.
+
+time.time() is a fake clock; ladder steps are plain callables returning a
+scripted outcome. conftest points REMEDIATION_STATE_PATH at tmp_path.
+"""
+
+import json
+
+import pytest
+
+from conftest import readiness
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    clock = {"t": 1_000_000.0}
+    monkeypatch.setattr(readiness.time, "time", lambda: clock["t"])
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(tmp_path / "events.jsonl"))
+    clock["state"] = lambda: json.loads((tmp_path / "remediation.json").read_text())
+    clock["events"] = lambda: [json.loads(l) for l in (tmp_path / "events.jsonl").read_text().splitlines()]
+    return clock
+
+
+def _step(outcomes, calls, name):
+    def fn():
+        calls.append(name)
+        return outcomes.pop(0)
+    return fn
+
+
+def test_failure_backs_off_then_doubles(ledger):
+    calls = []
+    ladder = [("targeted-restart", _step([False, False], calls, "targeted"))]
+    assert readiness.run_remediation("proxy-down", ladder, "ports down") is False
+    # Within the 300s backoff nothing runs.
+    ledger["t"] += 200
+    assert readiness.run_remediation("proxy-down", ladder, "ports down") is None
+    ledger["t"] += 150
+    assert readiness.run_remediation("proxy-down", ladder, "ports down") is False
+    entry = ledger["state"]()["signatures"]["proxy-down"]["actions"]["targeted-restart"]
+    assert entry["next_allowed"] - ledger["t"] == 600
+    assert calls == ["targeted", "targeted"]
+    assert ledger["events"]()[1]["detail"]["outcome"] == "refused"
+
+
+def test_repeated_failure_is_refused_and_ladder_escalates(ledger):
+    calls = []
+    ladder = [("targeted-restart", _step([False] * 3, calls, "targeted")),
+              ("stack-restart", _step([True], calls, "stack"))]
+    for _ in range(3):
+        readiness.run_remediation("container-down:ipfs_cluster", ladder[:1], "not running")
+        ledger["t"] += readiness.REMEDIATION_BACKOFF_MAX_SEC
+    assert readiness.remediation_blocked("container-down:ipfs_cluster", "targeted-restart").startswith("refused")
+    # Other signatures are unaffected.
+    assert readiness.remediation_blocked("container-down:fula_go", "targeted-restart") is None
+    assert readiness.run_remediation("container-down:ipfs_cluster", ladder, "not running") is True
+    assert calls == ["targeted"] * 3 + ["stack"]
+    sig = ledger["state"]()["signatures"]["container-down:ipfs_cluster"]
+    assert (sig["last_action"], sig["recoveries"], sig["episode_start"]) == ("stack-restart", 1, None)
+    assert sig["time_to_recover_s"] == 3 * readiness.REMEDIATION_BACKOFF_MAX_SEC
+    detail = ledger["events"]()[-1]["detail"]
+    assert detail["skipped"] == {"targeted-restart": "refused after 3 failed attempts"}
+    # After the refusal window one probation attempt is allowed.
+    ledger["t"] += readiness.REMEDIATION_REFUSE_SEC
+    assert readiness.remediation_blocked("container-down:ipfs_cluster", "targeted-restart") is None
+
+
+def test_fix_that_does_not_hold_counts_as_failure(ledger):
+    calls = []
+    ladder = [("stack-restart", _step([True, True], calls, "stack"))]
+    assert readiness.run_remediation("relay-swarm-down", ladder, "relays down")
+    ledger["t"] += 40 * 60
+    assert readiness.run_remediation("relay-swarm-down", ladder, "relays down") is None
+    entry = ledger["state"]()["signatures"]["relay-swarm-down"]["actions"]["stack-restart"]
+    assert (entry["successes"], entry["failures"], entry["last_outcome"]) == (0, 1, "recurred")
+
+
+def test_ledger_survives_restart(ledger, monkeypatch):
+    readiness.run_remediation("peerid-collision", [("regenerate-cluster-identity", lambda: False)], "collision")
+    monkeypatch.setattr(readiness, "_remediation_state", None)
+    ledger["t"] += 10
+    assert readiness.remediation_blocked("peerid-collision", "regenerate-cluster-identity") == "backoff, 290s left"
+
+
+def test_raising_step_is_a_failure(ledger):
+    def boom():
+        raise OSError("docker socket gone")
+
+    assert readiness.run_remediation("proxy-down", [("targeted-restart", boom)], "ports down") is False
+    assert ledger["state"]()["signatures"]["proxy-down"]["last_outcome"] == "failed"
+
+
+def test_log_pattern_fix_backs_off_instead_of_restarting_every_cycle(ledger, tmp_path, monkeypatch):
+    env = tmp_path / ".env"
+    monkeypatch.setattr(readiness, "ENV_FILE_PATH", str(env))
+    restarts = []
+    monkeypatch.setattr(readiness, "_restart_stack", lambda caller: restarts.append(caller) or False)
+    env.write_bytes(b"\x00" * 64)
+    assert readiness.check_and_fix_env_file() is True
+    # Corrupted again next cycle: the file is still rewritten, the restart waits.
+    ledger["t"] += 60
+    env.write_bytes(b"\x00" * 64)
+    assert readiness.check_and_fix_env_file() is False
+    assert b"\x00" not in env.read_bytes()
+    assert restarts == ["check_and_fix_env_file"]
+    # Another kind of corruption has its own signature.
+    env.write_text("not a key value line\n")
+    assert readiness.check_and_fix_env_file() is True
+    assert set(ledger["state"]()["signatures"]) == {"env-file:null-bytes", "env-file:format"}
+
+
+def test_config_yaml_restart_is_gated_per_pattern(ledger, monkeypatch):
+    logs = {"fula_go": "Failed to unmarshal YAML config"}
+    monkeypatch.setattr(readiness.subprocess, "getoutput", lambda cmd: logs["fula_go"])
+    exists = readiness.os.path.exists
+    monkeypatch.setattr(readiness.os.path, "exists",
+                        lambda path: path == "/home/pi/.internal/config.yaml" or exists(path))
+    # The config itself is fine (the control-character read fails harmlessly here).
+    monkeypatch.setattr(readiness, "validate_yaml_syntax", lambda path: (True, None))
+    restarts = []
+    monkeypatch.setattr(readiness, "_restart_stack", lambda caller: restarts.append(caller) or True)
+    assert readiness.check_and_fix_config_yaml() is True
+    # The line is still in the log tail ten minutes later: the restart didn't
+    # hold, and it isn't repeated.
+    ledger["t"] += 600
+    assert readiness.check_and_fix_config_yaml() is False
+    assert len(restarts) == 1
+    sig = "config-yaml:failed-to-unmarshal-yaml-config"
+    assert ledger["state"]()["signatures"][sig]["actions"]["stack-restart"]["last_outcome"] == "recurred"
+    logs["fula_go"] = "The initipfs exited with an error: Exit code 1"
+    assert readiness.check_and_fix_config_yaml() is True
+    assert len(restarts) == 2
+
+
+def test_restart_ladder_applies_the_fix_on_either_step(monkeypatch):
+    fixes, steps = [], []
+
+    def restart_containers(failed, reason, while_stopped=None, escalate=True):
+        steps.append(("targeted", escalate))
+        while_stopped()
+        return False
+
+    monkeypatch.setattr(readiness, "restart_containers", restart_containers)
+    monkeypatch.setattr(readiness, "_restart_stack", lambda remediation: steps.append(remediation) or True)
+    ladder = readiness.restart_ladder("ipfs_cluster", "stale cluster.lock", while_stopped=lambda: fixes.append(1))
+    assert [fn() for _, fn in ladder] == [False, True]
+    assert steps == [("targeted", False), "ipfs_cluster:stack-restart"]
+    assert fixes == [1, 1]
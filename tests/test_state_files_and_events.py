@@ -1,7 +1,7 @@
 """Tests for Layer 1.8 — state file writers + events.jsonl helper in readiness-check.py.
 
 These cover the atomic-write helper, the events.jsonl appender (including
-size-based rotation), the post_heartbeat state-file capture across each
+size-based rotation), the _start_periodic loop helper, the post_heartbeat state-file capture across each
 exit branch (no-discovery-URL, no-signing-key, no-circuits, POST success,
 POST failure, rate-limited), and the _append_event wiring at safe_restart_fula
 / safe_start_fula / activate_wireguard_support call sites.
@@ -12,6 +12,7 @@ so they don't touch /run or /var/log.
 
 import json
 import os
+import threading
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -141,6 +142,31 @@ def test_append_event_does_not_raise_on_unwritable_log(monkeypatch, caplog):
     # Either silently swallowed, or warning logged — both OK; just must not raise.
 
 
+# ---------------------------------------------------------------------------
+# _start_periodic
+# ---------------------------------------------------------------------------
+
+
+def test_start_periodic_survives_exceptions_and_is_idempotent(monkeypatch):
+    monkeypatch.setattr(readiness, "_periodic_threads", {})
+    calls = []
+    done = threading.Event()
+    parked = threading.Event()
+
+    def tick():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("first run fails")
+        if len(calls) == 3:
+            done.set()
+            parked.wait()  # park the daemon thread once the test has what it needs
+
+    thread = readiness._start_periodic("test-periodic", tick, 0.01)
+    assert readiness._start_periodic("test-periodic", tick, 0.01) is thread
+    assert done.wait(timeout=5)
+    assert thread.name == "test-periodic" and thread.daemon
+
+
 # ---------------------------------------------------------------------------
 # _write_heartbeat_state
 # ---------------------------------------------------------------------------
@@ -169,8 +195,9 @@ def test_write_heartbeat_state_captures_all_fields(tmp_path, monkeypatch):
 def heartbeat_state(tmp_path, monkeypatch):
     p = tmp_path / "hb.state"
     monkeypatch.setattr(readiness, "HEARTBEAT_STATE_PATH", str(p))
-    # Reset rate limiter so the function actually runs.
+    # Reset rate limiter and backoff schedule so the function actually runs.
     readiness._last_heartbeat = 0
+    readiness._reset_heartbeat_schedule()
     return p
 
 
@@ -0,0 +1,87 @@
+"""Consolidated state store — state_store.py and its use from
+readiness-check.py (mirrored writes, store-first reads, exporter view).
+
+conftest points state_store.STORE_PATH at tmp_path and resets the writer.
+"""
+
+import json
+
+import pytest
+
+from conftest import readiness, state_store
+
+
+def test_sections_roundtrip_with_generations():
+    state_store.update("heartbeat", {"http_status": 200}, now=1000.0)
+    state_store.update("discovery", {"ok": True}, now=1005.0)
+    state_store.update("heartbeat", {"http_status": 503}, now=1010.0)
+    doc = state_store.load()
+    assert doc["generation"] == 3
+    assert doc["sections"]["heartbeat"]["generation"] == 3
+    assert doc["sections"]["discovery"]["updated_epoch"] == 1005.0
+    assert doc["sections"]["discovery"]["updated"] == "1970-01-01T00:16:45Z"
+    assert state_store.snapshot() == {"heartbeat": {"http_status": 503}, "discovery": {"ok": True}}
+    assert state_store.section("time") is None
+
+
+def test_writer_keeps_a_private_copy():
+    data = {"ok": False}
+    state_store.update("discovery", data)
+    data["ok"] = True
+    state_store.update("time", {"synced": True})
+    assert state_store.section("discovery") == {"ok": False}
+
+
+def test_restarted_writer_keeps_other_sections():
+    state_store.update("power", {"max_temp_c": 60.0})
+    state_store.reset()
+    state_store.update("time", {"synced": True})
+    assert set(state_store.snapshot()) == {"power", "time"}
+    assert state_store.load()["generation"] == 2
+
+
+@pytest.mark.parametrize("name,data,exc", [
+    ("bogus", {}, ValueError),
+    ("time", ["not", "an", "object"], ValueError),
+    ("time", {"when": object()}, TypeError),
+])
+def test_rejects_untyped_updates(name, data, exc):
+    with pytest.raises(exc):
+        state_store.update(name, data)
+
+
+@pytest.mark.parametrize("content", ["{not json", json.dumps({"format": 99, "sections": {}}), "[]"])
+def test_unreadable_store_is_empty(content):
+    with open(state_store.STORE_PATH, "w") as f:
+        f.write(content)
+    assert state_store.snapshot() == {}
+
+
+def test_state_file_writes_are_mirrored(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "TIME_STATE_PATH", str(tmp_path / "time.state"))
+    readiness._atomic_write_state(readiness.TIME_STATE_PATH, {"synced": False, "offset_ms": 9})
+    # The compatibility view is still written.
+    assert json.loads((tmp_path / "time.state").read_text())["offset_ms"] == 9
+    assert state_store.section("time") == {"synced": False, "offset_ms": 9}
+    # Files that aren't state sections (persistent ledgers) stay out of the store.
+    readiness._atomic_write_state(str(tmp_path / "remediation.json"), {"signatures": {}})
+    assert set(state_store.snapshot()) == {"time"}
+
+
+def test_readers_prefer_the_store(tmp_path, monkeypatch):
+    discovery = tmp_path / "discovery.state"
+    discovery.write_text(json.dumps({"ok": True}))
+    monkeypatch.setattr(readiness, "DISCOVERY_STATE_PATH", str(discovery))
+    assert readiness._internet_likely_down() is False
+    recent = readiness.datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    state_store.update("discovery", {"ok": False, "last_check_ts": recent})
+    assert readiness._internet_likely_down() is True
+
+
+def test_exporter_reads_one_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(readiness, "TIME_STATE_PATH", str(tmp_path / "missing-time.state"))
+    state_store.update("time", {"synced": True, "offset_ms": 4}, now=2000.0)
+    samples = dict(line.rsplit(" ", 1) for line in readiness.render_openmetrics().splitlines()
+                   if not line.startswith("#"))
+    assert samples["fula_time_offset_seconds"] == "0.004"
+    assert samples['fula_state_updated_timestamp_seconds{section="time"}'] == "2000"
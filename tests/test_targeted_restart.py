@@ -0,0 +1,94 @@
+"""Targeted restarts — plan_restart() / restart_containers() in
+readiness-check.py.
+
+docker stop/start and the init hooks go through conftest's recorded_run;
+wait_until_healthy() and safe_restart_fula() are stubbed so the fallback path
+can be driven directly.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import readiness
+
+
+@pytest.fixture
+def docker(tmp_path, monkeypatch, recorded_run):
+    env = SimpleNamespace(missing=set(), healthy=[True], waits=[], full_restarts=0, tmp=tmp_path)
+
+    def respond(cmd):
+        if cmd[:2] == ["sudo", "docker"] and cmd[-1] in env.missing:
+            return 1, ""
+
+    def wait(remediation, checks=readiness.HEALTH_CHECKS, deadline=None):
+        env.waits.append((remediation, tuple(checks)))
+        return env.healthy.pop(0)
+
+    def full_restart(**kwargs):
+        env.full_restarts += 1
+
+    recorded_run.respond = respond
+    monkeypatch.setattr(readiness, "wait_until_healthy", wait)
+    monkeypatch.setattr(readiness, "safe_restart_fula", full_restart)
+    monkeypatch.setattr(readiness, "FULA_PATH", str(tmp_path))
+    return env
+
+
+def _docker_calls(calls):
+    return [(c[2], c[3]) for c in calls if c[:2] == ["sudo", "docker"]]
+
+
+@pytest.mark.parametrize("failed,plan", [
+    ("ipfs_host", ["ipfs_host", "ipfs_cluster", "ipfs_local", "fula_gateway", "fula_pinning"]),
+    ("ipfs_cluster", ["ipfs_cluster"]),
+    ("ipfs_local", ["ipfs_local", "fula_gateway", "fula_pinning"]),
+    ("fula_go", ["fula_go"]),
+    ("blox-ai", ["blox-ai"]),
+])
+def test_plan_restart_follows_dependency_graph(failed, plan):
+    assert readiness.plan_restart(failed) == plan
+
+
+def test_cluster_fault_leaves_kubo_and_go_fula_running(docker, recorded_run, events_log):
+    removed = []
+    assert readiness.restart_containers("ipfs_cluster", "stale cluster.lock",
+                                        while_stopped=lambda: removed.append(_docker_calls(recorded_run.calls)))
+    # go-fula (proxy/BLE) doesn't depend on the cluster and keeps running.
+    assert _docker_calls(recorded_run.calls) == [("stop", "ipfs_cluster"), ("start", "ipfs_cluster")]
+    # The lock is removed only once the cluster is stopped.
+    assert removed == [[("stop", "ipfs_cluster")]]
+    assert docker.waits == [("targeted-restart:ipfs_cluster", ("containers", "cluster"))]
+    # Cluster init hook ran before its start; kubo's did not.
+    chmods = [c[-1] for c in recorded_run.calls if c[1] == "chmod"]
+    assert chmods == [str(docker.tmp / "ipfs-cluster" / "ipfs-cluster-container-init.d.sh")]
+    assert docker.full_restarts == 0
+    event = events_log("restart")[-1]
+    assert event["detail"]["plan"] == ["ipfs_cluster"]
+    assert event["detail"]["escalated"] is False
+
+
+def test_kubo_restart_reruns_config_merge(docker, recorded_run):
+    (docker.tmp / "update_kubo_config.py").write_text("")
+    readiness.restart_containers("ipfs_host", "ipfs_host not running")
+    merge = ["sudo", "python3", str(docker.tmp / "update_kubo_config.py")]
+    assert merge in recorded_run.calls
+    # Merge happens before kubo starts.
+    assert recorded_run.calls.index(merge) < recorded_run.calls.index(["sudo", "docker", "start", "ipfs_host"])
+
+
+def test_missing_container_falls_back_to_full_restart(docker, events_log):
+    docker.missing = {"fula_go"}
+    docker.healthy = [True]
+    assert readiness.restart_containers("fula_go", "proxy ports unreachable") is True
+    assert docker.full_restarts == 1
+    assert docker.waits == [("targeted-restart:fula_go:escalated", readiness.HEALTH_CHECKS)]
+    assert events_log("restart")[-1]["detail"]["escalated"] is True
+
+
+def test_unhealthy_after_targeted_restart_escalates(docker, events_log):
+    docker.healthy = [False, False]
+    assert readiness.restart_containers("ipfs_local", "ipfs_local not running") is False
+    assert docker.full_restarts == 1
+    detail = events_log("restart")[-1]["detail"]
+    assert (detail["escalated"], detail["healthy"]) == (True, False)
@@ -0,0 +1,181 @@
+"""Rename-to-trash wipes + background reaper in readiness-check.py.
+
+Branches are tmp_path directories; `sudo` (and the reaper's ionice/nice
+prefix) is stripped and the remaining command runs for real, so renames and
+deletes happen on disk.
+"""
+
+import json
+import os
+import subprocess
+
+import pytest
+
+from conftest import readiness
+
+_real_run = subprocess.run
+
+
+def _strip_privilege(args):
+    args = list(args)
+    if args[:1] == ["sudo"]:
+        args = args[1:]
+    if args[:2] == ["ionice", "-c3"]:
+        args = args[2:]
+    if args[:3] == ["ionice", "-c2", "-n7"]:
+        args = args[3:]
+    if args[:3] == ["nice", "-n", "19"]:
+        args = args[3:]
+    return args
+
+
+@pytest.fixture
+def trash_env(tmp_path, monkeypatch):
+    union = tmp_path / "uniondrive"
+    union.mkdir()
+    branches = [tmp_path / "media" / "disk1", tmp_path / "media" / "disk2"]
+    for b in branches:
+        b.mkdir(parents=True)
+    monkeypatch.setattr(readiness, "UNIONDRIVE_PATH", str(union))
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(tmp_path / "events.jsonl"))
+    monkeypatch.setattr(readiness, "_list_mounted_branches",
+                        lambda: {str(b): b.name for b in branches})
+    calls = []
+
+    def fake_run(args, **kwargs):
+        calls.append(list(args))
+        return _real_run(_strip_privilege(args), **kwargs)
+
+    monkeypatch.setattr(readiness.subprocess, "run", fake_run)
+    # Keep the reaper out of the way unless a test drives it directly.
+    started = []
+    monkeypatch.setattr(readiness, "_start_trash_reaper", lambda: started.append(True))
+
+    def populate(branch, rel, n=3):
+        d = branch / rel
+        d.mkdir(parents=True)
+        for i in range(n):
+            (d / f"{i:06d}.sst").write_text("x" * 100)
+        return d
+
+    return {"union": union, "branches": branches, "calls": calls,
+            "started": started, "populate": populate, "tmp": tmp_path}
+
+
+def test_trash_dir_renames_every_branch_copy(trash_env):
+    b1, b2 = trash_env["branches"]
+    trash_env["populate"](b1, "ipfs-cluster/pebble")
+    trash_env["populate"](b2, "ipfs-cluster/pebble")
+
+    ok, err = readiness._trash_dir(str(trash_env["union"] / "ipfs-cluster" / "pebble"))
+
+    assert (ok, err) == (True, "")
+    for b in (b1, b2):
+        assert not (b / "ipfs-cluster" / "pebble").exists()
+        (entry,) = os.listdir(b / ".fula-trash")
+        assert entry.endswith("-ipfs-cluster_pebble")
+        assert len(os.listdir(b / ".fula-trash" / entry)) == 3
+    assert not any(c[:3] == ["sudo", "rm", "-rf"] for c in trash_env["calls"])
+    assert trash_env["started"] == [True]
+
+
+def test_trash_dir_name_collision_gets_suffix(trash_env, monkeypatch):
+    b1, _ = trash_env["branches"]
+    target = str(trash_env["union"] / "ipfs_datastore" / "datastore")
+    trash_env["populate"](b1, "ipfs_datastore/datastore")
+    readiness._trash_dir(target)
+    trash_env["populate"](b1, "ipfs_datastore/datastore")
+    readiness._trash_dir(target)
+    entries = sorted(os.listdir(b1 / ".fula-trash"))
+    assert len(entries) == 2
+    assert entries[1].endswith(".1") or entries[0][:16] != entries[1][:16]
+
+
+def test_trash_dir_outside_uniondrive_falls_back_to_rm(trash_env):
+    other = trash_env["tmp"] / "elsewhere"
+    other.mkdir()
+    (other / "f").write_text("x")
+    ok, _ = readiness._trash_dir(str(other))
+    assert ok is True
+    assert not other.exists()
+    assert any(c[:3] == ["sudo", "rm", "-rf"] for c in trash_env["calls"])
+    assert trash_env["started"] == []
+
+
+def test_trash_dir_failed_rename_falls_back_to_rm(trash_env, monkeypatch):
+    b1, _ = trash_env["branches"]
+    trash_env["populate"](b1, "ipfs_datastore/blocks")
+    union_copy = trash_env["populate"](trash_env["union"], "ipfs_datastore/blocks")
+
+    def failing_run(args, **kwargs):
+        trash_env["calls"].append(list(args))
+        if args[:2] == ["sudo", "mv"]:
+            return subprocess.CompletedProcess(args, 1, "", "mv: Invalid cross-device link")
+        return _real_run(_strip_privilege(args), **kwargs)
+
+    monkeypatch.setattr(readiness.subprocess, "run", failing_run)
+    ok, _ = readiness._trash_dir(str(union_copy))
+    assert ok is True
+    assert not union_copy.exists()
+    assert trash_env["started"] == []
+
+
+def test_reaper_deletes_trash_and_logs_event(trash_env):
+    b1, b2 = trash_env["branches"]
+    trash_env["populate"](b1, ".fula-trash/20260101T000000Z-ipfs-cluster_pebble")
+    trash_env["populate"](b2, ".fula-trash/20260101T000000Z-ipfs-cluster_pebble")
+
+    for mountpoint, entry in readiness._list_trash_entries():
+        assert readiness._reap_trash_entry(mountpoint, entry) is True
+
+    assert readiness._list_trash_entries() == []
+    events = [json.loads(l) for l in (trash_env["tmp"] / "events.jsonl").read_text().splitlines()]
+    assert [e["category"] for e in events] == ["trash-reaped", "trash-reaped"]
+    assert all(e["detail"]["ok"] for e in events)
+    assert all(e["detail"]["reclaimed_bytes"] is not None for e in events)
+    assert ["sudo", "ionice", "-c3", "nice", "-n", "19", "rm", "-rf"] == trash_env["calls"][0][:8]
+
+
+def test_reaper_thread_drains_and_exits(trash_env, monkeypatch):
+    b1, _ = trash_env["branches"]
+    trash_env["populate"](b1, ".fula-trash/a")
+    trash_env["populate"](b1, ".fula-trash/b")
+    monkeypatch.undo()  # restore the real _start_trash_reaper, then re-patch the rest
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(trash_env["tmp"] / "events.jsonl"))
+    monkeypatch.setattr(readiness, "_list_mounted_branches", lambda: {str(b1): "disk1"})
+    monkeypatch.setattr(readiness.subprocess, "run",
+                        lambda args, **kw: _real_run(_strip_privilege(args), **kw))
+    monkeypatch.setattr(readiness, "_trash_reaper_thread", None)
+
+    readiness._start_trash_reaper()
+    thread = readiness._trash_reaper_thread
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert os.listdir(b1 / ".fula-trash") == []
+    assert readiness._trash_reaper_thread is None
+
+
+def test_reclaim_tier_hands_trash_to_urgent_reaper(tmp_path, monkeypatch):
+    branch = tmp_path / "disk1"
+    (branch / ".fula-trash" / "a").mkdir(parents=True)
+    (branch / ".fula-trash" / "a" / "000001.sst").write_text("x" * 100)
+    monkeypatch.setattr(readiness, "EVENTS_LOG_PATH", str(tmp_path / "events.jsonl"))
+    monkeypatch.setattr(readiness, "_list_mounted_branches", lambda: {str(branch): "disk1"})
+    calls = []
+    monkeypatch.setattr(readiness.subprocess, "run",
+                        lambda args, **kw: calls.append(list(args)) or _real_run(_strip_privilege(args), **kw))
+    monkeypatch.setattr(readiness, "_trash_reaper_thread", None)
+    real_sleep = readiness.time.sleep
+    monkeypatch.setattr(readiness.time, "sleep", lambda s: real_sleep(0.05))
+
+    # Sizing the trash would walk it; the tier only knows whether it's empty.
+    assert readiness._estimate_trash() is None
+    readiness._reclaim_trash(lambda: not os.listdir(branch / ".fula-trash"))
+    thread = readiness._trash_reaper_thread
+    if thread is not None:
+        thread.join(timeout=10)
+    assert os.listdir(branch / ".fula-trash") == []
+    assert calls == [["sudo", "ionice", "-c2", "-n7", "nice", "-n", "19", "rm", "-rf",
+                      str(branch / ".fula-trash" / "a")]]
+    assert readiness._estimate_trash() == 0
+    assert not readiness._trash_urgent.is_set()
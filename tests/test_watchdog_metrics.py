@@ -0,0 +1,77 @@
+"""Watchdog metrics — @instrumented / timed_check / watchdog_cycle_*() in
+readiness-check.py and /run/fula-watchdog-metrics.json.
+
+time.perf_counter() is a fake clock where durations matter; conftest points
+WATCHDOG_METRICS_PATH at tmp_path.
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import readiness
+
+
+@pytest.fixture
+def metrics(tmp_path, monkeypatch):
+    clock = {"t": 0.0}
+    monkeypatch.setattr(readiness, "_metrics", {"checks": {}, "cycles": {}})
+    monkeypatch.setattr(readiness, "_metrics_open_cycles", {})
+    monkeypatch.setattr(readiness, "_metrics_last_write", 0.0)
+    monkeypatch.setattr(readiness.time, "perf_counter", lambda: clock["t"])
+    clock["file"] = lambda: json.loads((tmp_path / "watchdog-metrics.json").read_text())
+    return clock
+
+
+def test_instrumented_records_durations_and_percentiles(metrics):
+    @readiness.instrumented
+    def check_thing(seconds):
+        metrics["t"] += seconds
+        return seconds < 5
+
+    for seconds in range(1, 11):
+        check_thing(seconds)
+    assert check_thing.__name__ == "check_thing"
+    m = readiness.watchdog_metrics()["checks"]["check_thing"]
+    assert (m["count"], m["errors"], m["window"]) == (10, 0, 10)
+    assert (m["p50_s"], m["p95_s"], m["max_s"], m["last_s"]) == (5, 10, 10, 10)
+    assert m["last_result"] is False
+
+
+def test_exception_counts_as_error_and_propagates(metrics):
+    @readiness.instrumented
+    def check_broken():
+        raise OSError("no such device")
+
+    with pytest.raises(OSError):
+        check_broken()
+    m = readiness.watchdog_metrics()["checks"]["check_broken"]
+    assert (m["count"], m["errors"]) == (1, 1)
+    assert m["last_error"] == "OSError: no such device"
+
+
+def test_subprocess_spawns_are_attributed(metrics):
+    with readiness.timed_check("check_spawning"):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        subprocess.getoutput("true")
+    with readiness.timed_check("check_quiet"):
+        pass
+    checks = readiness.watchdog_metrics()["checks"]
+    assert checks["check_spawning"]["last_spawns"] == 2
+    assert checks["check_quiet"]["spawns"] == 0
+
+
+def test_cycle_writes_snapshot(metrics):
+    readiness.watchdog_cycle_begin("monitor")
+    with readiness.timed_check("check_conditions"):
+        metrics["t"] += 3
+    metrics["t"] += 1
+    readiness.watchdog_cycle_end("monitor")
+    # Closing an already closed cycle is a no-op.
+    readiness.watchdog_cycle_end("monitor")
+    snapshot = metrics["file"]()
+    assert snapshot["cycles"]["monitor"]["count"] == 1
+    assert snapshot["cycles"]["monitor"]["last_s"] == 4
+    assert snapshot["checks"]["check_conditions"]["last_s"] == 3
@@ -0,0 +1,105 @@
+"""Shared WireGuard status provider — wireguard_status.py and its callers.
+
+`wg show support dump` output is canned; /sys/class/net, the key files and
+the registration state live in tmp_path.
+"""
+
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from conftest import readiness, local_command_server
+import wireguard_status
+
+NOW = 1_700_000_000
+
+
+def _dump(now):
+    return (
+        "cHJpdmF0ZQ==\tcHVibGlj\t51820\toff\n"
+        f"UEVFUjE=\t(none)\t203.0.113.7:51820\t10.250.0.0/24\t{int(now) - 42}\t1000\t2000\t25\n"
+        "UEVFUjI=\t(none)\t(none)\t10.251.0.0/24\t0\t5\t7\toff\n"
+    )
+
+
+@pytest.fixture
+def wg_env(tmp_path, monkeypatch):
+    net = tmp_path / "net"
+    net.mkdir()
+    keys = [tmp_path / "support_private.key", tmp_path / "support_public.key"]
+    for k in keys:
+        k.write_text("k")
+    reg = tmp_path / "registration.state"
+    reg.write_text("endpoint=vpn.fx.land:51820\nassigned_ip=10.250.0.9\npeer_id=12D3Koo\n")
+    monkeypatch.setattr(wireguard_status, "SYS_CLASS_NET", str(net))
+    monkeypatch.setattr(wireguard_status, "KEY_PATHS", tuple(str(k) for k in keys))
+    monkeypatch.setattr(wireguard_status, "REGISTRATION_STATE_PATH", str(reg))
+    monkeypatch.setattr(wireguard_status.shutil, "which", lambda name: "/usr/bin/wg")
+    calls = []
+
+    def dump(interface):
+        calls.append(interface)
+        return _dump(time.time())
+
+    monkeypatch.setattr(wireguard_status, "_wg_dump", dump)
+    wireguard_status.invalidate()
+    yield {"net": net, "reg": reg, "calls": calls}
+    wireguard_status.invalidate()
+
+
+def test_parse_dump_skips_interface_line_and_reads_peers():
+    peers = wireguard_status.parse_dump(_dump(NOW))
+    assert [p["public_key"] for p in peers] == ["UEVFUjE=", "UEVFUjI="]
+    assert peers[0]["endpoint"] == "203.0.113.7:51820"
+    assert peers[1]["endpoint"] is None
+    assert (peers[0]["persistent_keepalive_sec"], peers[1]["persistent_keepalive_sec"]) == (25, None)
+
+
+def test_status_matches_status_sh_shape(wg_env):
+    (wg_env["net"] / "support").mkdir()
+    status = wireguard_status.read_status(read_dump=lambda _if: _dump(NOW), now=NOW)
+    assert {k: status[k] for k in status if k != "peers"} == {
+        "installed": True, "registered": True, "active": True,
+        "endpoint": "vpn.fx.land:51820", "assigned_ip": "10.250.0.9",
+        "peer_id_registered": "12D3Koo",
+        "last_handshake_age_sec": 42, "rx_bytes": 1005, "tx_bytes": 2007,
+        "persistent_keepalive_sec": 25,
+    }
+
+
+def test_inactive_interface_skips_wg(wg_env):
+    wg_env["reg"].unlink()
+    status = wireguard_status.read_status()
+    assert (status["active"], status["registered"], status["endpoint"]) == (False, False, "")
+    assert status["last_handshake_age_sec"] is None and status["rx_bytes"] is None
+    assert wg_env["calls"] == []
+
+
+def test_negative_age_is_not_clamped():
+    peers = [{"latest_handshake": NOW + 30, "rx_bytes": 0, "tx_bytes": 0,
+              "persistent_keepalive_sec": None}]
+    assert wireguard_status.aggregate(peers, now=NOW)["last_handshake_age_sec"] == -30
+
+
+def test_callers_share_one_cached_read(wg_env):
+    (wg_env["net"] / "support").mkdir()
+    parsed, err = readiness._read_wireguard_status()
+    assert err is None and parsed["active"] is True
+    server = local_command_server.LocalCommandServer(plugin_manifest_glob="/nonexistent/*")
+    assert server._wireguard_status()["rx_bytes"] == 1005
+    assert len(wg_env["calls"]) == 1
+    wireguard_status.invalidate()
+    readiness._read_wireguard_status()
+    assert len(wg_env["calls"]) == 2
+
+
+def test_handshake_check_writes_state_without_status_sh(wg_env, tmp_path, monkeypatch):
+    (wg_env["net"] / "support").mkdir()
+    monkeypatch.setattr(readiness, "WIREGUARD_STATE_PATH", str(tmp_path / "wg.state"))
+    with patch.object(readiness, "subprocess") as mock_sub:
+        assert readiness.check_wireguard_handshake_age() is True
+        mock_sub.run.assert_not_called()
+    state = json.loads((tmp_path / "wg.state").read_text())
+    assert state["persistent_keepalive_sec"] == 25 and state["rx_bytes"] == 1005